@@ -0,0 +1,560 @@
+"""
+Load Driver
+
+Runs a mixed name / phone / image workload against the real app
+(`uvicorn main:app` in a subprocess) with every upstream served by the
+local stand-ins (benchmarks/stubs.py), and reports:
+- Throughput and latency percentiles (p50/p90/p95/p99/max) per workload
+- Status codes (errors are counted, not retried)
+- App process RSS (start, peak while under load, end) and CPU time per
+  request (steadier than throughput when the driver shares the CPU)
+- Mean time per request stage from the app's /metrics
+- Upstream calls seen by the stand-ins
+
+Results can be saved as JSON and compared against an earlier run; the
+comparison exits non-zero when p99 latency, throughput or the success
+rate regress past --max-regression. Runs are only comparable under the
+same load: if duration, concurrency, mix, users, stand-in config or any
+other setting in COMPARED_CONFIG differs from the earlier run, the
+comparison is refused before the run starts (--allow-config-mismatch
+compares anyway, with a warning).
+
+Rate limiting is disabled for the app under test unless --rate-limit is
+given (a few virtual users would otherwise hit 10/minute immediately).
+
+Usage:
+    cd backend
+    python -m benchmarks.load --duration 30 --concurrency 16 --mix name=5,phone=3,image=2
+    python -m benchmarks.load --save benchmarks/results/my-change.json \\
+        --compare benchmarks/results/user-023.json
+    python -m benchmarks.load --stub-config '{"tineye": {"latency_ms": 3000}}' --image-kb 4096
+"""
+
+import argparse
+import asyncio
+import io
+import json
+import os
+import platform
+import random
+import re
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+from jose import jwt
+
+from benchmarks.stubs import load_overrides, merge_config
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+JWT_SECRET = "benchmark-jwt-secret"
+
+WORKLOADS = ("name", "phone", "image")
+
+_FIRST_NAMES = ["John", "Michael", "David", "James", "Robert", "William", "Daniel", "Chris"]
+_LAST_NAMES = ["Smith", "Johnson", "Williams", "Brown", "Jones", "Garcia", "Miller", "Davis"]
+_AREA_CODES = ["415", "212", "312", "512", "206", "305", "617", "303"]
+
+# Settings that change the load itself; runs differing in any of them aren't comparable
+COMPARED_CONFIG = (
+    "duration", "warmup", "concurrency", "mix", "users", "repeat_ratio", "image_kb",
+    "no_cache", "rate_limit", "log_level", "log_sample_rate", "stubs",
+)
+
+
+# ==================== PROCESS HELPERS ====================
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _rss_mb(pid: int) -> Tuple[Optional[float], Optional[float]]:
+    """(current RSS, peak RSS) in MB from /proc (None where unavailable)."""
+    current = peak = None
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    current = int(line.split()[1]) / 1024
+                elif line.startswith("VmHWM:"):
+                    peak = int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return current, peak
+
+
+def _cpu_seconds(pid: int) -> Optional[float]:
+    """User + system CPU time of a process (all threads) from /proc."""
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+    except OSError:
+        return None
+    # utime and stime are fields 14 and 15 of the full line
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+
+def _git_revision() -> Optional[str]:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def _wait_ready(url: str, process: subprocess.Popen, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                raise RuntimeError(f"Process for {url} exited with code {process.returncode}")
+            try:
+                if (await client.get(url, timeout=1.0)).status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError(f"Timed out waiting for {url}")
+
+
+def _start_stubs(port: int, stub_config: Optional[str], log) -> subprocess.Popen:
+    command = [sys.executable, "-m", "benchmarks.stubs", "--port", str(port)]
+    if stub_config:
+        command += ["--config", stub_config]
+    return subprocess.Popen(command, cwd=BACKEND_DIR, stdout=log, stderr=subprocess.STDOUT)
+
+
+def _start_app(port: int, stub_port: int, args: argparse.Namespace, workdir: str, log) -> subprocess.Popen:
+    stub = f"http://127.0.0.1:{stub_port}"
+    env = dict(os.environ)
+    env.update({
+        "SUPABASE_URL": stub,
+        "SUPABASE_SERVICE_ROLE_KEY": "benchmark-service-role-key",
+        "SUPABASE_JWT_SECRET": JWT_SECRET,
+        "OFFENDERS_IO_API_KEY": "benchmark",
+        "OFFENDERS_IO_API_URL": f"{stub}/offenders_io",
+        "CRIMEOMETER_API_KEY": "benchmark",
+        "CRIMEOMETER_API_URL": f"{stub}/crimeometer/v1",
+        "TINEYE_API_KEY": "benchmark",
+        "TINEYE_API_URL": f"{stub}/tineye/rest/",
+        "TWILIO_ACCOUNT_SID": "benchmark",
+        "TWILIO_AUTH_TOKEN": "benchmark",
+        "TWILIO_LOOKUP_URL": f"{stub}/twilio/v2/PhoneNumbers",
+        "REFUND_OUTBOX_PATH": os.path.join(workdir, "refund_outbox.db"),
+        "RATE_LIMIT_ENABLED": "true" if args.rate_limit else "false",
+        "LOG_LEVEL": args.log_level,
+        "LOG_DEBUG_SAMPLE_RATE": str(args.log_sample_rate),
+    })
+    if args.no_cache:
+        env.update({
+            "OFFENDER_CACHE_TTL": "0",
+            "OFFENDER_CACHE_NEGATIVE_TTL": "0",
+            "PHONE_CACHE_ENABLED": "false",
+            "IMAGE_CACHE_ENABLED": "false",
+        })
+    command = [
+        sys.executable, "-m", "uvicorn", "main:app",
+        "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning",
+    ]
+    return subprocess.Popen(command, cwd=BACKEND_DIR, env=env, stdout=log, stderr=subprocess.STDOUT)
+
+
+# ==================== WORKLOADS ====================
+
+def _make_images(count: int, size_kb: int, seed: int) -> List[bytes]:
+    """Distinct JPEGs of roughly size_kb each (noise compresses poorly, so size tracks dimensions)."""
+    from PIL import Image
+
+    rng = random.Random(seed)
+    side = max(64, int((size_kb * 1024 / 1.5) ** 0.5))
+    images = []
+    for _ in range(count):
+        pixels = bytes(rng.getrandbits(8) for _ in range(96 * 96 * 3))
+        image = Image.frombytes("RGB", (96, 96), pixels).resize((side, side))
+        buffer = io.BytesIO()
+        image.save(buffer, format="JPEG", quality=90)
+        images.append(buffer.getvalue())
+    return images
+
+
+class Workload:
+    """Builds randomized requests for each workload type."""
+
+    def __init__(self, mix: Dict[str, int], users: int, repeat_ratio: float, images: List[bytes], seed: int):
+        self.rng = random.Random(seed)
+        self.kinds = [kind for kind, weight in mix.items() for _ in range(weight)]
+        self.repeat_ratio = repeat_ratio
+        self.images = images
+        expires = int(time.time()) + 24 * 3600
+        self.tokens = [
+            jwt.encode({"sub": f"00000000-0000-4000-8000-{index:012d}", "exp": expires}, JWT_SECRET, algorithm="HS256")
+            for index in range(users)
+        ]
+
+    def _repeat(self) -> bool:
+        return self.rng.random() < self.repeat_ratio
+
+    def next_request(self) -> Tuple[str, Dict[str, Any]]:
+        kind = self.rng.choice(self.kinds)
+        headers = {"Authorization": f"Bearer {self.rng.choice(self.tokens)}"}
+
+        if kind == "name":
+            if self._repeat():
+                first, last = _FIRST_NAMES[0], _LAST_NAMES[0]
+            else:
+                first = self.rng.choice(_FIRST_NAMES)
+                last = f"{self.rng.choice(_LAST_NAMES)}{self.rng.randrange(100000)}"
+            return kind, {
+                "method": "POST", "url": "/api/search/name", "headers": headers,
+                "json": {"firstName": first, "lastName": last, "state": "CA"},
+            }
+
+        if kind == "phone":
+            if self._repeat():
+                number = "+14155552671"
+            else:
+                exchange = self.rng.randrange(200, 1000)
+                while exchange % 100 == 11 or exchange == 555:
+                    exchange = self.rng.randrange(200, 1000)
+                number = f"+1{self.rng.choice(_AREA_CODES)}{exchange}{self.rng.randrange(10000):04d}"
+            return kind, {
+                "method": "POST", "url": "/api/phone/lookup", "headers": headers,
+                "json": {"phone_number": number},
+            }
+
+        image = self.images[0] if self._repeat() else self.rng.choice(self.images)
+        return kind, {
+            "method": "POST", "url": "/api/image-search", "headers": headers,
+            "files": {"image": ("upload.jpg", image, "image/jpeg")},
+        }
+
+
+# ==================== RESULTS ====================
+
+def _percentile(sorted_values: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+def _summarize(latencies: List[float], statuses: Counter, duration: float) -> Dict[str, Any]:
+    values = sorted(latencies)
+    ok = sum(count for status, count in statuses.items() if 200 <= int(status) < 300)
+    return {
+        "requests": len(values),
+        "ok": ok,
+        "throughput_rps": round(len(values) / duration, 2) if duration else 0.0,
+        "statuses": dict(sorted(statuses.items())),
+        "latency_ms": {
+            "p50": round(_percentile(values, 0.50) * 1000, 2),
+            "p90": round(_percentile(values, 0.90) * 1000, 2),
+            "p95": round(_percentile(values, 0.95) * 1000, 2),
+            "p99": round(_percentile(values, 0.99) * 1000, 2),
+            "max": round(values[-1] * 1000, 2) if values else 0.0,
+            "mean": round(sum(values) / len(values) * 1000, 2) if values else 0.0,
+        },
+    }
+
+
+_STAGE_LINE = re.compile(r'^pinkflag_stage_duration_seconds_(sum|count)\{([^}]*)\} (\S+)$')
+
+
+def _stage_means(metrics_text: str) -> Dict[str, Dict[str, float]]:
+    """Mean milliseconds and count per stage label set from the app's /metrics."""
+    totals: Dict[str, Dict[str, float]] = defaultdict(dict)
+    for line in metrics_text.splitlines():
+        match = _STAGE_LINE.match(line)
+        if match:
+            kind, labels, value = match.groups()
+            key = ",".join(part.split("=")[1].strip('"') for part in labels.split(","))
+            totals[key][kind] = float(value)
+    return {
+        key: {"count": int(values.get("count", 0)), "mean_ms": round(values["sum"] / values["count"] * 1000, 3)}
+        for key, values in sorted(totals.items())
+        if values.get("count")
+    }
+
+
+def _flatten(value: Any, prefix: str) -> Dict[str, Any]:
+    if not isinstance(value, dict):
+        return {prefix: value}
+    flat = {}
+    for key, item in value.items():
+        flat.update(_flatten(item, f"{prefix}.{key}"))
+    return flat
+
+
+def config_differences(config: Dict[str, Any], baseline: Dict[str, Any]) -> Tuple[List[str], List[str]]:
+    """
+    Settings that differ between a run and the baseline it is compared with.
+
+    Returns:
+        (mismatches that make the comparison meaningless,
+         warnings: settings the baseline didn't record, different environment)
+    """
+    mismatches, warnings = [], []
+    baseline_config = baseline.get("config", {})
+    for name in COMPARED_CONFIG:
+        if name not in baseline_config:
+            warnings.append(f"{name}: not recorded in baseline (now {config[name]!r})")
+            continue
+        current, previous = _flatten(config[name], name), _flatten(baseline_config[name], name)
+        for key in sorted(current.keys() | previous.keys()):
+            if current.get(key) != previous.get(key):
+                mismatches.append(f"{key}: {previous.get(key)!r} -> {current.get(key)!r}")
+
+    environment = {"python": platform.python_version(), "cpus": os.cpu_count()}
+    for key, value in environment.items():
+        previous = baseline.get("environment", {}).get(key)
+        if previous != value:
+            warnings.append(f"environment.{key}: {previous!r} -> {value!r}")
+    return mismatches, warnings
+
+
+def compare(result: Dict[str, Any], baseline: Dict[str, Any], max_regression: float) -> bool:
+    """Print deltas against a baseline run. Returns False if anything regressed too far."""
+    passed = True
+    print(f"\nComparison with baseline ({baseline.get('label')}, {baseline.get('git_revision')}):")
+    for kind, current in result["workloads"].items():
+        previous = baseline.get("workloads", {}).get(kind)
+        if not previous:
+            print(f"  {kind:6} (not in baseline)")
+            continue
+        p99_change = (current["latency_ms"]["p99"] / previous["latency_ms"]["p99"] - 1) if previous["latency_ms"]["p99"] else 0.0
+        rps_change = (current["throughput_rps"] / previous["throughput_rps"] - 1) if previous["throughput_rps"] else 0.0
+        # Fast failures would otherwise look like an improvement
+        ok_rate = current["ok"] / current["requests"] if current["requests"] else 0.0
+        previous_ok_rate = previous["ok"] / previous["requests"] if previous["requests"] else 0.0
+        regressed = (
+            p99_change > max_regression
+            or rps_change < -max_regression
+            or ok_rate < previous_ok_rate - max_regression
+        )
+        passed = passed and not regressed
+        print(
+            f"  {kind:6} p99 {previous['latency_ms']['p99']:.1f} -> {current['latency_ms']['p99']:.1f} ms ({p99_change:+.1%}), "
+            f"throughput {previous['throughput_rps']:.1f} -> {current['throughput_rps']:.1f} rps ({rps_change:+.1%}), "
+            f"ok {previous_ok_rate:.1%} -> {ok_rate:.1%}"
+            f"{'  REGRESSION' if regressed else ''}"
+        )
+    cpu, previous_cpu = result.get("app_cpu_ms_per_request"), baseline.get("app_cpu_ms_per_request")
+    if cpu and previous_cpu:
+        print(f"  app CPU per request {previous_cpu:.3f} -> {cpu:.3f} ms ({cpu / previous_cpu - 1:+.1%})")
+    return passed
+
+
+def print_report(result: Dict[str, Any]) -> None:
+    config = result["config"]
+    print(f"\n{result['label']}: {config['duration']}s, concurrency {config['concurrency']}, mix {config['mix']}")
+    print(f"{'workload':8} {'reqs':>6} {'rps':>8} {'p50':>8} {'p90':>8} {'p99':>8} {'max':>8}  statuses")
+    rows = list(result["workloads"].items()) + [("total", result["total"])]
+    for kind, stats in rows:
+        latency = stats["latency_ms"]
+        print(
+            f"{kind:8} {stats['requests']:>6} {stats['throughput_rps']:>8.1f} "
+            f"{latency['p50']:>8.1f} {latency['p90']:>8.1f} {latency['p99']:>8.1f} {latency['max']:>8.1f}  {stats['statuses']}"
+        )
+    rss = result["rss_mb"]
+    print(f"RSS (MB): start {rss['start']}, peak {rss['peak']}, end {rss['end']}")
+    print(f"App CPU per request: {result['app_cpu_ms_per_request']} ms")
+    if result["stages"]:
+        print("Stage means (ms): " + ", ".join(f"{key} {value['mean_ms']}" for key, value in result["stages"].items()))
+    print(f"Upstream calls: {result['upstream_calls']}")
+
+
+# ==================== DRIVER ====================
+
+def _run_config(args: argparse.Namespace, stubs: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "duration": args.duration,
+        "warmup": args.warmup,
+        "concurrency": args.concurrency,
+        "mix": args.mix,
+        "users": args.users,
+        "repeat_ratio": args.repeat_ratio,
+        "image_kb": args.image_kb,
+        "no_cache": args.no_cache,
+        "rate_limit": args.rate_limit,
+        "log_level": args.log_level,
+        "log_sample_rate": args.log_sample_rate,
+        "stubs": stubs,
+    }
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    mix = {}
+    for part in args.mix.split(","):
+        kind, _, weight = part.partition("=")
+        if kind not in WORKLOADS:
+            raise SystemExit(f"Unknown workload {kind!r} (expected {', '.join(WORKLOADS)})")
+        mix[kind] = int(weight or 1)
+
+    images = _make_images(args.image_pool, args.image_kb, args.seed) if "image" in mix else []
+    workload = Workload(mix, args.users, args.repeat_ratio, images, args.seed)
+
+    stub_port, app_port = _free_port(), _free_port()
+    workdir = tempfile.mkdtemp(prefix="pinkflag-bench-")
+    log = open(os.path.join(workdir, "processes.log"), "wb")
+    stubs = _start_stubs(stub_port, args.stub_config, log)
+    app = _start_app(app_port, stub_port, args, workdir, log)
+
+    try:
+        await _wait_ready(f"http://127.0.0.1:{stub_port}/stats", stubs)
+        await _wait_ready(f"http://127.0.0.1:{app_port}/health", app)
+
+        latencies: Dict[str, List[float]] = defaultdict(list)
+        statuses: Dict[str, Counter] = defaultdict(Counter)
+        rss_start, _ = _rss_mb(app.pid)
+        rss_samples = [rss_start or 0.0]
+
+        limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{app_port}", limits=limits, timeout=60.0) as client:
+
+            async def worker(deadline: float, record: bool) -> None:
+                while time.monotonic() < deadline:
+                    kind, request = workload.next_request()
+                    started = time.perf_counter()
+                    try:
+                        response = await client.request(**request)
+                        status = str(response.status_code)
+                    except httpx.HTTPError as e:
+                        status = type(e).__name__
+                    if record:
+                        latencies[kind].append(time.perf_counter() - started)
+                        statuses[kind][status] += 1
+
+            async def sample_rss(stop: asyncio.Event) -> None:
+                while not stop.is_set():
+                    current, _ = _rss_mb(app.pid)
+                    if current is not None:
+                        rss_samples.append(current)
+                    try:
+                        await asyncio.wait_for(stop.wait(), timeout=0.5)
+                    except asyncio.TimeoutError:
+                        pass
+
+            if args.warmup > 0:
+                deadline = time.monotonic() + args.warmup
+                await asyncio.gather(*(worker(deadline, record=False) for _ in range(args.concurrency)))
+
+            stop = asyncio.Event()
+            sampler = asyncio.create_task(sample_rss(stop))
+            cpu_start = _cpu_seconds(app.pid)
+            started = time.monotonic()
+            deadline = started + args.duration
+            await asyncio.gather(*(worker(deadline, record=True) for _ in range(args.concurrency)))
+            elapsed = time.monotonic() - started
+            cpu_end = _cpu_seconds(app.pid)
+            stop.set()
+            await sampler
+
+            metrics_text = (await client.get("/metrics")).text
+            stub_stats = httpx.get(f"http://127.0.0.1:{stub_port}/stats").json()
+
+        rss_end, rss_peak = _rss_mb(app.pid)
+        all_latencies = [value for values in latencies.values() for value in values]
+        all_statuses = sum(statuses.values(), Counter())
+        app_cpu_ms = None
+        if cpu_start is not None and cpu_end is not None and all_latencies:
+            app_cpu_ms = round((cpu_end - cpu_start) / len(all_latencies) * 1000, 3)
+
+        return {
+            "label": args.label,
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "git_revision": _git_revision(),
+            "environment": {
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "cpus": os.cpu_count(),
+            },
+            "config": _run_config(args, stub_stats["config"]),
+            "workloads": {kind: _summarize(latencies[kind], statuses[kind], elapsed) for kind in mix},
+            "total": _summarize(all_latencies, all_statuses, elapsed),
+            "rss_mb": {
+                "start": round(rss_start, 1) if rss_start else None,
+                "peak": round(max(max(rss_samples), rss_peak or 0.0), 1),
+                "end": round(rss_end, 1) if rss_end else None,
+            },
+            "app_cpu_ms_per_request": app_cpu_ms,
+            "stages": _stage_means(metrics_text),
+            "upstream_calls": stub_stats["calls"],
+            "upstream_errors": stub_stats["errors"],
+        }
+    finally:
+        for process in (app, stubs):
+            process.terminate()
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        log.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Load test main:app against local provider stand-ins")
+    parser.add_argument("--label", default="run", help="Name stored with the results")
+    parser.add_argument("--duration", type=float, default=30.0, help="Measured seconds")
+    parser.add_argument("--warmup", type=float, default=3.0, help="Unmeasured seconds before the run")
+    parser.add_argument("--concurrency", type=int, default=16, help="Requests in flight")
+    parser.add_argument("--mix", default="name=5,phone=3,image=2", help="Workload weights")
+    parser.add_argument("--users", type=int, default=50, help="Distinct authenticated users")
+    parser.add_argument("--repeat-ratio", type=float, default=0.2, help="Share of requests repeating a hot query")
+    parser.add_argument("--image-kb", type=int, default=512, help="Approximate upload size")
+    parser.add_argument("--image-pool", type=int, default=32, help="Distinct images to upload")
+    parser.add_argument("--stub-config", help="Stand-in overrides as JSON (inline or file), see benchmarks/stubs.py")
+    parser.add_argument("--no-cache", action="store_true", help="Disable the app's result caches")
+    parser.add_argument("--rate-limit", action="store_true", help="Keep the app's rate limits enabled")
+    parser.add_argument("--log-level", default="INFO", help="App LOG_LEVEL (DEBUG shows logging overhead)")
+    parser.add_argument("--log-sample-rate", type=float, default=1.0, help="App LOG_DEBUG_SAMPLE_RATE")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--save", help="Write results JSON to this path")
+    parser.add_argument("--compare", help="Baseline results JSON to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.15, help="Allowed p99/throughput/success-rate regression (fraction)")
+    parser.add_argument("--allow-config-mismatch", action="store_true", help="Compare even if the load settings differ from the baseline's")
+    args = parser.parse_args()
+
+    baseline = None
+    if args.compare:
+        # Check before spending a whole run on a comparison that would be refused
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        expected = _run_config(args, merge_config(load_overrides(args.stub_config)))
+        mismatches, warnings = config_differences(expected, baseline)
+        for warning in warnings:
+            print(f"warning: {warning}")
+        if mismatches:
+            details = "\n".join(f"  {mismatch}" for mismatch in mismatches)
+            if not args.allow_config_mismatch:
+                raise SystemExit(
+                    f"Load settings differ from {args.compare}:\n{details}\n"
+                    "Re-run with the baseline's settings, or pass --allow-config-mismatch"
+                )
+            print(f"warning: comparing runs with different load settings:\n{details}")
+
+    result = asyncio.run(run(args))
+    print_report(result)
+
+    if args.save:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save)), exist_ok=True)
+        with open(args.save, "w") as f:
+            json.dump(result, f, indent=2)
+        print(f"\nSaved results to {args.save}")
+
+    if baseline is not None:
+        if not compare(result, baseline, args.max_regression):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,534 @@
+"""
+Micro Benchmarks
+
+In-process timings for the hot-path helpers every request goes through,
+without the network noise of benchmarks/load.py:
+- rate_limiter: GCRA check with a few hot keys and with millions of
+  distinct keys (plus idle eviction back down to a small table)
+- metrics: histogram observation, counter increment and a stage timer
+- logging: caller-side cost of a structured log call (queued, formatted
+  on the writer thread) vs the print() it replaced, both writing to a
+  drained pipe like container stdout; plus the writer thread's throughput
+- jwt_auth: require_auth with a full HS256 verification per request
+  (before the verified-token cache) vs a cache hit
+- ranking: vectorized Levenshtein over a whole candidate set vs the naive
+  per-pair Python loop, at several result-set sizes (the crossover sets
+  name_ranking's small-set threshold), plus rank_results
+- upload_rss: peak RSS growth while N large image uploads are handled
+  concurrently, reading each upload whole (before) vs staging it in chunks
+  and streaming it from disk (after), sent to the TinEye stand-in running
+  in a separate process
+- local_registry: ingest of a multi-million-row synthetic registry export,
+  index size, and lookup latency for exact-name (the default, non-
+  authoritative path), phonetic and first-name-only queries
+
+Usage:
+    cd backend
+    python -m benchmarks.micro
+    python -m benchmarks.micro --keys 3000000 --save benchmarks/results/micro.json
+    python -m benchmarks.micro --only jwt_auth,logging
+    python -m benchmarks.micro --only local_registry --registry-rows 5000000
+"""
+
+import argparse
+import asyncio
+import gc
+import hashlib
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import tempfile
+import threading
+import time
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, Iterator, List
+
+import httpx
+
+from middleware.rate_limit import GCRABucketStore
+from services.metrics import Counter, Histogram, StageTimer
+from services import structured_log
+
+
+def _per_op_us(func: Callable[[int], None], operations: int) -> float:
+    """Microseconds per operation for func(operations)."""
+    started = time.perf_counter()
+    func(operations)
+    return round((time.perf_counter() - started) / operations * 1e6, 3)
+
+
+def _rss_mb() -> float:
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    return 0.0
+
+
+def _reset_peak_rss() -> bool:
+    """Reset the kernel's peak RSS (VmHWM) counter; False if not supported."""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def _peak_rss_mb() -> float:
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    return 0.0
+
+
+def bench_rate_limiter(keys: int, hot_operations: int) -> Dict[str, Any]:
+    # Hot keys: a handful of users hammering one rule
+    store = GCRABucketStore(10, 60.0, max_keys=keys)
+    now = time.time()
+
+    def hot(operations: int) -> None:
+        for index in range(operations):
+            store.hit(f"user:{index & 7}", now + index * 1e-6)
+
+    hot_us = _per_op_us(hot, hot_operations)
+
+    # Many keys: every check inserts a new key
+    store = GCRABucketStore(10, 60.0, max_keys=keys)
+    rss_before = _rss_mb()
+
+    def distinct(operations: int) -> None:
+        for index in range(operations):
+            store.hit(f"user:{index}", now)
+
+    distinct_us = _per_op_us(distinct, keys)
+    rss_after = _rss_mb()
+    filled = len(store)
+
+    # Idle eviction: checks well past the period sweep out the old keys
+    later = now + 3600
+
+    def evict(operations: int) -> None:
+        for index in range(operations):
+            store.hit(f"late:{index % 100}", later + index * 1e-6)
+
+    evict_us = _per_op_us(evict, keys)
+
+    return {
+        "hot_keys_check_us": hot_us,
+        "distinct_keys_check_us": distinct_us,
+        "keys_stored": filled,
+        "rss_growth_mb": round(rss_after - rss_before, 1),
+        "eviction_check_us": evict_us,
+        "keys_after_eviction": len(store),
+    }
+
+
+def bench_metrics(operations: int) -> Dict[str, Any]:
+    # Benchmark-only metrics (this process never serves /metrics)
+    histogram = Histogram("bench_seconds", "", ("stage", "provider"))
+    counter = Counter("bench_total", "", ("result",))
+
+    def observe(count: int) -> None:
+        for index in range(count):
+            histogram.observe(0.003, "provider_call", "twilio")
+
+    def increment(count: int) -> None:
+        for index in range(count):
+            counter.inc("hit")
+
+    def timer(count: int) -> None:
+        for index in range(count):
+            with StageTimer("bench", ""):
+                pass
+
+    return {
+        "histogram_observe_us": _per_op_us(observe, operations),
+        "counter_inc_us": _per_op_us(increment, operations),
+        "stage_timer_us": _per_op_us(timer, operations),
+    }
+
+
+def _drained_pipe():
+    """Line-buffered writer on a pipe whose read end is drained by a thread."""
+    read_fd, write_fd = os.pipe()
+
+    def drain() -> None:
+        while os.read(read_fd, 65536):
+            pass
+        os.close(read_fd)
+
+    threading.Thread(target=drain, daemon=True).start()
+    return os.fdopen(write_fd, "w", buffering=1, encoding="utf-8")
+
+
+def bench_logging(operations: int) -> Dict[str, Any]:
+    user_id = "00000000-0000-4000-8000-000000000001"
+    chunk = max(1, structured_log.LOG_QUEUE_SIZE // 2)
+
+    # The print() the credit service used to do on every RPC
+    stream = _drained_pipe()
+
+    def printing(count: int) -> None:
+        for index in range(count):
+            print(f"🔵 [CREDIT] Calling RPC deduct_credit_for_search for user {user_id}, cost: 1", file=stream)
+
+    print_us = _per_op_us(printing, operations)
+    stream.close()
+
+    # Structured: reroute the writer thread to a pipe of its own
+    structured_log.shutdown_logging()
+    stream = _drained_pipe()
+    structured_log.configure_logging(stream=stream)
+    logger = structured_log.get_logger("benchmarks.micro")
+    handler = structured_log._queue_handler
+
+    def wait_for_writer() -> None:
+        while handler.queue.qsize():
+            time.sleep(0.001)
+
+    # Caller cost, in chunks the queue can hold so nothing is dropped
+    caller_seconds = 0.0
+    started_all = time.perf_counter()
+    remaining = operations
+    while remaining:
+        count = min(chunk, remaining)
+        started = time.perf_counter()
+        for index in range(count):
+            logger.info("credit rpc started", rpc="deduct_credit_for_search", user_id=user_id, cost=1)
+        caller_seconds += time.perf_counter() - started
+        wait_for_writer()
+        remaining -= count
+    writer_seconds = time.perf_counter() - started_all
+
+    def disabled(count: int) -> None:
+        for index in range(count):
+            logger.debug("credit rpc started", user_id=user_id, cost=1, sample=0.1)
+
+    disabled_us = _per_op_us(disabled, operations) if not logger.is_enabled(10) else None
+
+    def sampled_out(count: int) -> None:
+        # What an enabled but sampled-out debug call costs
+        for index in range(count):
+            logger.info("credit rpc started", user_id=user_id, cost=1, sample=0.0)
+
+    sampled_us = _per_op_us(sampled_out, operations)
+
+    structured_log.shutdown_logging()
+    stream.close()
+
+    return {
+        "print_us": print_us,
+        "structured_caller_us": round(caller_seconds / operations * 1e6, 3),
+        "structured_writer_records_per_s": round(operations / writer_seconds),
+        "disabled_level_us": disabled_us,
+        "sampled_out_us": sampled_us,
+        "dropped": handler.dropped,
+    }
+
+
+async def _per_call_us(func: Callable[[], Any], operations: int) -> float:
+    """Microseconds per await of func()."""
+    started = time.perf_counter()
+    for _ in range(operations):
+        await func()
+    return round((time.perf_counter() - started) / operations * 1e6, 3)
+
+
+def bench_jwt_auth(operations: int) -> Dict[str, Any]:
+    from fastapi.security import HTTPAuthorizationCredentials
+    from jose import jwt
+
+    from middleware import auth
+
+    secret = "benchmark-jwt-secret"
+    auth.SUPABASE_JWT_SECRET = secret
+    token = jwt.encode(
+        {"sub": "00000000-0000-4000-8000-000000000001", "exp": int(time.time()) + 3600, "role": "authenticated"},
+        secret,
+        algorithm="HS256",
+    )
+    credentials = HTTPAuthorizationCredentials(scheme="Bearer", credentials=token)
+    request = SimpleNamespace(state=SimpleNamespace())
+
+    async def verify_every_time() -> None:
+        auth._token_cache.clear()
+        await auth.require_auth(request, credentials)
+
+    async def cached() -> None:
+        await auth.require_auth(request, credentials)
+
+    async def run() -> Dict[str, Any]:
+        before_us = await _per_call_us(verify_every_time, operations)
+        after_us = await _per_call_us(cached, operations)
+        return {
+            "verify_every_request_us": before_us,
+            "cached_us": after_us,
+            "speedup": round(before_us / after_us, 1) if after_us else None,
+        }
+
+    return asyncio.run(run())
+
+
+def bench_upload_rss(concurrency: int, size_mb: int) -> Dict[str, Any]:
+    from fastapi import UploadFile
+    from starlette.datastructures import Headers
+
+    from benchmarks.load import _free_port, _start_stubs, _wait_ready
+    from services.image_upload import stage_upload
+    from services.tineye_client import TinEyeClient
+
+    size = size_mb * 1024 * 1024
+
+    def uploads() -> List[UploadFile]:
+        # Spooled to disk past 1 MB, like Starlette's multipart parser does
+        files = []
+        block = os.urandom(1024 * 1024)
+        for _ in range(concurrency):
+            spooled = tempfile.SpooledTemporaryFile(max_size=1024 * 1024)
+            spooled.write(b"\xff\xd8\xff" + block[3:])
+            for _ in range(size_mb - 1):
+                spooled.write(block)
+            spooled.seek(0)
+            files.append(UploadFile(spooled, size=size, filename="photo.jpg",
+                                    headers=Headers({"content-type": "image/jpeg"})))
+        return files
+
+    async def read_whole(client: TinEyeClient, upload: UploadFile) -> None:
+        data = await upload.read()
+        hashlib.sha256(data).hexdigest()
+        await client.search_data(data)
+
+    async def staged(client: TinEyeClient, upload: UploadFile) -> None:
+        staged_upload = await stage_upload(upload)
+        try:
+            with staged_upload.open() as image:
+                await client.search_data(image)
+        finally:
+            staged_upload.close()
+
+    async def run(handler, api_url: str) -> Dict[str, Any]:
+        files = uploads()
+        gc.collect()
+        async with httpx.AsyncClient(timeout=60.0) as http:
+            client = TinEyeClient(http, "benchmark-key", api_url)
+            await client.remaining_searches()  # Warm the connection pool
+            start_rss = _rss_mb()
+            if not _reset_peak_rss():
+                return {"peak_rss_growth_mb": None, "note": "VmHWM reset unsupported"}
+            started = time.perf_counter()
+            await asyncio.gather(*(handler(client, upload) for upload in files))
+            elapsed = time.perf_counter() - started
+        for upload in files:
+            upload.file.close()
+        return {"peak_rss_growth_mb": round(_peak_rss_mb() - start_rss, 1), "seconds": round(elapsed, 2)}
+
+    # TinEye stand-in in its own process so its buffers don't count here
+    port = _free_port()
+    stub_config = json.dumps({"tineye": {"latency_ms": 200, "jitter_ms": 0, "matches": 0}})
+    stubs = _start_stubs(port, stub_config, subprocess.DEVNULL)
+    try:
+        asyncio.run(_wait_ready(f"http://127.0.0.1:{port}/stats", stubs))
+        api_url = f"http://127.0.0.1:{port}/tineye/rest/"
+        return {
+            "concurrent_uploads": concurrency,
+            "upload_mb": size_mb,
+            "read_whole": asyncio.run(run(read_whole, api_url)),
+            "staged_streaming": asyncio.run(run(staged, api_url)),
+        }
+    finally:
+        stubs.terminate()
+        stubs.wait()
+
+
+_SYLLABLES = ("an", "ber", "ca", "del", "son", "ri", "mo", "ley", "to", "var", "gar", "kin", "li", "th", "ez", "man")
+
+
+def _synthetic_names(rng: random.Random, count: int, syllables: int) -> List[str]:
+    names = set()
+    while len(names) < count:
+        names.add("".join(rng.choice(_SYLLABLES) for _ in range(rng.randint(2, syllables))).capitalize())
+    return sorted(names)
+
+
+def bench_ranking(sizes: List[int], repeats: int) -> Dict[str, Any]:
+    from services import name_ranking
+    from services.name_ranking import _levenshtein, batch_similarity, rank_results
+
+    rng = random.Random(3)
+    pool = _synthetic_names(rng, 20_000, 4)
+    query = "tosonthkin"
+    result: Dict[str, Any] = {}
+
+    for size in sizes:
+        candidates = [name.lower() for name in rng.sample(pool, size)]
+        records = [
+            {"fullName": f"Anandel {name}", "age": str(20 + index % 60), "state": "CA"}
+            for index, name in enumerate(candidates)
+        ]
+
+        def naive(count: int) -> None:
+            for _ in range(count):
+                [1.0 - _levenshtein(query, name) / max(len(query), len(name)) for name in candidates]
+
+        def vectorized_scores():
+            # Force the NumPy path even below its size threshold
+            threshold = name_ranking._VECTORIZE_MIN_CANDIDATES
+            name_ranking._VECTORIZE_MIN_CANDIDATES = 0
+            try:
+                return batch_similarity(query, candidates)
+            finally:
+                name_ranking._VECTORIZE_MIN_CANDIDATES = threshold
+
+        def vectorized(count: int) -> None:
+            for _ in range(count):
+                vectorized_scores()
+
+        def ranked(count: int) -> None:
+            for _ in range(count):
+                rank_results(records, "Anandel", "Tosonthkin", age="35", state="CA")
+
+        expected = [1.0 - _levenshtein(query, name) / max(len(query), len(name)) for name in candidates]
+        naive_us = _per_op_us(naive, repeats) / size
+        vectorized_us = _per_op_us(vectorized, repeats) / size
+        result[f"candidates_{size}"] = {
+            "naive_per_pair_us": round(naive_us, 3),
+            "vectorized_per_pair_us": round(vectorized_us, 3),
+            "speedup": round(naive_us / vectorized_us, 1),
+            "rank_results_ms": round(_per_op_us(ranked, repeats) / 1000, 3),
+            "matches_naive": bool(max(abs(a - b) for a, b in zip(expected, vectorized_scores())) < 1e-9),
+        }
+    return result
+
+
+def _synthetic_export(rows: int, first_names: List[str], last_names: List[str], seed: int) -> Iterator[Dict[str, Any]]:
+    """Registry export rows with a realistic skew: few first names, many last names."""
+    rng = random.Random(seed)
+    states = ("CA", "TX", "FL", "NY", "IL", "OH", "GA", "NC", "MI", "WA")
+    for index in range(rows):
+        state = states[index % len(states)]
+        yield {
+            "id": index,
+            "first_name": first_names[int(rng.paretovariate(1.2)) % len(first_names)],
+            "last_name": rng.choice(last_names),
+            "age": 20 + index % 60,
+            "city": "Springfield",
+            "state": state,
+            "zip": f"{10000 + rng.randrange(80000)}",
+            "offense": "Synthetic offense",
+        }
+
+
+def bench_local_registry(rows: int, queries: int) -> Dict[str, Any]:
+    from services.local_registry import LocalRegistry
+
+    rng = random.Random(7)
+    first_names = _synthetic_names(rng, 400, 3)
+    last_names = _synthetic_names(rng, 60_000, 4)
+    directory = tempfile.mkdtemp(prefix="registry-bench-")
+    path = os.path.join(directory, "registry.db")
+
+    try:
+        writer = LocalRegistry(path, read_only=False)
+        started = time.perf_counter()
+        counts = writer.ingest(_synthetic_export(rows, first_names, last_names, seed=1), source="synthetic")
+        ingest_seconds = time.perf_counter() - started
+        writer.close()
+
+        registry = LocalRegistry(path, read_only=True)
+        sample = list(_synthetic_export(queries, first_names, last_names, seed=1))
+
+        def latencies(query: Callable[[Dict[str, Any]], List[Dict[str, Any]]]) -> Dict[str, Any]:
+            timings = []
+            matched = 0
+            for row in sample:
+                started = time.perf_counter()
+                matched += len(query(row))
+                timings.append((time.perf_counter() - started) * 1e6)
+            timings.sort()
+            return {
+                "mean_us": round(statistics.fmean(timings), 1),
+                "p99_us": round(timings[int(len(timings) * 0.99) - 1], 1),
+                "mean_results": round(matched / len(sample), 1),
+            }
+
+        # Misspelled last names only match phonetically ("Smyth" for "Smith")
+        def misspelled(name: str) -> str:
+            return name[:-1] + ("y" if name[-1] != "y" else "i")
+
+        result = {
+            "rows": counts["upserted"],
+            "ingest_rows_per_s": round(rows / ingest_seconds),
+            "index_mb": round(os.path.getsize(path) / 1e6, 1),
+            "exact": latencies(lambda row: registry.lookup(row["first_name"], row["last_name"], exact_only=True)),
+            "exact_with_state": latencies(
+                lambda row: registry.lookup(row["first_name"], row["last_name"], state=row["state"], exact_only=True)
+            ),
+            "phonetic": latencies(lambda row: registry.lookup(row["first_name"], row["last_name"])),
+            "phonetic_misspelled": latencies(
+                lambda row: registry.lookup(row["first_name"], misspelled(row["last_name"]))
+            ),
+            "first_name_only_with_zip": latencies(
+                lambda row: registry.lookup(row["first_name"], None, zip_code=row["zip"], exact_only=True)
+            ),
+        }
+        registry.close()
+        return result
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+# Sections run by default, in order
+BENCHMARKS: Dict[str, Callable[[argparse.Namespace], Dict[str, Any]]] = {
+    "rate_limiter": lambda args: bench_rate_limiter(args.keys, args.operations),
+    "metrics": lambda args: bench_metrics(args.operations),
+    "logging": lambda args: bench_logging(min(args.operations, 200_000)),
+    "jwt_auth": lambda args: bench_jwt_auth(min(args.operations, 20_000)),
+    "ranking": lambda args: bench_ranking([10, 100, 1000, 10_000], max(1, min(args.operations // 10_000, 20))),
+    "upload_rss": lambda args: bench_upload_rss(args.uploads, 9),
+    "local_registry": lambda args: bench_local_registry(args.registry_rows, min(args.operations, 5_000)),
+}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Hot-path micro benchmarks")
+    parser.add_argument("--keys", type=int, default=1_000_000, help="Distinct rate limit keys")
+    parser.add_argument("--uploads", type=int, default=10, help="Concurrent uploads for upload_rss")
+    parser.add_argument("--registry-rows", type=int, default=2_000_000, help="Synthetic local registry size")
+    parser.add_argument("--operations", type=int, default=500_000, help="Operations per timing")
+    parser.add_argument("--only", help=f"Comma-separated sections ({', '.join(BENCHMARKS)})")
+    parser.add_argument("--save", help="Write results JSON to this path")
+    args = parser.parse_args()
+
+    sections = args.only.split(",") if args.only else list(BENCHMARKS)
+    unknown = [name for name in sections if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f"Unknown section(s): {', '.join(unknown)}")
+
+    result: Dict[str, Any] = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "environment": {"python": platform.python_version(), "platform": platform.platform()},
+    }
+    for name in sections:
+        result[name] = BENCHMARKS[name](args)
+    print(json.dumps(result, indent=2))
+
+    if args.save:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save)), exist_ok=True)
+        with open(args.save, "w") as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,576 @@
+"""
+Provider Stand-ins for Benchmarks
+
+One local server emulating every upstream the API calls, so load tests
+never touch paid services:
+- Supabase PostgREST: /rest/v1/rpc/* (deduct_credit_for_search,
+  deduct_credits_for_batch, refund_credit_for_failed_search,
+  update_search_results_batch), /rest/v1/searches updates, /rest/v1/profiles
+- Offenders.io:       /offenders_io/sexoffender
+- CrimeoMeter:        /crimeometer/v1/offenders
+- TinEye:             /tineye/rest/search/, /tineye/rest/remaining_searches/
+- Twilio Lookup v2:   /twilio/v2/PhoneNumbers/{number}
+
+Each provider has its own latency (mean + jitter, in ms), error rate, error
+status and payload size. GET /stats returns call and error counts, the
+current and peak number of concurrent calls per provider, calls abandoned
+by the client mid-latency and the bytes received in TinEye uploads.
+
+RespStandIn is a minimal Redis-protocol (RESP2) server for the shared state
+backend (services/shared_state.py): GET/SET/PTTL/DEL/TIME, AUTH/SELECT and
+the script commands. It doesn't embed Lua; EVAL/EVALSHA run a Python port
+of each script the app sends, and unknown scripts get an error reply.
+Commands that arrive in one read are answered with one write, so the
+largest batch seen shows whether the client pipelines.
+
+Usage:
+    python -m benchmarks.stubs --port 9100
+    python -m benchmarks.stubs --port 9100 --config '{"twilio": {"latency_ms": 800, "error_rate": 0.05}}'
+    python -m benchmarks.stubs --port 9100 --resp-port 6390   # Also serve SHARED_STATE_URL=redis://127.0.0.1:6390
+
+    # Point the app at it (benchmarks/load.py does this for you)
+    SUPABASE_URL=http://127.0.0.1:9100
+    OFFENDERS_IO_API_URL=http://127.0.0.1:9100/offenders_io
+    CRIMEOMETER_API_URL=http://127.0.0.1:9100/crimeometer/v1
+    TINEYE_API_URL=http://127.0.0.1:9100/tineye/rest/
+    TWILIO_LOOKUP_URL=http://127.0.0.1:9100/twilio/v2/PhoneNumbers
+"""
+
+import argparse
+import asyncio
+import copy
+import hashlib
+import json
+import os
+import random
+import time
+import uuid
+from collections import Counter
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response
+
+from services.shared_state import _GCRA_SCRIPT
+
+# Per-provider behaviour; anything can be overridden with --config
+DEFAULT_CONFIG: Dict[str, Dict[str, Any]] = {
+    "supabase": {"latency_ms": 15, "jitter_ms": 5, "error_rate": 0.0, "error_status": 500},
+    "offenders_io": {"latency_ms": 400, "jitter_ms": 150, "error_rate": 0.0, "error_status": 503, "records": 25},
+    "crimeometer": {"latency_ms": 600, "jitter_ms": 200, "error_rate": 0.0, "error_status": 503, "records": 10},
+    "tineye": {"latency_ms": 1500, "jitter_ms": 400, "error_rate": 0.0, "error_status": 503, "matches": 20, "backlinks": 3},
+    "twilio": {"latency_ms": 300, "jitter_ms": 100, "error_rate": 0.0, "error_status": 503},
+}
+
+_CITIES = [("San Francisco", "CA"), ("Austin", "TX"), ("Denver", "CO"), ("Miami", "FL"), ("Seattle", "WA")]
+
+
+def merge_config(overrides: Optional[Dict[str, Dict[str, Any]]] = None) -> Dict[str, Dict[str, Any]]:
+    """Defaults with per-provider overrides applied."""
+    config = copy.deepcopy(DEFAULT_CONFIG)
+    for provider, values in (overrides or {}).items():
+        if provider not in config:
+            raise ValueError(f"Unknown stub provider: {provider}")
+        config[provider].update(values)
+    return config
+
+
+def load_overrides(value: Optional[str]) -> Optional[Dict[str, Dict[str, Any]]]:
+    """Parse --config: inline JSON or the path of a JSON file."""
+    if not value:
+        return None
+    if os.path.exists(value):
+        with open(value) as f:
+            return json.load(f)
+    return json.loads(value)
+
+
+def create_app(config: Optional[Dict[str, Dict[str, Any]]] = None) -> FastAPI:
+    """Build the stand-in app for one benchmark run."""
+    config = merge_config(config)
+    calls: Counter = Counter()
+    errors: Counter = Counter()
+    in_flight: Counter = Counter()
+    peak_in_flight: Counter = Counter()
+    cancelled: Counter = Counter()
+    upload_bytes: Counter = Counter()
+    app = FastAPI(title="Pink Flag provider stand-ins")
+
+    async def disconnected(request: Request) -> None:
+        """Wait until the client closes the connection (request body already read)."""
+        while (await request.receive())["type"] != "http.disconnect":
+            pass
+
+    async def respond(
+        request: Request, provider: str, body_fn, error_body: Optional[Dict[str, Any]] = None
+    ) -> Any:
+        """Apply the provider's latency and error rate, then build its payload."""
+        settings = config[provider]
+        calls[provider] += 1
+        in_flight[provider] += 1
+        peak_in_flight[provider] = max(peak_in_flight[provider], in_flight[provider])
+        # A client that gives up mid-latency ends the call, as with a real upstream
+        waiter = asyncio.ensure_future(disconnected(request))
+        try:
+            delay = random.gauss(settings["latency_ms"], settings["jitter_ms"]) / 1000
+            done, _ = await asyncio.wait({waiter}, timeout=max(delay, 0.0))
+        finally:
+            waiter.cancel()
+            in_flight[provider] -= 1
+        if done:
+            cancelled[provider] += 1
+            return Response(status_code=499)
+        if random.random() < settings["error_rate"]:
+            errors[provider] += 1
+            return JSONResponse(error_body or {"message": "stub error"}, status_code=settings["error_status"])
+        return body_fn()
+
+    # ==================== SUPABASE (PostgREST) ====================
+
+    @app.post("/rest/v1/rpc/{function}")
+    async def rpc(function: str, request: Request):
+        params = await request.json()
+
+        def body():
+            if function == "deduct_credit_for_search":
+                return {"success": True, "search_id": str(uuid.uuid4()), "credits": 1000}
+            if function == "deduct_credits_for_batch":
+                items = params.get("p_items") or []
+                return {
+                    "success": True,
+                    "search_ids": [str(uuid.uuid4()) for _ in items],
+                    "credits": 1000,
+                    "total_cost": sum(int(item.get("cost", 1)) for item in items),
+                }
+            if function == "refund_credit_for_failed_search":
+                return {"success": True, "credits": 1000}
+            if function == "update_search_results_batch":
+                return {"success": True, "updated": len(params.get("p_updates") or [])}
+            return JSONResponse({"message": f"Unknown function {function}"}, status_code=404)
+
+        return await respond(request, "supabase", body)
+
+    @app.patch("/rest/v1/searches")
+    async def update_search(request: Request):
+        update = await request.json()
+        return await respond(request, "supabase", lambda: [update])
+
+    @app.get("/rest/v1/profiles")
+    async def profiles(request: Request):
+        return await respond(request, "supabase", lambda: {"credits": 1000})
+
+    # ==================== OFFENDER PROVIDERS ====================
+
+    def offenders(first_name: str, last_name: str, count: int, id_key: str, name_key: str) -> Dict[str, Any]:
+        records = []
+        for index in range(count):
+            city, state = _CITIES[index % len(_CITIES)]
+            # Mostly exact or near-exact names so ranking has real work to do
+            name = f"{first_name} {last_name}" if index % 3 else f"{first_name[:1]}. {last_name}"
+            records.append({
+                id_key: str(uuid.uuid4()),
+                name_key: name.strip(),
+                "age": str(25 + index % 40),
+                "city": city,
+                "state": state,
+                "crime": "Stub offense description",
+                "charges": "Stub offense description",
+                "registrationDate": "2020-01-15",
+                "registration_date": "2020-01-15",
+                "address": f"{100 + index} Main St, {city}, {state}",
+            })
+        return {"offenders": records}
+
+    @app.get("/offenders_io/sexoffender")
+    async def offenders_io(request: Request, firstName: str = "", lastName: str = ""):
+        records = config["offenders_io"]["records"]
+        return await respond(request, "offenders_io", lambda: offenders(firstName, lastName, records, "uuid", "name"))
+
+    @app.get("/crimeometer/v1/offenders")
+    async def crimeometer(request: Request, first_name: str = "", last_name: str = ""):
+        records = config["crimeometer"]["records"]
+        return await respond(request, "crimeometer", lambda: offenders(first_name, last_name, records, "id", "name"))
+
+    # ==================== TINEYE ====================
+
+    def tineye_matches() -> Dict[str, Any]:
+        settings = config["tineye"]
+        matches = [
+            {
+                "backlinks": [
+                    {
+                        "url": f"https://site{match}.example.com/page/{link}",
+                        "backlink": f"https://cdn{match}.example.com/img/{link}.jpg",
+                        "crawl_date": "2024-05-01",
+                    }
+                    for link in range(settings["backlinks"])
+                ]
+            }
+            for match in range(settings["matches"])
+        ]
+        return {
+            "code": 200,
+            "messages": [],
+            "results": {"matches": matches},
+            "stats": {"total_results": len(matches), "total_backlinks": len(matches) * settings["backlinks"]},
+        }
+
+    def tineye_error() -> Dict[str, Any]:
+        status = config["tineye"]["error_status"]
+        return {"code": status, "messages": ["stub error"], "results": {}}
+
+    @app.post("/tineye/rest/search/")
+    async def tineye_upload(request: Request):
+        # Receive the whole upload, like the real API
+        form = await request.form()
+        upload = form.get("image_upload")
+        if upload is None:
+            return JSONResponse({"code": 400, "messages": ["Missing image_upload"]}, status_code=400)
+        upload_bytes["tineye"] += len(await upload.read())
+        return await respond(request, "tineye", tineye_matches, tineye_error())
+
+    @app.get("/tineye/rest/search/")
+    async def tineye_url(request: Request):
+        return await respond(request, "tineye", tineye_matches, tineye_error())
+
+    @app.get("/tineye/rest/remaining_searches/")
+    async def tineye_remaining():
+        return {
+            "code": 200,
+            "results": {"bundles": [], "total_remaining_searches": 100000},
+        }
+
+    # ==================== TWILIO ====================
+
+    @app.get("/twilio/v2/PhoneNumbers/{number}")
+    async def twilio_lookup(request: Request, number: str):
+        return await respond(request, "twilio", lambda: {
+            "phone_number": number,
+            "country_code": "US",
+            "caller_name": {"caller_name": "JANE DOE", "caller_type": "CONSUMER"},
+            "line_type_intelligence": {"type": "mobile", "carrier_name": "Stub Wireless"},
+        })
+
+    # ==================== STATS ====================
+
+    @app.get("/stats")
+    async def stats():
+        return {
+            "calls": dict(calls),
+            "errors": dict(errors),
+            "in_flight": {provider: count for provider, count in in_flight.items() if count},
+            "peak_in_flight": dict(peak_in_flight),
+            "cancelled": dict(cancelled),
+            "upload_bytes": dict(upload_bytes),
+            "config": config,
+        }
+
+    return app
+
+
+# ==================== REDIS (RESP2) ====================
+
+class _RespError(Exception):
+    """Sent to the client as an error reply; the first word is the error code."""
+
+
+def _parse_command(buffer: bytearray, position: int) -> Optional[Tuple[List[bytes], int]]:
+    """Parse one RESP array of bulk strings, or None if it hasn't fully arrived."""
+    line_end = buffer.find(b"\r\n", position)
+    if line_end < 0:
+        return None
+    if buffer[position:position + 1] != b"*":
+        raise ConnectionError("Only RESP arrays are supported")
+    count = int(buffer[position + 1:line_end])
+    position = line_end + 2
+
+    args = []
+    for _ in range(count):
+        line_end = buffer.find(b"\r\n", position)
+        if line_end < 0:
+            return None
+        length = int(buffer[position + 1:line_end])
+        start = line_end + 2
+        if len(buffer) < start + length + 2:
+            return None
+        args.append(bytes(buffer[start:start + length]))
+        position = start + length + 2
+    return args, position
+
+
+def _encode_reply(reply: Any) -> bytes:
+    if isinstance(reply, _RespError):
+        return b"-%s\r\n" % str(reply).encode()
+    if isinstance(reply, str):
+        return b"+%s\r\n" % reply.encode()
+    if isinstance(reply, int):
+        return b":%d\r\n" % reply
+    if reply is None:
+        return b"$-1\r\n"
+    if isinstance(reply, bytes):
+        return b"$%d\r\n%s\r\n" % (len(reply), reply)
+    return b"*%d\r\n" % len(reply) + b"".join(_encode_reply(item) for item in reply)
+
+
+class RespStandIn:
+    """
+    Minimal in-memory Redis-protocol server.
+
+    Usage:
+        server = RespStandIn()
+        port = await server.start()
+        backend = RedisBackend(f"redis://127.0.0.1:{port}")
+        ...
+        server.flush_scripts()   # Like a server restart: next EVALSHA gets NOSCRIPT
+        await server.stop()      # Drops every connection
+    """
+
+    def __init__(self, password: Optional[str] = None, latency: float = 0.0):
+        """
+        Args:
+            password: Require AUTH with this password
+            latency: Seconds to wait before answering each batch of commands
+        """
+        self.password = password
+        self.latency = latency
+        self.port: Optional[int] = None
+
+        self._data: Dict[bytes, Tuple[bytes, Optional[float]]] = {}
+        self._scripts: Dict[str, str] = {}
+        # Python ports of the app's Lua scripts, keyed by SHA1 of their source
+        self._ports: Dict[str, Callable[[List[bytes], List[bytes]], Any]] = {
+            hashlib.sha1(_GCRA_SCRIPT.encode()).hexdigest(): self._gcra,
+        }
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._writers: Set[asyncio.StreamWriter] = set()
+        self._handlers: Set[asyncio.Task] = set()
+
+        # Stats
+        self.calls: Counter = Counter()
+        self.connections = 0
+        self.batches = 0
+        self.max_batch = 0
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> int:
+        """Listen on host:port (0 = any free port); returns the port."""
+        self._server = await asyncio.start_server(self._handle, host, port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self.port
+
+    async def stop(self) -> None:
+        """Stop listening and drop every client connection (data is kept)."""
+        if self._server is not None:
+            self._server.close()
+            self._server = None
+        for writer in list(self._writers):
+            writer.close()
+        self._writers.clear()
+        if self._handlers:
+            await asyncio.gather(*self._handlers, return_exceptions=True)
+
+    def flush_scripts(self) -> None:
+        """Forget cached scripts, as a restarted server would."""
+        self._scripts.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "calls": dict(self.calls),
+            "connections": self.connections,
+            "batches": self.batches,
+            "max_batch": self.max_batch,
+            "keys": len(self._data),
+        }
+
+    # ------------------------------------------------------------------
+    # Connection handling
+    # ------------------------------------------------------------------
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self.connections += 1
+        self._writers.add(writer)
+        self._handlers.add(asyncio.current_task())
+        session = {"authenticated": self.password is None}
+        buffer = bytearray()
+        try:
+            while True:
+                chunk = await reader.read(65536)
+                if not chunk:
+                    return
+                buffer += chunk
+
+                commands = []
+                position = 0
+                while True:
+                    parsed = _parse_command(buffer, position)
+                    if parsed is None:
+                        break
+                    args, position = parsed
+                    commands.append(args)
+                del buffer[:position]
+                if not commands:
+                    continue
+
+                self.batches += 1
+                self.max_batch = max(self.max_batch, len(commands))
+                if self.latency:
+                    await asyncio.sleep(self.latency)
+                writer.write(b"".join(_encode_reply(self._execute(args, session)) for args in commands))
+                await writer.drain()
+        except (ConnectionError, ValueError):
+            pass
+        finally:
+            self._writers.discard(writer)
+            self._handlers.discard(asyncio.current_task())
+            writer.close()
+
+    def _execute(self, args: List[bytes], session: Dict[str, Any]) -> Any:
+        name = args[0].decode().upper()
+        self.calls[name] += 1
+        try:
+            if name == "AUTH":
+                if args[-1].decode() != self.password:
+                    raise _RespError("WRONGPASS invalid username-password pair")
+                session["authenticated"] = True
+                return "OK"
+            if not session["authenticated"]:
+                raise _RespError("NOAUTH Authentication required.")
+            handler = getattr(self, f"_cmd_{name.lower()}", None)
+            if handler is None:
+                raise _RespError(f"ERR unknown command '{name}'")
+            return handler(*args[1:])
+        except _RespError as e:
+            return e
+        except (TypeError, ValueError):
+            return _RespError(f"ERR wrong number or type of arguments for '{name}'")
+
+    # ------------------------------------------------------------------
+    # Keys
+    # ------------------------------------------------------------------
+
+    def _live(self, key: bytes) -> Optional[Tuple[bytes, Optional[float]]]:
+        entry = self._data.get(key)
+        if entry is not None and entry[1] is not None and entry[1] <= time.monotonic():
+            del self._data[key]
+            return None
+        return entry
+
+    def _cmd_ping(self, *args: bytes) -> Any:
+        return args[0] if args else "PONG"
+
+    def _cmd_select(self, db: bytes) -> str:
+        int(db)
+        return "OK"
+
+    def _cmd_time(self) -> List[bytes]:
+        seconds, micros = divmod(time.time_ns() // 1000, 1_000_000)
+        return [str(seconds).encode(), str(micros).encode()]
+
+    def _cmd_get(self, key: bytes) -> Optional[bytes]:
+        entry = self._live(key)
+        return entry[0] if entry else None
+
+    def _cmd_set(self, key: bytes, value: bytes, *options: bytes) -> str:
+        expires_at = None
+        if options:
+            if len(options) != 2 or options[0].upper() != b"PX":
+                raise _RespError("ERR syntax error")
+            expires_at = time.monotonic() + int(options[1]) / 1000
+        self._data[key] = (value, expires_at)
+        return "OK"
+
+    def _cmd_pttl(self, key: bytes) -> int:
+        entry = self._live(key)
+        if entry is None:
+            return -2
+        if entry[1] is None:
+            return -1
+        return max(0, round((entry[1] - time.monotonic()) * 1000))
+
+    def _cmd_del(self, *keys: bytes) -> int:
+        return sum(self._data.pop(key, None) is not None for key in keys if self._live(key))
+
+    def _cmd_flushall(self) -> str:
+        self._data.clear()
+        return "OK"
+
+    # ------------------------------------------------------------------
+    # Scripts
+    # ------------------------------------------------------------------
+
+    def _cmd_script(self, subcommand: bytes, *args: bytes) -> Any:
+        subcommand = subcommand.upper()
+        if subcommand == b"LOAD":
+            return self._load(args[0].decode()).encode()
+        if subcommand == b"FLUSH":
+            self.flush_scripts()
+            return "OK"
+        if subcommand == b"EXISTS":
+            return [int(sha.decode() in self._scripts) for sha in args]
+        raise _RespError("ERR unknown SCRIPT subcommand")
+
+    def _load(self, source: str) -> str:
+        sha = hashlib.sha1(source.encode()).hexdigest()
+        if sha not in self._ports:
+            raise _RespError("ERR the stand-in has no port of this script")
+        self._scripts[sha] = source
+        return sha
+
+    def _cmd_eval(self, source: bytes, numkeys: bytes, *rest: bytes) -> Any:
+        sha = self._load(source.decode())
+        return self._run(sha, numkeys, rest)
+
+    def _cmd_evalsha(self, sha: bytes, numkeys: bytes, *rest: bytes) -> Any:
+        sha = sha.decode().lower()
+        if sha not in self._scripts:
+            raise _RespError("NOSCRIPT No matching script. Please use EVAL.")
+        return self._run(sha, numkeys, rest)
+
+    def _run(self, sha: str, numkeys: bytes, rest: Tuple[bytes, ...]) -> Any:
+        count = int(numkeys)
+        return self._ports[sha](list(rest[:count]), list(rest[count:]))
+
+    def _gcra(self, keys: List[bytes], argv: List[bytes]) -> List[int]:
+        """Port of shared_state._GCRA_SCRIPT (same clock source and rounding)."""
+        interval, tolerance = int(argv[0]), int(argv[1])
+        seconds, micros = (int(part) for part in self._cmd_time())
+        now = seconds * 1000 + micros // 1000
+        stored = self._cmd_get(keys[0])
+        tat = max(int(stored) if stored is not None else now, now)
+        wait = tat - now - tolerance
+        if wait > 0:
+            return [0, wait]
+        tat += interval
+        self._cmd_set(keys[0], str(tat).encode(), b"PX", str(tat - now).encode())
+        return [1, 0]
+
+
+def main() -> None:
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Run the provider stand-ins")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--config", help="JSON overrides (inline or a file path)")
+    parser.add_argument("--resp-port", type=int, help="Also run the Redis-protocol stand-in on this port")
+    args = parser.parse_args()
+
+    overrides = load_overrides(args.config)
+
+    if args.resp_port is None:
+        uvicorn.run(create_app(overrides), host=args.host, port=args.port, log_level="warning")
+        return
+
+    async def serve() -> None:
+        resp = RespStandIn()
+        await resp.start(args.host, args.resp_port)
+        server = uvicorn.Server(uvicorn.Config(create_app(overrides), host=args.host, port=args.port, log_level="warning"))
+        try:
+            await server.serve()
+        finally:
+            await resp.stop()
+
+    asyncio.run(serve())
+
+
+if __name__ == "__main__":
+    main()
@@ -1,19 +1,65 @@
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request
+from fastapi.responses import Response
 from fastapi.middleware.cors import CORSMiddleware
 from dotenv import load_dotenv
-from slowapi import Limiter, _rate_limit_exceeded_handler
-from slowapi.util import get_remote_address
-from slowapi.errors import RateLimitExceeded
 import os
 
 from routers import search, image_search, phone_lookup
+from services.credit_service import get_credit_service
+from services.provider_registry import get_provider_registry
+from services.local_registry import get_local_registry
+from services.circuit_breaker import get_breaker_status
+from services.image_cache import get_image_cache
+from services.image_processing import shutdown_image_pool, get_normalization_stats
+from middleware.auth import get_auth_cache_stats
+from middleware.upload_limit import UploadSizeLimitMiddleware
+from middleware.rate_limit import get_rate_limiter
+from services.image_upload import MAX_UPLOAD_BYTES
+from services.tineye_quota import get_tineye_quota
+from services.phone_cache import get_phone_cache, close_phone_cache
+from services.shared_state import get_shared_state, close_shared_state
+from services.metrics import render_metrics, CONTENT_TYPE as METRICS_CONTENT_TYPE
+from services.structured_log import get_logging_stats, shutdown_logging
+from middleware.request_id import RequestIdMiddleware
 
 # Load environment variables
 load_dotenv()
 
-# Initialize rate limiter
-# This limits requests per IP address to prevent abuse
-limiter = Limiter(key_func=get_remote_address)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Start and stop background workers with the app.
+
+    - Search history write-behind buffer (flushed on shutdown)
+    - Refund outbox worker (pending refunds stay journaled across restarts)
+    - Provider registry (shared services + pooled keep-alive HTTP clients)
+    - Image worker processes (perceptual hashing)
+    - TinEye quota poller (only when TINEYE_API_KEY is configured)
+    - Shared state connection (only when SHARED_STATE_URL is configured; opened on first use)
+    - Log writer thread (drained last so shutdown messages are written)
+    """
+    credit_service = get_credit_service()
+    provider_registry = get_provider_registry()
+    await credit_service.history_buffer.start()
+    await credit_service.refund_outbox.start()
+    if os.getenv("TINEYE_API_KEY"):
+        await get_tineye_quota().start()
+
+    yield
+
+    # Flush pending search history updates before the process exits
+    await credit_service.history_buffer.stop()
+    await credit_service.refund_outbox.stop()
+    await get_tineye_quota().stop()
+    await provider_registry.aclose()
+    close_phone_cache()
+    await close_shared_state()
+    shutdown_image_pool()
+    shutdown_logging()
+
 
 app = FastAPI(
     title="Pink Flag API",
@@ -21,12 +67,9 @@ app = FastAPI(
     version="2.0.0",  # Bumped version for security update
     docs_url="/docs",  # Swagger UI
     redoc_url="/redoc",  # ReDoc UI
+    lifespan=lifespan,
 )
 
-# Add rate limiter to app state
-app.state.limiter = limiter
-app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
-
 # Configure CORS - Locked down for production security
 # Only allow requests from our own backend and iOS app (if using deep links)
 app.add_middleware(
@@ -43,6 +86,16 @@ app.add_middleware(
     allow_headers=["Content-Type", "Authorization"],  # Only necessary headers
 )
 
+# Abort oversized image uploads while they stream in (10MB image + multipart overhead)
+app.add_middleware(
+    UploadSizeLimitMiddleware,
+    max_bytes=MAX_UPLOAD_BYTES + 64 * 1024,
+    paths=["/api/image-search"],
+)
+
+# Request id on every log record and in the X-Request-ID response header (added last = outermost)
+app.add_middleware(RequestIdMiddleware)
+
 # Include routers
 app.include_router(search.router, prefix="/api", tags=["search"])
 app.include_router(image_search.router, prefix="/api", tags=["image-search"])
@@ -60,6 +113,40 @@ async def root():
 async def health_check():
     return {"status": "healthy"}
 
+@app.get("/health/workers")
+async def worker_health():
+    """Queue depth and throughput of background workers, plus cache statistics."""
+    credit_service = get_credit_service()
+    local_registry = get_local_registry()
+    image_cache = get_image_cache()
+    phone_cache = get_phone_cache()
+    shared_state = get_shared_state()
+    return {
+        "search_history_buffer": credit_service.history_buffer.get_metrics(),
+        "refund_outbox": await credit_service.refund_outbox.get_metrics(),
+        "jwt_cache": get_auth_cache_stats(),
+        "rate_limiter": get_rate_limiter().stats(),
+        "shared_state": shared_state.stats() if shared_state else None,
+        "provider_connections": get_provider_registry().get_metrics(),
+        "offender_cache": get_provider_registry().offender_service.get_cache_stats(),
+        "phone_cache": phone_cache.stats() if phone_cache else None,
+        "image_cache": image_cache.stats() if image_cache else None,
+        "image_normalization": get_normalization_stats(),
+        "tineye_quota": get_tineye_quota().get_metrics(),
+        "local_registry": await asyncio.to_thread(local_registry.stats) if local_registry else None,
+        "logging": get_logging_stats(),
+    }
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Per-stage latency histograms and counters in the Prometheus text format."""
+    return Response(render_metrics(), media_type=METRICS_CONTENT_TYPE)
+
+@app.get("/health/providers")
+async def provider_health():
+    """Circuit breaker state, error rates, adaptive timeouts and recent transitions per provider."""
+    return get_breaker_status()
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -4,6 +4,10 @@ Authentication Middleware for Supabase JWT Validation
 This middleware validates Supabase JWT tokens on protected endpoints.
 It extracts the user ID from the token and attaches it to the request state.
 
+Verified tokens are kept in a bounded LRU cache (keyed by a SHA-256 digest of
+the token) until their `exp`, so repeat requests with the same token skip the
+decode + HMAC verification.
+
 Usage:
     from middleware.auth import require_auth, get_current_user
 
@@ -16,8 +20,14 @@ Usage:
 from fastapi import Request, HTTPException, status, Depends
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from jose import jwt, JWTError
-from typing import Optional
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+import hashlib
 import os
+import threading
+import time
+
+from services.metrics import CACHE_REQUESTS, timed_stage
 
 # Security scheme for Swagger UI
 security = HTTPBearer()
@@ -27,6 +37,104 @@ security = HTTPBearer()
 # Find it in Supabase Dashboard > Settings > API > JWT Settings > JWT Secret
 SUPABASE_JWT_SECRET = os.getenv("SUPABASE_JWT_SECRET")
 
+# Verified-token cache settings
+# Max number of distinct tokens kept in memory
+JWT_CACHE_MAX_SIZE = int(os.getenv("JWT_CACHE_MAX_SIZE", "10000"))
+# Upper bound on how long a verified token is trusted without re-verification (seconds)
+JWT_CACHE_MAX_TTL = float(os.getenv("JWT_CACHE_MAX_TTL", "300"))
+
+
+class _VerifiedTokenCache:
+    """
+    Bounded LRU cache of verified JWT claims.
+
+    Keys are SHA-256 digests of the raw token (the token itself is never stored).
+    Each entry expires at the token's `exp` claim (capped by JWT_CACHE_MAX_TTL),
+    so an expired token always misses and goes through full verification again.
+    """
+
+    def __init__(self, max_size: int, max_ttl: float):
+        self.max_size = max_size
+        self.max_ttl = max_ttl
+        self._entries: "OrderedDict[bytes, Tuple[str, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _key(token: str) -> bytes:
+        return hashlib.sha256(token.encode("utf-8")).digest()
+
+    def get(self, token: str) -> Optional[str]:
+        """Return the cached user ID for a still-valid token, or None."""
+        key = self._key(token)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            user_id, expires_at = entry
+            if expires_at <= now:
+                # Token (or our trust window) expired - force re-verification
+                del self._entries[key]
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return user_id
+
+    def put(self, token: str, user_id: str, exp: Optional[float]) -> None:
+        """Cache a verified token until its exp (capped by max_ttl)."""
+        if self.max_size <= 0:
+            return
+
+        now = time.time()
+        expires_at = now + self.max_ttl
+        if exp is not None:
+            expires_at = min(expires_at, float(exp))
+        if expires_at <= now:
+            return
+
+        key = self._key(token)
+        with self._lock:
+            self._entries[key] = (user_id, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+_token_cache = _VerifiedTokenCache(JWT_CACHE_MAX_SIZE, JWT_CACHE_MAX_TTL)
+
+
+def get_auth_cache_stats() -> Dict[str, float]:
+    """
+    Get hit/miss counters for the verified-token cache.
+
+    Returns:
+        Dict with size, hits, misses, evictions and hit_ratio
+    """
+    return _token_cache.stats()
+
 def get_current_user(request: Request) -> str:
     """
     Extract the current user ID from the request state.
@@ -51,6 +159,7 @@ def get_current_user(request: Request) -> str:
     return user_id
 
 
+@timed_stage("jwt_verify")
 async def require_auth(
     request: Request,
     credentials: HTTPAuthorizationCredentials = Depends(security)
@@ -60,9 +169,10 @@ async def require_auth(
 
     This function:
     1. Checks for Authorization header
-    2. Validates JWT signature using Supabase JWT secret
-    3. Extracts user ID from token payload
-    4. Attaches user_id to request.state for downstream use
+    2. Returns the cached user ID if this exact token was verified before and hasn't expired
+    3. Otherwise validates JWT signature using Supabase JWT secret
+    4. Extracts user ID from token payload
+    5. Attaches user_id to request.state for downstream use
 
     Args:
         request: FastAPI request object
@@ -92,6 +202,15 @@ async def require_auth(
             headers={"WWW-Authenticate": "Bearer"},
         )
 
+    # Fast path: token already verified and still within its exp
+    cached_user_id = _token_cache.get(token)
+    if cached_user_id:
+        CACHE_REQUESTS.inc("jwt", "hit")
+        request.state.user_id = cached_user_id
+        return cached_user_id
+
+    CACHE_REQUESTS.inc("jwt", "miss")
+
     try:
         # Decode and validate JWT token
         # Supabase uses HS256 algorithm for JWT signing
@@ -117,11 +236,16 @@ async def require_auth(
                 headers={"WWW-Authenticate": "Bearer"},
             )
 
+        # Remember the verified token until it expires
+        _token_cache.put(token, user_id, payload.get("exp"))
+
         # Attach user_id to request state for downstream use
         request.state.user_id = user_id
 
         return user_id
 
+    except HTTPException:
+        raise
     except JWTError as e:
         # Token is invalid or expired
         raise HTTPException(
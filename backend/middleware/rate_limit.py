@@ -0,0 +1,289 @@
+"""
+Rate Limiting (GCRA)
+
+One shared in-process rate-limit engine for every endpoint, replacing the
+per-router slowapi Limiters (separate stores, IP-only keys, moving-window
+storage that grew with every distinct key).
+
+- Keyed on the authenticated user (request.state.user_id, set by require_auth),
+  falling back to the client IP for unauthenticated requests - users behind
+  the same carrier NAT no longer share one bucket
+- GCRA (generic cell rate algorithm): each key stores a single float, its
+  theoretical arrival time (TAT). "10/minute" admits a burst of 10, then one
+  request every 6 seconds. Each check is O(1)
+- Idle keys are evicted incrementally: keys are kept in last-update order,
+  and a key untouched for a full period has a TAT in the past (a fresh
+  bucket), so it can be dropped without changing any decision. Each check
+  pops at most a couple of stale keys from the front; RATE_LIMIT_MAX_KEYS is
+  a hard cap on top
+- With SHARED_STATE_URL set, limits hold across instances: the shared store
+  (services/shared_state.py) runs the same GCRA atomically and is the
+  authority. The local bucket stays in front as a near-cache - it only sees
+  this instance's requests, so a local rejection is always a global one and
+  needs no round trip - and is the fallback while the store is unreachable
+
+Usage:
+    from middleware.rate_limit import get_rate_limiter
+
+    limiter = get_rate_limiter()
+
+    @router.post("/search/name", dependencies=[Depends(require_auth)])
+    @limiter.limit("10/minute")
+    async def search_by_name(request: Request, ...):
+        ...
+
+Exceeding a limit raises HTTPException(429) with a Retry-After header.
+"""
+
+import functools
+import inspect
+import math
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from fastapi import HTTPException, Request, status
+
+from services.shared_state import SharedStateError, get_shared_state
+
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+
+# Hard cap on tracked keys per rule (least recently seen keys are dropped first)
+RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", "1000000"))
+
+# Stale keys evicted per check (keeps eviction O(1) per request)
+_EVICT_PER_CHECK = 2
+
+_PERIODS = {
+    "second": 1.0,
+    "minute": 60.0,
+    "hour": 3600.0,
+    "day": 86400.0,
+}
+
+
+def parse_limit(limit: str) -> Tuple[int, float]:
+    """
+    Parse a limit like "10/minute" or "100/hour".
+
+    Returns:
+        (requests, period in seconds)
+    """
+    count, _, unit = limit.partition("/")
+    unit = unit.strip().lower().rstrip("s")
+    if not count.strip().isdigit() or unit not in _PERIODS or int(count) < 1:
+        raise ValueError(f"Invalid rate limit: {limit!r} (expected e.g. '10/minute')")
+    return int(count), _PERIODS[unit]
+
+
+class GCRABucketStore:
+    """
+    GCRA state for one rule: key -> theoretical arrival time.
+
+    A request is admitted if TAT - now <= period - interval, i.e. fewer than
+    `requests` requests are "in flight" in the current window; admitting it
+    moves TAT forward by one interval.
+    """
+
+    def __init__(self, requests: int, period: float, max_keys: int = RATE_LIMIT_MAX_KEYS):
+        self.requests = requests
+        self.period = period
+        self.interval = period / requests
+        self.tolerance = period - self.interval
+        self.max_keys = max_keys
+
+        # Ordered by last update (oldest first) for incremental eviction
+        self._tat: "OrderedDict[str, float]" = OrderedDict()
+
+        # Stats
+        self.allowed = 0
+        self.limited = 0
+        self.evicted = 0
+        self.shared_limited = 0
+        self.shared_fallbacks = 0
+
+    def __len__(self) -> int:
+        return len(self._tat)
+
+    def hit(self, key: str, now: Optional[float] = None) -> Tuple[bool, float]:
+        """
+        Count one request for key.
+
+        Returns:
+            (allowed, retry_after seconds; 0 when allowed)
+        """
+        if now is None:
+            now = time.monotonic()
+
+        self._evict(now)
+
+        tat = self._tat.get(key, now)
+        if tat < now:
+            tat = now
+
+        wait = tat - now - self.tolerance
+        if wait > 0:
+            # Rejected requests don't consume capacity (TAT unchanged)
+            self.limited += 1
+            return False, wait
+
+        self._tat[key] = tat + self.interval
+        self._tat.move_to_end(key)
+        self.allowed += 1
+
+        if len(self._tat) > self.max_keys:
+            self._tat.popitem(last=False)
+            self.evicted += 1
+
+        return True, 0.0
+
+    def undo(self, key: str) -> None:
+        """Give back the capacity of the last admitted request (rejected elsewhere)."""
+        tat = self._tat.get(key)
+        if tat is not None:
+            self._tat[key] = tat - self.interval
+        self.allowed -= 1
+        self.limited += 1
+
+    def _evict(self, now: float) -> None:
+        """Drop up to a few keys whose buckets have fully refilled."""
+        for _ in range(_EVICT_PER_CHECK):
+            if not self._tat:
+                return
+            key, tat = next(iter(self._tat.items()))
+            if tat > now:
+                # Oldest update is still within its period - so are all later ones
+                return
+            del self._tat[key]
+            self.evicted += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "limit": f"{self.requests}/{int(self.period)}s",
+            "keys": len(self._tat),
+            "allowed": self.allowed,
+            "limited": self.limited,
+            "evicted": self.evicted,
+            "shared_limited": self.shared_limited,
+            "shared_fallbacks": self.shared_fallbacks,
+        }
+
+
+def rate_limit_key(request: Request) -> str:
+    """Authenticated user id if require_auth ran, else the client IP."""
+    user_id = getattr(request.state, "user_id", None)
+    if user_id:
+        return f"user:{user_id}"
+    return f"ip:{request.client.host if request.client else 'unknown'}"
+
+
+class RateLimiter:
+    """Shared rate-limit engine; one GCRA store per (endpoint, limit) rule."""
+
+    def __init__(self, enabled: bool = RATE_LIMIT_ENABLED, max_keys: int = RATE_LIMIT_MAX_KEYS):
+        self.enabled = enabled
+        self.max_keys = max_keys
+        self._rules: Dict[str, GCRABucketStore] = {}
+
+    def rule(self, name: str, limit: str) -> GCRABucketStore:
+        """Get or create the store for a named rule."""
+        store = self._rules.get(name)
+        if store is None:
+            requests, period = parse_limit(limit)
+            store = GCRABucketStore(requests, period, self.max_keys)
+            self._rules[name] = store
+        return store
+
+    async def check(self, request: Request, name: str, limit: str) -> None:
+        """
+        Count a request against a rule (across instances if shared state is configured).
+
+        Raises:
+            HTTPException: 429 with Retry-After when the limit is exceeded
+        """
+        if not self.enabled:
+            return
+
+        store = self.rule(name, limit)
+        key = rate_limit_key(request)
+        allowed, retry_after = store.hit(key)
+
+        shared = get_shared_state()
+        if allowed and shared is not None:
+            try:
+                allowed, retry_after = await shared.gcra(f"{name}:{key}", store.interval, store.tolerance)
+            except SharedStateError:
+                # Store unreachable: the local decision stands
+                store.shared_fallbacks += 1
+            else:
+                if not allowed:
+                    # Other instances used up the budget
+                    store.undo(key)
+                    store.shared_limited += 1
+
+        if not allowed:
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail=f"Rate limit exceeded: {limit}",
+                headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+            )
+
+    def limit(self, limit: str, name: Optional[str] = None) -> Callable:
+        """
+        Decorator applying `limit` to an endpoint.
+
+        The endpoint must take a `request: Request` argument. The check runs
+        after FastAPI dependencies, so require_auth has already set the user id.
+        """
+        parse_limit(limit)  # Fail at import time on a bad limit string
+
+        def decorator(func: Callable) -> Callable:
+            rule_name = name or f"{func.__module__}.{func.__name__}"
+            request_param = next(
+                (
+                    param.name
+                    for param in inspect.signature(func).parameters.values()
+                    if param.annotation is Request
+                ),
+                None,
+            )
+            if request_param is None:
+                raise TypeError(f"{rule_name} needs a 'request: Request' parameter to be rate limited")
+
+            @functools.wraps(func)
+            async def wrapper(*args, **kwargs):
+                await self.check(kwargs[request_param], rule_name, limit)
+                return await func(*args, **kwargs)
+
+            return wrapper
+
+        return decorator
+
+    def stats(self) -> Dict[str, Any]:
+        """Per-rule key counts and allow/limit counters."""
+        return {
+            "enabled": self.enabled,
+            "shared": get_shared_state() is not None,
+            "max_keys_per_rule": self.max_keys,
+            "rules": {name: store.stats() for name, store in self._rules.items()},
+        }
+
+
+# Singleton instance
+_rate_limiter: Optional[RateLimiter] = None
+
+
+def get_rate_limiter() -> RateLimiter:
+    """
+    Get or create the shared RateLimiter.
+
+    Returns:
+        RateLimiter: Engine shared by all routers
+    """
+    global _rate_limiter
+
+    if _rate_limiter is None:
+        _rate_limiter = RateLimiter()
+
+    return _rate_limiter
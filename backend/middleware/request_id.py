@@ -0,0 +1,59 @@
+"""
+Request ID Middleware
+
+Gives every request an id that appears on all of its log records and is
+returned to the client, so an app bug report can be matched to server logs.
+
+- Uses the caller's X-Request-ID header when it looks sane (proxies like
+  Fly's edge can set it), otherwise generates one
+- Stores it in the request_id context var read by services/structured_log.py
+  (tasks spawned during the request inherit it)
+- Echoes it back in the X-Request-ID response header
+
+Usage:
+    from middleware.request_id import RequestIdMiddleware
+
+    app.add_middleware(RequestIdMiddleware)
+"""
+
+import re
+import uuid
+
+from services.structured_log import request_id_var
+
+REQUEST_ID_HEADER = b"x-request-id"
+
+# Accept only short opaque tokens from clients (ends up in every log line)
+_VALID_REQUEST_ID = re.compile(rb"^[A-Za-z0-9._-]{1,64}$")
+
+
+class RequestIdMiddleware:
+    """Pure ASGI middleware setting the request id context var."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = None
+        for name, value in scope.get("headers", []):
+            if name == REQUEST_ID_HEADER and _VALID_REQUEST_ID.match(value):
+                request_id = value
+                break
+        if request_id is None:
+            request_id = uuid.uuid4().hex.encode()
+
+        token = request_id_var.set(request_id.decode())
+
+        async def send_with_request_id(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + [(REQUEST_ID_HEADER, request_id)]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_request_id)
+        finally:
+            request_id_var.reset(token)
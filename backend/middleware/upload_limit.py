@@ -0,0 +1,61 @@
+"""
+Upload Size Limit Middleware
+
+Rejects oversized request bodies on upload endpoints while they stream in,
+instead of after the whole body has been received and parsed.
+
+- A declared Content-Length over the limit is rejected before any body is read
+- Otherwise bytes are counted as they arrive; the request is aborted with
+  413 as soon as the running total passes the limit (also covers chunked
+  uploads without a Content-Length)
+
+Usage:
+    from middleware.upload_limit import UploadSizeLimitMiddleware
+
+    app.add_middleware(
+        UploadSizeLimitMiddleware,
+        max_bytes=10 * 1024 * 1024 + 64 * 1024,
+        paths=["/api/image-search"],
+    )
+"""
+
+from typing import Iterable
+
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse
+
+UPLOAD_TOO_LARGE_DETAIL = "Image file too large. Maximum size is 10MB."
+
+
+class UploadSizeLimitMiddleware:
+    """Pure ASGI middleware enforcing a body size limit on selected paths."""
+
+    def __init__(self, app, max_bytes: int, paths: Iterable[str]):
+        self.app = app
+        self.max_bytes = max_bytes
+        self.paths = set(paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+
+        for name, value in scope.get("headers", []):
+            if name == b"content-length" and value.isdigit() and int(value) > self.max_bytes:
+                response = JSONResponse({"detail": UPLOAD_TOO_LARGE_DETAIL}, status_code=413)
+                await response(scope, receive, send)
+                return
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    # Raised inside body parsing; FastAPI re-raises HTTPExceptions as-is
+                    raise HTTPException(status_code=413, detail=UPLOAD_TOO_LARGE_DETAIL)
+            return message
+
+        await self.app(scope, limited_receive, send)
@@ -12,25 +12,37 @@ Endpoints:
 from fastapi import APIRouter, HTTPException, UploadFile, File, Form, Request, Depends
 from pydantic import BaseModel
 from typing import Optional, List
-from slowapi import Limiter
-from slowapi.util import get_remote_address
 
-from services.tineye_service import TinEyeService
+from services.provider_registry import get_provider_registry
+from services.circuit_breaker import get_circuit_breaker, CircuitOpenError
+from services.tineye_service import TINEYE_TIMEOUT
 from services.credit_service import get_credit_service, InsufficientCreditsError
+from services.image_cache import get_image_cache, ImageResultCache, IMAGE_CACHE_SKIP_CREDITS
+from services.image_fetch import fetch_image
+from services.image_processing import compute_image_hash
+from services.image_upload import stage_upload, InvalidUploadError, StagedUpload
+from services.tineye_quota import get_tineye_quota
 from middleware.auth import require_auth, get_current_user
+from middleware.rate_limit import get_rate_limiter
+from services.structured_log import get_logger
+
+logger = get_logger(__name__)
 
 router = APIRouter()
 
-# Initialize rate limiter for this router
-limiter = Limiter(key_func=get_remote_address)
+# Shared rate limiter (keyed by user, falling back to IP)
+limiter = get_rate_limiter()
 
 # Initialize credit service
 credit_service = get_credit_service()
 
+# Shared with TinEyeService - checked before credits are deducted
+tineye_breaker = get_circuit_breaker("tineye", max_timeout=TINEYE_TIMEOUT)
+
 
 def get_tineye_service():
-    """Lazy initialization of TinEye service."""
-    return TinEyeService()
+    """Lazy initialization of the shared TinEye service (raises ValueError if not configured)."""
+    return get_provider_registry().tineye_service
 
 
 class ImageSearchResult(BaseModel):
@@ -47,10 +59,54 @@ class ImageSearchResponse(BaseModel):
     total_backlinks: int
     results: List[ImageSearchResult]
     message: str
+    cached: bool = False  # True if served from the near-duplicate image cache
+
+
+def _build_response(result: dict, cached: bool = False) -> ImageSearchResponse:
+    """Build the API response (with a user-friendly message) from a search result."""
+    # Generate user-friendly message
+    if result["total_matches"] == 0:
+        message = "No matches found. This image appears to be original or not indexed."
+    elif result["total_matches"] == 1:
+        message = "1 match found. This image appears elsewhere online."
+    else:
+        message = f"{result['total_matches']} matches found. This image appears on multiple websites."
+
+    return ImageSearchResponse(
+        total_matches=result["total_matches"],
+        total_backlinks=result["total_backlinks"],
+        results=result["results"],
+        message=message,
+        cached=cached
+    )
+
+
+async def _image_hash(
+    image_cache: ImageResultCache,
+    staged: Optional[StagedUpload],
+    image_url: Optional[str]
+) -> Optional[int]:
+    """Perceptual hash of the upload or URL image; None if it can't be computed (cache is skipped)."""
+    try:
+        if staged is None:
+            source = await fetch_image(image_url)
+            return await compute_image_hash(source) if source is not None else None
+
+        # Byte-identical re-upload: reuse the hash computed last time
+        image_hash = image_cache.hash_for_digest(staged.sha256)
+        if image_hash is None:
+            # Workers read the temp file themselves - no copy of the upload in this process
+            image_hash = await compute_image_hash(staged.path)
+            if image_hash is not None:
+                image_cache.remember_digest(staged.sha256, image_hash)
+        return image_hash
+    except Exception as e:
+        logger.warning("image hash failed", error=e)
+        return None
 
 
 @router.post("/image-search", response_model=ImageSearchResponse, dependencies=[Depends(require_auth)])
-@limiter.limit("10/minute")  # Max 10 image searches per minute per IP
+@limiter.limit("10/minute")  # Max 10 image searches per minute per user
 async def search_image(
     request: Request,
     image: Optional[UploadFile] = File(None),
@@ -61,7 +117,7 @@ async def search_image(
 
     **Authentication Required**: Must provide valid Supabase JWT token.
 
-    **Rate Limit**: 10 requests per minute per IP address.
+    **Rate Limit**: 10 requests per minute per user.
 
     Accepts either:
     - image: Uploaded image file (multipart/form-data)
@@ -76,6 +132,9 @@ async def search_image(
     - Check if image is a stock photo
 
     **Note**: This endpoint requires the user to have sufficient credits.
+    Re-searches of a recently searched photo (even re-compressed or resized)
+    are answered from the near-duplicate image cache; with
+    IMAGE_CACHE_SKIP_CREDITS enabled they are free.
     """
     # Get authenticated user ID
     user_id = get_current_user(request)
@@ -93,6 +152,46 @@ async def search_image(
             detail="Provide either 'image' file or 'image_url', not both"
         )
 
+    # STEP 0: Stream the upload to a temp file BEFORE anything is charged:
+    # read in chunks, type-checked from magic bytes, aborted past 10MB
+    staged = None
+    if image:
+        try:
+            staged = await stage_upload(image)
+        except InvalidUploadError as e:
+            raise HTTPException(status_code=e.status_code, detail=e.detail)
+
+    try:
+        return await _search_image(user_id, image, image_url, staged)
+    finally:
+        if staged is not None:
+            staged.close()
+
+
+async def _search_image(
+    user_id: str,
+    image: Optional[UploadFile],
+    image_url: Optional[str],
+    staged: Optional[StagedUpload]
+) -> ImageSearchResponse:
+    """Cache lookup, credit deduction and TinEye search for a validated request."""
+    # Near-duplicate cache: perceptual hash of the uploaded (or fetched) image
+    image_cache = get_image_cache()
+    image_hash = await _image_hash(image_cache, staged, image_url) if image_cache is not None else None
+    cached = image_cache.get(image_hash) if image_hash is not None else None
+
+    if cached is not None and IMAGE_CACHE_SKIP_CREDITS:
+        # Same photo searched recently - free, no TinEye call
+        return _build_response(cached[0], cached=True)
+
+    # Fail fast (without charging) while TinEye's circuit breaker is open
+    if cached is None and not tineye_breaker.is_available():
+        raise HTTPException(
+            status_code=503,
+            detail="Image search is temporarily unavailable. Please try again shortly.",
+            headers={"Retry-After": str(int(tineye_breaker.retry_after()) or 1)}
+        )
+
     # Create query string for logging
     query = image_url if image_url else f"image_upload_{image.filename if image else 'unknown'}"
 
@@ -109,40 +208,24 @@ async def search_image(
         search_id = credit_result["search_id"]
         remaining_credits = credit_result["credits"]
 
-        # STEP 2: Perform the actual image search
-        tineye_service = get_tineye_service()
-
-        if image:
-            # Validate file type
-            if image.content_type not in ["image/jpeg", "image/png", "image/gif", "image/webp"]:
-                raise HTTPException(
-                    status_code=400,
-                    detail=f"Unsupported image type: {image.content_type}. Use JPEG, PNG, GIF, or WebP."
-                )
-
-            # Read image data
-            image_data = await image.read()
-
-            # Check file size (max 10MB)
-            if len(image_data) > 10 * 1024 * 1024:
-                raise HTTPException(
-                    status_code=400,
-                    detail="Image file too large. Maximum size is 10MB."
-                )
-
-            # Perform search
-            result = await tineye_service.search_by_image_data(image_data)
+        # STEP 2: Perform the actual image search (or reuse a near-duplicate's results)
+        if cached is not None:
+            result = cached[0]
         else:
-            # Search by URL
-            result = await tineye_service.search_by_url(image_url)
-
-        # Generate user-friendly message
-        if result["total_matches"] == 0:
-            message = "No matches found. This image appears to be original or not indexed."
-        elif result["total_matches"] == 1:
-            message = "1 match found. This image appears elsewhere online."
-        else:
-            message = f"{result['total_matches']} matches found. This image appears on multiple websites."
+            tineye_service = get_tineye_service()
+
+            if staged is not None:
+                # Downscale + strip metadata in the worker pool (small images pass through),
+                # then stream to TinEye from the temp file in chunks
+                await staged.normalize()
+                with staged.open() as image_file:
+                    result = await tineye_service.search_by_image_data(image_file)
+            else:
+                # Search by URL
+                result = await tineye_service.search_by_url(image_url)
+
+            if image_hash is not None:
+                image_cache.set(image_hash, result)
 
         # STEP 3: Update search history with results count
         await credit_service.update_search_results(
@@ -151,12 +234,7 @@ async def search_image(
             search_type="image"
         )
 
-        return ImageSearchResponse(
-            total_matches=result["total_matches"],
-            total_backlinks=result["total_backlinks"],
-            results=result["results"],
-            message=message
-        )
+        return _build_response(result, cached=cached is not None)
 
     except InsufficientCreditsError:
         # Re-raise credit errors as-is (already formatted)
@@ -166,6 +244,20 @@ async def search_image(
         # Re-raise HTTP exceptions (validation errors, etc.)
         raise
 
+    except CircuitOpenError as e:
+        # Breaker opened between the availability check and the call - refund credit
+        await credit_service.refund_credit(
+            user_id=user_id,
+            search_id=search_id,
+            reason="provider_unavailable",
+            amount=4
+        )
+        raise HTTPException(
+            status_code=503,
+            detail="Image search is temporarily unavailable. Your credits have been refunded.",
+            headers={"Retry-After": str(int(e.retry_after) or 1)}
+        )
+
     except Exception as e:
         # For unexpected errors, refund the credit if it was deducted
         if 'search_id' in locals() and search_id:
@@ -176,7 +268,7 @@ async def search_image(
                 amount=4
             )
 
-        print(f"Image search error: {e}")
+        logger.exception("image search failed")
         raise HTTPException(
             status_code=500,
             detail=f"Image search failed: {str(e)}"
@@ -189,37 +281,55 @@ async def get_remaining_searches():
     Get the number of remaining TinEye API searches.
 
     Useful for monitoring usage and knowing when to purchase more searches.
+    Answered from the in-memory quota cache (refreshed in the background and
+    decremented after each search) - no TinEye call per request.
     """
     try:
-        tineye_service = get_tineye_service()
-        remaining = await tineye_service.get_remaining_searches()
-
-        return {
-            "remaining_searches": remaining,
-            "message": f"You have {remaining} image searches remaining in your TinEye account."
-        }
+        get_tineye_service()
     except Exception as e:
         raise HTTPException(
             status_code=500,
             detail=f"Failed to get remaining searches: {str(e)}"
         )
 
+    quota = get_tineye_quota()
+    remaining = await quota.get()
+    if remaining is None:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Failed to get remaining searches: {quota.get_metrics()['last_error']}"
+        )
+
+    return {
+        "remaining_searches": remaining,
+        "low_quota": remaining < quota.low_threshold,
+        "message": f"You have {remaining} image searches remaining in your TinEye account."
+    }
+
 
 @router.get("/image-search/test")
 async def test_image_search():
     """Test endpoint to verify image search API is configured."""
     try:
-        tineye_service = get_tineye_service()
-        remaining = await tineye_service.get_remaining_searches()
-
-        return {
-            "status": "configured",
-            "message": "TinEye API is properly configured",
-            "remaining_searches": remaining
-        }
+        get_tineye_service()
     except Exception as e:
         return {
             "status": "error",
             "message": f"TinEye API configuration error: {str(e)}",
             "remaining_searches": 0
         }
+
+    quota = get_tineye_quota()
+    remaining = await quota.get()
+    if remaining is None:
+        return {
+            "status": "error",
+            "message": f"TinEye API configuration error: {quota.get_metrics()['last_error']}",
+            "remaining_searches": 0
+        }
+
+    return {
+        "status": "configured",
+        "message": "TinEye API is properly configured",
+        "remaining_searches": remaining
+    }
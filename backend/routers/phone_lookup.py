@@ -6,24 +6,34 @@ Twilio credentials are stored on the server side to prevent client-side exposure
 
 Endpoints:
 - POST /api/phone/lookup: Lookup phone number information
+- POST /api/phone/lookup/batch: Lookup several numbers (NDJSON stream, one charge)
 """
 
 from fastapi import APIRouter, HTTPException, Request, Depends
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field, validator
-from typing import Optional, Dict, Any
-from slowapi import Limiter
-from slowapi.util import get_remote_address
+from typing import Optional, Dict, Any, List, Tuple
+import asyncio
 import os
 import httpx
-import re
 
 from middleware.auth import require_auth, get_current_user
+from middleware.rate_limit import get_rate_limiter
 from services.credit_service import get_credit_service, InsufficientCreditsError
+from services.provider_registry import get_provider_registry
+from services.circuit_breaker import get_circuit_breaker, CircuitOpenError
+from services.phone_cache import get_phone_cache
+from services.numbering_plan import normalize_phone_number, InvalidPhoneNumberError, PhoneNumberInfo
+from services.batch_runner import run_batch, ndjson_stream, BATCH_MAX_ITEMS, NDJSON_MEDIA_TYPE
+from services.metrics import stage_timer
+from services.structured_log import get_logger
+
+logger = get_logger(__name__)
 
 router = APIRouter()
 
-# Initialize rate limiter (protects Twilio cost exposure)
-limiter = Limiter(key_func=get_remote_address)
+# Shared rate limiter (protects Twilio cost exposure)
+limiter = get_rate_limiter()
 
 # Initialize credit service
 credit_service = get_credit_service()
@@ -31,24 +41,43 @@ credit_service = get_credit_service()
 # Get Twilio credentials from environment
 TWILIO_ACCOUNT_SID = os.getenv("TWILIO_ACCOUNT_SID")
 TWILIO_AUTH_TOKEN = os.getenv("TWILIO_AUTH_TOKEN")
-TWILIO_LOOKUP_URL = "https://lookups.twilio.com/v2/PhoneNumbers"
+TWILIO_LOOKUP_URL = os.getenv("TWILIO_LOOKUP_URL", "https://lookups.twilio.com/v2/PhoneNumbers")
+
+# Upper bound for one Twilio lookup (seconds); the circuit breaker adapts
+# the effective timeout to Twilio's observed p99 latency
+TWILIO_TIMEOUT = 15.0
+twilio_breaker = get_circuit_breaker("twilio", max_timeout=TWILIO_TIMEOUT)
+
+
+def _is_twilio_outage(response: httpx.Response) -> bool:
+    """5xx and 429 responses count against the Twilio circuit breaker."""
+    return response.status_code >= 500 or response.status_code == 429
 
 
 class PhoneLookupRequest(BaseModel):
     """Request model for phone lookup."""
-    phone_number: str = Field(..., description="Phone number to lookup (10+ digits, US format preferred)")
+    phone_number: str = Field(..., description="Phone number to lookup (E.164, or US/Canada national format)")
 
     @validator('phone_number')
     def validate_phone_number(cls, v):
-        """Validate phone number format."""
-        # Remove all non-digit characters
-        digits_only = re.sub(r'\D', '', v)
+        """Normalize to E.164 offline; impossible numbers are rejected before any credit is deducted."""
+        try:
+            return normalize_phone_number(v).e164
+        except InvalidPhoneNumberError as e:
+            raise ValueError(str(e))
 
-        # Check minimum length
-        if len(digits_only) < 10:
-            raise ValueError("Phone number must be at least 10 digits")
 
-        return digits_only
+class PhoneBatchLookupRequest(BaseModel):
+    """Request model for batch phone lookup."""
+    phone_numbers: List[str] = Field(..., min_length=1, max_length=BATCH_MAX_ITEMS)
+
+    @validator('phone_numbers', each_item=True)
+    def validate_phone_numbers(cls, v):
+        """Every number must be possible - the whole batch is rejected before charging otherwise."""
+        try:
+            return normalize_phone_number(v).e164
+        except InvalidPhoneNumberError as e:
+            raise ValueError(str(e))
 
 
 class PhoneLookupResult(BaseModel):
@@ -58,11 +87,85 @@ class PhoneLookupResult(BaseModel):
     carrier: Optional[str] = None
     line_type: Optional[str] = None  # Mobile, Landline, VoIP, etc.
     location: Optional[str] = None  # City, State
+    country: Optional[str] = None  # ISO country (local numbering plan)
+    region: Optional[str] = None  # State/province of the area code (local numbering plan)
     fraud_risk: Optional[str] = None  # Risk assessment
     fraud_score: Optional[int] = None  # Numeric risk score
     metadata: Optional[Dict[str, Any]] = None  # Additional API response data
 
 
+def _with_plan_hints(payload: Dict[str, Any], info: PhoneNumberInfo) -> Dict[str, Any]:
+    """Fill country/region/location (and line type if Twilio had none) from the numbering plan."""
+    result = dict(payload)
+    result["country"] = info.country
+    result["region"] = info.region
+    if info.country:
+        result["location"] = f"{info.region}, {info.country}" if info.region else info.country
+    if not result.get("line_type"):
+        result["line_type"] = info.line_type
+    return result
+
+
+class TwilioLookupError(Exception):
+    """Non-200 response from Twilio Lookup (never cached)."""
+
+    def __init__(self, status_code: int):
+        self.status_code = status_code
+        super().__init__(f"Twilio lookup failed with status {status_code}")
+
+
+async def _twilio_lookup(phone_number: str) -> Dict[str, Any]:
+    """
+    Call Twilio Lookup API v2 for an E.164 number.
+
+    Returns:
+        PhoneLookupResult fields as a JSON-serializable dict (the cached payload)
+
+    Raises:
+        TwilioLookupError: On a non-200 response
+    """
+    # Shared keep-alive client (no new TCP/TLS handshake per lookup)
+    client = get_provider_registry().http_client("twilio")
+
+    response = await twilio_breaker.call(
+        lambda: client.get(
+            f"{TWILIO_LOOKUP_URL}/{phone_number}",
+            params={
+                "Fields": "line_type_intelligence,caller_name"
+            },
+            auth=(TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN),
+            headers={
+                "Accept": "application/json"
+            },
+            timeout=TWILIO_TIMEOUT
+        ),
+        is_failure=_is_twilio_outage
+    )
+
+    if response.status_code != 200:
+        raise TwilioLookupError(response.status_code)
+
+    with stage_timer("transform", "twilio"):
+        # Parse successful response
+        data = response.json()
+
+        # Extract and structure the response
+        # Twilio Lookup API v2 response structure
+        line_type_intel = data.get("line_type_intelligence") or {}
+        caller_name_data = data.get("caller_name") or {}
+
+        return PhoneLookupResult(
+            phone_number=data.get("phone_number", phone_number),
+            caller_name=caller_name_data.get("caller_name"),
+            carrier=line_type_intel.get("carrier_name"),
+            line_type=line_type_intel.get("type"),  # mobile, landline, voip, etc.
+            location=f"{data.get('country_code', '')}",  # Twilio provides country code
+            fraud_risk=None,  # Available with SMS Pumping Risk package ($0.025 extra)
+            fraud_score=None,  # Available with SMS Pumping Risk package
+            metadata=data  # Store full response for debugging
+        ).model_dump()
+
+
 @router.post("/phone/lookup", response_model=PhoneLookupResult, dependencies=[Depends(require_auth)])
 @limiter.limit("15/minute")  # App-level guardrail to control Twilio spend
 async def lookup_phone(
@@ -74,16 +177,22 @@ async def lookup_phone(
 
     **Authentication Required**: Must provide valid Supabase JWT token.
 
-    **Rate Limit**: 15 requests per minute per IP address.
+    **Rate Limit**: 15 requests per minute per user.
 
     Returns caller information including:
     - Caller Name (CNAM)
     - Carrier information
     - Line type (Mobile, Landline, VoIP)
-    - Country code
+    - Country and region (from the local numbering plan)
+
+    Numbers are normalized to E.164 and validated offline first: impossible
+    numbers (unknown country code, wrong length, invalid area code) get a 422
+    without any credit being deducted.
 
     **Note**: This endpoint requires the user to have sufficient credits.
     Credits are validated and deducted server-side before the lookup is performed.
+    Numbers looked up recently are answered from the phone lookup cache
+    (no Twilio call); concurrent lookups of the same number share one call.
 
     **Cost**: $0.018 per lookup ($0.008 for Line Type Intelligence + $0.01 for Caller Name)
 
@@ -106,6 +215,22 @@ async def lookup_phone(
     # Get authenticated user ID
     user_id = get_current_user(request)
 
+    # Already normalized to E.164 by the request validator - also the cache key
+    phone_number = lookup_request.phone_number
+    plan_info = normalize_phone_number(phone_number)
+
+    # Recently looked-up number: answered from the cache, no Twilio call
+    phone_cache = get_phone_cache()
+    cached = await phone_cache.get(phone_number) if phone_cache is not None else None
+
+    # Fail fast (without charging) while Twilio's circuit breaker is open
+    if cached is None and not twilio_breaker.is_available():
+        raise HTTPException(
+            status_code=503,
+            detail="Phone lookup service is temporarily unavailable. Please try again shortly.",
+            headers={"Retry-After": str(int(twilio_breaker.retry_after()) or 1)}
+        )
+
     try:
         # STEP 1: Validate and deduct credit BEFORE performing lookup
         # Phone searches cost 2 credits due to Twilio API pricing ($0.018/lookup)
@@ -119,100 +244,92 @@ async def lookup_phone(
         search_id = credit_result["search_id"]
         remaining_credits = credit_result["credits"]
 
-        # STEP 2: Call Twilio Lookup API v2
-        async with httpx.AsyncClient(timeout=15.0) as client:
-            # Format phone number for URL (E.164 format with + prefix)
-            phone_number = lookup_request.phone_number
-            if not phone_number.startswith('+'):
-                phone_number = f'+{phone_number}'
-
-            response = await client.get(
-                f"{TWILIO_LOOKUP_URL}/{phone_number}",
-                params={
-                    "Fields": "line_type_intelligence,caller_name"
-                },
-                auth=(TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN),
-                headers={
-                    "Accept": "application/json"
-                }
+        # STEP 2: Call Twilio Lookup API v2 (unless cached)
+        if cached is not None:
+            payload = cached
+        elif phone_cache is not None:
+            # Concurrent lookups of the same number share one Twilio call
+            payload = await phone_cache.get_or_load(
+                phone_number, lambda: _twilio_lookup(phone_number)
             )
+        else:
+            payload = await _twilio_lookup(phone_number)
 
-            # Handle non-success responses
-            if response.status_code == 503:
-                # Service temporarily unavailable (maintenance)
-                # Refund credit for service unavailability
-                await credit_service.refund_credit(
-                    user_id=user_id,
-                    search_id=search_id,
-                    reason="api_maintenance_503",
-                    amount=2
-                )
-                raise HTTPException(
-                    status_code=503,
-                    detail="Phone lookup service is temporarily unavailable. Your credit has been refunded."
-                )
-            elif response.status_code == 500:
-                # Server error
-                # Refund credit for server error
-                await credit_service.refund_credit(
-                    user_id=user_id,
-                    search_id=search_id,
-                    reason="server_error_500",
-                    amount=2
-                )
-                raise HTTPException(
-                    status_code=500,
-                    detail="Phone lookup service encountered an error. Your credit has been refunded."
-                )
-            elif response.status_code == 429:
-                # Rate limit exceeded
-                raise HTTPException(
-                    status_code=429,
-                    detail="Too many requests. Please try again in a minute."
-                )
-            elif response.status_code == 400:
-                # Bad request (invalid phone number format)
-                raise HTTPException(
-                    status_code=400,
-                    detail="Invalid phone number format. Please check the number and try again."
-                )
-            elif response.status_code != 200:
-                # Other errors
-                raise HTTPException(
-                    status_code=response.status_code,
-                    detail=f"Phone lookup failed with status {response.status_code}"
-                )
+        # Twilio enriches; country/region/line-type hints come from the local plan
+        result = PhoneLookupResult(**_with_plan_hints(payload, plan_info))
 
-            # Parse successful response
-            data = response.json()
-
-            # Extract and structure the response
-            # Twilio Lookup API v2 response structure
-            line_type_intel = data.get("line_type_intelligence", {})
-            caller_name_data = data.get("caller_name", {})
-
-            result = PhoneLookupResult(
-                phone_number=data.get("phone_number", lookup_request.phone_number),
-                caller_name=caller_name_data.get("caller_name"),
-                carrier=line_type_intel.get("carrier_name"),
-                line_type=line_type_intel.get("type"),  # mobile, landline, voip, etc.
-                location=f"{data.get('country_code', '')}",  # Twilio provides country code
-                fraud_risk=None,  # Available with SMS Pumping Risk package ($0.025 extra)
-                fraud_score=None,  # Available with SMS Pumping Risk package
-                metadata=data  # Store full response for debugging
-            )
+        # STEP 3: Update search history with results
+        await credit_service.update_search_results(
+            search_id=search_id,
+            results_count=1,  # Phone lookups always return 1 result
+            search_type="phone"
+        )
 
-            # STEP 3: Update search history with results
-            await credit_service.update_search_results(
+        return result
+
+    except TwilioLookupError as e:
+        # Handle non-success responses
+        if e.status_code == 503:
+            # Service temporarily unavailable (maintenance)
+            # Refund credit for service unavailability
+            await credit_service.refund_credit(
+                user_id=user_id,
                 search_id=search_id,
-                results_count=1,  # Phone lookups always return 1 result
-                search_type="phone"
+                reason="api_maintenance_503",
+                amount=2
+            )
+            raise HTTPException(
+                status_code=503,
+                detail="Phone lookup service is temporarily unavailable. Your credit has been refunded."
+            )
+        elif e.status_code == 500:
+            # Server error
+            # Refund credit for server error
+            await credit_service.refund_credit(
+                user_id=user_id,
+                search_id=search_id,
+                reason="server_error_500",
+                amount=2
+            )
+            raise HTTPException(
+                status_code=500,
+                detail="Phone lookup service encountered an error. Your credit has been refunded."
+            )
+        elif e.status_code == 429:
+            # Rate limit exceeded
+            raise HTTPException(
+                status_code=429,
+                detail="Too many requests. Please try again in a minute."
+            )
+        elif e.status_code == 400:
+            # Bad request (invalid phone number format)
+            raise HTTPException(
+                status_code=400,
+                detail="Invalid phone number format. Please check the number and try again."
+            )
+        else:
+            # Other errors
+            raise HTTPException(
+                status_code=e.status_code,
+                detail=f"Phone lookup failed with status {e.status_code}"
             )
 
-            return result
+    except CircuitOpenError as e:
+        # Breaker opened between the availability check and the call - refund credit
+        await credit_service.refund_credit(
+            user_id=user_id,
+            search_id=search_id,
+            reason="provider_unavailable",
+            amount=2
+        )
+        raise HTTPException(
+            status_code=503,
+            detail="Phone lookup service is temporarily unavailable. Your credit has been refunded.",
+            headers={"Retry-After": str(int(e.retry_after) or 1)}
+        )
 
-    except httpx.TimeoutException:
-        # Network timeout - refund credit
+    except (httpx.TimeoutException, TimeoutError):
+        # Network timeout (or adaptive timeout) - refund credit
         await credit_service.refund_credit(
             user_id=user_id,
             search_id=search_id,
@@ -255,13 +372,164 @@ async def lookup_phone(
                 amount=2
             )
 
-        print(f"Phone lookup error: {e}")
+        logger.exception("phone lookup failed")
         raise HTTPException(
             status_code=500,
             detail=f"Unexpected error during phone lookup: {str(e)}"
         )
 
 
+def _classify_lookup_error(e: Exception) -> Tuple[int, str, Optional[str]]:
+    """
+    Map a failed batch item to (status_code, error message, refund reason).
+
+    Same refund policy as lookup_phone: outages, timeouts and network errors
+    are refunded; Twilio 400/429/other 4xx are not.
+    """
+    if isinstance(e, TwilioLookupError):
+        if e.status_code == 503:
+            return 503, "Phone lookup service is temporarily unavailable.", "api_maintenance_503"
+        if e.status_code == 500:
+            return 500, "Phone lookup service encountered an error.", "server_error_500"
+        if e.status_code == 429:
+            return 429, "Too many requests. Please try again in a minute.", None
+        if e.status_code == 400:
+            return 400, "Invalid phone number format.", None
+        return e.status_code, f"Phone lookup failed with status {e.status_code}", None
+    if isinstance(e, CircuitOpenError):
+        return 503, "Phone lookup service is temporarily unavailable.", "provider_unavailable"
+    if isinstance(e, (httpx.TimeoutException, TimeoutError)):
+        return 504, "Phone lookup request timed out.", "request_timeout"
+    if isinstance(e, httpx.NetworkError):
+        return 503, "Network error during phone lookup.", "network_error"
+    return 500, f"Unexpected error during phone lookup: {str(e)}", "unknown_error"
+
+
+@router.post("/phone/lookup/batch", dependencies=[Depends(require_auth)])
+@limiter.limit("5/minute")  # Each batch carries up to BATCH_MAX_ITEMS lookups
+async def lookup_phone_batch(
+    request: Request,
+    batch_request: PhoneBatchLookupRequest
+):
+    """
+    Look up several phone numbers in one request.
+
+    **Authentication Required**: Must provide valid Supabase JWT token.
+
+    **Rate Limit**: 5 batches per minute per user.
+
+    Credits for the whole batch (2 per number) are deducted in a single
+    transaction up front. Lookups run with bounded concurrency and results
+    are streamed back as newline-delimited JSON as each one completes:
+
+        {"index": 0, "phone_number": "+1...", "status": "ok", "result": {...}}
+        {"index": 1, "phone_number": "+1...", "status": "error", "status_code": 504, "error": "...", "refunded": true}
+        {"done": true, "total": 2, "succeeded": 1, "failed": 1, "credits_charged": 4, "credits_refunded": 2, ...}
+
+    Failed items are refunded individually (same rules as /phone/lookup).
+    Impossible numbers reject the whole batch with 422 before anything is charged.
+    """
+    if not TWILIO_ACCOUNT_SID or not TWILIO_AUTH_TOKEN:
+        raise HTTPException(
+            status_code=500,
+            detail="Phone lookup service not configured. Please contact support."
+        )
+
+    user_id = get_current_user(request)
+    phone_numbers = batch_request.phone_numbers
+
+    # Fail fast (without charging) if some numbers need Twilio and its breaker is open
+    phone_cache = get_phone_cache()
+    cached = [
+        await phone_cache.get(number) if phone_cache is not None else None
+        for number in phone_numbers
+    ]
+    if any(payload is None for payload in cached) and not twilio_breaker.is_available():
+        raise HTTPException(
+            status_code=503,
+            detail="Phone lookup service is temporarily unavailable. Please try again shortly.",
+            headers={"Retry-After": str(int(twilio_breaker.retry_after()) or 1)}
+        )
+
+    # STEP 1: One credit transaction for the whole batch (one search entry per number)
+    credit_result = await credit_service.check_and_deduct_credits_batch(
+        user_id=user_id,
+        search_type="phone",
+        items=[{"query": number, "cost": 2} for number in phone_numbers]
+    )
+    search_ids = credit_result["search_ids"]
+    totals = {"succeeded": 0, "failed": 0, "credits_refunded": 0}
+
+    async def lookup_item(index: int, slot: asyncio.Semaphore) -> Dict[str, Any]:
+        phone_number = phone_numbers[index]
+        search_id = search_ids[index]
+        try:
+            # STEP 2: Cache hit, shared in-flight lookup, or Twilio call (waiting
+            # for a slot counts as in progress: a cancelled queued item is refunded too)
+            async with slot:
+                if cached[index] is not None:
+                    payload = cached[index]
+                elif phone_cache is not None:
+                    payload = await phone_cache.get_or_load(
+                        phone_number, lambda: _twilio_lookup(phone_number)
+                    )
+                else:
+                    payload = await _twilio_lookup(phone_number)
+
+            result = PhoneLookupResult(**_with_plan_hints(payload, normalize_phone_number(phone_number)))
+
+            # STEP 3: Search history (buffered and written in bulk)
+            await credit_service.update_search_results(
+                search_id=search_id,
+                results_count=1,
+                search_type="phone"
+            )
+
+            totals["succeeded"] += 1
+            return {"index": index, "phone_number": phone_number, "status": "ok", "result": result.model_dump()}
+
+        except asyncio.CancelledError:
+            # Client went away before this lookup finished - don't keep the credit
+            await credit_service.refund_credit(
+                user_id=user_id, search_id=search_id, reason="batch_cancelled", amount=2
+            )
+            raise
+
+        except Exception as e:
+            status_code, message, refund_reason = _classify_lookup_error(e)
+            if refund_reason:
+                await credit_service.refund_credit(
+                    user_id=user_id, search_id=search_id, reason=refund_reason, amount=2
+                )
+                totals["credits_refunded"] += 2
+            if status_code == 500:
+                logger.exception("phone batch lookup failed", search_id=search_id)
+
+            totals["failed"] += 1
+            return {
+                "index": index,
+                "phone_number": phone_number,
+                "status": "error",
+                "status_code": status_code,
+                "error": message,
+                "refunded": refund_reason is not None,
+            }
+
+    def summary() -> Dict[str, Any]:
+        return {
+            "done": True,
+            "total": len(phone_numbers),
+            **totals,
+            "credits_charged": 2 * len(phone_numbers),
+            "remaining_credits": credit_result["credits"] + totals["credits_refunded"],
+        }
+
+    return StreamingResponse(
+        ndjson_stream(run_batch(len(phone_numbers), lookup_item), summary),
+        media_type=NDJSON_MEDIA_TYPE
+    )
+
+
 @router.get("/phone/test")
 async def test_phone_lookup():
     """
@@ -1,24 +1,30 @@
+import asyncio
+
 from fastapi import APIRouter, HTTPException, Query, Request, Depends
-from pydantic import BaseModel
-from typing import Optional, List
-from slowapi import Limiter
-from slowapi.util import get_remote_address
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
+from typing import Optional, List, Dict, Any
 
-from services.offender_api import OffenderAPIService
+from services.provider_registry import get_provider_registry
+from services.name_ranking import rank_results
 from services.credit_service import get_credit_service, InsufficientCreditsError
+from services.batch_runner import run_batch, ndjson_stream, BATCH_MAX_ITEMS, NDJSON_MEDIA_TYPE
+from services.metrics import stage_timer
 from middleware.auth import require_auth, get_current_user
+from middleware.rate_limit import get_rate_limiter
 
 router = APIRouter()
 
-# Initialize rate limiter for this router
-limiter = Limiter(key_func=get_remote_address)
+# Shared rate limiter (keyed by user, falling back to IP)
+limiter = get_rate_limiter()
 
 # Initialize credit service
 credit_service = get_credit_service()
 
-# Lazy initialization to ensure environment variables are loaded first
+# Lazy initialization to ensure environment variables are loaded first.
+# The service is shared and uses the registry's pooled HTTP clients.
 def get_offender_service():
-    return OffenderAPIService()
+    return get_provider_registry().offender_service
 
 class SearchRequest(BaseModel):
     firstName: str
@@ -28,6 +34,9 @@ class SearchRequest(BaseModel):
     age: Optional[str] = None
     state: Optional[str] = None
 
+class BatchSearchRequest(BaseModel):
+    searches: List[SearchRequest] = Field(..., min_length=1, max_length=BATCH_MAX_ITEMS)
+
 class OffenderResult(BaseModel):
     id: str
     fullName: str
@@ -38,9 +47,10 @@ class OffenderResult(BaseModel):
     registrationDate: Optional[str] = None
     distance: Optional[float] = None
     address: Optional[str] = None
+    matchScore: Optional[float] = None  # 0-1 confidence that this record matches the search
 
 @router.post("/search/name", response_model=List[OffenderResult], dependencies=[Depends(require_auth)])
-@limiter.limit("10/minute")  # Max 10 searches per minute per IP
+@limiter.limit("10/minute")  # Max 10 searches per minute per user
 async def search_by_name(
     search_request: SearchRequest,
     request: Request
@@ -50,7 +60,7 @@ async def search_by_name(
 
     **Authentication Required**: Must provide valid Supabase JWT token.
 
-    **Rate Limit**: 10 requests per minute per IP address.
+    **Rate Limit**: 10 requests per minute per user.
 
     Returns a list of potential matches with disclaimer that these should be verified independently.
 
@@ -60,6 +70,13 @@ async def search_by_name(
     # Get authenticated user ID from request state
     user_id = get_current_user(request)
 
+    # Fail fast (without charging) while every offender provider's circuit breaker is open
+    if not get_offender_service().is_available():
+        raise HTTPException(
+            status_code=503,
+            detail="Offender search is temporarily unavailable. Please try again shortly."
+        )
+
     # Create search query string for logging
     query = f"{search_request.firstName} {search_request.lastName}"
 
@@ -76,29 +93,8 @@ async def search_by_name(
         search_id = credit_result["search_id"]
         remaining_credits = credit_result["credits"]
 
-        # STEP 2: Perform the actual search
-        offender_service = get_offender_service()
-        results = await offender_service.search_by_name(
-            first_name=search_request.firstName,
-            last_name=search_request.lastName,
-            phone_number=search_request.phoneNumber,
-            zip_code=search_request.zipCode,
-            age=search_request.age,
-            state=search_request.state
-        )
-
-        # Post-filter by age and state if provided (since external APIs may not support these filters)
-        if search_request.age:
-            try:
-                target_age = int(search_request.age)
-                # Filter results within a 5-year range
-                results = [r for r in results if r.get('age') and abs(r['age'] - target_age) <= 5]
-            except ValueError:
-                pass  # Invalid age format, skip filtering
-
-        if search_request.state:
-            # Filter by state (case-insensitive)
-            results = [r for r in results if r.get('state', '').upper() == search_request.state.upper()]
+        # STEP 2: Perform the actual search (filtered and ranked, best matches first)
+        results = await _search_and_rank(search_request)
 
         # STEP 3: Update search history with results count
         await credit_service.update_search_results(
@@ -132,12 +128,141 @@ async def search_by_name(
             detail=f"Error searching offender database: {str(e)}"
         )
 
+async def _search_and_rank(search_request: SearchRequest) -> List[Dict[str, Any]]:
+    """Offender search with age/state filtering, best matches first."""
+    # Age (+/- 5 years) and state filters are applied by the service
+    # while provider responses stream in
+    results = await get_offender_service().search_by_name(
+        first_name=search_request.firstName,
+        last_name=search_request.lastName,
+        phone_number=search_request.phoneNumber,
+        zip_code=search_request.zipCode,
+        age=search_request.age,
+        state=search_request.state
+    )
+
+    # Best matches first: fuzzy name similarity + age/location weighting. Each
+    # provider's results were already capped at OFFENDER_RESULT_LIMIT, keeping
+    # the closest names (ResultFilter.name_score), not the first ones received
+    with stage_timer("rank"):
+        return rank_results(
+            results,
+            first_name=search_request.firstName,
+            last_name=search_request.lastName,
+            age=search_request.age,
+            state=search_request.state
+        )
+
+@router.post("/search/name/batch", dependencies=[Depends(require_auth)])
+@limiter.limit("5/minute")  # Each batch carries up to BATCH_MAX_ITEMS searches
+async def search_by_name_batch(
+    batch_request: BatchSearchRequest,
+    request: Request
+):
+    """
+    Run several name searches in one request.
+
+    **Authentication Required**: Must provide valid Supabase JWT token.
+
+    **Rate Limit**: 5 batches per minute per user.
+
+    Credits for the whole batch (10 per search) are deducted in a single
+    transaction up front. Searches run with bounded concurrency and results
+    are streamed back as newline-delimited JSON as each one completes:
+
+        {"index": 0, "query": "Jane Doe", "status": "ok", "results": [...]}
+        {"index": 1, "query": "John Roe", "status": "error", "status_code": 500, "error": "...", "refunded": true}
+        {"done": true, "total": 2, "succeeded": 1, "failed": 1, "credits_charged": 20, "credits_refunded": 10, ...}
+
+    Failed searches are refunded individually.
+    """
+    user_id = get_current_user(request)
+    searches = batch_request.searches
+
+    # Fail fast (without charging) while every offender provider's circuit breaker is open
+    if not get_offender_service().is_available():
+        raise HTTPException(
+            status_code=503,
+            detail="Offender search is temporarily unavailable. Please try again shortly."
+        )
+
+    queries = [f"{item.firstName} {item.lastName}" for item in searches]
+
+    # STEP 1: One credit transaction for the whole batch (one search entry per item)
+    credit_result = await credit_service.check_and_deduct_credits_batch(
+        user_id=user_id,
+        search_type="name",
+        items=[{"query": query, "cost": 10} for query in queries]
+    )
+    search_ids = credit_result["search_ids"]
+    totals = {"succeeded": 0, "failed": 0, "credits_refunded": 0}
+
+    async def search_item(index: int, slot: asyncio.Semaphore) -> Dict[str, Any]:
+        search_id = search_ids[index]
+        try:
+            # STEP 2: Search + rank (waiting for a slot counts as in progress:
+            # a cancelled queued item is refunded too)
+            async with slot:
+                results = await _search_and_rank(searches[index])
+
+            # STEP 3: Search history (buffered and written in bulk)
+            await credit_service.update_search_results(
+                search_id=search_id,
+                results_count=len(results),
+                search_type="name"
+            )
+
+            totals["succeeded"] += 1
+            return {
+                "index": index,
+                "query": queries[index],
+                "status": "ok",
+                "results": [OffenderResult(**result).model_dump() for result in results],
+            }
+
+        except asyncio.CancelledError:
+            # Client went away before this search finished - don't keep the credits
+            await credit_service.refund_credit(
+                user_id=user_id, search_id=search_id, reason="batch_cancelled", amount=10
+            )
+            raise
+
+        except Exception as e:
+            await credit_service.refund_credit(
+                user_id=user_id, search_id=search_id, reason="api_error_500", amount=10
+            )
+            totals["failed"] += 1
+            totals["credits_refunded"] += 10
+            return {
+                "index": index,
+                "query": queries[index],
+                "status": "error",
+                "status_code": 500,
+                "error": f"Error searching offender database: {str(e)}",
+                "refunded": True,
+            }
+
+    def summary() -> Dict[str, Any]:
+        return {
+            "done": True,
+            "total": len(searches),
+            **totals,
+            "credits_charged": 10 * len(searches),
+            "remaining_credits": credit_result["credits"] + totals["credits_refunded"],
+        }
+
+    return StreamingResponse(
+        ndjson_stream(run_batch(len(searches), search_item), summary),
+        media_type=NDJSON_MEDIA_TYPE
+    )
+
 @router.get("/search/test")
 async def test_search():
     """Test endpoint to verify API connectivity"""
     return {
         "message": "Search API is working",
         "endpoints": {
-            "POST /api/search/name": "Search by name with optional filters"
+            "POST /api/search/name": "Search by name with optional filters",
+            "POST /api/search/name/batch": "Several name searches in one request (NDJSON stream)"
         }
     }
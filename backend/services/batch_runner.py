@@ -0,0 +1,84 @@
+"""
+Batch Runner
+
+Runs the items of a batch request with bounded concurrency and yields each
+item's outcome as soon as it completes, so batch endpoints can stream
+per-item results (NDJSON) instead of waiting for the slowest item.
+
+If the consumer stops early (client disconnected, response cancelled), the
+items still running or still queued are cancelled. Item workers are expected
+to catch CancelledError to refund their credit before re-raising, and to
+acquire their concurrency slot inside that try block - otherwise an item
+cancelled while waiting for a slot would never reach its refund handler.
+
+Usage:
+    async def worker(index: int, slot: asyncio.Semaphore) -> dict:
+        try:
+            async with slot:
+                ...
+            return {"index": index, "status": "ok", "result": ...}
+        except asyncio.CancelledError:
+            ...  # refund
+            raise
+
+    return StreamingResponse(
+        ndjson_stream(run_batch(len(items), worker), summary_fn),
+        media_type=NDJSON_MEDIA_TYPE,
+    )
+"""
+
+import asyncio
+import json
+import os
+from contextlib import aclosing
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Optional
+
+# Max items accepted in one batch request
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "10"))
+
+# Max items of one batch calling upstream providers at the same time
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "4"))
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+
+async def run_batch(
+    count: int,
+    worker: Callable[[int, asyncio.Semaphore], Awaitable[Dict[str, Any]]],
+    concurrency: int = BATCH_CONCURRENCY
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Run worker(0..count-1, slot) with at most `concurrency` holding the slot.
+
+    Every worker starts right away and waits for the shared slot itself, so
+    cancellation always lands inside the worker (see module docstring).
+
+    Yields:
+        Each worker's result dict, in completion order
+    """
+    slot = asyncio.Semaphore(max(1, concurrency))
+    tasks = [asyncio.create_task(worker(index, slot)) for index in range(count)]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        pending = [task for task in tasks if not task.done()]
+        for task in pending:
+            task.cancel()
+        if pending:
+            # Let cancelled workers run their refund handlers
+            await asyncio.gather(*pending, return_exceptions=True)
+
+
+async def ndjson_stream(
+    outcomes: AsyncIterator[Dict[str, Any]],
+    summary_fn: Optional[Callable[[], Dict[str, Any]]] = None
+) -> AsyncIterator[bytes]:
+    """Encode outcomes as newline-delimited JSON, followed by an optional summary line."""
+    # aclosing: if the response is cancelled, run_batch's cleanup runs right away
+    async with aclosing(outcomes):
+        async for outcome in outcomes:
+            yield (json.dumps(outcome, separators=(",", ":"), default=str) + "\n").encode()
+
+    if summary_fn is not None:
+        yield (json.dumps(summary_fn(), separators=(",", ":"), default=str) + "\n").encode()
@@ -0,0 +1,366 @@
+"""
+Provider Circuit Breakers and Adaptive Timeouts
+
+Wraps every outbound provider call (Offenders.io, CrimeoMeter, Twilio, TinEye)
+with a per-provider circuit breaker that tracks rolling latency and error rate.
+
+- Timeouts adapt to the provider: p99 of recent successful calls times a
+  multiplier, clamped between a floor and the provider's old fixed timeout.
+- When the error rate over the rolling window crosses the threshold the
+  breaker opens and calls fail immediately (CircuitOpenError) instead of
+  waiting out the full timeout during an upstream brownout.
+- After BREAKER_OPEN_SECONDS a few probe calls are let through (half-open);
+  success closes the breaker again, failure re-opens it.
+
+Routers check `is_available()` BEFORE deducting credits, so users are not
+charged (and then refunded) for a provider we already know is down.
+
+Usage:
+    from services.circuit_breaker import get_circuit_breaker, CircuitOpenError
+
+    breaker = get_circuit_breaker("twilio", max_timeout=15.0)
+    if not breaker.is_available():
+        raise HTTPException(status_code=503, ...)
+
+    response = await breaker.call(lambda: client.get(url))
+"""
+
+import asyncio
+import os
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional, Tuple
+
+from .metrics import STAGE_SECONDS
+from .structured_log import get_logger
+
+logger = get_logger(__name__)
+
+# Breaker opens when at least this fraction of calls in the window failed...
+BREAKER_FAILURE_RATE = float(os.getenv("BREAKER_FAILURE_RATE", "0.5"))
+# ...and the window holds at least this many calls
+BREAKER_MIN_CALLS = int(os.getenv("BREAKER_MIN_CALLS", "10"))
+# Rolling window: outcomes older than this are ignored (seconds)
+BREAKER_WINDOW_SECONDS = float(os.getenv("BREAKER_WINDOW_SECONDS", "60"))
+# How long an open breaker fails fast before letting probes through (seconds)
+BREAKER_OPEN_SECONDS = float(os.getenv("BREAKER_OPEN_SECONDS", "30"))
+# Concurrent probe calls allowed while half-open
+BREAKER_HALF_OPEN_PROBES = int(os.getenv("BREAKER_HALF_OPEN_PROBES", "1"))
+
+# Adaptive timeout = p99 latency x multiplier, clamped to [min, provider max]
+ADAPTIVE_TIMEOUT_MULTIPLIER = float(os.getenv("ADAPTIVE_TIMEOUT_MULTIPLIER", "2.0"))
+ADAPTIVE_TIMEOUT_MIN = float(os.getenv("ADAPTIVE_TIMEOUT_MIN", "2.0"))
+# Successful-call latencies needed before the timeout adapts
+_ADAPTIVE_MIN_SAMPLES = 20
+_LATENCY_WINDOW = 200
+
+# State transitions kept per breaker for the status endpoint
+_TRANSITION_HISTORY = 20
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a provider whose breaker is open."""
+
+    def __init__(self, provider: str, retry_after: float):
+        self.provider = provider
+        self.retry_after = retry_after
+        super().__init__(f"{provider} circuit open - retry in {retry_after:.0f}s")
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker + latency tracker for one upstream provider.
+
+    Not thread-safe; used from the event loop only.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_timeout: float,
+        failure_rate: float = BREAKER_FAILURE_RATE,
+        min_calls: int = BREAKER_MIN_CALLS,
+        window_seconds: float = BREAKER_WINDOW_SECONDS,
+        open_seconds: float = BREAKER_OPEN_SECONDS,
+        half_open_probes: int = BREAKER_HALF_OPEN_PROBES,
+        timeout_multiplier: float = ADAPTIVE_TIMEOUT_MULTIPLIER,
+        min_timeout: float = ADAPTIVE_TIMEOUT_MIN,
+    ):
+        self.name = name
+        self.max_timeout = max_timeout
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.window_seconds = window_seconds
+        self.open_seconds = open_seconds
+        self.half_open_probes = half_open_probes
+        self.timeout_multiplier = timeout_multiplier
+        self.min_timeout = min(min_timeout, max_timeout)
+
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._probes_in_flight = 0
+
+        # (monotonic time, succeeded) per call, pruned to the window
+        self._outcomes: Deque[Tuple[float, bool]] = deque()
+        # Latencies (seconds) of recent successful calls
+        self._latencies: Deque[float] = deque(maxlen=_LATENCY_WINDOW)
+        self._transitions: Deque[Dict[str, Any]] = deque(maxlen=_TRANSITION_HISTORY)
+
+        # Counters
+        self.total_calls = 0
+        self.total_failures = 0
+        self.total_timeouts = 0
+        self.total_rejected = 0
+
+    # ==================== STATE ====================
+
+    @property
+    def state(self) -> str:
+        """Current state; an open breaker turns half-open once open_seconds have passed."""
+        if self._state == OPEN and time.monotonic() - self._opened_at >= self.open_seconds:
+            self._transition(HALF_OPEN, "open period elapsed")
+        return self._state
+
+    def _transition(self, new_state: str, reason: str) -> None:
+        if new_state == self._state:
+            return
+        self._transitions.append({
+            "from": self._state,
+            "to": new_state,
+            "reason": reason,
+            "at": time.time(),
+        })
+        logger.warning("circuit breaker transition", breaker=self.name, from_state=self._state, to_state=new_state, reason=reason)
+        self._state = new_state
+        self._probes_in_flight = 0
+        if new_state == OPEN:
+            self._opened_at = time.monotonic()
+        elif new_state == CLOSED:
+            self._outcomes.clear()
+
+    def retry_after(self) -> float:
+        """Seconds until an open breaker lets probes through (0 if not open)."""
+        if self.state != OPEN:
+            return 0.0
+        return max(self.open_seconds - (time.monotonic() - self._opened_at), 0.0)
+
+    def is_available(self) -> bool:
+        """
+        Whether a call would currently be attempted.
+
+        Does not reserve a half-open probe slot, so routers can use it as a
+        cheap check before deducting credits.
+        """
+        state = self.state
+        if state == OPEN:
+            return False
+        if state == HALF_OPEN:
+            return self._probes_in_flight < self.half_open_probes
+        return True
+
+    def _acquire(self) -> None:
+        """Admit one call or raise CircuitOpenError."""
+        state = self.state
+        if state == OPEN or (state == HALF_OPEN and self._probes_in_flight >= self.half_open_probes):
+            self.total_rejected += 1
+            raise CircuitOpenError(self.name, self.retry_after() or self.open_seconds)
+        if state == HALF_OPEN:
+            self._probes_in_flight += 1
+
+    # ==================== RECORDING ====================
+
+    def _prune(self, now: float) -> None:
+        cutoff = now - self.window_seconds
+        while self._outcomes and self._outcomes[0][0] < cutoff:
+            self._outcomes.popleft()
+
+    def record_success(self, latency: float) -> None:
+        """Record a successful call and its latency."""
+        now = time.monotonic()
+        self.total_calls += 1
+        self._latencies.append(latency)
+        self._outcomes.append((now, True))
+        self._prune(now)
+
+        if self._state == HALF_OPEN:
+            self._transition(CLOSED, "probe succeeded")
+
+    def record_failure(self, reason: str = "error") -> None:
+        """Record a failed call (error, timeout or retryable upstream status)."""
+        now = time.monotonic()
+        self.total_calls += 1
+        self.total_failures += 1
+        self._outcomes.append((now, False))
+        self._prune(now)
+
+        if self._state == HALF_OPEN:
+            self._transition(OPEN, f"probe failed: {reason}")
+            return
+
+        if self._state == CLOSED and len(self._outcomes) >= self.min_calls:
+            failures = sum(1 for _, ok in self._outcomes if not ok)
+            rate = failures / len(self._outcomes)
+            if rate >= self.failure_rate:
+                self._transition(OPEN, f"error rate {rate:.0%} over {len(self._outcomes)} calls")
+
+    # ==================== LATENCY ====================
+
+    def latency_percentile(self, percentile: float) -> Optional[float]:
+        """Latency (seconds) at a percentile (0-1) of recent successful calls, None if no samples."""
+        if not self._latencies:
+            return None
+        ordered = sorted(self._latencies)
+        index = min(int(len(ordered) * percentile), len(ordered) - 1)
+        return ordered[index]
+
+    @property
+    def sample_count(self) -> int:
+        return len(self._latencies)
+
+    def timeout(self) -> float:
+        """
+        Current timeout for one call.
+
+        Uses the provider's max timeout until enough samples are collected,
+        then p99 x multiplier clamped to [min_timeout, max_timeout].
+        """
+        if len(self._latencies) < _ADAPTIVE_MIN_SAMPLES:
+            return self.max_timeout
+        p99 = self.latency_percentile(0.99)
+        return min(max(p99 * self.timeout_multiplier, self.min_timeout), self.max_timeout)
+
+    # ==================== CALLS ====================
+
+    async def call(
+        self,
+        factory: Callable[[], Awaitable[Any]],
+        is_failure: Optional[Callable[[Any], bool]] = None,
+        timeout: Optional[float] = None,
+    ) -> Any:
+        """
+        Run one provider call under the breaker and adaptive timeout.
+
+        Args:
+            factory: Zero-argument callable returning the awaitable to run
+            is_failure: Optional check that marks a returned value as a failure
+                (e.g. a Twilio 5xx response) without raising
+            timeout: Override for the adaptive timeout (seconds)
+
+        Returns:
+            Whatever the awaitable returns
+
+        Raises:
+            CircuitOpenError: If the breaker is open (the provider is not called)
+            TimeoutError: If the call exceeded the timeout
+            Exception: Anything raised by the call itself
+        """
+        self._acquire()
+        call_timeout = timeout if timeout is not None else self.timeout()
+        started = time.monotonic()
+
+        try:
+            result = await asyncio.wait_for(factory(), timeout=call_timeout)
+        except asyncio.TimeoutError:
+            STAGE_SECONDS.observe(time.monotonic() - started, "provider_call", self.name)
+            self.total_timeouts += 1
+            self.record_failure(f"timeout after {call_timeout:.1f}s")
+            raise TimeoutError(f"{self.name} call timed out after {call_timeout:.1f}s")
+        except asyncio.CancelledError:
+            # Caller gave up (hedging, fan-out deadline) - not the provider's fault
+            if self._state == HALF_OPEN:
+                self._probes_in_flight = max(self._probes_in_flight - 1, 0)
+            raise
+        except Exception as e:
+            STAGE_SECONDS.observe(time.monotonic() - started, "provider_call", self.name)
+            if _is_client_error(e):
+                # Our request was bad (4xx) - the provider itself is healthy
+                self.record_success(time.monotonic() - started)
+            else:
+                self.record_failure(type(e).__name__)
+            raise
+
+        STAGE_SECONDS.observe(time.monotonic() - started, "provider_call", self.name)
+        if is_failure is not None and is_failure(result):
+            self.record_failure("upstream error response")
+        else:
+            self.record_success(time.monotonic() - started)
+        return result
+
+    def get_status(self) -> Dict[str, Any]:
+        """State, error rate, latency percentiles and recent transitions."""
+        state = self.state
+        self._prune(time.monotonic())
+        window_failures = sum(1 for _, ok in self._outcomes if not ok)
+
+        def ms(value: Optional[float]) -> Optional[float]:
+            return round(value * 1000, 1) if value is not None else None
+
+        return {
+            "state": state,
+            "retry_after_seconds": round(self.retry_after(), 1),
+            "window_calls": len(self._outcomes),
+            "window_error_rate": round(window_failures / len(self._outcomes), 4) if self._outcomes else 0.0,
+            "latency_ms": {
+                "p50": ms(self.latency_percentile(0.50)),
+                "p95": ms(self.latency_percentile(0.95)),
+                "p99": ms(self.latency_percentile(0.99)),
+                "samples": len(self._latencies),
+            },
+            "timeout_seconds": round(self.timeout(), 3),
+            "max_timeout_seconds": self.max_timeout,
+            "total_calls": self.total_calls,
+            "total_failures": self.total_failures,
+            "total_timeouts": self.total_timeouts,
+            "total_rejected": self.total_rejected,
+            "transitions": list(self._transitions),
+        }
+
+
+def _is_client_error(error: Exception) -> bool:
+    """
+    True for 4xx errors other than 429 (rate limits count as failures).
+
+    Understands httpx.HTTPStatusError (response.status_code) and
+    TinEyeAPIError (code).
+    """
+    response = getattr(error, "response", None)
+    status = getattr(response, "status_code", None)
+    if status is None:
+        status = getattr(error, "code", None)
+    try:
+        status = int(status)
+    except (TypeError, ValueError):
+        return False
+    return 400 <= status < 500 and status != 429
+
+
+# Breaker per provider name
+_breakers: Dict[str, CircuitBreaker] = {}
+
+
+def get_circuit_breaker(name: str, max_timeout: float = 10.0) -> CircuitBreaker:
+    """
+    Get or create the breaker for a provider.
+
+    Args:
+        name: Provider name ('offenders_io', 'crimeometer', 'twilio', 'tineye')
+        max_timeout: Timeout cap (seconds) - the provider's previous fixed timeout.
+            Only used when the breaker is first created.
+
+    Returns:
+        CircuitBreaker: Shared breaker for this provider
+    """
+    breaker = _breakers.get(name)
+    if breaker is None:
+        breaker = CircuitBreaker(name, max_timeout=max_timeout)
+        _breakers[name] = breaker
+    return breaker
+
+
+def get_breaker_status() -> Dict[str, Any]:
+    """Status of every breaker created so far (for the status endpoint)."""
+    return {name: breaker.get_status() for name, breaker in _breakers.items()}
@@ -5,13 +5,21 @@ Handles server-side credit validation, deduction, and refunds.
 This prevents client-side manipulation of credit balances.
 
 All credit operations are performed using Supabase RPC functions for atomic transactions.
+Database calls go through the async Supabase client so they never block the event loop.
 """
 
 import json
 import re
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional
 from fastapi import HTTPException, status
-from .supabase_client import get_admin_client
+from supabase import AsyncClient
+from .supabase_client import get_async_admin_client
+from .search_history_buffer import SearchHistoryBuffer
+from .refund_outbox import RefundOutbox
+from .metrics import REFUNDS, timed_stage
+from .structured_log import get_logger
+
+logger = get_logger(__name__)
 
 
 class InsufficientCreditsError(HTTPException):
@@ -36,8 +44,22 @@ class CreditService:
     """
 
     def __init__(self):
-        """Initialize credit service with Supabase admin client."""
-        self.supabase = get_admin_client()
+        """Initialize credit service. The async admin client is created on first use."""
+        self.supabase: Optional[AsyncClient] = None
+
+        # Search history updates are written behind the response in batches.
+        # The buffer's flush task is started/stopped by the app lifespan.
+        self.history_buffer = SearchHistoryBuffer(flush_fn=self.write_search_updates)
+
+        # Refunds are journaled locally and applied by a background worker
+        # with retries. Also started/stopped by the app lifespan.
+        self.refund_outbox = RefundOutbox(apply_fn=self.apply_refund)
+
+    async def _get_supabase(self) -> AsyncClient:
+        """Return the shared async Supabase admin client, creating it if needed."""
+        if self.supabase is None:
+            self.supabase = await get_async_admin_client()
+        return self.supabase
 
     async def get_user_credits(self, user_id: str) -> int:
         """
@@ -53,7 +75,8 @@ class CreditService:
             HTTPException: If user not found or database error
         """
         try:
-            response = self.supabase.table("profiles").select("credits").eq("user_id", user_id).single().execute()
+            supabase = await self._get_supabase()
+            response = await supabase.table("profiles").select("credits").eq("user_id", user_id).single().execute()
 
             if not response.data:
                 raise HTTPException(
@@ -71,6 +94,7 @@ class CreditService:
                 detail=f"Failed to fetch user credits: {str(e)}"
             )
 
+    @timed_stage("credit_rpc")
     async def check_and_deduct_credit(
         self,
         user_id: str,
@@ -105,8 +129,9 @@ class CreditService:
         """
         try:
             # Call Supabase RPC function for atomic credit deduction
-            print(f"🔵 [CREDIT] Calling RPC deduct_credit_for_search for user {user_id}, cost: {cost}")
-            response = self.supabase.rpc(
+            supabase = await self._get_supabase()
+            logger.debug("credit rpc started", rpc="deduct_credit_for_search", user_id=user_id, cost=cost, sample=0.1)
+            response = await supabase.rpc(
                 "deduct_credit_for_search",
                 {
                     "p_user_id": user_id,
@@ -116,7 +141,7 @@ class CreditService:
                 }
             ).execute()
 
-            print(f"✅ [CREDIT] RPC execute() completed successfully")
+            logger.debug("credit rpc completed", rpc="deduct_credit_for_search", user_id=user_id, sample=0.1)
             result = response.data
 
             # Handle case where response.data is a string instead of dict
@@ -155,7 +180,7 @@ class CreditService:
             # WORKAROUND: Supabase Python client sometimes throws exceptions
             # when RPC returns JSON type instead of JSONB. The actual response
             # is embedded in the exception details as a byte string.
-            print(f"⚠️ [CREDIT] RPC execute() threw exception: {type(e).__name__}")
+            logger.warning("credit rpc raised", rpc="deduct_credit_for_search", user_id=user_id, error_type=type(e).__name__)
             error_str = str(e)
 
             # Try to extract JSON from byte string in error details
@@ -175,22 +200,111 @@ class CreditService:
 
                     # If we successfully parsed it and it has success=true, use it!
                     if result.get("success"):
-                        print(f"✅ [CREDIT] Extracted successful result from exception - search_id: {result.get('search_id')}, credits: {result.get('credits')}")
+                        logger.info(
+                            "credit rpc result recovered from exception",
+                            user_id=user_id,
+                            search_id=result.get("search_id"),
+                            credits=result.get("credits"),
+                        )
                         return {
                             "search_id": result.get("search_id"),
                             "credits": result.get("credits"),
                             "success": True,
                         }
                 except (json.JSONDecodeError, KeyError, ValueError) as parse_error:
-                    print(f"❌ [CREDIT] Failed to parse embedded JSON from error: {parse_error}")
+                    logger.error("credit rpc embedded json unparseable", user_id=user_id, error=parse_error)
 
             # If we couldn't extract valid JSON, raise the original error
-            print(f"❌ [CREDIT] Could not extract valid JSON, raising error")
+            logger.error("credit rpc failed", rpc="deduct_credit_for_search", user_id=user_id, error=e)
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail=f"Credit validation error: {error_str}"
             )
 
+    @timed_stage("credit_rpc_batch")
+    async def check_and_deduct_credits_batch(
+        self,
+        user_id: str,
+        search_type: str,
+        items: List[Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        """
+        Deduct credits for a whole batch of searches in one transaction.
+
+        Uses the Supabase RPC function `deduct_credits_for_batch` which locks the
+        profile once, checks the total cost, records one deduction transaction and
+        creates one search history entry per item (so items can be refunded
+        individually with refund_credit()).
+
+        Args:
+            user_id: Supabase user ID
+            search_type: Type of search ('name', 'phone')
+            items: One dict per item with `query` (for logging) and `cost`
+
+        Returns:
+            Dict containing:
+                - search_ids: Search entry UUIDs, in item order
+                - credits: Remaining credits after deduction
+                - success: Boolean indicating success
+
+        Raises:
+            InsufficientCreditsError: If user doesn't have enough credits for the whole batch
+            HTTPException: If database operation fails
+        """
+        try:
+            supabase = await self._get_supabase()
+            total_cost = sum(item["cost"] for item in items)
+            logger.debug(
+                "credit rpc started",
+                rpc="deduct_credits_for_batch",
+                user_id=user_id,
+                items=len(items),
+                cost=total_cost,
+                sample=0.1,
+            )
+            response = await supabase.rpc(
+                "deduct_credits_for_batch",
+                {
+                    "p_user_id": user_id,
+                    "p_search_type": search_type,
+                    "p_items": items,
+                }
+            ).execute()
+
+            result = response.data
+            if isinstance(result, str):
+                result = json.loads(result)
+
+        except Exception as e:
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Credit validation error: {str(e)}"
+            )
+
+        if not result or not result.get("success"):
+            error = result.get("error", "unknown_error") if result else "empty_response"
+
+            if error == "insufficient_credits":
+                raise InsufficientCreditsError(result.get("credits", 0))
+
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Credit deduction failed: {error}"
+            )
+
+        search_ids = result.get("search_ids") or []
+        if len(search_ids) != len(items):
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail="Credit deduction failed: search entry count mismatch"
+            )
+
+        return {
+            "search_ids": search_ids,
+            "credits": result.get("credits"),
+            "success": True,
+        }
+
     async def refund_credit(
         self,
         user_id: str,
@@ -201,11 +315,53 @@ class CreditService:
         """
         Refund credits for a failed search.
 
-        This uses the Supabase RPC function `refund_credit_for_failed_search` which:
+        When the refund outbox is running, the refund is journaled locally and
+        applied by a background worker (with retries), so the caller's error
+        response doesn't wait on the database. Otherwise it is applied directly.
+
+        Args:
+            user_id: Supabase user ID
+            search_id: UUID of the search entry to refund
+            reason: Reason code for refund (e.g., "api_error_503")
+            amount: Number of credits to refund (default: 1)
+
+        Returns:
+            Dict containing:
+                - credits: Updated credit balance after refund (None if queued)
+                - success: Boolean indicating the refund was applied or durably queued
+                - queued: True if the refund will be applied in the background
+        """
+        REFUNDS.inc(reason)
+
+        if self.refund_outbox.running:
+            try:
+                await self.refund_outbox.enqueue(user_id, search_id, reason, amount)
+                return {"credits": None, "success": True, "queued": True}
+            except Exception as e:
+                # Journal unavailable - fall back to applying the refund inline
+                logger.warning("refund outbox write failed", search_id=search_id, error=e)
+
+        result = await self.apply_refund(user_id, search_id, reason, amount)
+        result["queued"] = False
+        return result
+
+    async def apply_refund(
+        self,
+        user_id: str,
+        search_id: str,
+        reason: str,
+        amount: int = 1
+    ) -> Dict[str, Any]:
+        """
+        Apply a refund via the Supabase RPC function `refund_credit_for_failed_search`.
+
+        The RPC:
         1. Adds credits back to user's balance
         2. Creates a refund transaction record
         3. Updates the search entry with refund status
 
+        Never raises - failures are returned so the refund outbox can retry them.
+
         Args:
             user_id: Supabase user ID
             search_id: UUID of the search entry to refund
@@ -216,12 +372,11 @@ class CreditService:
             Dict containing:
                 - credits: Updated credit balance after refund
                 - success: Boolean indicating success
-
-        Raises:
-            HTTPException: If refund operation fails
+                - error: Error code when success is False (e.g. "already_refunded")
         """
         try:
-            response = self.supabase.rpc(
+            supabase = await self._get_supabase()
+            response = await supabase.rpc(
                 "refund_credit_for_failed_search",
                 {
                     "p_user_id": user_id,
@@ -238,33 +393,27 @@ class CreditService:
                 try:
                     result = json.loads(result)
                 except json.JSONDecodeError:
-                    # Refunds are best-effort, log but don't fail
-                    print(f"Warning: Failed to parse refund RPC response for user {user_id}")
+                    logger.warning("refund rpc response unparseable", user_id=user_id, search_id=search_id)
                     return {"credits": 0, "success": False, "error": "parse_error"}
 
             if not result or not result.get("success"):
-                error = result.get("error", "unknown_error")
-                raise HTTPException(
-                    status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                    detail=f"Credit refund failed: {error}"
-                )
+                error = result.get("error", "unknown_error") if result else "empty_response"
+                return {"credits": 0, "success": False, "error": error}
 
             return {
                 "credits": result.get("credits"),
                 "success": True,
             }
 
-        except HTTPException:
-            raise
         except Exception as e:
-            # Refunds are best-effort - log error but don't fail the request
-            print(f"Warning: Credit refund failed for user {user_id}: {e}")
+            logger.warning("credit refund failed", user_id=user_id, search_id=search_id, error=e)
             return {
                 "credits": 0,
                 "success": False,
                 "error": str(e),
             }
 
+    @timed_stage("update_search_results")
     async def update_search_results(
         self,
         search_id: str,
@@ -275,6 +424,10 @@ class CreditService:
         """
         Update search entry with results count and metadata.
 
+        When the write-behind buffer is running, the update is queued and
+        flushed in bulk later, so no database round trip happens here.
+        Otherwise (e.g. scripts without the app lifespan) it is written directly.
+
         Args:
             search_id: UUID of the search entry
             results_count: Number of results returned
@@ -282,8 +435,12 @@ class CreditService:
             metadata: Optional additional metadata to store
 
         Returns:
-            bool: True if update successful, False otherwise
+            bool: True if update was queued or written, False otherwise
         """
+        if self.history_buffer.running:
+            self.history_buffer.enqueue(search_id, results_count, search_type, metadata)
+            return True
+
         try:
             update_data = {"results_count": results_count}
 
@@ -293,15 +450,43 @@ class CreditService:
             if metadata:
                 update_data["metadata"] = metadata
 
-            self.supabase.table("searches").update(update_data).eq("id", search_id).execute()
+            supabase = await self._get_supabase()
+            await supabase.table("searches").update(update_data).eq("id", search_id).execute()
 
             return True
 
         except Exception as e:
             # Don't fail the request if history update fails
-            print(f"Warning: Failed to update search results for {search_id}: {e}")
+            logger.warning("search results update failed", search_id=search_id, error=e)
             return False
 
+    async def write_search_updates(self, updates: List[Dict[str, Any]]) -> None:
+        """
+        Write a batch of search history updates in a single statement.
+
+        Uses the Supabase RPC function `update_search_results_batch`, which runs
+        one multi-row UPDATE ... FROM jsonb_to_recordset(...) for the whole batch.
+
+        Args:
+            updates: Rows with `id`, `results_count` and optional `search_type`/`metadata`
+
+        Raises:
+            Exception: If the RPC fails (the buffer keeps the batch and retries)
+        """
+        supabase = await self._get_supabase()
+        response = await supabase.rpc(
+            "update_search_results_batch",
+            {"p_updates": updates}
+        ).execute()
+
+        result = response.data
+        if isinstance(result, str):
+            result = json.loads(result)
+
+        if not result or not result.get("success"):
+            error = result.get("error", "unknown_error") if result else "empty_response"
+            raise RuntimeError(f"Batch search update failed: {error}")
+
 
 # Singleton instance for dependency injection
 _credit_service: Optional[CreditService] = None
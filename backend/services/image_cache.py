@@ -0,0 +1,234 @@
+"""
+Near-Duplicate Image Search Cache
+
+Caches TinEye search results by perceptual image hash, so a re-upload of the
+same photo - re-compressed, resized or re-screenshotted - is answered from
+cache instead of a new 4-credit TinEye search.
+
+Hashes are indexed in a BK-tree keyed on Hamming distance: a lookup only
+visits subtrees whose distance band can contain a match, so finding every
+hash within a few bits of the query stays fast with tens of thousands of
+cached images.
+
+- Entries expire after IMAGE_CACHE_TTL
+- A lookup matches hashes within IMAGE_CACHE_MAX_DISTANCE bits (closest wins)
+- Oldest entries are evicted past IMAGE_CACHE_MAX_ENTRIES
+- Expired/evicted hashes are removed from the tree by periodic rebuilds
+- Byte-identical re-uploads (same SHA-256) reuse the remembered perceptual
+  hash, skipping the decode + hash step entirely
+
+Usage:
+    from services.image_cache import get_image_cache
+
+    cache = get_image_cache()
+    hit = cache.get(image_hash)          # (result, distance) or None
+    cache.set(image_hash, result)
+
+    image_hash = cache.hash_for_digest(sha256_hex)  # None if not seen
+    cache.remember_digest(sha256_hex, image_hash)
+"""
+
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from .metrics import CACHE_REQUESTS
+
+# Cache settings
+IMAGE_CACHE_ENABLED = os.getenv("IMAGE_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+IMAGE_CACHE_TTL = float(os.getenv("IMAGE_CACHE_TTL", "604800"))  # 7 days
+IMAGE_CACHE_MAX_DISTANCE = int(os.getenv("IMAGE_CACHE_MAX_DISTANCE", "6"))  # bits out of 64
+IMAGE_CACHE_MAX_ENTRIES = int(os.getenv("IMAGE_CACHE_MAX_ENTRIES", "20000"))
+# If true, a cache hit is free for the user (no credits deducted)
+IMAGE_CACHE_SKIP_CREDITS = os.getenv("IMAGE_CACHE_SKIP_CREDITS", "false").lower() in ("1", "true", "yes")
+
+
+def hamming(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
+
+
+class BKTree:
+    """
+    Burkhard-Keller tree over 64-bit hashes with Hamming distance.
+
+    Each node stores its children by distance to the node, so by the triangle
+    inequality a search for radius r under a node at distance d only needs
+    the children keyed d-r .. d+r.
+    """
+
+    def __init__(self):
+        # Node: [hash, {distance: child_node}]
+        self._root: Optional[list] = None
+        self.size = 0
+
+    def add(self, value: int) -> None:
+        if self._root is None:
+            self._root = [value, {}]
+            self.size = 1
+            return
+
+        node = self._root
+        while True:
+            distance = hamming(value, node[0])
+            if distance == 0:
+                return  # Already present
+            child = node[1].get(distance)
+            if child is None:
+                node[1][distance] = [value, {}]
+                self.size += 1
+                return
+            node = child
+
+    def search(self, value: int, radius: int) -> List[Tuple[int, int]]:
+        """All (distance, hash) pairs within radius, closest first."""
+        if self._root is None:
+            return []
+
+        found = []
+        stack = [self._root]
+        while stack:
+            node = stack.pop()
+            distance = hamming(value, node[0])
+            if distance <= radius:
+                found.append((distance, node[0]))
+            for child_distance, child in node[1].items():
+                if distance - radius <= child_distance <= distance + radius:
+                    stack.append(child)
+
+        found.sort()
+        return found
+
+
+class ImageResultCache:
+    """TTL cache of image search results with Hamming-distance lookup."""
+
+    def __init__(
+        self,
+        ttl: float = IMAGE_CACHE_TTL,
+        max_distance: int = IMAGE_CACHE_MAX_DISTANCE,
+        max_entries: int = IMAGE_CACHE_MAX_ENTRIES,
+    ):
+        self.ttl = ttl
+        self.max_distance = max_distance
+        self.max_entries = max_entries
+
+        # hash -> (expires_at, result), oldest first
+        self._entries: "OrderedDict[int, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._tree = BKTree()
+        # SHA-256 of upload bytes -> perceptual hash, most recent last
+        self._digests: "OrderedDict[str, int]" = OrderedDict()
+
+        # Stats
+        self.exact_hits = 0
+        self.near_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.rebuilds = 0
+        self.digest_hits = 0
+
+    def get(self, image_hash: int) -> Optional[Tuple[Dict[str, Any], int]]:
+        """
+        Closest cached result within max_distance.
+
+        Returns:
+            (result, hamming distance) or None
+        """
+        now = time.monotonic()
+        for distance, candidate in self._tree.search(image_hash, self.max_distance):
+            entry = self._entries.get(candidate)
+            if entry is None:
+                continue  # Evicted - dropped from the tree at the next rebuild
+            if entry[0] <= now:
+                del self._entries[candidate]
+                continue
+            if distance == 0:
+                self.exact_hits += 1
+            else:
+                self.near_hits += 1
+            CACHE_REQUESTS.inc("image", "hit")
+            return entry[1], distance
+
+        self.misses += 1
+        CACHE_REQUESTS.inc("image", "miss")
+        return None
+
+    def set(self, image_hash: int, result: Dict[str, Any]) -> None:
+        """Cache a search result under an image hash."""
+        self._entries.pop(image_hash, None)
+        self._entries[image_hash] = (time.monotonic() + self.ttl, result)
+        self._tree.add(image_hash)
+
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+        # Tree nodes can't be deleted; rebuild once half of them are stale
+        if self._tree.size > 2 * max(len(self._entries), 1):
+            self._rebuild()
+
+    def hash_for_digest(self, digest: str) -> Optional[int]:
+        """Perceptual hash previously computed for these exact bytes, if any."""
+        image_hash = self._digests.get(digest)
+        if image_hash is not None:
+            self._digests.move_to_end(digest)
+            self.digest_hits += 1
+        return image_hash
+
+    def remember_digest(self, digest: str, image_hash: int) -> None:
+        """Remember the perceptual hash of an exact upload (bounded like the result entries)."""
+        self._digests[digest] = image_hash
+        self._digests.move_to_end(digest)
+        while len(self._digests) > self.max_entries:
+            self._digests.popitem(last=False)
+
+    def _rebuild(self) -> None:
+        now = time.monotonic()
+        for stale in [h for h, (expires_at, _) in self._entries.items() if expires_at <= now]:
+            del self._entries[stale]
+
+        self._tree = BKTree()
+        for image_hash in self._entries:
+            self._tree.add(image_hash)
+        self.rebuilds += 1
+
+    def stats(self) -> Dict[str, Any]:
+        hits = self.exact_hits + self.near_hits
+        lookups = hits + self.misses
+        return {
+            "enabled": IMAGE_CACHE_ENABLED,
+            "entries": len(self._entries),
+            "tree_nodes": self._tree.size,
+            "max_entries": self.max_entries,
+            "max_distance": self.max_distance,
+            "skip_credits_on_hit": IMAGE_CACHE_SKIP_CREDITS,
+            "exact_hits": self.exact_hits,
+            "near_hits": self.near_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "rebuilds": self.rebuilds,
+            "digest_hits": self.digest_hits,
+            "hit_ratio": round(hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+# Singleton instance
+_image_cache: Optional[ImageResultCache] = None
+
+
+def get_image_cache() -> Optional[ImageResultCache]:
+    """
+    Get or create the singleton image result cache.
+
+    Returns:
+        ImageResultCache, or None if IMAGE_CACHE_ENABLED is false
+    """
+    global _image_cache
+
+    if not IMAGE_CACHE_ENABLED:
+        return None
+
+    if _image_cache is None:
+        _image_cache = ImageResultCache()
+
+    return _image_cache
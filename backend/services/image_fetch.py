@@ -0,0 +1,155 @@
+"""
+Image URL Fetcher
+
+Downloads a user-supplied image URL so URL searches can be perceptually
+hashed and matched against the image cache like uploads.
+
+The URL comes from the client, so the fetch is locked down:
+- http/https only, no redirects
+- hosts resolving to private, loopback, link-local or reserved addresses are refused
+- the connection goes to the address that was checked: the "image_fetch"
+  client's transport never resolves hosts itself, so a DNS answer that
+  changes between the check and the connect (DNS rebinding) can't point the
+  fetch at an internal address. TLS SNI and the Host header still use the
+  URL's hostname. Environment proxies are ignored for the same reason.
+- body is streamed and abandoned past IMAGE_FETCH_MAX_BYTES
+- short timeout (the fetch is an optimization; TinEye still gets the URL on failure)
+
+Usage:
+    from services.image_fetch import fetch_image
+
+    data = await fetch_image(image_url)   # bytes, or None if not fetchable
+"""
+
+import asyncio
+import ipaddress
+import os
+import socket
+from contextvars import ContextVar
+from typing import Dict, Iterable, List, Optional
+
+import httpcore
+import httpx
+
+from .structured_log import get_logger
+
+logger = get_logger(__name__)
+
+IMAGE_FETCH_MAX_BYTES = int(os.getenv("IMAGE_FETCH_MAX_BYTES", str(10 * 1024 * 1024)))
+IMAGE_FETCH_TIMEOUT = float(os.getenv("IMAGE_FETCH_TIMEOUT", "5.0"))
+
+
+# host -> checked public addresses, for the fetch running in this context
+_pinned_addresses: ContextVar[Optional[Dict[str, List[str]]]] = ContextVar("image_fetch_pinned_addresses", default=None)
+
+
+class _PinnedNetworkBackend(httpcore.AsyncNetworkBackend):
+    """Connects only to addresses fetch_image already checked; never resolves hosts."""
+
+    def __init__(self):
+        self._backend = httpcore.AnyIOBackend()
+
+    async def connect_tcp(
+        self,
+        host: str,
+        port: int,
+        timeout: Optional[float] = None,
+        local_address: Optional[str] = None,
+        socket_options: Optional[Iterable] = None,
+    ) -> httpcore.AsyncNetworkStream:
+        addresses = (_pinned_addresses.get() or {}).get(host)
+        if not addresses:
+            raise httpcore.ConnectError(f"No checked address for {host}")
+
+        error: Optional[Exception] = None
+        for address in addresses:
+            try:
+                return await self._backend.connect_tcp(address, port, timeout, local_address, socket_options)
+            except (httpcore.ConnectError, httpcore.ConnectTimeout) as e:
+                error = e
+        raise error
+
+    async def connect_unix_socket(self, path: str, timeout: Optional[float] = None, socket_options=None):
+        raise httpcore.ConnectError("Unix sockets are not allowed for image fetches")
+
+    async def sleep(self, seconds: float) -> None:
+        await self._backend.sleep(seconds)
+
+
+class PinnedAddressTransport(httpx.AsyncHTTPTransport):
+    """
+    httpx transport for the "image_fetch" pool (see ProviderRegistry.http_client).
+
+    Same as the default transport except that connections go to the addresses
+    fetch_image pinned for the host, not to a fresh DNS answer.
+    """
+
+    def __init__(self, **kwargs):
+        super().__init__(trust_env=False, **kwargs)
+        # httpx doesn't expose httpcore's network_backend option
+        self._pool._network_backend = _PinnedNetworkBackend()
+
+
+async def _public_addresses(host: str, port: int) -> List[str]:
+    """Addresses the host resolves to, or [] unless every one of them is public."""
+    try:
+        infos = await asyncio.get_running_loop().getaddrinfo(host, port, type=socket.SOCK_STREAM)
+    except socket.gaierror:
+        return []
+
+    addresses = []
+    for info in infos:
+        address = ipaddress.ip_address(info[4][0])
+        if not address.is_global:
+            return []
+        if str(address) not in addresses:
+            addresses.append(str(address))
+    return addresses
+
+
+async def fetch_image(url: str) -> Optional[bytes]:
+    """
+    Download an image URL for hashing.
+
+    Returns:
+        The image bytes, or None if the URL is not allowed, too large or fails
+    """
+    try:
+        parsed = httpx.URL(url)
+    except httpx.InvalidURL:
+        return None
+    if parsed.scheme not in ("http", "https") or not parsed.raw_host:
+        return None
+
+    # The host as httpcore will see it (IDNA-encoded, IPv6 without brackets)
+    host = parsed.raw_host.decode("ascii")
+    port = parsed.port or (443 if parsed.scheme == "https" else 80)
+    addresses = await _public_addresses(host, port)
+    if not addresses:
+        logger.warning("image fetch refused: non-public host", host=host)
+        return None
+
+    from .provider_registry import get_provider_registry
+    client = get_provider_registry().http_client("image_fetch")
+
+    token = _pinned_addresses.set({host: addresses})
+    try:
+        async with client.stream("GET", parsed, timeout=IMAGE_FETCH_TIMEOUT, follow_redirects=False) as response:
+            if response.status_code != 200:
+                return None
+
+            declared = response.headers.get("content-length")
+            if declared and declared.isdigit() and int(declared) > IMAGE_FETCH_MAX_BYTES:
+                return None
+
+            body = bytearray()
+            async for chunk in response.aiter_bytes():
+                body += chunk
+                if len(body) > IMAGE_FETCH_MAX_BYTES:
+                    return None
+            return bytes(body)
+    except Exception as e:
+        logger.warning("image fetch failed", error=e)
+        return None
+    finally:
+        _pinned_addresses.reset(token)
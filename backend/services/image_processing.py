@@ -0,0 +1,308 @@
+"""
+Image Processing Worker Pool
+
+CPU-bound image work (decoding, perceptual hashing) runs in a small process
+pool so it never blocks the event loop or holds the GIL for other requests.
+
+Perceptual hashes (64-bit ints):
+- dHash: grayscale 9x8 thumbnail, one bit per horizontal gradient sign
+- pHash: grayscale 32x32 thumbnail, sign of the 8x8 low-frequency DCT
+  coefficients relative to their median
+
+Both survive re-compression and resizing, so re-uploads of the same photo
+land within a few bits of each other (Hamming distance).
+
+Normalization (before uploading to TinEye): decode, apply EXIF orientation,
+strip metadata, downscale to IMAGE_NORMALIZE_MAX_SIDE and re-encode as JPEG.
+Reverse search gains nothing from pixels beyond that, so a 10MB phone photo
+goes over the wire as a ~200KB JPEG. Small images are sent unchanged.
+
+Requires Pillow. If it is not installed, hashing is unavailable and callers
+skip the image cache.
+
+Usage:
+    from services.image_processing import compute_image_hash
+
+    image_hash = await compute_image_hash(image_bytes)   # None if undecodable
+    image_hash = await compute_image_hash("/tmp/upload.img")  # or a file path
+
+    # Downscaled, metadata-free JPEG written to dest_path (None = send original)
+    info = await normalize_image(src_path, size, dest_path)
+
+    # In app lifespan shutdown
+    shutdown_image_pool()
+"""
+
+import asyncio
+import io
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Optional, Union
+
+from .structured_log import get_logger
+
+logger = get_logger(__name__)
+
+# Image bytes, or the path of a file holding them (workers open it themselves,
+# so large uploads are never pickled across the process boundary)
+ImageSource = Union[bytes, str]
+
+# Worker processes for image work (each holds a decoded image at a time)
+IMAGE_WORKERS = int(os.getenv("IMAGE_WORKERS", str(min(2, os.cpu_count() or 1))))
+
+# Perceptual hash algorithm: "dhash" (default, fastest) or "phash"
+IMAGE_HASH_ALGORITHM = os.getenv("IMAGE_HASH_ALGORITHM", "dhash").lower()
+
+# Decompression bomb guard for decoded images (pixels)
+MAX_IMAGE_PIXELS = 50_000_000
+
+# Normalize uploads before sending them to TinEye
+IMAGE_NORMALIZE_ENABLED = os.getenv("IMAGE_NORMALIZE_ENABLED", "true").lower() == "true"
+
+# Longest side after downscaling (pixels) - plenty for reverse image search
+IMAGE_NORMALIZE_MAX_SIDE = int(os.getenv("IMAGE_NORMALIZE_MAX_SIDE", "1024"))
+
+# JPEG quality of the re-encoded image
+IMAGE_NORMALIZE_QUALITY = int(os.getenv("IMAGE_NORMALIZE_QUALITY", "85"))
+
+# Uploads at or below this size are sent as-is (bytes) - re-encoding saves little
+IMAGE_NORMALIZE_MIN_BYTES = int(os.getenv("IMAGE_NORMALIZE_MIN_BYTES", str(256 * 1024)))
+
+
+def pillow_available() -> bool:
+    try:
+        import PIL  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+# ==================== WORKER FUNCTIONS (run in child processes) ====================
+
+def _open_image(source: ImageSource):
+    from PIL import Image
+
+    Image.MAX_IMAGE_PIXELS = MAX_IMAGE_PIXELS
+    return Image.open(source if isinstance(source, str) else io.BytesIO(source))
+
+
+def _load_grayscale(source: ImageSource, size: tuple):
+    """Decode an image to a grayscale thumbnail of exactly `size`."""
+    from PIL import Image
+
+    image = _open_image(source)
+    # Let the JPEG decoder downscale while decoding (much faster for big photos)
+    image.draft("L", (size[0] * 4, size[1] * 4))
+    image = image.convert("L")
+    return image.resize(size, Image.Resampling.LANCZOS)
+
+
+def dhash(data: ImageSource) -> int:
+    """64-bit difference hash of an image."""
+    import numpy as np
+
+    pixels = np.asarray(_load_grayscale(data, (9, 8)), dtype=np.int16)
+    bits = (pixels[:, 1:] > pixels[:, :-1]).flatten()
+    return int("".join("1" if b else "0" for b in bits), 2)
+
+
+def phash(data: ImageSource) -> int:
+    """64-bit DCT-based perceptual hash of an image."""
+    import numpy as np
+
+    pixels = np.asarray(_load_grayscale(data, (32, 32)), dtype=np.float64)
+
+    # 2-D DCT-II via a DCT matrix (avoids a SciPy dependency)
+    n = 32
+    k = np.arange(n)
+    dct = np.cos(np.pi * (2 * k[None, :] + 1) * k[:, None] / (2 * n))
+    coefficients = dct @ pixels @ dct.T
+
+    low = coefficients[:8, :8].flatten()
+    median = np.median(low[1:])  # Exclude the DC term
+    bits = low > median
+    return int("".join("1" if b else "0" for b in bits), 2)
+
+
+def _hash_worker(data: ImageSource, algorithm: str) -> Optional[int]:
+    try:
+        return phash(data) if algorithm == "phash" else dhash(data)
+    except Exception:
+        # Not an image Pillow can decode
+        return None
+
+
+def _normalize_worker(src_path: str, dest_path: str, max_side: int, quality: int) -> Dict[str, Any]:
+    """
+    Write a downscaled, metadata-free JPEG of src_path to dest_path.
+
+    Returns the original dimensions and the encoded size, or an 'error'.
+    """
+    from PIL import Image, ImageOps
+
+    started = time.perf_counter()
+    try:
+        image = _open_image(src_path)
+        width, height = image.size
+
+        # Let the JPEG decoder downscale while decoding (no-op for other formats)
+        image.draft("RGB", (max_side, max_side))
+
+        # Bake in EXIF rotation - the metadata carrying it is dropped below
+        image = ImageOps.exif_transpose(image)
+
+        # First frame only (animated GIF/WebP); flatten transparency onto white
+        if image.mode in ("RGBA", "LA", "P"):
+            image = image.convert("RGBA")
+            background = Image.new("RGB", image.size, (255, 255, 255))
+            background.paste(image, mask=image.getchannel("A"))
+            image = background
+        elif image.mode != "RGB":
+            image = image.convert("RGB")
+
+        image.thumbnail((max_side, max_side), Image.Resampling.LANCZOS)
+
+        # A fresh save without exif/icc_profile arguments carries no metadata
+        image.save(dest_path, "JPEG", quality=quality, optimize=True)
+
+        return {
+            "width": width,
+            "height": height,
+            "output_width": image.size[0],
+            "output_height": image.size[1],
+            "output_bytes": os.path.getsize(dest_path),
+            "worker_ms": (time.perf_counter() - started) * 1000,
+        }
+    except Exception as e:
+        return {"error": str(e)}
+
+
+# ==================== POOL ====================
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+def get_image_pool() -> ProcessPoolExecutor:
+    """Get or create the shared image worker pool."""
+    global _pool
+
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=IMAGE_WORKERS)
+
+    return _pool
+
+
+def shutdown_image_pool() -> None:
+    """Stop the worker processes (called on app shutdown)."""
+    global _pool
+
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+# ==================== NORMALIZATION METRICS ====================
+
+class NormalizationStats:
+    """Counters for the upload normalization stage (exposed on /health/workers)."""
+
+    def __init__(self):
+        self.normalized = 0
+        self.bypassed = 0
+        self.kept_original = 0  # Re-encoded output wasn't smaller
+        self.failed = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def record(self, outcome: str, bytes_in: int = 0, bytes_out: int = 0, elapsed_ms: float = 0.0) -> None:
+        setattr(self, outcome, getattr(self, outcome) + 1)
+        if outcome == "normalized":
+            self.bytes_in += bytes_in
+            self.bytes_out += bytes_out
+            self.total_ms += elapsed_ms
+            self.max_ms = max(self.max_ms, elapsed_ms)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": IMAGE_NORMALIZE_ENABLED and pillow_available(),
+            "max_side": IMAGE_NORMALIZE_MAX_SIDE,
+            "min_bytes": IMAGE_NORMALIZE_MIN_BYTES,
+            "normalized": self.normalized,
+            "bypassed": self.bypassed,
+            "kept_original": self.kept_original,
+            "failed": self.failed,
+            "bytes_in": self.bytes_in,
+            "bytes_out": self.bytes_out,
+            "bytes_saved": self.bytes_in - self.bytes_out,
+            "avg_ratio": round(self.bytes_out / self.bytes_in, 4) if self.bytes_in else None,
+            "avg_ms": round(self.total_ms / self.normalized, 1) if self.normalized else None,
+            "max_ms": round(self.max_ms, 1),
+        }
+
+
+_normalization_stats = NormalizationStats()
+
+
+def get_normalization_stats() -> Dict[str, Any]:
+    """Normalization counters, byte savings and latency."""
+    return _normalization_stats.stats()
+
+
+async def compute_image_hash(data: ImageSource, algorithm: str = IMAGE_HASH_ALGORITHM) -> Optional[int]:
+    """
+    Perceptual hash of image bytes (or an image file path), computed in the worker pool.
+
+    Returns:
+        64-bit hash, or None if Pillow is missing or the data isn't a decodable image
+    """
+    if not pillow_available():
+        return None
+
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_image_pool(), _hash_worker, data, algorithm)
+
+
+async def normalize_image(src_path: str, size: int, dest_path: str) -> Optional[Dict[str, Any]]:
+    """
+    Downscale and re-encode an image file for upload, in the worker pool.
+
+    Args:
+        src_path: Staged image file
+        size: Its size in bytes (small files bypass the stage)
+        dest_path: Where to write the normalized JPEG
+
+    Returns:
+        Info dict (output_bytes, dimensions, elapsed_ms) if dest_path should be
+        sent instead of the original; None if the original should be sent
+        (disabled, small image, not decodable, or re-encoding didn't shrink it)
+    """
+    if not IMAGE_NORMALIZE_ENABLED or not pillow_available():
+        return None
+
+    if size <= IMAGE_NORMALIZE_MIN_BYTES:
+        _normalization_stats.record("bypassed")
+        return None
+
+    started = time.perf_counter()
+    loop = asyncio.get_running_loop()
+    info = await loop.run_in_executor(
+        get_image_pool(), _normalize_worker,
+        src_path, dest_path, IMAGE_NORMALIZE_MAX_SIDE, IMAGE_NORMALIZE_QUALITY
+    )
+    elapsed_ms = (time.perf_counter() - started) * 1000
+
+    if "error" in info:
+        logger.warning("image normalization failed, sending original", error=info["error"])
+        _normalization_stats.record("failed")
+        return None
+
+    if info["output_bytes"] >= size:
+        _normalization_stats.record("kept_original")
+        return None
+
+    info["elapsed_ms"] = elapsed_ms
+    _normalization_stats.record("normalized", size, info["output_bytes"], elapsed_ms)
+    return info
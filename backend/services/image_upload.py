@@ -0,0 +1,165 @@
+"""
+Streaming Image Upload Staging
+
+Consumes an uploaded image in fixed-size chunks instead of `await image.read()`:
+
+- the image type is detected from magic bytes in the first chunk (the
+  client-reported content type is not trusted)
+- the upload is aborted as soon as it passes the size limit
+- a SHA-256 digest is computed on the fly (exact re-uploads skip perceptual hashing)
+- chunks are written to a temporary file, so memory per upload stays at one
+  chunk; the hashing workers read the file by path and the TinEye client
+  streams it from disk
+- before the TinEye upload, normalize() swaps in a downscaled, metadata-free
+  JPEG produced by the image worker pool (services/image_processing.py)
+
+Usage:
+    from services.image_upload import stage_upload, InvalidUploadError
+
+    try:
+        staged = await stage_upload(image)
+    except InvalidUploadError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+
+    try:
+        ...  # staged.path, staged.open(), staged.sha256, staged.content_type
+        await staged.normalize()  # optional: shrink before uploading
+    finally:
+        staged.close()
+"""
+
+import hashlib
+import os
+import tempfile
+from typing import BinaryIO, Optional
+
+from fastapi import UploadFile
+
+from .image_processing import normalize_image
+
+# Max image size accepted (bytes)
+MAX_UPLOAD_BYTES = 10 * 1024 * 1024
+
+# Bytes read from the upload per step
+UPLOAD_CHUNK_SIZE = 64 * 1024
+
+
+class InvalidUploadError(Exception):
+    """Upload rejected (unsupported type or too large)."""
+
+    def __init__(self, status_code: int, detail: str):
+        self.status_code = status_code
+        self.detail = detail
+        super().__init__(detail)
+
+
+def sniff_image_type(head: bytes) -> Optional[str]:
+    """Detect JPEG, PNG, GIF or WebP from the file's leading bytes."""
+    if head.startswith(b"\xff\xd8\xff"):
+        return "image/jpeg"
+    if head.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "image/png"
+    if head.startswith((b"GIF87a", b"GIF89a")):
+        return "image/gif"
+    if len(head) >= 12 and head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+    return None
+
+
+class StagedUpload:
+    """A validated upload stored in a temporary file."""
+
+    def __init__(self, path: str, size: int, sha256: str, content_type: str):
+        self.path = path
+        self.size = size
+        self.sha256 = sha256
+        self.content_type = content_type
+
+        self.original_size = size
+        self.normalized = False
+
+    def open(self) -> BinaryIO:
+        """Open the staged image for reading (caller closes)."""
+        return open(self.path, "rb")
+
+    async def normalize(self) -> None:
+        """
+        Replace the staged file with its normalized JPEG, if that is smaller.
+
+        sha256 stays the digest of the original upload (it keys the hash memo).
+        Leaves the upload untouched for small or undecodable images.
+        """
+        if self.normalized:
+            return
+
+        dest = tempfile.NamedTemporaryFile(prefix="upload-", suffix=".jpg", delete=False)
+        dest.close()
+
+        try:
+            info = await normalize_image(self.path, self.size, dest.name)
+        except BaseException:
+            os.unlink(dest.name)
+            raise
+
+        if info is None:
+            os.unlink(dest.name)
+            return
+
+        os.unlink(self.path)
+        self.path = dest.name
+        self.size = info["output_bytes"]
+        self.content_type = "image/jpeg"
+        self.normalized = True
+
+    def close(self) -> None:
+        """Delete the temporary file."""
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+
+
+async def stage_upload(
+    upload: UploadFile,
+    max_bytes: int = MAX_UPLOAD_BYTES,
+    chunk_size: int = UPLOAD_CHUNK_SIZE
+) -> StagedUpload:
+    """
+    Validate and stage an upload chunk by chunk.
+
+    Raises:
+        InvalidUploadError: 400 for an unsupported type or a file over max_bytes
+    """
+    digest = hashlib.sha256()
+    size = 0
+    content_type = None
+
+    handle = tempfile.NamedTemporaryFile(prefix="upload-", suffix=".img", delete=False)
+    try:
+        with handle:
+            while True:
+                chunk = await upload.read(chunk_size)
+                if not chunk:
+                    break
+
+                if content_type is None:
+                    content_type = sniff_image_type(chunk)
+                    if content_type is None:
+                        raise InvalidUploadError(
+                            400, "Unsupported image type. Use JPEG, PNG, GIF, or WebP."
+                        )
+
+                size += len(chunk)
+                if size > max_bytes:
+                    raise InvalidUploadError(400, "Image file too large. Maximum size is 10MB.")
+
+                digest.update(chunk)
+                handle.write(chunk)
+
+        if content_type is None:
+            raise InvalidUploadError(400, "Uploaded image is empty.")
+    except BaseException:
+        os.unlink(handle.name)
+        raise
+
+    return StagedUpload(handle.name, size, digest.hexdigest(), content_type)
@@ -0,0 +1,106 @@
+"""
+Incremental JSON Array Parser
+
+Yields the items of one array inside a streamed JSON document (e.g. the
+`offenders` array of a provider response) as soon as each item has arrived,
+without first loading and parsing the whole payload.
+
+Only the array's current item is held in memory, so callers can filter
+records as they stream in and stop reading once they have enough.
+
+Usage:
+    async with client.stream("GET", url) as response:
+        async for offender in iter_array_items(response.aiter_bytes(), "offenders"):
+            ...
+"""
+
+import codecs
+import json
+import re
+from typing import Any, AsyncIterator
+
+_decoder = json.JSONDecoder()
+_SEPARATORS = re.compile(r"[\s,]*")
+# Items whose closing character tells us they are complete
+_SELF_DELIMITING = '{["'
+_ITEM_END = re.compile(r"\s*[,\]]")
+
+
+async def iter_array_items(chunks: AsyncIterator[bytes], key: str) -> AsyncIterator[Any]:
+    """
+    Stream the items of the array stored under `key`.
+
+    Args:
+        chunks: Async iterator of raw (UTF-8) response bytes
+        key: Name of the array property, e.g. "offenders"
+
+    Yields:
+        Each decoded array item, in order
+
+    Raises:
+        ValueError: If the stream ends in the middle of the array
+        json.JSONDecodeError: If an array item is malformed
+
+    If the key never appears (e.g. an error payload), nothing is yielded.
+    """
+    text_decoder = codecs.getincrementaldecoder("utf-8")()
+    array_start = re.compile(r'"%s"\s*:\s*\[' % re.escape(key))
+    # Enough trailing text to catch the array start split across two chunks
+    lookbehind = len(key) + 64
+
+    buffer = ""
+    position = 0
+    in_array = False
+    exhausted = False
+    iterator = chunks.__aiter__()
+
+    while True:
+        if not in_array:
+            match = array_start.search(buffer)
+            if match:
+                in_array = True
+                buffer = buffer[match.end():]
+                position = 0
+                continue
+            if exhausted:
+                return
+            buffer = buffer[-lookbehind:]
+        else:
+            position = _SEPARATORS.match(buffer, position).end()
+            if position < len(buffer):
+                if buffer[position] == "]":
+                    return
+                try:
+                    item, end = _decoder.raw_decode(buffer, position)
+                except json.JSONDecodeError:
+                    # Item not complete yet - read more unless the stream is over
+                    if exhausted:
+                        raise
+                else:
+                    # A number cut off at the buffer end still decodes ("45" of
+                    # "456", "7.5" of "7.5e2"), so scalars only count once a
+                    # "," or "]" follows them
+                    complete = (
+                        buffer[position] in _SELF_DELIMITING
+                        or exhausted
+                        or _ITEM_END.match(buffer, end) is not None
+                    )
+                    if complete:
+                        position = end
+                        yield item
+                        continue
+            elif exhausted:
+                raise ValueError(f"Stream ended inside the '{key}' array")
+
+            # Drop consumed text so memory stays proportional to one item
+            buffer = buffer[position:]
+            position = 0
+
+        try:
+            chunk = await iterator.__anext__()
+        except StopAsyncIteration:
+            exhausted = True
+            buffer += text_decoder.decode(b"", final=True)
+            continue
+
+        buffer += text_decoder.decode(chunk)
@@ -0,0 +1,578 @@
+"""
+Local Offender Registry Index
+
+Optional on-disk index of public sex offender registry exports, consulted
+before the paid Offenders.io / CrimeoMeter APIs.
+
+Records are stored in SQLite with normalized and phonetic (Soundex and
+Double Metaphone) name keys plus state and ZIP secondary indexes, and are
+returned in the same standard format as OffenderAPIService. An exact-name
+lookup on a 2M-row index takes well under a millisecond, compared to $0.20 and
+1-10 s for an API search.
+
+Phonetic keys collide for unrelated people (Robert Smith / Rupert Schmidt), so
+unless the index is authoritative only exact normalized-name matches are
+returned and anything else goes to the paid APIs.
+
+An index usually holds the exports of a few states only. Each ingest can
+declare which states its export fully covers (--covers); a non-authoritative
+index answers on its own only for searches restricted to a covered state.
+Other local hits are merged with the paid API results, so registrants from
+states missing from the index are never dropped.
+
+Enable by pointing LOCAL_REGISTRY_PATH at an index built with the ingest command:
+
+    # Build or incrementally refresh the index from a CSV or JSON Lines export
+    python -m services.local_registry ingest exports/ca_registry.csv --source ca --covers CA
+    python -m services.local_registry ingest exports/tx_registry.jsonl --source tx --covers TX --prune
+
+    # Show index size per source
+    python -m services.local_registry stats
+
+Ingest is incremental: rows are upserted by id, unchanged rows are skipped
+(content hash), and --prune removes rows from that source that are no longer
+in the export.
+
+Benchmark on synthetic data: python -m benchmarks.micro --only local_registry
+
+Expected columns / keys (extra columns are ignored):
+    id, name (or first_name + last_name), age, city, state, zip,
+    offense, registration_date, address
+"""
+
+import argparse
+import asyncio
+import csv
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from metaphone import doublemetaphone
+
+# Path to the SQLite index (unset = local registry disabled)
+LOCAL_REGISTRY_PATH = os.getenv("LOCAL_REGISTRY_PATH") or None
+
+# If true, local results are final: phonetic-only matches are returned and an
+# empty result means no paid API call. If false, exact normalized-name matches
+# stop the API search only for a state an ingested source covers; otherwise
+# they are merged with the API results. Leave false unless the index covers
+# every state users search.
+LOCAL_REGISTRY_AUTHORITATIVE = os.getenv("LOCAL_REGISTRY_AUTHORITATIVE", "false").lower() in ("1", "true", "yes")
+
+# Rows per transaction during ingest
+_INGEST_BATCH_SIZE = 10000
+
+_SOUNDEX_CODES = {
+    **dict.fromkeys("bfpv", "1"),
+    **dict.fromkeys("cgjkqsxz", "2"),
+    **dict.fromkeys("dt", "3"),
+    "l": "4",
+    **dict.fromkeys("mn", "5"),
+    "r": "6",
+}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS offenders (
+    id TEXT PRIMARY KEY,
+    source TEXT NOT NULL,
+    full_name TEXT NOT NULL,
+    first_norm TEXT NOT NULL,
+    last_norm TEXT NOT NULL,
+    first_soundex TEXT NOT NULL,
+    last_soundex TEXT NOT NULL,
+    first_metaphone TEXT NOT NULL DEFAULT '',
+    first_metaphone_alt TEXT NOT NULL DEFAULT '',
+    last_metaphone TEXT NOT NULL DEFAULT '',
+    last_metaphone_alt TEXT NOT NULL DEFAULT '',
+    age INTEGER,
+    city TEXT,
+    state TEXT,
+    zip TEXT,
+    offense TEXT,
+    registration_date TEXT,
+    address TEXT,
+    row_hash TEXT NOT NULL,
+    ingested_at REAL NOT NULL
+);
+
+-- States whose complete registry each source holds (declared at ingest)
+CREATE TABLE IF NOT EXISTS source_coverage (
+    source TEXT NOT NULL,
+    state TEXT NOT NULL,
+    PRIMARY KEY (source, state)
+);
+"""
+
+_INDEXES = """
+CREATE INDEX IF NOT EXISTS idx_offenders_name ON offenders(last_norm, first_norm);
+CREATE INDEX IF NOT EXISTS idx_offenders_phonetic ON offenders(last_soundex, first_soundex);
+CREATE INDEX IF NOT EXISTS idx_offenders_metaphone ON offenders(last_metaphone, first_metaphone);
+CREATE INDEX IF NOT EXISTS idx_offenders_metaphone_alt ON offenders(last_metaphone_alt, first_metaphone_alt);
+CREATE INDEX IF NOT EXISTS idx_offenders_state ON offenders(state, last_soundex);
+CREATE INDEX IF NOT EXISTS idx_offenders_zip ON offenders(zip, last_soundex);
+CREATE INDEX IF NOT EXISTS idx_offenders_source ON offenders(source, ingested_at);
+"""
+
+
+# ----------------------------------------------------------------------
+# Name keys
+# ----------------------------------------------------------------------
+
+def normalize_name(value: Optional[str]) -> str:
+    """Lowercase and keep only letters (drops spaces, hyphens, apostrophes and other non-letters)."""
+    if not value:
+        return ""
+    return re.sub(r"[^a-z]", "", value.lower())
+
+
+def soundex(value: Optional[str]) -> str:
+    """
+    American Soundex code (e.g. "Robert" -> "R163").
+
+    Returns "" for names without letters.
+    """
+    name = normalize_name(value)
+    if not name:
+        return ""
+
+    first = name[0]
+    code = first.upper()
+    previous = _SOUNDEX_CODES.get(first, "")
+
+    for char in name[1:]:
+        digit = _SOUNDEX_CODES.get(char, "")
+        if digit and digit != previous:
+            code += digit
+            if len(code) == 4:
+                break
+        # 'h' and 'w' don't separate letters with the same code; vowels do
+        if char not in "hw":
+            previous = digit
+
+    return code.ljust(4, "0")
+
+
+def double_metaphone(value: Optional[str]) -> Tuple[str, str]:
+    """
+    Double Metaphone (primary, alternate) codes, e.g. "Schmidt" -> ("XMT", "SMT").
+
+    The alternate equals the primary when the name has only one reading,
+    so both columns can be matched with a plain IN. Returns ("", "") for
+    names without letters.
+    """
+    name = normalize_name(value)
+    if not name:
+        return "", ""
+    primary, alternate = doublemetaphone(name)
+    return primary, alternate or primary
+
+
+def split_full_name(full_name: str) -> Tuple[str, str]:
+    """
+    Split a registry name into (first, last).
+
+    Handles "LAST, FIRST MIDDLE" and "First Middle Last".
+    """
+    if "," in full_name:
+        last, _, rest = full_name.partition(",")
+        first = rest.strip().split(" ")[0] if rest.strip() else ""
+        return first, last.strip()
+
+    parts = full_name.split()
+    if not parts:
+        return "", ""
+    if len(parts) == 1:
+        return parts[0], ""
+    return parts[0], parts[-1]
+
+
+# ----------------------------------------------------------------------
+# Index
+# ----------------------------------------------------------------------
+
+class LocalRegistry:
+    """SQLite-backed offender index with normalized + phonetic name lookups."""
+
+    def __init__(self, path: str, read_only: bool = True):
+        self.path = path
+        self.read_only = read_only
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self.lookups = 0
+        self.hits = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            if self.read_only:
+                conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, check_same_thread=False)
+            else:
+                directory = os.path.dirname(self.path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                conn = sqlite3.connect(self.path, check_same_thread=False)
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.executescript(_SCHEMA)
+                conn.executescript(_INDEXES)
+            conn.row_factory = sqlite3.Row
+            self._conn = conn
+        return self._conn
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    # ------------------------------------------------------------------
+    # Lookup
+    # ------------------------------------------------------------------
+
+    def lookup(
+        self,
+        first_name: str,
+        last_name: Optional[str],
+        zip_code: Optional[str] = None,
+        state: Optional[str] = None,
+        limit: int = 200,
+        exact_only: bool = False
+    ) -> List[Dict[str, Any]]:
+        """
+        Find offenders whose names match or sound like the query.
+
+        A name sounds like the query if its Soundex code or either Double
+        Metaphone code matches. Exact normalized name matches are returned
+        before phonetic-only matches. ZIP and state narrow the search through
+        their secondary indexes.
+
+        Args:
+            exact_only: Only return exact normalized first (and last) name matches
+
+        Returns:
+            Records in the standard OffenderAPIService format
+        """
+        first_norm = normalize_name(first_name)
+        last_norm = normalize_name(last_name)
+
+        clauses: List[str] = []
+        params: List[Any] = []
+        exact_clause = "first_norm = ?"
+        exact_params: List[Any] = [first_norm]
+        if last_norm:
+            exact_clause = "last_norm = ? AND first_norm = ?"
+            exact_params = [last_norm, first_norm]
+
+        if exact_only:
+            clauses.append(exact_clause)
+            params.extend(exact_params)
+        else:
+            names = [("last", last_name), ("first", first_name)] if last_norm else [("first", first_name)]
+            for prefix, value in names:
+                codes = list(double_metaphone(value))
+                clauses.append(
+                    f"({prefix}_soundex = ? OR {prefix}_metaphone IN (?, ?) OR {prefix}_metaphone_alt IN (?, ?))"
+                )
+                params.extend([soundex(value)] + codes + codes)
+        if zip_code:
+            clauses.append("zip = ?")
+            params.append(zip_code.strip()[:5])
+        if state:
+            clauses.append("state = ?")
+            params.append(state.strip().upper())
+
+        query = (
+            "SELECT * FROM offenders WHERE " + " AND ".join(clauses) +
+            f" ORDER BY ({exact_clause}) DESC, last_norm, first_norm LIMIT ?"
+        )
+        params.extend(exact_params + [limit])
+
+        with self._lock:
+            rows = self._connect().execute(query, params).fetchall()
+
+        self.lookups += 1
+        if rows:
+            self.hits += 1
+        return [self._to_result(row) for row in rows]
+
+    async def search(
+        self,
+        first_name: str,
+        last_name: Optional[str],
+        zip_code: Optional[str] = None,
+        state: Optional[str] = None,
+        limit: int = 200,
+        exact_only: bool = False
+    ) -> List[Dict[str, Any]]:
+        """Async wrapper around lookup() that runs the SQLite query in a worker thread."""
+        return await asyncio.to_thread(self.lookup, first_name, last_name, zip_code, state, limit, exact_only)
+
+    def covers(self, state: Optional[str]) -> bool:
+        """True if an ingested source declared the complete registry of this state."""
+        if not state or not state.strip():
+            return False
+        with self._lock:
+            row = self._connect().execute(
+                "SELECT 1 FROM source_coverage WHERE state = ? LIMIT 1", (state.strip().upper(),)
+            ).fetchone()
+        return row is not None
+
+    @staticmethod
+    def _to_result(row: sqlite3.Row) -> Dict[str, Any]:
+        return {
+            "id": row["id"],
+            "fullName": row["full_name"],
+            "age": row["age"],
+            "city": row["city"],
+            "state": row["state"],
+            "offenseDescription": row["offense"],
+            "registrationDate": row["registration_date"],
+            "distance": None,
+            "address": row["address"] or f"{row['city'] or ''}, {row['state'] or ''}",
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        """Lookup counters and index size per source."""
+        with self._lock:
+            rows = self._connect().execute(
+                "SELECT source, COUNT(*) AS records, MAX(ingested_at) AS last_ingest "
+                "FROM offenders GROUP BY source"
+            ).fetchall()
+            coverage: Dict[str, List[str]] = {}
+            for source, state in self._connect().execute(
+                "SELECT source, state FROM source_coverage ORDER BY source, state"
+            ):
+                coverage.setdefault(source, []).append(state)
+        return {
+            "path": self.path,
+            "lookups": self.lookups,
+            "hits": self.hits,
+            "sources": {
+                row["source"]: {
+                    "records": row["records"],
+                    "last_ingest": row["last_ingest"],
+                    "covers": coverage.get(row["source"], []),
+                }
+                for row in rows
+            },
+        }
+
+    # ------------------------------------------------------------------
+    # Ingest
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _prepare_row(raw: Dict[str, Any], source: str, ingested_at: float) -> Optional[tuple]:
+        """Turn one export row into an index row. Returns None for unusable rows."""
+        first = (raw.get("first_name") or "").strip()
+        last = (raw.get("last_name") or "").strip()
+        full_name = (raw.get("name") or raw.get("full_name") or "").strip()
+
+        if not full_name:
+            full_name = f"{first} {last}".strip()
+        if not (first or last):
+            first, last = split_full_name(full_name)
+        if not full_name or not normalize_name(first):
+            return None
+
+        record_id = str(raw.get("id") or raw.get("uuid") or "").strip()
+        if not record_id:
+            # Stable id for exports without one
+            record_id = hashlib.sha1(
+                f"{full_name}|{raw.get('state')}|{raw.get('zip')}|{raw.get('registration_date')}".encode()
+            ).hexdigest()
+        record_id = f"{source}:{record_id}"
+
+        age = raw.get("age")
+        try:
+            age = int(age) if age not in (None, "") else None
+        except (TypeError, ValueError):
+            age = None
+
+        state = (raw.get("state") or "").strip().upper() or None
+        zip_code = str(raw.get("zip") or raw.get("zipcode") or "").strip()[:5] or None
+        values = (
+            full_name, normalize_name(first), normalize_name(last), soundex(first), soundex(last),
+            *double_metaphone(first), *double_metaphone(last),
+            age, raw.get("city") or None, state, zip_code,
+            raw.get("offense") or raw.get("crime") or None,
+            raw.get("registration_date") or raw.get("registrationDate") or None,
+            raw.get("address") or None,
+        )
+        row_hash = hashlib.sha1(json.dumps(values, default=str).encode()).hexdigest()
+
+        return (record_id, source) + values + (row_hash, ingested_at)
+
+    def ingest(
+        self,
+        rows: Iterable[Dict[str, Any]],
+        source: str,
+        prune: bool = False,
+        covers: Optional[Iterable[str]] = None
+    ) -> Dict[str, int]:
+        """
+        Upsert export rows into the index.
+
+        Args:
+            rows: Export records (dicts)
+            source: Name of the export (e.g. a state code); used for pruning and stats
+            prune: Remove rows of this source that were not in this export
+            covers: States whose complete registry this export holds. Replaces the
+                source's previous declaration; None keeps it. States a row merely
+                mentions are never assumed to be covered.
+
+        Returns:
+            Dict with counts of processed, upserted (new or changed), skipped and pruned rows
+        """
+        ingested_at = time.time()
+        counts = {"processed": 0, "upserted": 0, "skipped": 0, "pruned": 0}
+
+        with self._lock:
+            conn = self._connect()
+            conn.execute("PRAGMA synchronous=OFF")
+            batch: List[tuple] = []
+
+            def flush() -> None:
+                before = conn.total_changes
+                with conn:
+                    # Only rewrite rows whose content changed; always refresh ingested_at
+                    conn.executemany(
+                        """
+                        INSERT INTO offenders (
+                            id, source, full_name, first_norm, last_norm, first_soundex, last_soundex,
+                            first_metaphone, first_metaphone_alt, last_metaphone, last_metaphone_alt,
+                            age, city, state, zip, offense, registration_date, address, row_hash, ingested_at
+                        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                        ON CONFLICT(id) DO UPDATE SET
+                            source = excluded.source, full_name = excluded.full_name,
+                            first_norm = excluded.first_norm, last_norm = excluded.last_norm,
+                            first_soundex = excluded.first_soundex, last_soundex = excluded.last_soundex,
+                            first_metaphone = excluded.first_metaphone,
+                            first_metaphone_alt = excluded.first_metaphone_alt,
+                            last_metaphone = excluded.last_metaphone,
+                            last_metaphone_alt = excluded.last_metaphone_alt,
+                            age = excluded.age, city = excluded.city, state = excluded.state,
+                            zip = excluded.zip, offense = excluded.offense,
+                            registration_date = excluded.registration_date, address = excluded.address,
+                            row_hash = excluded.row_hash, ingested_at = excluded.ingested_at
+                        WHERE offenders.row_hash != excluded.row_hash
+                        """,
+                        batch,
+                    )
+                    changed = conn.total_changes - before
+                    conn.executemany(
+                        "UPDATE offenders SET ingested_at = ? WHERE id = ?",
+                        [(ingested_at, row[0]) for row in batch],
+                    )
+                counts["upserted"] += changed
+                batch.clear()
+
+            for raw in rows:
+                counts["processed"] += 1
+                row = self._prepare_row(raw, source, ingested_at)
+                if row is None:
+                    counts["skipped"] += 1
+                    continue
+                batch.append(row)
+                if len(batch) >= _INGEST_BATCH_SIZE:
+                    flush()
+            if batch:
+                flush()
+
+            if prune:
+                with conn:
+                    cursor = conn.execute(
+                        "DELETE FROM offenders WHERE source = ? AND ingested_at < ?",
+                        (source, ingested_at),
+                    )
+                    counts["pruned"] = cursor.rowcount
+
+            if covers is not None:
+                with conn:
+                    conn.execute("DELETE FROM source_coverage WHERE source = ?", (source,))
+                    conn.executemany(
+                        "INSERT OR IGNORE INTO source_coverage (source, state) VALUES (?, ?)",
+                        [(source, state.strip().upper()) for state in covers if state.strip()],
+                    )
+
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA optimize")
+
+        return counts
+
+
+def _read_export(path: str) -> Iterator[Dict[str, Any]]:
+    """Stream rows from a CSV or JSON Lines export."""
+    if path.endswith((".jsonl", ".ndjson")):
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+    else:
+        with open(path, newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                yield {key.strip().lower(): value for key, value in row.items() if key}
+
+
+# Singleton instance (None when disabled)
+_local_registry: Optional[LocalRegistry] = None
+
+
+def get_local_registry() -> Optional[LocalRegistry]:
+    """
+    Get the shared read-only LocalRegistry, or None if not configured.
+
+    Returns None when LOCAL_REGISTRY_PATH is unset or the index file doesn't exist yet.
+    """
+    global _local_registry
+
+    if _local_registry is None and LOCAL_REGISTRY_PATH and os.path.exists(LOCAL_REGISTRY_PATH):
+        _local_registry = LocalRegistry(LOCAL_REGISTRY_PATH, read_only=True)
+
+    return _local_registry
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Manage the local offender registry index")
+    parser.add_argument("--db", default=LOCAL_REGISTRY_PATH, help="Index path (default: LOCAL_REGISTRY_PATH)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    ingest = commands.add_parser("ingest", help="Ingest or refresh a CSV / JSON Lines export")
+    ingest.add_argument("export", help="Path to the export file")
+    ingest.add_argument("--source", required=True, help="Source name, e.g. a state code")
+    ingest.add_argument("--prune", action="store_true", help="Remove rows of this source not in the export")
+    ingest.add_argument(
+        "--covers",
+        help="Comma-separated states whose complete registry the export holds (e.g. CA); "
+             "searches in these states skip the paid APIs on an exact match",
+    )
+
+    commands.add_parser("stats", help="Show index size per source")
+
+    args = parser.parse_args(argv)
+    if not args.db:
+        parser.error("Set LOCAL_REGISTRY_PATH or pass --db")
+
+    registry = LocalRegistry(args.db, read_only=False)
+    try:
+        if args.command == "ingest":
+            started = time.monotonic()
+            covers = args.covers.split(",") if args.covers is not None else None
+            counts = registry.ingest(
+                _read_export(args.export), source=args.source, prune=args.prune, covers=covers
+            )
+            counts["seconds"] = round(time.monotonic() - started, 2)
+            print(json.dumps(counts))
+        else:
+            print(json.dumps(registry.stats(), indent=2))
+    finally:
+        registry.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,232 @@
+"""
+Request Metrics (Prometheus)
+
+Per-stage latency histograms and counters for paid requests, exposed in the
+Prometheus text format at GET /metrics.
+
+Stages (pinkflag_stage_duration_seconds{stage, provider}):
+- jwt_verify: require_auth, including verified-token cache hits
+- credit_rpc / credit_rpc_batch: credit deduction RPC
+- provider_call: one upstream call under its circuit breaker
+  (offenders_io, crimeometer, tineye, twilio)
+- transform: turning a provider payload into our result format
+- rank: name-match ranking of offender results
+- update_search_results: search history update (queued or written)
+
+Counters:
+- pinkflag_refunds_total{reason}
+- pinkflag_cache_requests_total{cache, result}: hit / miss / coalesced
+- pinkflag_upstream_responses_total{provider, status}: HTTP status per provider
+- pinkflag_low_quota_alerts_total{provider}: provider balance dropped below
+  its alert threshold (services/tineye_quota.py)
+
+Recording is cheap enough to leave on in production: everything records
+from the event loop thread, so there are no locks; a histogram observation
+is one dict lookup, a bisect over fixed buckets and two additions. Text is
+only rendered when /metrics is scraped.
+
+Usage:
+    from services.metrics import REFUNDS, stage_timer, timed_stage
+
+    with stage_timer("transform", "twilio"):
+        result = build_result(payload)
+
+    @timed_stage("credit_rpc")
+    async def check_and_deduct_credit(...):
+        ...
+
+    REFUNDS.inc("api_error_503")
+"""
+
+import functools
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, List, Sequence, Tuple, Union
+
+# Upper bounds (seconds): sub-millisecond cache hits up to slow provider calls
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values) if value != ""]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(value)
+
+
+class Counter:
+    """Monotonic counter with one value per label set."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        _REGISTRY.append(self)
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(labels, 0)
+
+    def render(self) -> List[str]:
+        return [
+            f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+            for labels, value in sorted(self._values.items())
+        ]
+
+
+class _HistogramSeries:
+    __slots__ = ("counts", "sum")
+
+    def __init__(self, buckets: int):
+        self.counts = [0] * (buckets + 1)  # Last slot is +Inf
+        self.sum = 0.0
+
+
+class Histogram:
+    """Fixed-bucket histogram with one series per label set."""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[Tuple[str, ...], _HistogramSeries] = {}
+        _REGISTRY.append(self)
+
+    def observe(self, value: float, *labels: str) -> None:
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = _HistogramSeries(len(self.buckets))
+        # Non-cumulative counts; first bucket with upper bound >= value
+        series.counts[bisect_left(self.buckets, value)] += 1
+        series.sum += value
+
+    def count(self, *labels: str) -> int:
+        series = self._series.get(labels)
+        return sum(series.counts) if series else 0
+
+    def render(self) -> List[str]:
+        lines = []
+        bounds = [_format_value(bound) for bound in self.buckets] + ["+Inf"]
+        for labels, series in sorted(self._series.items()):
+            cumulative = 0
+            for bound, count in zip(bounds, series.counts):
+                cumulative += count
+                label_text = _format_labels(self.labelnames, labels, f'le="{bound}"')
+                lines.append(f"{self.name}_bucket{label_text} {cumulative}")
+            label_text = _format_labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{label_text} {_format_value(series.sum)}")
+            lines.append(f"{self.name}_count{label_text} {cumulative}")
+        return lines
+
+
+_REGISTRY: List[Union[Counter, Histogram]] = []
+
+
+# ==================== METRICS ====================
+
+STAGE_SECONDS = Histogram(
+    "pinkflag_stage_duration_seconds",
+    "Time spent in each stage of a paid request",
+    ("stage", "provider"),
+)
+
+REFUNDS = Counter(
+    "pinkflag_refunds_total",
+    "Credit refunds issued, by reason",
+    ("reason",),
+)
+
+CACHE_REQUESTS = Counter(
+    "pinkflag_cache_requests_total",
+    "Cache lookups by cache and result (hit, miss, coalesced)",
+    ("cache", "result"),
+)
+
+UPSTREAM_RESPONSES = Counter(
+    "pinkflag_upstream_responses_total",
+    "HTTP responses from upstream providers, by status code",
+    ("provider", "status"),
+)
+
+LOW_QUOTA_ALERTS = Counter(
+    "pinkflag_low_quota_alerts_total",
+    "Low search-balance alerts fired, by provider",
+    ("provider",),
+)
+
+
+# ==================== RECORDING HELPERS ====================
+
+class StageTimer:
+    """Context manager recording the wall time of a block into STAGE_SECONDS."""
+
+    __slots__ = ("stage", "provider", "started")
+
+    def __init__(self, stage: str, provider: str = ""):
+        self.stage = stage
+        self.provider = provider
+        self.started = 0.0
+
+    def __enter__(self) -> "StageTimer":
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info) -> bool:
+        STAGE_SECONDS.observe(time.perf_counter() - self.started, self.stage, self.provider)
+        return False
+
+
+def stage_timer(stage: str, provider: str = "") -> StageTimer:
+    """Time a block of code as one stage (works around awaits too)."""
+    return StageTimer(stage, provider)
+
+
+def timed_stage(stage: str, provider: str = "") -> Callable:
+    """Decorator timing every call of an async function as one stage."""
+
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                STAGE_SECONDS.observe(time.perf_counter() - started, stage, provider)
+
+        return wrapper
+
+    return decorator
+
+
+def render_metrics() -> str:
+    """All metrics in the Prometheus text exposition format."""
+    lines = []
+    for metric in _REGISTRY:
+        lines.append(f"# HELP {metric.name} {metric.documentation}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,204 @@
+"""
+Offender Result Ranking
+
+Scores every candidate record against the searched name and sorts results by
+confidence, so the best matches come first instead of provider order.
+
+Name similarity is a normalized Levenshtein distance computed with NumPy for
+the whole candidate set at once: the dynamic-programming table is advanced one
+character at a time for all candidates in parallel, so a common surname with
+thousands of rows costs a few hundred vectorized operations instead of
+thousands of per-pair Python loops. Below about 32 candidates NumPy's
+per-call overhead outweighs that, so small sets use the plain per-pair loop
+(python -m benchmarks.micro --only ranking compares the two).
+
+Score components (weights are renormalized over the components the query uses):
+- Last name similarity
+- First name similarity
+- Age distance (when an age was searched)
+- Location (state match, when a state was searched)
+
+Each result gets a `matchScore` between 0 and 1.
+
+Usage:
+    ranked = rank_results(results, first_name="Jon", last_name="Smith", age="35", state="CA")
+"""
+
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from .local_registry import normalize_name, split_full_name
+
+# Component weights
+_WEIGHT_LAST = 0.45
+_WEIGHT_FIRST = 0.35
+_WEIGHT_AGE = 0.10
+_WEIGHT_LOCATION = 0.10
+
+# Age difference (years) at which the age component reaches 0
+_AGE_SCALE = 10.0
+
+# Names are compared on at most this many letters
+_MAX_NAME_LENGTH = 32
+
+# Smaller candidate sets are scored pair by pair (faster than NumPy setup)
+_VECTORIZE_MIN_CANDIDATES = 32
+
+
+def _encode(names: Sequence[str]) -> np.ndarray:
+    """Encode names as a zero-padded (N, L) uint8 matrix of letters."""
+    length = max((len(n) for n in names), default=0)
+    length = min(max(length, 1), _MAX_NAME_LENGTH)
+    matrix = np.zeros((len(names), length), dtype=np.uint8)
+    for row, name in enumerate(names):
+        encoded = name[:length].encode("ascii", "ignore")
+        matrix[row, :len(encoded)] = np.frombuffer(encoded, dtype=np.uint8)
+    return matrix
+
+
+def _levenshtein(a: str, b: str) -> int:
+    """Levenshtein distance of one pair (two-row dynamic programming)."""
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char_a != char_b)))
+        previous = current
+    return previous[-1]
+
+
+def batch_similarity(query: str, candidates: Sequence[str]) -> np.ndarray:
+    """
+    Normalized Levenshtein similarity between one query and many candidates.
+
+    Args:
+        query: Normalized query name (letters only)
+        candidates: Normalized candidate names
+
+    Returns:
+        float array of shape (N,), 1.0 = identical, 0.0 = nothing in common
+    """
+    count = len(candidates)
+    if count == 0:
+        return np.zeros(0)
+
+    query = query[:_MAX_NAME_LENGTH]
+    if count < _VECTORIZE_MIN_CANDIDATES:
+        similarities = []
+        for candidate in candidates:
+            candidate = candidate[:_MAX_NAME_LENGTH]
+            longest = max(len(query), len(candidate))
+            similarities.append(1.0 - _levenshtein(query, candidate) / longest if longest else 1.0)
+        return np.array(similarities)
+
+    lengths = np.fromiter((min(len(c), _MAX_NAME_LENGTH) for c in candidates), dtype=np.int32, count=count)
+    if not query:
+        return (lengths == 0).astype(float)
+
+    matrix = _encode(candidates)
+    query_codes = np.frombuffer(query.encode("ascii", "ignore"), dtype=np.uint8)
+    m = len(query_codes)
+
+    # previous[:, i] = distance between query[:i] and candidate[:j] for the current column j
+    previous = np.broadcast_to(np.arange(m + 1, dtype=np.int32), (count, m + 1)).copy()
+    distances = np.where(lengths == 0, m, 0).astype(np.int32)
+
+    for j in range(matrix.shape[1]):
+        column_chars = matrix[:, j]
+        current = np.empty_like(previous)
+        current[:, 0] = j + 1
+        for i in range(1, m + 1):
+            substitution = previous[:, i - 1] + (column_chars != query_codes[i - 1])
+            current[:, i] = np.minimum(
+                np.minimum(previous[:, i] + 1, current[:, i - 1] + 1),
+                substitution,
+            )
+        # Candidates whose last letter is at column j are finished
+        finished = lengths == (j + 1)
+        distances[finished] = current[finished, m]
+        previous = current
+
+    longest = np.maximum(lengths, m)
+    return 1.0 - distances / longest
+
+
+def _parse_int(value: Any) -> Optional[int]:
+    try:
+        return int(value) if value not in (None, "") else None
+    except (TypeError, ValueError):
+        return None
+
+
+def rank_results(
+    results: List[Dict[str, Any]],
+    first_name: str,
+    last_name: Optional[str] = None,
+    age: Optional[str] = None,
+    state: Optional[str] = None
+) -> List[Dict[str, Any]]:
+    """
+    Score results against the query and return them sorted by confidence.
+
+    Adds a `matchScore` (0-1, rounded to 3 decimals) to each record in place.
+    The sort is stable, so equal scores keep provider order.
+
+    Args:
+        results: Records in the standard offender result format
+        first_name: Searched first name
+        last_name: Searched last name
+        age: Searched age (string, as sent by the app)
+        state: Searched state (2-letter code)
+
+    Returns:
+        The same records, highest matchScore first
+    """
+    if not results:
+        return results
+
+    firsts, lasts = [], []
+    for record in results:
+        first, last = split_full_name(record.get("fullName") or "")
+        firsts.append(normalize_name(first))
+        lasts.append(normalize_name(last))
+
+    score = np.zeros(len(results))
+    total_weight = 0.0
+
+    query_last = normalize_name(last_name)
+    if query_last:
+        score += _WEIGHT_LAST * batch_similarity(query_last, lasts)
+        total_weight += _WEIGHT_LAST
+
+    query_first = normalize_name(first_name)
+    if query_first:
+        score += _WEIGHT_FIRST * batch_similarity(query_first, firsts)
+        total_weight += _WEIGHT_FIRST
+
+    target_age = _parse_int(age)
+    if target_age is not None:
+        parsed_ages = (_parse_int(r.get("age")) for r in results)
+        ages = np.array([-1 if a is None else a for a in parsed_ages])
+        # Unknown age is neutral (0.5)
+        age_score = np.where(ages >= 0, np.clip(1.0 - np.abs(ages - target_age) / _AGE_SCALE, 0.0, 1.0), 0.5)
+        score += _WEIGHT_AGE * age_score
+        total_weight += _WEIGHT_AGE
+
+    if state and state.strip():
+        target_state = state.strip().upper()
+        # Unknown state is neutral (0.5)
+        location_score = np.array([
+            0.5 if not r.get("state") else (1.0 if r["state"].upper() == target_state else 0.0)
+            for r in results
+        ])
+        score += _WEIGHT_LOCATION * location_score
+        total_weight += _WEIGHT_LOCATION
+
+    if total_weight:
+        score /= total_weight
+
+    for record, value in zip(results, score):
+        record["matchScore"] = round(float(value), 3)
+
+    order = np.argsort(-score, kind="stable")
+    return [results[i] for i in order]
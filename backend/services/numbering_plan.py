@@ -0,0 +1,236 @@
+"""
+Offline Phone Number Normalization
+
+Local numbering-plan engine that turns user input into a valid E.164 number
+before any credits are charged or Twilio is called.
+
+Bundled data (services/data/numbering_plan.csv) is loaded once into a prefix
+trie keyed on E.164 digits:
+- Country calling code rows carry the allowed national number lengths
+- Longer prefixes add hints: ISO country (NANP area codes map to US, CA,
+  PR, ...), state/province for NANP area codes, and line type where the
+  prefix decides it (mobile ranges, toll-free, premium rate)
+
+The longest matching prefix wins for each attribute, so a lookup is one
+walk down the trie (at most 15 steps).
+
+Validation rejects numbers that cannot exist: unknown country codes, wrong
+lengths, and invalid NANP area/exchange codes (N11, 37X/96X, leading 0/1,
+fictional 555-01XX). Numbers entered without a country code are read in the
+PHONE_DEFAULT_COUNTRY_CODE plan (US/Canada by default).
+
+Usage:
+    from services.numbering_plan import normalize_phone_number, InvalidPhoneNumberError
+
+    info = normalize_phone_number("(415) 555-2671")
+    info.e164       # "+14155552671"
+    info.country    # "US"
+    info.region     # "California"
+    info.line_type  # None (NANP numbers don't encode it)
+"""
+
+import csv
+import os
+import re
+from typing import Dict, List, Optional
+
+# Country code assumed for numbers entered without one
+PHONE_DEFAULT_COUNTRY_CODE = os.getenv("PHONE_DEFAULT_COUNTRY_CODE", "1")
+
+NUMBERING_PLAN_PATH = os.path.join(os.path.dirname(__file__), "data", "numbering_plan.csv")
+
+# E.164 allows at most 15 digits including the country code
+E164_MAX_DIGITS = 15
+
+
+class InvalidPhoneNumberError(ValueError):
+    """Input can't be a real phone number (raised before any credit is deducted)."""
+
+
+class PhoneNumberLengthError(InvalidPhoneNumberError):
+    """Wrong number of digits for the country code it was read with."""
+
+
+class PhoneNumberInfo:
+    """A normalized number with the hints found in the numbering plan."""
+
+    __slots__ = ("e164", "country_code", "national_number", "country", "region", "line_type")
+
+    def __init__(
+        self,
+        e164: str,
+        country_code: str,
+        national_number: str,
+        country: Optional[str] = None,
+        region: Optional[str] = None,
+        line_type: Optional[str] = None,
+    ):
+        self.e164 = e164
+        self.country_code = country_code
+        self.national_number = national_number
+        self.country = country
+        self.region = region
+        self.line_type = line_type
+
+    def as_dict(self) -> Dict[str, Optional[str]]:
+        return {slot: getattr(self, slot) for slot in self.__slots__}
+
+
+class _Node:
+    """Trie node; `row` holds the plan attributes for the prefix ending here."""
+
+    __slots__ = ("children", "row")
+
+    def __init__(self):
+        self.children: Dict[str, "_Node"] = {}
+        self.row: Optional[Dict[str, str]] = None
+
+
+class NumberingPlan:
+    """Prefix trie over numbering-plan rows."""
+
+    def __init__(self, rows: List[Dict[str, str]]):
+        self._root = _Node()
+        self.prefixes = 0
+        for row in rows:
+            node = self._root
+            for digit in row["prefix"]:
+                node = node.children.setdefault(digit, _Node())
+            node.row = row
+            self.prefixes += 1
+
+    @classmethod
+    def load(cls, path: str = NUMBERING_PLAN_PATH) -> "NumberingPlan":
+        """Build the trie from a numbering plan CSV ('#' lines are comments)."""
+        with open(path, newline="", encoding="utf-8") as f:
+            lines = (line for line in f if not line.startswith("#"))
+            return cls(list(csv.DictReader(lines)))
+
+    def parse(self, digits: str) -> PhoneNumberInfo:
+        """
+        Validate E.164 digits (no '+') and collect their hints.
+
+        Raises:
+            InvalidPhoneNumberError: Unknown country code or impossible number
+        """
+        if not digits.isdigit():
+            raise InvalidPhoneNumberError("Phone number must contain only digits")
+        if len(digits) > E164_MAX_DIGITS:
+            raise PhoneNumberLengthError("Phone number must have at most 15 digits")
+
+        # Walk the trie; the first row with lengths is the country calling code,
+        # deeper rows override country/region/line type
+        node = self._root
+        country_code = None
+        lengths = None
+        hints: Dict[str, Optional[str]] = {"country": None, "region": None, "line_type": None}
+
+        for depth, digit in enumerate(digits, start=1):
+            node = node.children.get(digit)
+            if node is None:
+                break
+            row = node.row
+            if row is None:
+                continue
+            if country_code is None and row["min_length"]:
+                country_code = digits[:depth]
+                lengths = (int(row["min_length"]), int(row["max_length"]))
+            for key in hints:
+                if row[key]:
+                    hints[key] = row[key]
+
+        if country_code is None:
+            raise InvalidPhoneNumberError("Unknown country calling code")
+
+        national = digits[len(country_code):]
+
+        # Tolerate a national trunk '0' typed after the country code (+44 0 20 ...)
+        if national.startswith("0") and len(national) > lengths[1]:
+            return self.parse(country_code + national[1:])
+
+        if not lengths[0] <= len(national) <= lengths[1]:
+            raise PhoneNumberLengthError(
+                f"Phone number has the wrong number of digits for +{country_code}"
+            )
+
+        if country_code == "1":
+            _validate_nanp(national)
+
+        return PhoneNumberInfo(
+            e164=f"+{country_code}{national}",
+            country_code=country_code,
+            national_number=national,
+            **hints,
+        )
+
+
+def _validate_nanp(national: str) -> None:
+    """US/Canada/Caribbean: NPA-NXX-XXXX structure rules."""
+    npa, nxx, line = national[:3], national[3:6], national[6:]
+
+    if npa[0] in "01" or npa[1] == "9" or npa[1:] == "11" or npa[:2] in ("37", "96"):
+        raise InvalidPhoneNumberError(f"Invalid US/Canada area code: {npa}")
+    if nxx[0] in "01" or nxx[1:] == "11":
+        raise InvalidPhoneNumberError(f"Invalid US/Canada exchange code: {nxx}")
+    if nxx == "555" and line.startswith("01"):
+        raise InvalidPhoneNumberError("555-01XX numbers are fictional")
+
+
+# Singleton instance
+_numbering_plan: Optional[NumberingPlan] = None
+
+
+def get_numbering_plan() -> NumberingPlan:
+    """Get or load the bundled numbering plan."""
+    global _numbering_plan
+
+    if _numbering_plan is None:
+        _numbering_plan = NumberingPlan.load()
+
+    return _numbering_plan
+
+
+def normalize_phone_number(raw: str, default_country_code: str = PHONE_DEFAULT_COUNTRY_CODE) -> PhoneNumberInfo:
+    """
+    Normalize user input to a valid E.164 number.
+
+    Accepts '+<cc>...', international dialing prefixes (011 / 00), national
+    format in the default country ((415) 555-2671, 1-415-555-2671), and bare
+    digits that already start with a country code.
+
+    Raises:
+        InvalidPhoneNumberError: If no reading of the input is a possible number
+    """
+    plan = get_numbering_plan()
+    value = raw.strip()
+    digits = re.sub(r"\D", "", value)
+
+    if not digits:
+        raise InvalidPhoneNumberError("Phone number must contain digits")
+
+    if value.startswith("+"):
+        return plan.parse(digits)
+
+    if default_country_code == "1" and digits.startswith("011"):
+        return plan.parse(digits[3:])
+    if digits.startswith("00"):
+        return plan.parse(digits[2:])
+
+    # National format in the default country first (drop the trunk prefix)
+    national = digits
+    if default_country_code == "1" and len(national) == 11 and national.startswith("1"):
+        national = national[1:]
+    elif default_country_code != "1" and national.startswith("0"):
+        national = national[1:]
+
+    try:
+        return plan.parse(default_country_code + national)
+    except PhoneNumberLengthError as national_error:
+        # Too short or long for the default country: maybe typed with their
+        # country code but without '+'. A national number of the right length
+        # that fails validation (e.g. a bad US exchange) is not re-read, or
+        # 2021234567 would become an Egyptian number.
+        try:
+            return plan.parse(digits)
+        except InvalidPhoneNumberError:
+            raise national_error
@@ -1,21 +1,258 @@
+import asyncio
+import heapq
 import httpx
 import os
-from typing import List, Optional, Dict, Any
+import re
+import time
+from contextlib import aclosing
+from typing import Awaitable, Callable, List, Optional, Dict, Any, Tuple, TYPE_CHECKING
+
+from .circuit_breaker import CircuitBreaker, get_circuit_breaker
+from .json_stream import iter_array_items
+from .metrics import STAGE_SECONDS
+from .local_registry import LOCAL_REGISTRY_AUTHORITATIVE, get_local_registry, normalize_name, split_full_name
+from .result_cache import ResultCache
+from .structured_log import get_logger
+
+if TYPE_CHECKING:
+    from .provider_registry import ProviderRegistry
+
+logger = get_logger(__name__)
+
+# Result cache settings (registry data is refreshed daily upstream)
+OFFENDER_CACHE_TTL = float(os.getenv("OFFENDER_CACHE_TTL", "21600"))  # 6 hours
+OFFENDER_CACHE_NEGATIVE_TTL = float(os.getenv("OFFENDER_CACHE_NEGATIVE_TTL", "3600"))  # 1 hour for empty results
+OFFENDER_CACHE_MAX_ENTRIES = int(os.getenv("OFFENDER_CACHE_MAX_ENTRIES", "5000"))
+# Optional SQLite file for an on-disk tier that survives restarts (unset = memory only)
+OFFENDER_CACHE_DISK_PATH = os.getenv("OFFENDER_CACHE_DISK_PATH") or None
+
+# How configured providers are combined:
+# - "fallback": try providers in order, next one only after a failure (default)
+# - "fanout":   query all providers concurrently and merge their results
+# - "hedge":    start the first provider, start the next one only if the first
+#               is slower than its hedge delay; first successful answer wins
+OFFENDER_SEARCH_MODE = os.getenv("OFFENDER_SEARCH_MODE", "fallback").lower()
+
+# Provider order (first = primary)
+OFFENDER_PROVIDER_ORDER = [
+    p.strip() for p in os.getenv("OFFENDER_PROVIDER_ORDER", "offenders_io,crimeometer").split(",") if p.strip()
+]
+
+# Overall deadline for fan-out mode (seconds). Providers still running are cancelled.
+OFFENDER_FANOUT_DEADLINE = float(os.getenv("OFFENDER_FANOUT_DEADLINE", "10.0"))
+
+# Hedge delay = this percentile of the provider's recent latency...
+OFFENDER_HEDGE_PERCENTILE = float(os.getenv("OFFENDER_HEDGE_PERCENTILE", "0.95"))
+# ...or a fixed per-provider override, e.g. OFFENDERS_IO_HEDGE_DELAY=1.5
+OFFENDER_HEDGE_DELAYS = {
+    provider: float(os.environ[f"{provider.upper()}_HEDGE_DELAY"])
+    for provider in ("offenders_io", "crimeometer")
+    if os.getenv(f"{provider.upper()}_HEDGE_DELAY")
+}
+# Used until enough latency samples are collected
+OFFENDER_HEDGE_DEFAULT_DELAY = float(os.getenv("OFFENDER_HEDGE_DEFAULT_DELAY", "2.0"))
+_HEDGE_MIN_SAMPLES = 20
+
+# Upper bound for one provider call (seconds). The circuit breaker lowers the
+# effective timeout to the provider's observed p99 x multiplier.
+OFFENDER_PROVIDER_TIMEOUT = 10.0
+
+# Max records kept per provider response. Results are ranked only after this
+# cap (routers/search.py), so for common names the cap keeps the best name
+# matches seen so far (ResultFilter.name_score) rather than the first ones;
+# parsing stops early once every kept record is an exact name match.
+OFFENDER_RESULT_LIMIT = int(os.getenv("OFFENDER_RESULT_LIMIT", "200"))
+
+# Age filter window (+/- years around the requested age)
+OFFENDER_AGE_WINDOW = 5
+
+# Query parameter used to send the state filter to Offenders.io upstream.
+# Unset = filter locally only.
+OFFENDERS_IO_STATE_PARAM = os.getenv("OFFENDERS_IO_STATE_PARAM") or None
+
+
+def _normalize_key_part(value: Optional[str]) -> str:
+    """Lowercase, trim and collapse whitespace so equivalent queries share a cache key."""
+    if not value:
+        return ""
+    return re.sub(r"\s+", " ", value.strip().lower())
+
+
+def _parse_age(value: Any) -> Optional[int]:
+    """Parse an age from an int or numeric string, returning None if it isn't one."""
+    if isinstance(value, int):
+        return value
+    if isinstance(value, str) and value.strip():
+        try:
+            return int(value)
+        except ValueError:
+            return None
+    return None
+
+
+class ResultFilter:
+    """
+    Age/state predicates and result cap applied while records are transformed.
+
+    - age: keep records within OFFENDER_AGE_WINDOW years (invalid age = no filter)
+    - state: keep records in this state (case-insensitive)
+    - limit: keep at most this many matching records, preferring the best
+      name_score when a provider returns more
+    """
+
+    def __init__(
+        self,
+        age: Optional[str] = None,
+        state: Optional[str] = None,
+        limit: Optional[int] = None,
+        first_name: Optional[str] = None,
+        last_name: Optional[str] = None
+    ):
+        self.age = _parse_age(age)
+        self.state = state.strip().upper() if state and state.strip() else None
+        self.limit = OFFENDER_RESULT_LIMIT if limit is None else limit
+        self._first = normalize_name(first_name)
+        self._last = normalize_name(last_name)
+        # Score of a record no later one can beat
+        self.best_score = (4 if self._last else 0) + (2 if self._first else 0)
+
+    def matches(self, record: Dict[str, Any]) -> bool:
+        if self.age is not None:
+            record_age = _parse_age(record.get("age"))
+            if record_age is None or abs(record_age - self.age) > OFFENDER_AGE_WINDOW:
+                return False
+        if self.state is not None:
+            if (record.get("state") or "").upper() != self.state:
+                return False
+        return True
+
+    def name_score(self, record: Dict[str, Any]) -> int:
+        """Cheap pre-ranking score: exact last name 4, exact first name 2, first initial 1."""
+        if not self.best_score:
+            return 0
+        first, last = split_full_name(record.get("fullName") or "")
+        first, last = normalize_name(first), normalize_name(last)
+        score = 4 if self._last and last == self._last else 0
+        if self._first:
+            if first == self._first:
+                score += 2
+            elif first[:1] == self._first[:1]:
+                score += 1
+        return score
+
+    def cache_key_parts(self) -> List[Optional[str]]:
+        return [str(self.age) if self.age is not None else None, self.state]
+
+
+def _merge_results(result_sets: List[List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    """
+    Merge results from several providers, dropping duplicates.
+
+    Records are considered the same offender if they share a provider id, or
+    if a different provider already returned the same normalized
+    name + age + state. The first occurrence wins, so pass result sets in
+    provider priority order.
+    """
+    merged = []
+    seen_ids = set()
+    seen_people: Dict[Tuple[str, Optional[int], str], int] = {}
+
+    for index, results in enumerate(result_sets):
+        for record in results:
+            record_id = record.get("id")
+            if record_id and record_id in seen_ids:
+                continue
+
+            name = _normalize_key_part(record.get("fullName"))
+            # Providers disagree on age type (int vs "42"), so compare parsed ages
+            person = (name, _parse_age(record.get("age")), (record.get("state") or "").upper())
+            if name and seen_people.get(person, index) != index:
+                continue
+
+            if record_id:
+                seen_ids.add(record_id)
+            if name:
+                seen_people.setdefault(person, index)
+            merged.append(record)
+
+    return merged
+
 
 class OffenderAPIService:
     """
     Service for querying sex offender registries.
 
     Currently supports:
+    - Local registry index (optional, consulted first - see services/local_registry.py)
     - Offenders.io API
-    - CrimeoMeter Sex Offenders API (fallback)
+    - CrimeoMeter Sex Offenders API (fallback, or concurrent in fanout/hedge mode)
     """
 
-    def __init__(self):
+    def __init__(self, registry: Optional["ProviderRegistry"] = None):
+        self._registry = registry
         self.offenders_io_key = os.getenv("OFFENDERS_IO_API_KEY")
         self.crimeometer_key = os.getenv("CRIMEOMETER_API_KEY")
-        self.base_url_offenders_io = "https://api.offenders.io"
-        self.base_url_crimeometer = "https://api.crimeometer.com/v1"
+        self.base_url_offenders_io = os.getenv("OFFENDERS_IO_API_URL", "https://api.offenders.io")
+        self.base_url_crimeometer = os.getenv("CRIMEOMETER_API_URL", "https://api.crimeometer.com/v1")
+
+        # One cache per provider so hit ratios can be compared per upstream
+        self.caches = {
+            provider: ResultCache(
+                provider,
+                ttl=OFFENDER_CACHE_TTL,
+                negative_ttl=OFFENDER_CACHE_NEGATIVE_TTL,
+                max_entries=OFFENDER_CACHE_MAX_ENTRIES,
+                disk_path=OFFENDER_CACHE_DISK_PATH,
+            )
+            for provider in ("offenders_io", "crimeometer")
+        }
+
+        # Circuit breakers track per-provider latency (for hedge delays and
+        # adaptive timeouts) and fail fast while a provider is down
+        self.breakers: Dict[str, CircuitBreaker] = {
+            provider: get_circuit_breaker(provider, max_timeout=OFFENDER_PROVIDER_TIMEOUT)
+            for provider in self.caches
+        }
+
+    def _client(self, provider: str) -> httpx.AsyncClient:
+        """Get the pooled keep-alive client for a provider from the registry."""
+        if self._registry is None:
+            from .provider_registry import get_provider_registry
+            self._registry = get_provider_registry()
+        return self._registry.http_client(provider)
+
+    async def _cached(self, provider: str, key_parts: List[Optional[str]], loader) -> List[Dict[str, Any]]:
+        """
+        Serve a provider query from cache, coalescing concurrent identical queries.
+
+        Returns copies of the cached records so callers can modify them freely.
+        """
+        key = "|".join(_normalize_key_part(part) for part in key_parts)
+        results = await self.caches[provider].get_or_load(key, loader)
+        return [dict(record) for record in results]
+
+    def is_available(self) -> bool:
+        """
+        Whether a search can currently be answered.
+
+        False only when every configured upstream provider has an open circuit
+        breaker and there is no local registry or mock data to fall back on.
+        Checked by the router before credits are deducted.
+        """
+        if get_local_registry() is not None:
+            return True
+        if not self.offenders_io_key and not self.crimeometer_key:
+            return True  # Mock data
+        configured = []
+        if self.offenders_io_key:
+            configured.append("offenders_io")
+        if self.crimeometer_key:
+            configured.append("crimeometer")
+        return any(self.breakers[provider].is_available() for provider in configured)
+
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """Per-provider cache hit/miss statistics."""
+        return {provider: cache.stats() for provider, cache in self.caches.items()}
 
     async def search_by_name(
         self,
@@ -34,46 +271,190 @@ class OffenderAPIService:
             last_name: Optional last name filter
             phone_number: Optional phone number filter
             zip_code: Optional ZIP code for location filtering
-            age: Optional age filter
+            age: Optional age filter (keeps records within +/- 5 years)
             state: Optional state filter (2-letter code)
 
         Returns:
-            List of matching offender records
+            List of matching offender records (at most OFFENDER_RESULT_LIMIT per provider)
         """
 
-        # Try Offenders.io first
-        if self.offenders_io_key:
-            try:
-                return await self._search_offenders_io(
-                    first_name, last_name, phone_number, zip_code
-                )
-            except Exception as e:
-                print(f"Offenders.io API error: {e}")
-                # Fall through to alternative API
+        # Age/state filters and the result cap are applied while each
+        # provider response is parsed, not in extra passes afterwards
+        result_filter = ResultFilter(age=age, state=state, first_name=first_name, last_name=last_name)
 
-        # Fallback to CrimeoMeter if available
-        if self.crimeometer_key and zip_code:
+        # Local registry index first: sub-millisecond and free
+        local_results: List[Dict[str, Any]] = []
+        local_registry = get_local_registry()
+        if local_registry is not None:
             try:
-                return await self._search_crimeometer(
-                    first_name, last_name, zip_code
+                # Phonetic keys collide for unrelated people, so unless the index
+                # is authoritative only exact name matches count
+                local_results = await local_registry.search(
+                    first_name, last_name, zip_code, result_filter.state,
+                    limit=result_filter.limit, exact_only=not LOCAL_REGISTRY_AUTHORITATIVE,
                 )
+                local_results = [r for r in local_results if result_filter.matches(r)]
+                if LOCAL_REGISTRY_AUTHORITATIVE:
+                    return local_results
+                # The index holds only some states' exports: it can stand in for
+                # the APIs only when the search is restricted to a covered state
+                if local_results and await asyncio.to_thread(local_registry.covers, result_filter.state):
+                    return local_results
             except Exception as e:
-                print(f"CrimeoMeter API error: {e}")
+                logger.warning("local registry lookup failed", error=e)
+                # Fall through to the paid APIs
+
+        calls = self._provider_calls(first_name, last_name, phone_number, zip_code, result_filter)
 
         # If no API keys configured, return mock data for development
         if not self.offenders_io_key and not self.crimeometer_key:
-            return self._get_mock_data(first_name, last_name)
+            results = [r for r in self._get_mock_data(first_name, last_name) if result_filter.matches(r)]
+        elif not calls:
+            results = []
+        elif len(calls) > 1 and OFFENDER_SEARCH_MODE == "fanout":
+            results = await self._search_fanout(calls)
+        elif len(calls) > 1 and OFFENDER_SEARCH_MODE == "hedge":
+            results = await self._search_hedged(calls)
+        else:
+            results = await self._search_fallback(calls)
+
+        # Local hits from an uncovered state: keep them, plus every other state's registrants
+        if local_results:
+            return _merge_results([local_results, results])
+        return results
+
+    def _provider_calls(
+        self,
+        first_name: str,
+        last_name: Optional[str],
+        phone_number: Optional[str],
+        zip_code: Optional[str],
+        result_filter: ResultFilter
+    ) -> List[Tuple[str, Callable[[], Awaitable[List[Dict[str, Any]]]]]]:
+        """Build (provider, call) pairs for every usable provider, in configured order."""
+        available = {}
+        key_parts = [first_name, last_name, zip_code] + result_filter.cache_key_parts()
+
+        if self.offenders_io_key:
+            available["offenders_io"] = lambda: self._cached(
+                "offenders_io",
+                key_parts,
+                lambda: self.breakers["offenders_io"].call(lambda: self._search_offenders_io(
+                    first_name, last_name, phone_number, zip_code, result_filter
+                ))
+            )
+
+        # CrimeoMeter requires a ZIP code
+        if self.crimeometer_key and zip_code:
+            available["crimeometer"] = lambda: self._cached(
+                "crimeometer",
+                key_parts,
+                lambda: self.breakers["crimeometer"].call(lambda: self._search_crimeometer(
+                    first_name, last_name, zip_code, result_filter
+                ))
+            )
+
+        return [(provider, available[provider]) for provider in OFFENDER_PROVIDER_ORDER if provider in available]
+
+    def _hedge_delay(self, provider: str) -> float:
+        """Seconds to wait on a provider before hedging with the next one."""
+        if provider in OFFENDER_HEDGE_DELAYS:
+            return OFFENDER_HEDGE_DELAYS[provider]
+
+        breaker = self.breakers.get(provider)
+        if breaker is None or breaker.sample_count < _HEDGE_MIN_SAMPLES:
+            return OFFENDER_HEDGE_DEFAULT_DELAY
+
+        return breaker.latency_percentile(OFFENDER_HEDGE_PERCENTILE)
+
+    async def _search_fallback(self, calls) -> List[Dict[str, Any]]:
+        """Try providers one at a time, moving on only after a failure."""
+        for provider, call in calls:
+            try:
+                return await call()
+            except Exception as e:
+                logger.warning("provider search failed", provider=provider, error=e)
+                # Fall through to alternative API
 
         return []
 
+    async def _search_fanout(self, calls) -> List[Dict[str, Any]]:
+        """Query all providers concurrently and merge their results."""
+        tasks = [asyncio.create_task(call()) for _, call in calls]
+        try:
+            done, pending = await asyncio.wait(tasks, timeout=OFFENDER_FANOUT_DEADLINE)
+
+            result_sets = []
+            for (provider, _), task in zip(calls, tasks):
+                if task in pending:
+                    logger.warning("provider search cancelled at fan-out deadline", provider=provider, deadline=OFFENDER_FANOUT_DEADLINE)
+                elif task.exception() is not None:
+                    logger.warning("provider search failed", provider=provider, error=task.exception())
+                else:
+                    result_sets.append(task.result())
+        finally:
+            # Providers that missed the deadline, or all of them if the caller
+            # was cancelled (client gone, batch item refunded)
+            for task in tasks:
+                task.cancel()
+
+        return _merge_results(result_sets)
+
+    async def _search_hedged(self, calls) -> List[Dict[str, Any]]:
+        """
+        Start the primary provider and hedge with the next one if it is slow.
+
+        The first successful answer wins and the remaining calls are cancelled.
+        If every running call has failed, the next provider starts right away.
+        """
+        remaining = list(calls)
+        running: Dict[asyncio.Task, str] = {}
+
+        def launch_next() -> Optional[str]:
+            if not remaining:
+                return None
+            provider, call = remaining.pop(0)
+            running[asyncio.create_task(call())] = provider
+            return provider
+
+        current = launch_next()
+        try:
+            while running:
+                timeout = self._hedge_delay(current) if remaining else None
+                done, _ = await asyncio.wait(
+                    running.keys(), timeout=timeout, return_when=asyncio.FIRST_COMPLETED
+                )
+
+                if not done:
+                    # Slower than the hedge delay - start the next provider too
+                    current = launch_next()
+                    continue
+
+                for task in done:
+                    provider = running.pop(task)
+                    if task.exception() is None:
+                        return task.result()
+                    logger.warning("provider search failed", provider=provider, error=task.exception())
+
+                # Every running call failed - move on to the next provider right away
+                if not running:
+                    current = launch_next()
+
+            return []
+        finally:
+            for task in running:
+                task.cancel()
+
     async def _search_offenders_io(
         self,
         first_name: str,
         last_name: Optional[str],
         phone_number: Optional[str],
-        zip_code: Optional[str]
+        zip_code: Optional[str],
+        result_filter: Optional[ResultFilter] = None
     ) -> List[Dict[str, Any]]:
         """Query Offenders.io API"""
+        result_filter = result_filter or ResultFilter()
 
         # Build params with camelCase naming as per API docs
         params = {
@@ -85,36 +466,37 @@ class OffenderAPIService:
             params["lastName"] = last_name
         if zip_code:
             params["zipcode"] = zip_code
+        if result_filter.state and OFFENDERS_IO_STATE_PARAM:
+            params[OFFENDERS_IO_STATE_PARAM] = result_filter.state
 
         headers = {
             "Content-Type": "application/json"
         }
 
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f"{self.base_url_offenders_io}/sexoffender",
-                params=params,
-                headers=headers,
-                timeout=10.0
-            )
-            response.raise_for_status()
-            data = response.json()
+        # Transform to standard format while streaming
+        results = await self._stream_offenders(
+            "offenders_io",
+            f"{self.base_url_offenders_io}/sexoffender",
+            params,
+            headers,
+            self._transform_offenders_io_record,
+            result_filter
+        )
 
-            # Debug logging
-            print(f"Offenders.io response: {len(data.get('offenders', []))} results")
-            if data.get('offenders'):
-                print(f"Sample result: {data['offenders'][0].get('name', 'N/A')}")
+        # Counts only - result names are PII
+        logger.debug("provider results", provider="offenders_io", count=len(results), sample=0.1)
 
-            # Transform to standard format
-            return self._transform_offenders_io_response(data)
+        return results
 
     async def _search_crimeometer(
         self,
         first_name: str,
         last_name: Optional[str],
-        zip_code: str
+        zip_code: str,
+        result_filter: Optional[ResultFilter] = None
     ) -> List[Dict[str, Any]]:
         """Query CrimeoMeter API"""
+        result_filter = result_filter or ResultFilter()
 
         params = {
             "first_name": first_name,
@@ -128,67 +510,99 @@ class OffenderAPIService:
             "x-api-key": self.crimeometer_key
         }
 
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f"{self.base_url_crimeometer}/offenders",
-                params=params,
-                headers=headers,
-                timeout=10.0
-            )
+        return await self._stream_offenders(
+            "crimeometer",
+            f"{self.base_url_crimeometer}/offenders",
+            params,
+            headers,
+            self._transform_crimeometer_record,
+            result_filter
+        )
+
+    async def _stream_offenders(
+        self,
+        provider: str,
+        url: str,
+        params: Dict[str, Any],
+        headers: Dict[str, str],
+        transform: Callable[[Dict[str, Any]], Dict[str, Any]],
+        result_filter: ResultFilter
+    ) -> List[Dict[str, Any]]:
+        """
+        Stream a provider response, transforming and filtering each record as it arrives.
+
+        Only matching records are kept. Past result_filter.limit matches, a
+        record replaces the worst-scoring kept one if its name scores higher;
+        reading stops once the kept records all have the best possible score.
+        Records are returned in response order.
+        """
+        # Min-heap of (name score, -arrival index, record): the root is the
+        # lowest score, latest arrival among ties, i.e. the first to evict
+        kept: List[Tuple[int, int, Dict[str, Any]]] = []
+        arrival = 0
+        client = self._client(provider)
+
+        # Transform time is summed per record (records arrive interleaved with network reads)
+        transform_seconds = 0.0
+
+        async with client.stream("GET", url, params=params, headers=headers, timeout=OFFENDER_PROVIDER_TIMEOUT) as response:
             response.raise_for_status()
-            data = response.json()
 
-            return self._transform_crimeometer_response(data)
+            async with aclosing(iter_array_items(response.aiter_bytes(), "offenders")) as offenders:
+                async for offender in offenders:
+                    arrival += 1
+                    started = time.perf_counter()
+                    record = transform(offender)
+                    matched = result_filter.matches(record)
+                    transform_seconds += time.perf_counter() - started
+                    if not matched:
+                        continue
+                    entry = (result_filter.name_score(record), -arrival, record)
+                    if len(kept) < result_filter.limit:
+                        heapq.heappush(kept, entry)
+                    elif kept and entry[0] > kept[0][0]:
+                        heapq.heapreplace(kept, entry)
+                    if len(kept) >= result_filter.limit and (not kept or kept[0][0] >= result_filter.best_score):
+                        break
+
+        STAGE_SECONDS.observe(transform_seconds, "transform", provider)
+        return [record for _, _, record in sorted(kept, key=lambda entry: -entry[1])]
 
     def _transform_offenders_io_response(self, data: Dict[str, Any]) -> List[Dict[str, Any]]:
         """Transform Offenders.io response to standard format"""
-        results = []
-        offenders = data.get("offenders", [])
-
-        for offender in offenders:
-            # Parse age from string to int if possible
-            age = offender.get("age")
-            if age and isinstance(age, str) and age.strip():
-                try:
-                    age = int(age)
-                except (ValueError, TypeError):
-                    age = None
-            else:
-                age = None
-
-            results.append({
-                "id": offender.get("uuid", ""),
-                "fullName": offender.get("name", ""),
-                "age": age,
-                "city": offender.get("city"),
-                "state": offender.get("state"),
-                "offenseDescription": offender.get("crime"),
-                "registrationDate": offender.get("registrationDate"),
-                "distance": None,  # Can calculate if needed
-                "address": offender.get("address", f"{offender.get('city', '')}, {offender.get('state', '')}")
-            })
+        return [self._transform_offenders_io_record(o) for o in data.get("offenders", [])]
 
-        return results
+    def _transform_offenders_io_record(self, offender: Dict[str, Any]) -> Dict[str, Any]:
+        """Transform one Offenders.io record to standard format"""
+        return {
+            "id": offender.get("uuid", ""),
+            "fullName": offender.get("name", ""),
+            "age": _parse_age(offender.get("age")),  # Offenders.io sends age as a string
+            "city": offender.get("city"),
+            "state": offender.get("state"),
+            "offenseDescription": offender.get("crime"),
+            "registrationDate": offender.get("registrationDate"),
+            "distance": None,  # Can calculate if needed
+            "address": offender.get("address", f"{offender.get('city', '')}, {offender.get('state', '')}")
+        }
 
     def _transform_crimeometer_response(self, data: Dict[str, Any]) -> List[Dict[str, Any]]:
         """Transform CrimeoMeter response to standard format"""
-        results = []
-        offenders = data.get("offenders", [])
-
-        for offender in offenders:
-            results.append({
-                "id": str(offender.get("id", "")),
-                "fullName": offender.get("name", ""),
-                "age": offender.get("age"),
-                "city": offender.get("city"),
-                "state": offender.get("state"),
-                "offenseDescription": offender.get("charges"),
-                "registrationDate": offender.get("registration_date"),
-                "distance": offender.get("distance_miles"),
-                "address": offender.get("location", "")
-            })
+        return [self._transform_crimeometer_record(o) for o in data.get("offenders", [])]
 
-        return results
+    def _transform_crimeometer_record(self, offender: Dict[str, Any]) -> Dict[str, Any]:
+        """Transform one CrimeoMeter record to standard format"""
+        return {
+            "id": str(offender.get("id", "")),
+            "fullName": offender.get("name", ""),
+            "age": offender.get("age"),
+            "city": offender.get("city"),
+            "state": offender.get("state"),
+            "offenseDescription": offender.get("charges"),
+            "registrationDate": offender.get("registration_date"),
+            "distance": offender.get("distance_miles"),
+            "address": offender.get("location", "")
+        }
 
     def _get_mock_data(self, first_name: str, last_name: Optional[str]) -> List[Dict[str, Any]]:
         """Return mock data for development/testing when no API keys are configured"""
@@ -0,0 +1,67 @@
+"""
+Phone Lookup Result Cache
+
+Shared TTL cache of normalized phone lookup results, keyed by E.164 number.
+
+CNAM and line-type data change rarely, yet every Twilio Lookup v2 call costs
+$0.018 and can take seconds. Built on ResultCache (services/result_cache.py):
+- In-memory LRU tier bounded by PHONE_CACHE_MAX_ENTRIES
+- Optional SQLite tier (PHONE_CACHE_DISK_PATH) that survives restarts
+- Single-flight: concurrent lookups of the same number share one Twilio call
+- Twilio errors are never cached
+
+Usage:
+    phone_cache = get_phone_cache()
+
+    result = await phone_cache.get("+14155550100")       # None on a miss
+    result = await phone_cache.get_or_load("+14155550100", loader)
+
+    # In app lifespan shutdown
+    close_phone_cache()
+"""
+
+import os
+from typing import Optional
+
+from .result_cache import ResultCache
+
+PHONE_CACHE_ENABLED = os.getenv("PHONE_CACHE_ENABLED", "true").lower() == "true"
+PHONE_CACHE_TTL = float(os.getenv("PHONE_CACHE_TTL", "604800"))  # 7 days
+PHONE_CACHE_MAX_ENTRIES = int(os.getenv("PHONE_CACHE_MAX_ENTRIES", "10000"))
+# Optional SQLite file for an on-disk tier that survives restarts (unset = memory only)
+PHONE_CACHE_DISK_PATH = os.getenv("PHONE_CACHE_DISK_PATH") or None
+
+
+# Singleton instance
+_phone_cache: Optional[ResultCache] = None
+
+
+def get_phone_cache() -> Optional[ResultCache]:
+    """
+    Get or create the shared phone lookup cache.
+
+    Returns:
+        ResultCache, or None if PHONE_CACHE_ENABLED is false
+    """
+    global _phone_cache
+
+    if not PHONE_CACHE_ENABLED:
+        return None
+
+    if _phone_cache is None:
+        _phone_cache = ResultCache(
+            "phone_lookup",
+            ttl=PHONE_CACHE_TTL,
+            max_entries=PHONE_CACHE_MAX_ENTRIES,
+            disk_path=PHONE_CACHE_DISK_PATH,
+            # Every successful lookup is a real answer - nothing counts as "empty"
+            is_negative=lambda value: False,
+        )
+
+    return _phone_cache
+
+
+def close_phone_cache() -> None:
+    """Close the disk tier (called on app shutdown)."""
+    if _phone_cache is not None:
+        _phone_cache.close()
@@ -0,0 +1,212 @@
+"""
+Provider Registry
+
+Holds long-lived upstream provider services and one pooled, keep-alive
+httpx.AsyncClient per upstream host (Offenders.io, CrimeoMeter, Twilio, TinEye).
+
+Before this, every paid search built a new service object and opened a fresh
+httpx.AsyncClient, paying a TCP + TLS handshake per request. Clients here are
+created on first use, reused for the life of the process, and closed by the
+FastAPI lifespan on shutdown.
+
+Usage:
+    from services.provider_registry import get_provider_registry
+
+    registry = get_provider_registry()
+    client = registry.http_client("twilio")
+    offender_service = registry.offender_service
+
+    # In app lifespan shutdown
+    await registry.aclose()
+"""
+
+import os
+from typing import Any, Dict, Optional
+
+import httpx
+
+from .metrics import UPSTREAM_RESPONSES
+from .structured_log import get_logger
+
+logger = get_logger(__name__)
+
+# Connection pool tuning (per upstream host)
+PROVIDER_MAX_CONNECTIONS = int(os.getenv("PROVIDER_MAX_CONNECTIONS", "20"))
+PROVIDER_MAX_KEEPALIVE = int(os.getenv("PROVIDER_MAX_KEEPALIVE", "10"))
+PROVIDER_KEEPALIVE_EXPIRY = float(os.getenv("PROVIDER_KEEPALIVE_EXPIRY", "60"))
+
+# Optional HTTP/2 (requires the `h2` package: pip install "httpx[http2]")
+PROVIDER_HTTP2 = os.getenv("PROVIDER_HTTP2", "false").lower() in ("1", "true", "yes")
+
+# Upstream providers that get their own connection pool
+# ("image_fetch" downloads user-supplied image URLs for the image cache)
+PROVIDERS = ("offenders_io", "crimeometer", "twilio", "tineye", "image_fetch")
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+class _ConnectionStats:
+    """
+    Counts requests vs. new connections for one upstream pool.
+
+    Uses httpcore's trace extension: every new TCP connection emits
+    `connection.connect_tcp.complete`, so requests - connections = reused.
+    """
+
+    def __init__(self, provider: str):
+        self.provider = provider
+        self.requests = 0
+        self.connections = 0
+        self.tls_handshakes = 0
+
+    async def on_request(self, request: httpx.Request) -> None:
+        self.requests += 1
+        request.extensions["trace"] = self._trace
+
+    async def on_response(self, response: httpx.Response) -> None:
+        UPSTREAM_RESPONSES.inc(self.provider, str(response.status_code))
+
+    async def _trace(self, event_name: str, info: Dict[str, Any]) -> None:
+        if event_name == "connection.connect_tcp.complete":
+            self.connections += 1
+        elif event_name == "connection.start_tls.complete":
+            self.tls_handshakes += 1
+
+    def as_dict(self) -> Dict[str, Any]:
+        reused = max(self.requests - self.connections, 0)
+        return {
+            "requests": self.requests,
+            "new_connections": self.connections,
+            "tls_handshakes": self.tls_handshakes,
+            "reused_connections": reused,
+            "reuse_ratio": round(reused / self.requests, 4) if self.requests else 0.0,
+        }
+
+
+class ProviderRegistry:
+    """
+    Registry of shared provider services and pooled HTTP clients.
+
+    Services are built lazily so a missing API key (e.g. TINEYE_API_KEY) only
+    fails the endpoints that need it, same as before.
+    """
+
+    def __init__(
+        self,
+        max_connections: int = PROVIDER_MAX_CONNECTIONS,
+        max_keepalive: int = PROVIDER_MAX_KEEPALIVE,
+        keepalive_expiry: float = PROVIDER_KEEPALIVE_EXPIRY,
+        http2: bool = PROVIDER_HTTP2,
+    ):
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self.http2 = http2 and _http2_available()
+        if http2 and not self.http2:
+            logger.warning("PROVIDER_HTTP2 enabled but 'h2' is not installed - using HTTP/1.1")
+
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+        self._stats: Dict[str, _ConnectionStats] = {}
+        self._offender_service = None
+        self._tineye_service = None
+
+    def http_client(self, provider: str) -> httpx.AsyncClient:
+        """
+        Get the shared keep-alive client for an upstream provider.
+
+        Args:
+            provider: One of PROVIDERS ('offenders_io', 'crimeometer', 'twilio', 'tineye', 'image_fetch')
+
+        Returns:
+            httpx.AsyncClient: Pooled client reused across requests
+        """
+        client = self._clients.get(provider)
+        if client is None or client.is_closed:
+            if provider not in PROVIDERS:
+                raise ValueError(f"Unknown provider: {provider}")
+
+            stats = self._stats.setdefault(provider, _ConnectionStats(provider))
+            transport = None
+            if provider == "image_fetch":
+                # User-supplied URLs: connect only to the address that passed the SSRF check
+                from .image_fetch import PinnedAddressTransport
+                transport = PinnedAddressTransport(limits=self.limits, http2=self.http2)
+            client = httpx.AsyncClient(
+                limits=self.limits,
+                http2=self.http2,
+                timeout=httpx.Timeout(10.0, connect=5.0),
+                transport=transport,
+                trust_env=transport is None,
+                event_hooks={"request": [stats.on_request], "response": [stats.on_response]},
+            )
+            self._clients[provider] = client
+        return client
+
+    @property
+    def offender_service(self):
+        """Shared OffenderAPIService using the pooled provider clients."""
+        if self._offender_service is None:
+            from .offender_api import OffenderAPIService
+            self._offender_service = OffenderAPIService(registry=self)
+        return self._offender_service
+
+    @property
+    def tineye_service(self):
+        """
+        Shared TinEyeService.
+
+        Raises:
+            ValueError: If TINEYE_API_KEY is not configured
+        """
+        if self._tineye_service is None:
+            from .tineye_service import TinEyeService
+            self._tineye_service = TinEyeService(registry=self)
+        return self._tineye_service
+
+    async def aclose(self) -> None:
+        """Close all pooled HTTP clients and cache files (called on app shutdown)."""
+        for client in self._clients.values():
+            await client.aclose()
+        self._clients.clear()
+
+        if self._offender_service is not None:
+            for cache in self._offender_service.caches.values():
+                cache.close()
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Per-provider request/connection counts showing saved handshakes."""
+        return {
+            "http2": self.http2,
+            "max_connections": self.limits.max_connections,
+            "max_keepalive_connections": self.limits.max_keepalive_connections,
+            "providers": {
+                provider: stats.as_dict() for provider, stats in self._stats.items()
+            },
+        }
+
+
+# Singleton instance for dependency injection
+_provider_registry: Optional[ProviderRegistry] = None
+
+
+def get_provider_registry() -> ProviderRegistry:
+    """
+    Get or create the singleton ProviderRegistry.
+
+    Returns:
+        ProviderRegistry: The shared provider registry
+    """
+    global _provider_registry
+
+    if _provider_registry is None:
+        _provider_registry = ProviderRegistry()
+
+    return _provider_registry
@@ -0,0 +1,335 @@
+"""
+Durable Refund Outbox
+
+Refunds are written to a local SQLite journal first and applied to Supabase
+by a background worker. This makes refunds durable (a failed RPC is retried
+instead of losing the user's credits) and keeps the refund round trip off
+the error responses the routers send.
+
+Guarantees:
+- Idempotent: one outbox entry per search_id (a second refund for the same
+  search is ignored while pending, and `already_refunded` from the RPC
+  counts as applied)
+- Retries with exponential backoff until REFUND_MAX_ATTEMPTS is reached
+- Bounded load: at most REFUND_BATCH_SIZE refunds are applied per cycle,
+  so a burst of provider failures cannot pile up on the database
+
+The journal must live on persistent storage: the routers tell users their
+credits were refunded as soon as the entry is journaled. On Fly the root
+filesystem is reset whenever a machine stops (auto_stop_machines), so the
+default path is on the volume mounted at /data (fly.toml [mounts]). On
+shutdown, stop() applies what it can within REFUND_STOP_DRAIN_SECONDS;
+anything left stays in the journal for the next start.
+
+Usage:
+    outbox = RefundOutbox(apply_fn=credit_service.apply_refund)
+    await outbox.start()     # In app lifespan startup
+    await outbox.enqueue(user_id, search_id, "api_maintenance_503", amount=2)
+    await outbox.stop()      # In app lifespan shutdown
+"""
+
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from .structured_log import get_logger
+
+logger = get_logger(__name__)
+
+# Location of the SQLite journal. Must be on persistent storage (the Fly volume
+# mounted at /data), never the machine's ephemeral root filesystem.
+REFUND_OUTBOX_PATH = os.getenv("REFUND_OUTBOX_PATH", "/data/refund_outbox.db")
+
+# Max seconds stop() spends applying queued refunds before shutting down
+REFUND_STOP_DRAIN_SECONDS = float(os.getenv("REFUND_STOP_DRAIN_SECONDS", "5.0"))
+
+# Max refunds applied per worker cycle
+REFUND_BATCH_SIZE = int(os.getenv("REFUND_BATCH_SIZE", "20"))
+
+# Worker poll interval when idle (seconds)
+REFUND_POLL_INTERVAL = float(os.getenv("REFUND_POLL_INTERVAL", "1.0"))
+
+# Backoff after the Nth failure: base * 2^(N-1), capped at max (seconds)
+REFUND_BACKOFF_BASE = float(os.getenv("REFUND_BACKOFF_BASE", "2.0"))
+REFUND_BACKOFF_MAX = float(os.getenv("REFUND_BACKOFF_MAX", "300.0"))
+
+# After this many failed attempts an entry is parked as 'failed' for manual review
+REFUND_MAX_ATTEMPTS = int(os.getenv("REFUND_MAX_ATTEMPTS", "12"))
+
+# RPC errors that mean the refund is already applied
+_ALREADY_APPLIED_ERRORS = {"already_refunded"}
+
+
+class RefundOutbox:
+    """
+    SQLite-backed outbox for credit refunds.
+
+    SQLite calls run in a worker thread (asyncio.to_thread) so journal writes
+    never block the event loop.
+    """
+
+    def __init__(
+        self,
+        apply_fn: Callable[[str, str, str, int], Awaitable[Dict[str, Any]]],
+        path: str = REFUND_OUTBOX_PATH,
+        batch_size: int = REFUND_BATCH_SIZE,
+        poll_interval: float = REFUND_POLL_INTERVAL,
+        max_attempts: int = REFUND_MAX_ATTEMPTS,
+    ):
+        """
+        Args:
+            apply_fn: Coroutine (user_id, search_id, reason, amount) -> RPC result dict
+            path: SQLite journal file path
+            batch_size: Max refunds applied per worker cycle
+            poll_interval: Seconds between checks for due refunds
+            max_attempts: Attempts before an entry is parked as 'failed'
+        """
+        self._apply_fn = apply_fn
+        self.path = path
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+
+        self._conn: Optional[sqlite3.Connection] = None
+        self._db_lock = threading.Lock()
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+        # Metrics (since process start)
+        self._enqueued = 0
+        self._duplicates = 0
+        self._applied = 0
+        self._retries = 0
+        self._failed = 0
+
+    @property
+    def running(self) -> bool:
+        """True while the background worker is active."""
+        return self._task is not None and not self._task.done()
+
+    # ------------------------------------------------------------------
+    # SQLite journal (runs in a worker thread)
+    # ------------------------------------------------------------------
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS refunds (
+                    search_id TEXT PRIMARY KEY,
+                    user_id TEXT NOT NULL,
+                    reason TEXT NOT NULL,
+                    amount INTEGER NOT NULL,
+                    status TEXT NOT NULL DEFAULT 'pending',
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    next_attempt_at REAL NOT NULL,
+                    last_error TEXT,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+                """
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_refunds_due ON refunds(status, next_attempt_at)"
+            )
+            self._conn = conn
+        return self._conn
+
+    def _insert(self, user_id: str, search_id: str, reason: str, amount: int) -> bool:
+        now = time.time()
+        with self._db_lock:
+            cursor = self._connect().execute(
+                """
+                INSERT OR IGNORE INTO refunds
+                    (search_id, user_id, reason, amount, next_attempt_at, created_at, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                """,
+                (search_id, user_id, reason, amount, now, now, now),
+            )
+            return cursor.rowcount == 1
+
+    def _fetch_due(self, limit: int) -> List[sqlite3.Row]:
+        with self._db_lock:
+            return self._connect().execute(
+                """
+                SELECT search_id, user_id, reason, amount, attempts
+                FROM refunds
+                WHERE status = 'pending' AND next_attempt_at <= ?
+                ORDER BY next_attempt_at
+                LIMIT ?
+                """,
+                (time.time(), limit),
+            ).fetchall()
+
+    def _mark_applied(self, search_id: str) -> None:
+        # Applied entries are removed. A late duplicate for the same search is
+        # still safe: the RPC answers `already_refunded`, which counts as applied.
+        with self._db_lock:
+            self._connect().execute("DELETE FROM refunds WHERE search_id = ?", (search_id,))
+
+    def _mark_retry(self, search_id: str, attempts: int, error: str) -> bool:
+        """Schedule the next attempt. Returns False if the entry was parked as failed."""
+        now = time.time()
+        exhausted = attempts >= self.max_attempts
+        delay = min(REFUND_BACKOFF_BASE * (2 ** (attempts - 1)), REFUND_BACKOFF_MAX)
+        with self._db_lock:
+            self._connect().execute(
+                """
+                UPDATE refunds
+                SET status = ?, attempts = ?, next_attempt_at = ?, last_error = ?, updated_at = ?
+                WHERE search_id = ?
+                """,
+                ("failed" if exhausted else "pending", attempts, now + delay, error[:500], now, search_id),
+            )
+        return not exhausted
+
+    def _counts(self) -> Dict[str, int]:
+        with self._db_lock:
+            rows = self._connect().execute(
+                "SELECT status, COUNT(*) FROM refunds GROUP BY status"
+            ).fetchall()
+        return {status: count for status, count in rows}
+
+    # ------------------------------------------------------------------
+    # Public API
+    # ------------------------------------------------------------------
+
+    async def enqueue(self, user_id: str, search_id: str, reason: str, amount: int = 1) -> bool:
+        """
+        Durably record a refund. Returns once the entry is journaled.
+
+        Args:
+            user_id: Supabase user ID
+            search_id: UUID of the search entry to refund (idempotency key)
+            reason: Reason code for refund (e.g., "api_error_503")
+            amount: Number of credits to refund
+
+        Returns:
+            bool: True if a new entry was recorded, False if this search was already queued
+        """
+        inserted = await asyncio.to_thread(self._insert, user_id, search_id, reason, amount)
+        if inserted:
+            self._enqueued += 1
+            self._wakeup.set()
+        else:
+            self._duplicates += 1
+        return inserted
+
+    async def start(self) -> None:
+        """Open the journal and start the background worker."""
+        await asyncio.to_thread(self._connect)
+        if not self.running:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self, drain_seconds: float = REFUND_STOP_DRAIN_SECONDS) -> None:
+        """
+        Stop the background worker after a bounded final drain.
+
+        Due refunds are applied for up to drain_seconds; entries still pending
+        (or backing off after a failure) stay in the journal and are applied
+        after the next start.
+        """
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+        if self._conn is not None and drain_seconds > 0:
+            try:
+                await asyncio.wait_for(self._drain(), timeout=drain_seconds)
+            except asyncio.TimeoutError:
+                logger.warning("refund outbox drain timed out, pending refunds kept in journal", seconds=drain_seconds)
+            except Exception:
+                logger.exception("refund outbox drain failed, pending refunds kept in journal")
+
+        with self._db_lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    async def process_due(self) -> int:
+        """
+        Apply one batch of due refunds concurrently.
+
+        Returns:
+            int: Number of refunds applied in this batch
+        """
+        rows = await asyncio.to_thread(self._fetch_due, self.batch_size)
+        if not rows:
+            return 0
+
+        results = await asyncio.gather(*(self._apply_one(row) for row in rows))
+        return sum(1 for applied in results if applied)
+
+    async def _drain(self) -> None:
+        """Apply due refunds until none are left (failed ones back off and aren't due)."""
+        while await asyncio.to_thread(self._fetch_due, 1):
+            await self.process_due()
+
+    async def _apply_one(self, row: sqlite3.Row) -> bool:
+        search_id = row["search_id"]
+        try:
+            result = await self._apply_fn(row["user_id"], search_id, row["reason"], row["amount"])
+            error = None if result.get("success") else result.get("error", "unknown_error")
+        except Exception as e:
+            error = str(e) or type(e).__name__
+
+        if error is None or error in _ALREADY_APPLIED_ERRORS:
+            await asyncio.to_thread(self._mark_applied, search_id)
+            self._applied += 1
+            return True
+
+        will_retry = await asyncio.to_thread(self._mark_retry, search_id, row["attempts"] + 1, error)
+        if will_retry:
+            self._retries += 1
+        else:
+            self._failed += 1
+            logger.error("refund abandoned", search_id=search_id, attempts=self.max_attempts, error=error)
+        return False
+
+    async def _run(self) -> None:
+        """Worker loop: apply due refunds, then wait for new entries or the poll interval."""
+        while True:
+            try:
+                applied = await self.process_due()
+            except Exception:
+                logger.exception("refund outbox worker error")
+                applied = 0
+
+            # A full batch means more may be due - keep draining
+            if applied >= self.batch_size:
+                continue
+
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+    async def get_metrics(self) -> Dict[str, Any]:
+        """Return journal counts (pending/failed) and worker counters."""
+        counts = await asyncio.to_thread(self._counts)
+        return {
+            "running": self.running,
+            "pending": counts.get("pending", 0),
+            "failed": counts.get("failed", 0),
+            "enqueued_total": self._enqueued,
+            "duplicates_total": self._duplicates,
+            "applied_total": self._applied,
+            "retries_total": self._retries,
+            "failed_total": self._failed,
+        }
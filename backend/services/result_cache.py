@@ -0,0 +1,356 @@
+"""
+Result Cache
+
+TTL cache for upstream provider results with:
+- In-memory LRU tier (bounded number of entries)
+- Optional shared tier (services/shared_state.py, when SHARED_STATE_URL is
+  set) so all instances reuse each other's results; the memory tier acts as
+  its near-cache and the cache keeps working from memory/disk while the
+  store is unreachable
+- Optional on-disk tier (SQLite) that survives restarts
+- Negative caching: empty results are cached with a shorter TTL
+- Single-flight coalescing: concurrent lookups for the same key share one
+  upstream call instead of each paying for it
+- Hit/miss statistics
+
+Errors raised by the loader are never cached, so provider fallbacks still run.
+
+Usage:
+    cache = ResultCache("offenders_io", ttl=21600, negative_ttl=3600)
+
+    results = await cache.get_or_load(
+        key="john|doe|94102",
+        loader=lambda: provider.search(...),
+    )
+"""
+
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from .metrics import CACHE_REQUESTS
+from .shared_state import SharedStateBackend, SharedStateError, get_shared_state
+from .structured_log import get_logger
+
+logger = get_logger(__name__)
+
+_MISSING = object()
+
+
+class _DiskTier:
+    """SQLite key/value store with per-entry expiry (accessed via asyncio.to_thread)."""
+
+    def __init__(self, path: str, table: str):
+        self.path = path
+        self.table = table
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {self.table} "
+                "(key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            self._conn = conn
+        return self._conn
+
+    def get(self, key: str) -> Tuple[Any, float]:
+        with self._lock:
+            row = self._connect().execute(
+                f"SELECT value, expires_at FROM {self.table} WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return _MISSING, 0.0
+            value, expires_at = row
+            if expires_at <= time.time():
+                self._connect().execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+                return _MISSING, 0.0
+            return json.loads(value), expires_at
+
+    def set(self, key: str, value: Any, expires_at: float) -> None:
+        payload = json.dumps(value, separators=(",", ":"))
+        with self._lock:
+            self._connect().execute(
+                f"INSERT OR REPLACE INTO {self.table} (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, payload, expires_at),
+            )
+
+    def purge_expired(self) -> int:
+        with self._lock:
+            cursor = self._connect().execute(
+                f"DELETE FROM {self.table} WHERE expires_at <= ?", (time.time(),)
+            )
+            return cursor.rowcount
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+class ResultCache:
+    """
+    Two-tier TTL cache with single-flight loading.
+
+    Values must be JSON-serializable if the shared or disk tier is enabled.
+    None is treated as "not cached", so loaders should return [] or {} for empty results.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        ttl: float,
+        negative_ttl: Optional[float] = None,
+        max_entries: int = 5000,
+        disk_path: Optional[str] = None,
+        is_negative: Callable[[Any], bool] = lambda value: not value,
+        shared: bool = True,
+    ):
+        """
+        Args:
+            name: Cache name (used in stats and as the disk table name)
+            ttl: Seconds a non-empty result stays fresh
+            negative_ttl: Seconds an empty result stays fresh (defaults to ttl, 0 disables)
+            max_entries: Max entries in the in-memory tier (LRU eviction)
+            disk_path: SQLite file for the on-disk tier (None disables it)
+            is_negative: Predicate deciding whether a value counts as an empty result
+            shared: Use the shared tier when SHARED_STATE_URL is configured
+        """
+        self.name = name
+        self.ttl = ttl
+        self.negative_ttl = ttl if negative_ttl is None else negative_ttl
+        self.max_entries = max_entries
+        self._is_negative = is_negative
+        self._use_shared = shared
+
+        self._memory: "OrderedDict[str, Tuple[Any, float]]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._disk = _DiskTier(disk_path, f"cache_{name}") if disk_path else None
+
+        # Stats
+        self.memory_hits = 0
+        self.shared_hits = 0
+        self.disk_hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self.load_errors = 0
+        self.shared_errors = 0
+
+    # ------------------------------------------------------------------
+    # Memory tier
+    # ------------------------------------------------------------------
+
+    def _memory_get(self, key: str) -> Any:
+        entry = self._memory.get(key)
+        if entry is None:
+            return _MISSING
+        value, expires_at = entry
+        if expires_at <= time.time():
+            del self._memory[key]
+            return _MISSING
+        self._memory.move_to_end(key)
+        return value
+
+    def _memory_set(self, key: str, value: Any, expires_at: float) -> None:
+        self._memory[key] = (value, expires_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self.evictions += 1
+
+    def _ttl_for(self, value: Any) -> float:
+        return self.negative_ttl if self._is_negative(value) else self.ttl
+
+    def _record_hit(self, value: Any, tier: str) -> None:
+        CACHE_REQUESTS.inc(self.name, "hit")
+        if tier == "memory":
+            self.memory_hits += 1
+        elif tier == "shared":
+            self.shared_hits += 1
+        else:
+            self.disk_hits += 1
+        if self._is_negative(value):
+            self.negative_hits += 1
+
+    # ------------------------------------------------------------------
+    # Shared tier
+    # ------------------------------------------------------------------
+
+    def _shared(self) -> Optional[SharedStateBackend]:
+        return get_shared_state() if self._use_shared else None
+
+    async def _shared_get(self, shared: SharedStateBackend, key: str) -> Tuple[Any, float]:
+        try:
+            value, ttl = await shared.cache_get(f"{self.name}:{key}")
+        except SharedStateError:
+            # Unreachable store fails fast; keep serving from the local tiers
+            self.shared_errors += 1
+            return _MISSING, 0.0
+        if value is None:
+            return _MISSING, 0.0
+        return value, time.time() + ttl
+
+    async def _shared_set(self, shared: SharedStateBackend, key: str, value: Any, ttl: float) -> None:
+        try:
+            await shared.cache_set(f"{self.name}:{key}", value, ttl)
+        except SharedStateError:
+            self.shared_errors += 1
+        except Exception as e:
+            logger.warning("shared cache write failed", cache=self.name, error=e)
+
+    # ------------------------------------------------------------------
+    # Public API
+    # ------------------------------------------------------------------
+
+    async def get(self, key: str) -> Any:
+        """
+        Look up a fresh value without loading.
+
+        Returns:
+            The cached value, or None if missing/expired
+        """
+        value = self._memory_get(key)
+        if value is not _MISSING:
+            self._record_hit(value, "memory")
+            return value
+
+        shared = self._shared()
+        if shared is not None:
+            value, expires_at = await self._shared_get(shared, key)
+            if value is not _MISSING:
+                self._memory_set(key, value, expires_at)
+                self._record_hit(value, "shared")
+                return value
+
+        if self._disk is not None:
+            try:
+                value, expires_at = await asyncio.to_thread(self._disk.get, key)
+            except Exception as e:
+                logger.warning("disk cache read failed", cache=self.name, error=e)
+                value = _MISSING
+            if value is not _MISSING:
+                self._memory_set(key, value, expires_at)
+                self._record_hit(value, "disk")
+                return value
+
+        return None
+
+    async def set(self, key: str, value: Any) -> None:
+        """Store a value in every tier using the positive or negative TTL."""
+        ttl = self._ttl_for(value)
+        if ttl <= 0:
+            return
+
+        expires_at = time.time() + ttl
+        self._memory_set(key, value, expires_at)
+
+        shared = self._shared()
+        if shared is not None:
+            await self._shared_set(shared, key, value, ttl)
+
+        if self._disk is not None:
+            try:
+                await asyncio.to_thread(self._disk.set, key, value, expires_at)
+            except Exception as e:
+                logger.warning("disk cache write failed", cache=self.name, error=e)
+
+    async def get_or_load(self, key: str, loader: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Return the cached value for key, or load it once for all concurrent callers.
+
+        Args:
+            key: Normalized cache key
+            loader: Coroutine factory that fetches the value from upstream
+
+        Returns:
+            The cached or freshly loaded value
+
+        Raises:
+            Whatever the loader raises (errors are shared by coalesced callers, never cached)
+        """
+        value = await self.get(key)
+        if value is not None:
+            return value
+
+        # Single-flight: join an in-progress load for the same key
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            self.coalesced += 1
+            CACHE_REQUESTS.inc(self.name, "coalesced")
+            return await asyncio.shield(inflight)
+
+        self.misses += 1
+        CACHE_REQUESTS.inc(self.name, "miss")
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            value = await loader()
+        except BaseException as e:
+            self.load_errors += 1
+            if isinstance(e, asyncio.CancelledError):
+                # Don't propagate the leader's cancellation into the other callers
+                future.set_exception(RuntimeError(f"{self.name} lookup was cancelled"))
+            else:
+                future.set_exception(e)
+            # Avoid "exception was never retrieved" when nobody joined
+            future.exception()
+            raise
+        else:
+            future.set_result(value)
+            await self.set(key, value)
+            return value
+        finally:
+            self._inflight.pop(key, None)
+
+    async def purge_expired(self) -> int:
+        """Drop expired entries from the memory and disk tiers (shared entries expire on their own)."""
+        now = time.time()
+        expired = [key for key, (_, expires_at) in self._memory.items() if expires_at <= now]
+        for key in expired:
+            del self._memory[key]
+
+        removed = len(expired)
+        if self._disk is not None:
+            removed += await asyncio.to_thread(self._disk.purge_expired)
+        return removed
+
+    def close(self) -> None:
+        """Close the disk tier (memory tier is simply dropped with the process)."""
+        if self._disk is not None:
+            self._disk.close()
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and hit ratio."""
+        hits = self.memory_hits + self.shared_hits + self.disk_hits
+        lookups = hits + self.misses + self.coalesced
+        return {
+            "entries": len(self._memory),
+            "max_entries": self.max_entries,
+            "shared_tier": self._shared() is not None,
+            "disk_tier": self._disk is not None,
+            "memory_hits": self.memory_hits,
+            "shared_hits": self.shared_hits,
+            "disk_hits": self.disk_hits,
+            "negative_hits": self.negative_hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "evictions": self.evictions,
+            "load_errors": self.load_errors,
+            "shared_errors": self.shared_errors,
+            "hit_ratio": round((hits + self.coalesced) / lookups, 4) if lookups else 0.0,
+        }
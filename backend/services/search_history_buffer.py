@@ -0,0 +1,208 @@
+"""
+Search History Write-Behind Buffer
+
+Collects search history updates (results_count, search_type, metadata) in memory
+and writes them to the `searches` table in bulk, off the request path.
+
+Every paid search used to run its own UPDATE before the response went out.
+With this buffer the router only enqueues the update, and a background task
+flushes pending updates with a single `update_search_results_batch` RPC when
+either the batch size or the flush interval is reached.
+
+Usage:
+    buffer = SearchHistoryBuffer(flush_fn=credit_service.write_search_updates)
+    await buffer.start()          # In app lifespan startup
+    buffer.enqueue(search_id, results_count=3, search_type="name")
+    await buffer.stop()           # In app lifespan shutdown (flushes pending updates)
+"""
+
+import asyncio
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from .structured_log import get_logger
+
+logger = get_logger(__name__)
+
+# Flush when this many distinct searches are pending
+SEARCH_HISTORY_BATCH_SIZE = int(os.getenv("SEARCH_HISTORY_BATCH_SIZE", "50"))
+
+# Flush at least this often (seconds) while updates are pending
+SEARCH_HISTORY_FLUSH_INTERVAL = float(os.getenv("SEARCH_HISTORY_FLUSH_INTERVAL", "1.0"))
+
+# Upper bound on pending updates if the database is unreachable for a while
+SEARCH_HISTORY_MAX_PENDING = int(os.getenv("SEARCH_HISTORY_MAX_PENDING", "5000"))
+
+
+class SearchHistoryBuffer:
+    """
+    Write-behind buffer for `searches` table updates.
+
+    Updates are keyed by search_id, so a later update for the same search
+    replaces the earlier one instead of producing a second row in the batch.
+    """
+
+    def __init__(
+        self,
+        flush_fn: Callable[[List[Dict[str, Any]]], Awaitable[None]],
+        batch_size: int = SEARCH_HISTORY_BATCH_SIZE,
+        flush_interval: float = SEARCH_HISTORY_FLUSH_INTERVAL,
+        max_pending: int = SEARCH_HISTORY_MAX_PENDING,
+    ):
+        """
+        Args:
+            flush_fn: Coroutine that writes a list of update rows in one statement
+            batch_size: Number of pending updates that triggers an immediate flush
+            flush_interval: Maximum seconds an update waits before being flushed
+            max_pending: Pending updates beyond this are dropped (oldest first)
+        """
+        self._flush_fn = flush_fn
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+
+        # search_id -> update row (dicts preserve insertion order, oldest first)
+        self._pending: Dict[str, Dict[str, Any]] = {}
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._flush_lock = asyncio.Lock()
+
+        # Metrics
+        self._enqueued = 0
+        self._flushed = 0
+        self._flushes = 0
+        self._failed_flushes = 0
+        self._dropped = 0
+        self._last_flush_at: Optional[float] = None
+        self._last_flush_duration: Optional[float] = None
+        self._last_flush_failed = False
+
+    @property
+    def running(self) -> bool:
+        """True while the background flush task is active."""
+        return self._task is not None and not self._task.done()
+
+    def enqueue(
+        self,
+        search_id: str,
+        results_count: int,
+        search_type: Optional[str] = None,
+        metadata: Optional[Dict[str, Any]] = None
+    ) -> None:
+        """
+        Queue a search history update. Never blocks and never raises.
+
+        Args:
+            search_id: UUID of the search entry
+            results_count: Number of results returned
+            search_type: Optional search type ('name', 'phone', 'image')
+            metadata: Optional additional metadata to store
+        """
+        row = self._pending.pop(search_id, None) or {"id": search_id}
+        row["results_count"] = results_count
+        if search_type:
+            row["search_type"] = search_type
+        if metadata:
+            row["metadata"] = metadata
+        self._pending[search_id] = row
+        self._enqueued += 1
+
+        # Drop the oldest updates rather than growing without bound
+        while len(self._pending) > self.max_pending:
+            self._pending.pop(next(iter(self._pending)))
+            self._dropped += 1
+
+        if len(self._pending) >= self.batch_size:
+            self._wakeup.set()
+
+    async def start(self) -> None:
+        """Start the background flush task."""
+        if not self.running:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the background task and flush everything still pending."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+        await self.flush()
+
+    async def flush(self) -> int:
+        """
+        Write all pending updates in a single batch.
+
+        Returns:
+            int: Number of updates written (0 if nothing was pending or the write failed)
+        """
+        async with self._flush_lock:
+            if not self._pending:
+                return 0
+
+            batch = self._pending
+            self._pending = {}
+            started = time.monotonic()
+
+            try:
+                await self._flush_fn(list(batch.values()))
+            except Exception as e:
+                self._failed_flushes += 1
+                self._last_flush_failed = True
+                logger.warning("search history flush failed", updates=len(batch), error=e)
+
+                # Put the batch back ahead of updates that arrived meanwhile, so
+                # the drop-oldest trim below evicts the failed (older) rows first.
+                # A newer update for the same search is merged over its old row.
+                requeued = {
+                    search_id: row for search_id, row in batch.items() if search_id not in self._pending
+                }
+                for search_id, row in self._pending.items():
+                    requeued[search_id] = {**batch[search_id], **row} if search_id in batch else row
+                self._pending = requeued
+                while len(self._pending) > self.max_pending:
+                    self._pending.pop(next(iter(self._pending)))
+                    self._dropped += 1
+                return 0
+
+            self._last_flush_failed = False
+            self._flushes += 1
+            self._flushed += len(batch)
+            self._last_flush_at = time.time()
+            self._last_flush_duration = time.monotonic() - started
+            return len(batch)
+
+    async def _run(self) -> None:
+        """Flush on size trigger (wakeup event) or time trigger (interval)."""
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+            await self.flush()
+
+            # Back off for one interval after a failure instead of spinning
+            if self._last_flush_failed:
+                await asyncio.sleep(self.flush_interval)
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Return queue depth and flush statistics."""
+        return {
+            "queue_depth": len(self._pending),
+            "running": self.running,
+            "batch_size": self.batch_size,
+            "flush_interval_seconds": self.flush_interval,
+            "enqueued_total": self._enqueued,
+            "flushed_total": self._flushed,
+            "flushes_total": self._flushes,
+            "failed_flushes_total": self._failed_flushes,
+            "dropped_total": self._dropped,
+            "last_flush_at": self._last_flush_at,
+            "last_flush_duration_seconds": self._last_flush_duration,
+        }
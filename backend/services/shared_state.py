@@ -0,0 +1,436 @@
+"""
+Shared State Backend
+
+Cross-instance state for rate limits and hot caches. fly.toml scales
+machines to zero and back, so per-process state multiplied every limit by
+the instance count and reset on each cold start.
+
+SharedStateBackend is the pluggable interface; RedisBackend implements it
+for any server speaking the Redis protocol (Redis, Valkey, Upstash, or a
+local stand-in for testing):
+- One connection per process with auto-pipelining: commands issued by
+  concurrent requests are buffered and written together once per event-loop
+  pass, without waiting for earlier replies; replies are matched in order
+- Atomic read-modify-write runs as Lua scripts (EVALSHA, falling back to
+  EVAL once after a server restart flushes the script cache)
+- Fail fast: after a connection error or timeout the backend reports itself
+  unavailable for SHARED_STATE_RETRY_SECONDS instead of making every request
+  wait on a dead store. Callers keep their local state as a near-cache and
+  fall back to it (middleware/rate_limit.py, services/result_cache.py)
+
+Configure with SHARED_STATE_URL (unset = every instance keeps local state):
+    redis://[:password@]host[:port][/db]
+    rediss://...   (TLS)
+
+Usage:
+    shared = get_shared_state()   # None when SHARED_STATE_URL is unset
+
+    try:
+        allowed, retry_after = await shared.gcra("rl:search:user:123", 6.0, 54.0)
+    except SharedStateError:
+        ...  # Use local state
+
+    # In app lifespan shutdown
+    await close_shared_state()
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import ssl
+import time
+from abc import ABC, abstractmethod
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Sequence, Tuple
+from urllib.parse import unquote, urlsplit
+
+from .structured_log import get_logger
+
+logger = get_logger(__name__)
+
+SHARED_STATE_URL = os.getenv("SHARED_STATE_URL") or None
+
+# Max seconds to wait for a reply before treating the store as unreachable
+SHARED_STATE_TIMEOUT = float(os.getenv("SHARED_STATE_TIMEOUT", "0.25"))
+
+# Seconds to serve from local state after the store failed before reconnecting
+SHARED_STATE_RETRY_SECONDS = float(os.getenv("SHARED_STATE_RETRY_SECONDS", "10"))
+
+# Namespace for every key this app writes (lets several apps share one store)
+SHARED_STATE_PREFIX = os.getenv("SHARED_STATE_PREFIX", "pinkflag:")
+
+
+class SharedStateError(Exception):
+    """The shared store couldn't answer (error reply, timeout, unreachable)."""
+
+
+class SharedStateUnavailable(SharedStateError):
+    """The shared store is unreachable; use local state."""
+
+
+# GCRA: KEYS[1] = bucket, ARGV[1] = emission interval (ms), ARGV[2] = burst tolerance (ms)
+# Uses the server clock so every instance agrees on "now". The key expires
+# exactly when the bucket is full again, so idle keys evict themselves.
+_GCRA_SCRIPT = """
+local interval = tonumber(ARGV[1])
+local tolerance = tonumber(ARGV[2])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) * 1000 + math.floor(tonumber(clock[2]) / 1000)
+local tat = tonumber(redis.call('GET', KEYS[1]) or now)
+if tat < now then
+  tat = now
+end
+local wait = tat - now - tolerance
+if wait > 0 then
+  return {0, wait}
+end
+tat = tat + interval
+redis.call('SET', KEYS[1], tat, 'PX', tat - now)
+return {1, 0}
+"""
+
+
+class _Script:
+    """Lua script source plus the SHA1 the server caches it under."""
+
+    def __init__(self, source: str):
+        self.source = source
+        self.sha = hashlib.sha1(source.encode()).hexdigest()
+
+
+class SharedStateBackend(ABC):
+    """Interface for shared rate-limit and cache state."""
+
+    @abstractmethod
+    async def gcra(self, key: str, interval: float, tolerance: float) -> Tuple[bool, float]:
+        """
+        Count one request against a GCRA bucket.
+
+        Args:
+            key: Bucket key (namespaced by the backend)
+            interval: Seconds between requests at the sustained rate
+            tolerance: Burst allowance in seconds (period - interval)
+
+        Returns:
+            (allowed, retry_after seconds; 0 when allowed)
+        """
+
+    @abstractmethod
+    async def cache_get(self, key: str) -> Tuple[Any, float]:
+        """Returns (value, seconds until expiry), or (None, 0) on a miss."""
+
+    @abstractmethod
+    async def cache_set(self, key: str, value: Any, ttl: float) -> None:
+        """Store a JSON-serializable value for ttl seconds."""
+
+    @abstractmethod
+    async def close(self) -> None:
+        """Close connections; the backend reconnects on next use."""
+
+    @abstractmethod
+    def stats(self) -> Dict[str, Any]:
+        """Connection and command counters for the health endpoint."""
+
+
+def _encode_command(args: Sequence[Any]) -> bytes:
+    """Encode one command as a RESP array of bulk strings."""
+    parts = [b"*%d\r\n" % len(args)]
+    for arg in args:
+        if isinstance(arg, bytes):
+            data = arg
+        elif isinstance(arg, float):
+            data = repr(arg).encode()
+        else:
+            data = str(arg).encode()
+        parts.append(b"$%d\r\n%s\r\n" % (len(data), data))
+    return b"".join(parts)
+
+
+class RedisBackend(SharedStateBackend):
+    """Shared state on a Redis-protocol server (RESP2) over one pipelined connection."""
+
+    def __init__(
+        self,
+        url: str,
+        timeout: float = SHARED_STATE_TIMEOUT,
+        retry_seconds: float = SHARED_STATE_RETRY_SECONDS,
+        prefix: str = SHARED_STATE_PREFIX,
+    ):
+        parts = urlsplit(url)
+        if parts.scheme not in ("redis", "rediss"):
+            raise ValueError(f"Unsupported shared state URL scheme: {parts.scheme!r}")
+
+        self.host = parts.hostname or "localhost"
+        self.port = parts.port or 6379
+        self.username = unquote(parts.username) if parts.username else None
+        self.password = unquote(parts.password) if parts.password else None
+        self.db = int(parts.path.lstrip("/") or 0)
+        self.tls = parts.scheme == "rediss"
+        self.timeout = timeout
+        self.retry_seconds = retry_seconds
+        self.prefix = prefix
+
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._reader_task: Optional[asyncio.Task] = None
+        self._connect_lock = asyncio.Lock()
+
+        # Futures awaiting replies, in the order their commands were written
+        self._pending: Deque[asyncio.Future] = deque()
+        self._write_buffer = bytearray()
+        self._flush_scheduled = False
+
+        self._down_until = 0.0
+        self._gcra = _Script(_GCRA_SCRIPT)
+
+        # Stats
+        self.commands = 0
+        self.flushes = 0
+        self.errors = 0
+        self.reconnects = 0
+
+    # ------------------------------------------------------------------
+    # Connection
+    # ------------------------------------------------------------------
+
+    @property
+    def available(self) -> bool:
+        return time.monotonic() >= self._down_until
+
+    async def _ensure_connected(self) -> None:
+        if self._writer is not None:
+            return
+        if not self.available:
+            raise SharedStateUnavailable("Shared state store is unreachable")
+
+        async with self._connect_lock:
+            if self._writer is not None:
+                return
+            try:
+                self._reader, self._writer = await asyncio.wait_for(
+                    asyncio.open_connection(
+                        self.host, self.port, ssl=ssl.create_default_context() if self.tls else None
+                    ),
+                    timeout=self.timeout * 4,
+                )
+            except (OSError, asyncio.TimeoutError) as e:
+                self._mark_down(f"connect failed: {e!r}")
+                raise SharedStateUnavailable(str(e)) from e
+
+            self._reader_task = asyncio.create_task(self._read_loop(self._reader))
+            self.reconnects += 1
+
+            # Handshake goes through the normal pipeline
+            handshake: List[Sequence[Any]] = []
+            if self.password:
+                handshake.append(
+                    ("AUTH", self.username, self.password) if self.username else ("AUTH", self.password)
+                )
+            if self.db:
+                handshake.append(("SELECT", self.db))
+            if handshake:
+                try:
+                    await self.pipeline(handshake)
+                except SharedStateUnavailable:
+                    raise
+                except SharedStateError as e:
+                    self._mark_down(f"handshake failed: {e}")
+                    raise SharedStateUnavailable(str(e)) from e
+
+            logger.info("shared state connected", host=self.host, port=self.port, db=self.db)
+
+    def _mark_down(self, reason: str) -> None:
+        """Fail pending commands and serve from local state for retry_seconds."""
+        if self.available:
+            logger.warning("shared state unavailable, using local state", retry_seconds=self.retry_seconds, reason=reason)
+        self.errors += 1
+        self._down_until = time.monotonic() + self.retry_seconds
+        self._disconnect(SharedStateUnavailable(reason))
+
+    def _disconnect(self, error: Exception) -> None:
+        writer, self._writer, self._reader = self._writer, None, None
+        if writer is not None:
+            writer.close()
+        if self._reader_task is not None and self._reader_task is not asyncio.current_task():
+            self._reader_task.cancel()
+        self._reader_task = None
+        self._write_buffer.clear()
+        while self._pending:
+            future = self._pending.popleft()
+            if not future.done():
+                future.set_exception(error)
+                future.exception()  # Retrieved by whoever awaits it; avoid warnings otherwise
+
+    async def close(self) -> None:
+        self._disconnect(SharedStateUnavailable("Shared state backend closed"))
+
+    # ------------------------------------------------------------------
+    # Protocol
+    # ------------------------------------------------------------------
+
+    def _flush(self) -> None:
+        """Write every command buffered during this event-loop pass in one go."""
+        self._flush_scheduled = False
+        if self._writer is None or not self._write_buffer:
+            return
+        self._writer.write(bytes(self._write_buffer))
+        self._write_buffer.clear()
+        self.flushes += 1
+
+    async def pipeline(self, commands: Sequence[Sequence[Any]]) -> List[Any]:
+        """
+        Send commands without waiting for each reply; return the replies in order.
+
+        Raises:
+            SharedStateError: Error reply, timeout, or unreachable store
+        """
+        await self._ensure_connected()
+
+        loop = asyncio.get_running_loop()
+        futures = []
+        for command in commands:
+            self._write_buffer += _encode_command(command)
+            future = loop.create_future()
+            self._pending.append(future)
+            futures.append(future)
+        self.commands += len(commands)
+
+        if not self._flush_scheduled:
+            self._flush_scheduled = True
+            loop.call_soon(self._flush)
+
+        try:
+            replies = await asyncio.wait_for(asyncio.gather(*futures), timeout=self.timeout)
+        except asyncio.TimeoutError as e:
+            self._mark_down("reply timed out")
+            raise SharedStateUnavailable("Shared state reply timed out") from e
+
+        for reply in replies:
+            if isinstance(reply, SharedStateError):
+                raise reply
+        return replies
+
+    async def execute(self, *args: Any) -> Any:
+        return (await self.pipeline([args]))[0]
+
+    async def _read_loop(self, reader: asyncio.StreamReader) -> None:
+        try:
+            while True:
+                reply = await self._read_reply(reader)
+                future = self._pending.popleft()
+                # Cancelled/timed-out callers leave done futures behind; keep order anyway
+                if not future.done():
+                    future.set_result(reply)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            if self._reader is reader:
+                self._mark_down(f"connection lost: {e!r}")
+
+    async def _read_reply(self, reader: asyncio.StreamReader) -> Any:
+        line = await reader.readline()
+        if not line:
+            raise ConnectionError("Connection closed by server")
+
+        kind, body = line[:1], line[1:-2]
+        if kind == b"+":
+            return body.decode()
+        if kind == b"-":
+            # Returned, not raised: the connection is still in sync
+            return SharedStateError(body.decode())
+        if kind == b":":
+            return int(body)
+        if kind == b"$":
+            length = int(body)
+            if length < 0:
+                return None
+            return (await reader.readexactly(length + 2))[:-2]
+        if kind == b"*":
+            length = int(body)
+            if length < 0:
+                return None
+            return [await self._read_reply(reader) for _ in range(length)]
+        raise ConnectionError(f"Unexpected reply type: {line[:20]!r}")
+
+    async def _eval(self, script: _Script, keys: Sequence[str], args: Sequence[Any]) -> Any:
+        try:
+            return await self.execute("EVALSHA", script.sha, len(keys), *keys, *args)
+        except SharedStateError as e:
+            if not str(e).startswith("NOSCRIPT"):
+                raise
+            # Script cache was flushed (server restart); EVAL also reloads it
+            return await self.execute("EVAL", script.source, len(keys), *keys, *args)
+
+    # ------------------------------------------------------------------
+    # SharedStateBackend
+    # ------------------------------------------------------------------
+
+    async def gcra(self, key: str, interval: float, tolerance: float) -> Tuple[bool, float]:
+        allowed, wait_ms = await self._eval(
+            self._gcra,
+            [f"{self.prefix}rl:{key}"],
+            [max(1, round(interval * 1000)), round(tolerance * 1000)],
+        )
+        return bool(allowed), wait_ms / 1000.0
+
+    async def cache_get(self, key: str) -> Tuple[Any, float]:
+        full_key = f"{self.prefix}cache:{key}"
+        value, ttl_ms = await self.pipeline([("GET", full_key), ("PTTL", full_key)])
+        if value is None or ttl_ms <= 0:
+            return None, 0.0
+        return json.loads(value), ttl_ms / 1000.0
+
+    async def cache_set(self, key: str, value: Any, ttl: float) -> None:
+        payload = json.dumps(value, separators=(",", ":"))
+        await self.execute("SET", f"{self.prefix}cache:{key}", payload, "PX", max(1, round(ttl * 1000)))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": "redis",
+            "endpoint": f"{self.host}:{self.port}/{self.db}",
+            "connected": self._writer is not None,
+            "available": self.available,
+            "commands": self.commands,
+            "flushes": self.flushes,
+            "pending": len(self._pending),
+            "errors": self.errors,
+            "connections_opened": self.reconnects,
+        }
+
+
+_BACKENDS = {
+    "redis": RedisBackend,
+    "rediss": RedisBackend,
+}
+
+# Singleton instance
+_shared_state: Optional[SharedStateBackend] = None
+
+
+def get_shared_state() -> Optional[SharedStateBackend]:
+    """
+    Get or create the shared state backend.
+
+    Returns:
+        SharedStateBackend, or None if SHARED_STATE_URL is unset (local state only)
+    """
+    global _shared_state
+
+    if SHARED_STATE_URL is None:
+        return None
+
+    if _shared_state is None:
+        scheme = urlsplit(SHARED_STATE_URL).scheme
+        backend_class = _BACKENDS.get(scheme)
+        if backend_class is None:
+            raise ValueError(f"Unsupported SHARED_STATE_URL scheme: {scheme!r}")
+        _shared_state = backend_class(SHARED_STATE_URL)
+
+    return _shared_state
+
+
+async def close_shared_state() -> None:
+    """Close the shared state connection (called on app shutdown)."""
+    if _shared_state is not None:
+        await _shared_state.close()
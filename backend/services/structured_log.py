@@ -0,0 +1,322 @@
+"""
+Structured Logging
+
+JSON log records written off the event loop, replacing print() in services
+and routers.
+
+- Non-blocking: loggers only put the record on a bounded in-memory queue;
+  a QueueListener thread formats, redacts and writes to stdout. If the
+  queue is full (stdout stalled), records are dropped and counted instead
+  of blocking requests.
+- Structured: one JSON object per line with ts, level, logger, event,
+  request_id (from the X-Request-ID middleware) and keyword fields.
+- Sampling: high-volume debug events pass sample=<rate>; only that share
+  is recorded (each record carries its sample_rate so counts can be
+  scaled back up). Disabled levels cost one level check.
+- Redaction (LOG_REDACT, on by default): fields named like names, phone
+  numbers or image URLs are masked, and phone numbers, URLs and emails
+  are scrubbed from messages and error strings. Names can't be detected
+  in free text, so pass them as fields, never inside the event text.
+
+Usage:
+    from services.structured_log import get_logger
+
+    logger = get_logger(__name__)
+
+    logger.info("credit deducted", user_id=user_id, credits=credits)
+    logger.debug("provider results", provider="offenders_io", count=len(results), sample=0.01)
+    logger.warning("refund failed", user_id=user_id, error=e)
+    logger.exception("unexpected error")  # Inside an except block; adds the traceback
+
+Output:
+    {"ts": "2026-01-01T12:00:00.123Z", "level": "info", "logger": "services.credit_service",
+     "event": "credit deducted", "request_id": "3f2a...", "user_id": "...", "credits": 9}
+"""
+
+import atexit
+import json
+import logging
+import os
+import queue
+import random
+import re
+import sys
+import threading
+import time
+from contextvars import ContextVar
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Dict, Optional
+
+# Minimum level recorded (DEBUG, INFO, WARNING, ERROR)
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+
+# Share of sampled debug events recorded; the call site's sample= is multiplied by this
+LOG_DEBUG_SAMPLE_RATE = float(os.getenv("LOG_DEBUG_SAMPLE_RATE", "1.0"))
+
+# Mask PII in fields and messages
+LOG_REDACT = os.getenv("LOG_REDACT", "true").lower() == "true"
+
+# Records buffered for the writer thread before new ones are dropped
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+
+# Request id for the current request (set by middleware/request_id.py)
+request_id_var: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+
+
+# ==================== REDACTION ====================
+
+# Field names whose values are PII (compared lowercase, without underscores)
+_NAME_FIELDS = {"name", "firstname", "lastname", "fullname", "callername", "names"}
+_PHONE_FIELDS = {"phone", "phonenumber", "number", "e164"}
+_URL_FIELDS = {"url", "imageurl", "backlink"}
+
+# Cheap pre-check: text without digits, "://" or "@" has nothing to scrub
+_MAY_NEED_REDACTION = re.compile(r"\d|://|@")
+_URL_PATTERN = re.compile(r"\b(?:https?|wss?)://[^\s'\"<>]+", re.IGNORECASE)
+_EMAIL_PATTERN = re.compile(r"\b[\w.+-]+@[\w-]+(?:\.[\w-]+)+\b")
+# 7+ digits with optional +, spaces, dots, dashes or parentheses between them
+_PHONE_PATTERN = re.compile(r"(?<![\w.])\+?\(?\d(?:[\s().-]*\d){6,14}\b")
+
+
+def _mask_phone(value: str) -> str:
+    digits = re.sub(r"\D", "", value)
+    return f"***{digits[-2:]}" if len(digits) >= 7 else "[redacted]"
+
+
+def _url_host(match: "re.Match[str]") -> str:
+    """Keep scheme and host (useful for debugging), drop path and query (may carry names)."""
+    url = match.group(0)
+    scheme, _, rest = url.partition("://")
+    host = rest.split("/", 1)[0].split("?", 1)[0]
+    return f"{scheme}://{host}/[redacted]"
+
+
+def redact_text(text: str) -> str:
+    """Scrub URLs, emails and phone numbers from free text."""
+    if not _MAY_NEED_REDACTION.search(text):
+        return text
+    text = _URL_PATTERN.sub(_url_host, text)
+    text = _EMAIL_PATTERN.sub("[email]", text)
+    return _PHONE_PATTERN.sub(lambda match: _mask_phone(match.group(0)), text)
+
+
+def redact_field(key: str, value: Any) -> Any:
+    """Mask a field by name, or scrub it if it's a string."""
+    normalized = key.lower().replace("_", "")
+    if value is None or isinstance(value, (bool, int, float)):
+        return value
+    # Ids (user_id, search_id, request_id) are opaque UUIDs, not PII
+    if normalized == "id" or key.endswith("_id"):
+        return value
+    if normalized in _NAME_FIELDS:
+        return "[redacted]"
+    if normalized in _PHONE_FIELDS:
+        return _mask_phone(str(value))
+    if normalized in _URL_FIELDS:
+        return _URL_PATTERN.sub(_url_host, str(value))
+    if isinstance(value, str):
+        return redact_text(value)
+    if isinstance(value, dict):
+        return {k: redact_field(str(k), v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [redact_field(key, item) for item in value]
+    return redact_text(str(value))
+
+
+# ==================== FORMATTING ====================
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record. Runs on the listener thread."""
+
+    def __init__(self, redact: bool = LOG_REDACT):
+        super().__init__()
+        self.redact = redact
+        self._second = -1
+        self._second_text = ""
+
+    def _timestamp(self, created: float) -> str:
+        second = int(created)
+        if second != self._second:
+            self._second = second
+            self._second_text = time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(second))
+        return f"{self._second_text}.{int((created - second) * 1000):03d}Z"
+
+    def format(self, record: logging.LogRecord) -> str:
+        event = record.getMessage()
+        entry: Dict[str, Any] = {
+            "ts": self._timestamp(record.created),
+            "level": record.levelname.lower(),
+            "logger": record.name,
+            "event": redact_text(event) if self.redact else event,
+        }
+        request_id = getattr(record, "request_id", None)
+        if request_id is not None:
+            entry["request_id"] = request_id
+        # Keyword fields from StructuredLogger (plain stdlib records have none)
+        for key, value in getattr(record, "fields", {}).items():
+            if isinstance(value, BaseException):
+                value = f"{type(value).__name__}: {value}"
+            entry[key] = redact_field(key, value) if self.redact else value
+        if record.exc_info:
+            exc_text = self.formatException(record.exc_info)
+            entry["exc"] = redact_text(exc_text) if self.redact else exc_text
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+# ==================== QUEUE PIPELINE ====================
+
+class _DroppingQueueHandler(QueueHandler):
+    """QueueHandler that never blocks the caller and skips the eager formatting."""
+
+    def __init__(self, log_queue: "queue.SimpleQueue[logging.LogRecord]", max_size: int):
+        super().__init__(log_queue)
+        self.max_size = max_size
+        self.dropped = 0
+
+    def handle(self, record: logging.LogRecord) -> bool:
+        # No handler lock: SimpleQueue.put is already thread-safe
+        if self.filter(record):
+            self.emit(record)
+            return True
+        return False
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # The listener lives in this process, so the record can be formatted
+        # there; the default prepare() would format here, on the event loop
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        # SimpleQueue is lock-free on put (a bounded Queue takes a lock and a
+        # condition per record), so the bound is checked here instead
+        if self.queue.qsize() >= self.max_size:
+            self.dropped += 1
+            return
+        self.queue.put_nowait(record)
+
+
+class _RequestContextFilter(logging.Filter):
+    """Attach the current request id. Runs on the caller's thread, where the context var is set."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        request_id = request_id_var.get()
+        if request_id is not None:
+            record.request_id = request_id
+        return True
+
+
+_queue_handler: Optional[_DroppingQueueHandler] = None
+_listener: Optional[QueueListener] = None
+_configure_lock = threading.Lock()
+
+
+def configure_logging(stream=None) -> None:
+    """
+    Install the queue handler on the root logger and start the writer thread.
+
+    Safe to call more than once; called on first get_logger().
+    """
+    global _queue_handler, _listener
+
+    with _configure_lock:
+        if _listener is not None:
+            return
+
+        # The JSON output has no thread/process fields; skip looking them up per record
+        logging.logThreads = False
+        logging.logProcesses = False
+        logging.logMultiprocessing = False
+
+        log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+        output = logging.StreamHandler(stream or sys.stdout)
+        output.setFormatter(JsonFormatter())
+
+        _queue_handler = _DroppingQueueHandler(log_queue, LOG_QUEUE_SIZE)
+        _queue_handler.addFilter(_RequestContextFilter())
+
+        # Root keeps its WARNING default, so library INFO chatter (httpx logs
+        # every request) stays out; get_logger() sets LOG_LEVEL on app loggers
+        logging.getLogger().addHandler(_queue_handler)
+
+        _listener = QueueListener(log_queue, output, respect_handler_level=False)
+        _listener.start()
+        atexit.register(shutdown_logging)
+
+
+def shutdown_logging() -> None:
+    """Write out everything still queued and stop the writer thread."""
+    global _listener
+
+    with _configure_lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
+            logging.getLogger().removeHandler(_queue_handler)
+
+
+def get_logging_stats() -> Dict[str, Any]:
+    """Queue depth and dropped records (for /health/workers)."""
+    if _queue_handler is None:
+        return {"configured": False}
+    return {
+        "configured": True,
+        "level": LOG_LEVEL,
+        "queued": _queue_handler.queue.qsize(),
+        "dropped": _queue_handler.dropped,
+        "debug_sample_rate": LOG_DEBUG_SAMPLE_RATE,
+        "redact": LOG_REDACT,
+    }
+
+
+# ==================== LOGGER ====================
+
+class StructuredLogger:
+    """Thin wrapper over a stdlib logger taking an event plus keyword fields."""
+
+    __slots__ = ("_logger",)
+
+    def __init__(self, logger: logging.Logger):
+        self._logger = logger
+
+    def _log(self, level: int, event: str, fields: Dict[str, Any], exc_info: Any = None) -> None:
+        if not self._logger.isEnabledFor(level):
+            return
+        sample = fields.pop("sample", None)
+        if sample is not None:
+            rate = sample * LOG_DEBUG_SAMPLE_RATE
+            if rate < 1.0 and random.random() >= rate:
+                return
+            fields["sample_rate"] = rate
+        if exc_info:
+            exc_info = sys.exc_info()
+        # makeRecord + handle skips Logger._log's caller lookup (a stack walk
+        # per call); file and line aren't part of the JSON output
+        logger = self._logger
+        record = logger.makeRecord(logger.name, level, "", 0, event, (), exc_info)
+        record.fields = fields
+        logger.handle(record)
+
+    def debug(self, event: str, **fields: Any) -> None:
+        self._log(logging.DEBUG, event, fields)
+
+    def info(self, event: str, **fields: Any) -> None:
+        self._log(logging.INFO, event, fields)
+
+    def warning(self, event: str, **fields: Any) -> None:
+        self._log(logging.WARNING, event, fields)
+
+    def error(self, event: str, **fields: Any) -> None:
+        self._log(logging.ERROR, event, fields)
+
+    def exception(self, event: str, **fields: Any) -> None:
+        self._log(logging.ERROR, event, fields, exc_info=True)
+
+    def is_enabled(self, level: int) -> bool:
+        return self._logger.isEnabledFor(level)
+
+
+def get_logger(name: str) -> StructuredLogger:
+    """Structured logger for a module (pass __name__)."""
+    configure_logging()
+    logger = logging.getLogger(name)
+    logger.setLevel(LOG_LEVEL)
+    return StructuredLogger(logger)
@@ -7,9 +7,10 @@ Used for server-side credit validation, user management, and database operations
 This client uses the service role key for admin operations (bypassing RLS).
 """
 
+import asyncio
 import os
 from typing import Optional
-from supabase import create_client, Client
+from supabase import create_client, acreate_client, Client, AsyncClient
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -24,6 +25,12 @@ SUPABASE_ANON_KEY = os.getenv("SUPABASE_ANON_KEY")  # Public key (for RLS-aware
 _supabase_client: Optional[Client] = None
 _supabase_admin_client: Optional[Client] = None
 
+# Async admin client used on the request path (credit RPCs, search history).
+# Its PostgREST calls are awaited, so a slow database round trip no longer
+# blocks the event loop, and the underlying httpx pool keeps connections alive.
+_supabase_async_admin_client: Optional[AsyncClient] = None
+_async_admin_client_lock = asyncio.Lock()
+
 
 def get_supabase_client(use_service_role: bool = False) -> Client:
     """
@@ -94,6 +101,48 @@ def get_admin_client() -> Client:
     return get_supabase_client(use_service_role=True)
 
 
+async def get_async_admin_client() -> AsyncClient:
+    """
+    Get or create the async Supabase admin client (service role).
+
+    Use this from `async def` code paths instead of get_admin_client() so
+    database calls are awaited rather than blocking the event loop.
+
+    Returns:
+        AsyncClient: Async Supabase admin client that bypasses RLS
+
+    Raises:
+        ValueError: If Supabase credentials are not configured
+
+    Usage:
+        admin = await get_async_admin_client()
+        result = await admin.rpc('deduct_credit_for_search', params).execute()
+    """
+    global _supabase_async_admin_client
+
+    if _supabase_async_admin_client is not None:
+        return _supabase_async_admin_client
+
+    if not SUPABASE_URL:
+        raise ValueError("SUPABASE_URL environment variable is not set")
+
+    if not SUPABASE_SERVICE_ROLE_KEY:
+        raise ValueError(
+            "SUPABASE_SERVICE_ROLE_KEY environment variable is not set. "
+            "Get this from Supabase Dashboard > Settings > API > service_role key"
+        )
+
+    # Guard creation so concurrent first requests share a single client
+    async with _async_admin_client_lock:
+        if _supabase_async_admin_client is None:
+            _supabase_async_admin_client = await acreate_client(
+                SUPABASE_URL,
+                SUPABASE_SERVICE_ROLE_KEY
+            )
+
+    return _supabase_async_admin_client
+
+
 def get_user_client() -> Client:
     """
     Convenience method to get user client (anon key).
@@ -0,0 +1,209 @@
+"""
+Async TinEye REST Client
+
+Native asyncio client for the TinEye REST API, built on the registry's pooled
+keep-alive httpx client. Replaces the synchronous pytineye SDK, which blocked
+a worker thread and opened its own connections for every in-flight search.
+
+Supports the three calls we use:
+- search_data(): POST an image as a multipart upload (bytes, or a file object
+  that httpx streams in chunks without loading it into memory)
+- search_url(): GET a search by image URL
+- remaining_searches(): search bundle balance
+
+Search responses are parsed straight into the dict format TinEyeService
+returns (total_matches, total_backlinks, results, stats) - no intermediate
+Match/Backlink objects.
+
+Usage:
+    client = TinEyeClient(http_client, api_key="...")
+    result = await client.search_data(image_bytes)
+    remaining = await client.remaining_searches()
+"""
+
+import json
+from datetime import datetime
+from typing import Any, BinaryIO, Dict, List, Optional, Union
+from urllib.parse import urlparse
+
+import httpx
+
+from .metrics import stage_timer
+
+DEFAULT_API_URL = "https://api.tineye.com/rest/"
+
+# Max unique results returned to the app per search
+MAX_RESULTS = 50
+
+
+class TinEyeAPIError(Exception):
+    """Error reported by the TinEye API (code is the HTTP-style status TinEye returns)."""
+
+    def __init__(self, code: int, messages: Optional[List[str]] = None):
+        self.code = code
+        self.messages = messages or []
+        super().__init__(f"TinEye API error {code}: {'; '.join(str(m) for m in self.messages) or 'no details'}")
+
+
+def _format_crawl_date(value: Optional[str]) -> Optional[str]:
+    """TinEye crawl dates are 'YYYY-MM-DD'; return ISO format like the app expects."""
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").isoformat()
+    except ValueError:
+        return None
+
+
+def parse_search_response(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Turn a TinEye search payload into our standard result format.
+
+    Each match can have multiple backlinks (pages where the image appears);
+    results are flattened to one entry per page, de-duplicated by page URL.
+    """
+    results = []
+    seen_urls = set()
+    total_backlinks = 0
+
+    matches = (payload.get("results") or {}).get("matches") or []
+    for match in matches:
+        backlinks = match.get("backlinks") or []
+        total_backlinks += len(backlinks)
+
+        for backlink in backlinks:
+            page_url = backlink.get("url") or ""
+            if not page_url or page_url in seen_urls:
+                continue
+            seen_urls.add(page_url)
+
+            results.append({
+                "domain": urlparse(page_url).netloc or "Unknown",
+                "page_url": page_url,
+                "image_url": backlink.get("backlink") or "",
+                "crawl_date": _format_crawl_date(backlink.get("crawl_date")),
+            })
+
+    stats = payload.get("stats") or {}
+    return {
+        "total_matches": stats.get("total_results", len(matches)),
+        "total_backlinks": stats.get("total_backlinks", total_backlinks),
+        "results": results[:MAX_RESULTS],
+        "stats": stats,
+    }
+
+
+class TinEyeClient:
+    """
+    Minimal async TinEye REST client.
+
+    The httpx client is shared (connection pooling is the caller's concern);
+    this class only builds requests and parses responses.
+    """
+
+    def __init__(self, http_client: httpx.AsyncClient, api_key: str, api_url: str = DEFAULT_API_URL):
+        self._http = http_client
+        self.api_key = api_key
+        self.api_url = api_url.rstrip("/") + "/"
+
+    async def _request(
+        self,
+        method: str,
+        endpoint: str,
+        params: Optional[Dict[str, Any]] = None,
+        files: Optional[Dict[str, Any]] = None,
+        timeout: Optional[float] = None,
+    ) -> Dict[str, Any]:
+        """
+        Call one API endpoint and return the parsed JSON payload.
+
+        Raises:
+            TinEyeAPIError: If TinEye reports an error or the body isn't JSON
+            httpx.HTTPError: On transport errors
+        """
+        response = await self._http.request(
+            method,
+            f"{self.api_url}{endpoint}/",
+            params=params if files is None else None,
+            data=params if files is not None else None,
+            files=files,
+            headers={"x-api-key": self.api_key, "Accept": "application/json"},
+            timeout=timeout if timeout is not None else httpx.USE_CLIENT_DEFAULT,
+        )
+
+        try:
+            payload = json.loads(response.content)
+        except ValueError as e:
+            raise TinEyeAPIError(response.status_code if response.status_code != 200 else 500,
+                                 [f"Could not decode JSON: {e}"])
+
+        code = payload.get("code", response.status_code)
+        if response.status_code != 200 or code != 200:
+            raise TinEyeAPIError(code, payload.get("messages"))
+
+        return payload
+
+    @staticmethod
+    def _search_params(offset: int, limit: int, sort: str, order: str) -> Dict[str, Any]:
+        return {"offset": offset, "limit": limit, "sort": sort, "order": order}
+
+    async def search_data(
+        self,
+        data: Union[bytes, BinaryIO],
+        offset: int = 0,
+        limit: int = 100,
+        sort: str = "score",
+        order: str = "desc",
+        timeout: Optional[float] = None,
+    ) -> Dict[str, Any]:
+        """
+        Search using image bytes or an open binary file (multipart upload).
+
+        Returns:
+            Dict with total_matches, total_backlinks, results, stats
+        """
+        payload = await self._request(
+            "POST",
+            "search",
+            params=self._search_params(offset, limit, sort, order),
+            files={"image_upload": ("image.jpg", data)},
+            timeout=timeout,
+        )
+        with stage_timer("transform", "tineye"):
+            return parse_search_response(payload)
+
+    async def search_url(
+        self,
+        url: str,
+        offset: int = 0,
+        limit: int = 100,
+        sort: str = "score",
+        order: str = "desc",
+        timeout: Optional[float] = None,
+    ) -> Dict[str, Any]:
+        """
+        Search using a public image URL.
+
+        Returns:
+            Dict with total_matches, total_backlinks, results, stats
+        """
+        params = self._search_params(offset, limit, sort, order)
+        params["image_url"] = url
+        payload = await self._request("GET", "search", params=params, timeout=timeout)
+        with stage_timer("transform", "tineye"):
+            return parse_search_response(payload)
+
+    async def remaining_searches(self, timeout: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Search bundle balance.
+
+        Returns:
+            Dict with 'bundles' (remaining_searches, start_date, expire_date as
+            returned by TinEye) and 'total_remaining_searches'
+        """
+        payload = await self._request("GET", "remaining_searches", timeout=timeout)
+        results = payload.get("results") or {}
+        return {
+            "bundles": results.get("bundles") or [],
+            "total_remaining_searches": results.get("total_remaining_searches"),
+        }
@@ -0,0 +1,238 @@
+"""
+TinEye Search Quota Cache
+
+Keeps the TinEye search bundle balance in memory so the quota endpoints
+(/api/image-search/remaining, /api/image-search/test) and health probes
+answer instantly instead of calling TinEye's remaining_searches API each time.
+
+- A background task refreshes the real balance every TINEYE_QUOTA_REFRESH_SECONDS
+- Each successful TinEye search decrements the cached value locally, so it
+  stays close between refreshes (the next refresh corrects any drift, e.g.
+  searches made by other workers)
+- When the balance drops below TINEYE_QUOTA_LOW_THRESHOLD a warning is logged
+  once and counted in pinkflag_low_quota_alerts_total (re-armed after the
+  bundle is topped up)
+- While TinEye is down or not configured, get() doesn't refetch on every
+  call: after a failed fetch it answers None for TINEYE_QUOTA_RETRY_SECONDS
+  (the background task keeps retrying on its own schedule)
+
+Usage:
+    quota = get_tineye_quota()
+    await quota.start()            # In app lifespan startup
+    remaining = await quota.get()  # Cached value (fetched once if unknown)
+    quota.decrement()              # After a successful search
+    await quota.stop()             # In app lifespan shutdown
+"""
+
+import asyncio
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from .metrics import LOW_QUOTA_ALERTS
+from .structured_log import get_logger
+
+logger = get_logger(__name__)
+
+# How often the real balance is fetched from TinEye (seconds)
+TINEYE_QUOTA_REFRESH_SECONDS = float(os.getenv("TINEYE_QUOTA_REFRESH_SECONDS", "300"))
+
+# Log an alert when fewer searches than this remain
+TINEYE_QUOTA_LOW_THRESHOLD = int(os.getenv("TINEYE_QUOTA_LOW_THRESHOLD", "100"))
+
+# After a failed fetch, get() returns None without fetching for this long (seconds)
+TINEYE_QUOTA_RETRY_SECONDS = float(os.getenv("TINEYE_QUOTA_RETRY_SECONDS", "30"))
+
+# Timeout for one remaining_searches call (seconds)
+TINEYE_QUOTA_TIMEOUT = 10.0
+
+
+async def _fetch_remaining() -> int:
+    """Fetch the real balance from TinEye (raises if not configured or unreachable)."""
+    from .provider_registry import get_provider_registry
+
+    response = await get_provider_registry().tineye_service.api.remaining_searches(
+        timeout=TINEYE_QUOTA_TIMEOUT
+    )
+    remaining = response["total_remaining_searches"]
+    if remaining is None:
+        raise ValueError("TinEye response has no total_remaining_searches")
+    return int(remaining)
+
+
+class TinEyeQuota:
+    """In-memory TinEye balance with a background refresher and local decrements."""
+
+    def __init__(
+        self,
+        fetch_fn: Callable[[], Awaitable[int]] = _fetch_remaining,
+        refresh_interval: float = TINEYE_QUOTA_REFRESH_SECONDS,
+        low_threshold: int = TINEYE_QUOTA_LOW_THRESHOLD,
+        retry_after: float = TINEYE_QUOTA_RETRY_SECONDS,
+    ):
+        """
+        Args:
+            fetch_fn: Coroutine returning the real remaining search count
+            refresh_interval: Seconds between background refreshes
+            low_threshold: Balance below which a low-quota alert fires
+            retry_after: Seconds get() waits after a failed fetch before fetching again
+        """
+        self._fetch_fn = fetch_fn
+        self.refresh_interval = refresh_interval
+        self.low_threshold = low_threshold
+        self.retry_after = retry_after
+
+        self._remaining: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._refresh_lock = asyncio.Lock()
+        self._low_alerted = False
+
+        # Metrics
+        self._refreshes = 0
+        self._failed_refreshes = 0
+        self._local_decrements = 0
+        self._low_quota_alerts = 0
+        self._last_refresh_at: Optional[float] = None
+        self._last_failure_at: Optional[float] = None  # time.monotonic()
+        self._skipped_fetches = 0
+        self._last_error: Optional[str] = None
+        self._last_drift: Optional[int] = None
+
+    @property
+    def running(self) -> bool:
+        """True while the background refresh task is active."""
+        return self._task is not None and not self._task.done()
+
+    @property
+    def remaining(self) -> Optional[int]:
+        """Cached balance (None until the first successful refresh)."""
+        return self._remaining
+
+    async def get(self) -> Optional[int]:
+        """
+        Cached balance; fetched if it isn't known yet.
+
+        Returns:
+            Remaining searches, or None if TinEye has never answered (without
+            fetching again if the last fetch failed under retry_after seconds ago)
+        """
+        if self._remaining is None:
+            if self._last_failure_at is not None and time.monotonic() - self._last_failure_at < self.retry_after:
+                self._skipped_fetches += 1
+            else:
+                await self.refresh()
+        return self._remaining
+
+    def decrement(self, count: int = 1) -> None:
+        """Account for searches made since the last refresh."""
+        if self._remaining is None:
+            return
+        self._remaining = max(0, self._remaining - count)
+        self._local_decrements += count
+        self._check_low()
+
+    async def refresh(self) -> bool:
+        """
+        Replace the cached balance with the real one.
+
+        Concurrent callers share one in-flight fetch.
+
+        Returns:
+            bool: True if the balance was fetched
+        """
+        if self._refresh_lock.locked():
+            # Someone is already fetching - wait for their answer
+            async with self._refresh_lock:
+                return self._last_error is None
+
+        async with self._refresh_lock:
+            try:
+                remaining = await self._fetch_fn()
+            except Exception as e:
+                self._failed_refreshes += 1
+                self._last_failure_at = time.monotonic()
+                self._last_error = str(e) or type(e).__name__
+                logger.warning("tineye quota refresh failed", error=self._last_error)
+                return False
+
+            if self._remaining is not None:
+                self._last_drift = self._remaining - remaining
+            self._remaining = remaining
+            self._last_error = None
+            self._last_failure_at = None
+            self._refreshes += 1
+            self._last_refresh_at = time.time()
+            self._check_low()
+            return True
+
+    def _check_low(self) -> None:
+        """Fire the low-quota alert once per drop below the threshold."""
+        if self._remaining is None:
+            return
+
+        if self._remaining < self.low_threshold:
+            if not self._low_alerted:
+                self._low_alerted = True
+                self._low_quota_alerts += 1
+                LOW_QUOTA_ALERTS.inc("tineye")
+                logger.warning("tineye search quota low", remaining=self._remaining, threshold=self.low_threshold)
+        else:
+            self._low_alerted = False
+
+    async def start(self) -> None:
+        """Start the background refresh task."""
+        if not self.running:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the background refresh task."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        """Refresh immediately, then every refresh_interval seconds."""
+        while True:
+            await self.refresh()
+            await asyncio.sleep(self.refresh_interval)
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Return the cached balance and refresh statistics."""
+        return {
+            "remaining_searches": self._remaining,
+            "low_quota": self._low_alerted,
+            "low_threshold": self.low_threshold,
+            "running": self.running,
+            "refresh_interval_seconds": self.refresh_interval,
+            "refreshes_total": self._refreshes,
+            "failed_refreshes_total": self._failed_refreshes,
+            "skipped_fetches_total": self._skipped_fetches,
+            "local_decrements_total": self._local_decrements,
+            "low_quota_alerts_total": self._low_quota_alerts,
+            "last_refresh_at": self._last_refresh_at,
+            "last_refresh_drift": self._last_drift,
+            "last_error": self._last_error,
+        }
+
+
+# Singleton instance
+_tineye_quota: Optional[TinEyeQuota] = None
+
+
+def get_tineye_quota() -> TinEyeQuota:
+    """
+    Get or create the singleton TinEyeQuota.
+
+    Returns:
+        TinEyeQuota: Shared quota cache
+    """
+    global _tineye_quota
+
+    if _tineye_quota is None:
+        _tineye_quota = TinEyeQuota()
+
+    return _tineye_quota
@@ -9,12 +9,33 @@ Usage:
 - search_by_url(): Search using an image URL
 
 Returns structured results with domains, URLs, and crawl dates where the image was found.
+
+Calls go through the native async TinEyeClient (services/tineye_client.py) on
+the registry's pooled 'tineye' httpx client, so an in-flight search holds a
+pooled connection, not a thread. Searches run under the 'tineye' circuit
+breaker (services/circuit_breaker.py): adaptive timeout from observed
+latency, fail fast while TinEye is down. Each successful search decrements
+the cached bundle balance (services/tineye_quota.py).
 """
 
 import os
-from typing import List, Dict, Any, Optional
-from urllib.parse import urlparse
-from pytineye import TinEyeAPIRequest
+from typing import BinaryIO, Dict, Any, Optional, Union, TYPE_CHECKING
+
+from .circuit_breaker import CircuitOpenError, get_circuit_breaker
+from .tineye_client import DEFAULT_API_URL, TinEyeClient
+from .tineye_quota import get_tineye_quota
+from .structured_log import get_logger
+
+if TYPE_CHECKING:
+    from .provider_registry import ProviderRegistry
+
+logger = get_logger(__name__)
+
+# Upper bound for one search (seconds)
+TINEYE_TIMEOUT = 60.0
+
+# Override for local stub servers / benchmarks
+TINEYE_API_URL = os.getenv("TINEYE_API_URL", DEFAULT_API_URL)
 
 
 class TinEyeService:
@@ -28,39 +49,54 @@ class TinEyeService:
     - Scam profiles using others' images
     """
 
-    def __init__(self):
+    def __init__(self, registry: Optional["ProviderRegistry"] = None):
         self.api_key = os.getenv("TINEYE_API_KEY")
-        self.api_url = "https://api.tineye.com/rest/"
+        self.api_url = TINEYE_API_URL
 
         if not self.api_key:
             raise ValueError("TINEYE_API_KEY not configured in environment")
 
-        # Initialize TinEye API client
-        self.api = TinEyeAPIRequest(
-            api_url=self.api_url,
-            api_key=self.api_key
-        )
+        self._registry = registry
+        self.breaker = get_circuit_breaker("tineye", max_timeout=TINEYE_TIMEOUT)
 
-    async def search_by_image_data(self, image_data: bytes) -> Dict[str, Any]:
+    @property
+    def api(self) -> TinEyeClient:
+        """TinEye client on the current pooled connection (re-created if the pool was closed)."""
+        if self._registry is None:
+            from .provider_registry import get_provider_registry
+            self._registry = get_provider_registry()
+        return TinEyeClient(self._registry.http_client("tineye"), self.api_key, self.api_url)
+
+    def is_available(self) -> bool:
+        """False while the TinEye circuit breaker is open (checked before credits are deducted)."""
+        return self.breaker.is_available()
+
+    async def search_by_image_data(self, image_data: Union[bytes, BinaryIO]) -> Dict[str, Any]:
         """
         Search TinEye using raw image data (file upload).
 
         Args:
-            image_data: Raw bytes of the image file
+            image_data: Raw bytes of the image file, or an open binary file
+                (streamed to TinEye in chunks)
 
         Returns:
             Dictionary containing:
             - total_matches: Number of matches found
+            - total_backlinks: Number of pages the image appears on
             - results: List of match details (domain, URLs, dates)
-            - query_hash: Hash of the searched image
+            - stats: Raw TinEye search stats
         """
         try:
-            # TinEye's pytineye library is synchronous, so we call it directly
-            # In production, consider running in thread pool for true async
-            response = self.api.search_data(data=image_data)
-            return self._transform_response(response)
+            api = self.api
+            result = await self.breaker.call(
+                lambda: api.search_data(data=image_data, timeout=TINEYE_TIMEOUT)
+            )
+            get_tineye_quota().decrement()
+            return result
+        except CircuitOpenError:
+            raise
         except Exception as e:
-            print(f"TinEye search error: {e}")
+            logger.warning("tineye search failed", error=e)
             raise Exception(f"Image search failed: {str(e)}")
 
     async def search_by_url(self, image_url: str) -> Dict[str, Any]:
@@ -74,73 +110,28 @@ class TinEyeService:
             Dictionary containing match results
         """
         try:
-            response = self.api.search_url(url=image_url)
-            return self._transform_response(response)
+            api = self.api
+            result = await self.breaker.call(
+                lambda: api.search_url(url=image_url, timeout=TINEYE_TIMEOUT)
+            )
+            get_tineye_quota().decrement()
+            return result
+        except CircuitOpenError:
+            raise
         except Exception as e:
-            print(f"TinEye URL search error: {e}")
+            logger.warning("tineye url search failed", error=e)
             raise Exception(f"Image search failed: {str(e)}")
 
-    def _transform_response(self, response) -> Dict[str, Any]:
-        """
-        Transform TinEye API response into standardized format.
-
-        The TinEye response object contains matches with backlinks.
-        We extract the most useful information for the user.
-        """
-        results = []
-        total_backlinks = 0
-
-        # Process each match
-        matches = getattr(response, 'matches', []) or []
-        for match in matches:
-            # Each match can have multiple backlinks (pages where image appears)
-            backlinks = getattr(match, 'backlinks', []) or []
-            total_backlinks += len(backlinks)
-
-            for backlink in backlinks:
-                # Extract domain from URL since Backlink object doesn't have domain attribute
-                try:
-                    url = getattr(backlink, 'url', '') or ''
-                    domain = urlparse(url).netloc if url else "Unknown"
-                except Exception:
-                    domain = "Unknown"
-
-                results.append({
-                    "domain": domain,
-                    "page_url": getattr(backlink, 'url', ''),
-                    "image_url": getattr(backlink, 'backlink', ''),
-                    "crawl_date": backlink.crawl_date.isoformat() if getattr(backlink, 'crawl_date', None) else None,
-                })
-
-        # Remove duplicates by page_url while preserving order
-        seen_urls = set()
-        unique_results = []
-        for result in results:
-            if result["page_url"] and result["page_url"] not in seen_urls:
-                seen_urls.add(result["page_url"])
-                unique_results.append(result)
-
-        # Get stats from response.stats dictionary
-        stats = getattr(response, 'stats', {}) or {}
-        total_results = stats.get('total_results', len(matches))
-        total_backlinks_from_stats = stats.get('total_backlinks', total_backlinks)
-
-        return {
-            "total_matches": total_results,
-            "total_backlinks": total_backlinks_from_stats,
-            "results": unique_results[:50],  # Limit to first 50 results
-            "stats": stats
-        }
-
     async def get_remaining_searches(self) -> int:
         """
-        Get the number of remaining searches in the TinEye account.
+        Get the number of remaining searches in the TinEye account (live API call).
 
         Useful for monitoring API usage and alerting when bundle is low.
+        Endpoints should read the cached value from get_tineye_quota() instead.
         """
         try:
-            response = self.api.remaining_searches()
-            return response.remaining_searches
+            response = await self.api.remaining_searches()
+            return response["total_remaining_searches"]
         except Exception as e:
-            print(f"Error getting remaining searches: {e}")
+            logger.warning("tineye remaining searches lookup failed", error=e)
             return -1
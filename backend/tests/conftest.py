@@ -0,0 +1,107 @@
+"""
+Shared test fixtures.
+
+Provider stand-ins come from benchmarks/stubs.py and run in a real uvicorn
+server on a background thread, so services talk to them over HTTP exactly
+as they would to the real providers. The Redis-protocol stand-in runs on
+the test's own event loop; redis_server starts a real redis-server (when
+installed) to check the stand-in against.
+"""
+
+import shutil
+import socket
+import subprocess
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, AsyncIterator, Dict, Iterator, Optional
+
+import pytest
+import uvicorn
+
+from benchmarks.stubs import RespStandIn, create_app
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@contextmanager
+def serve_app(app) -> Iterator[str]:
+    """Run an ASGI app on a free local port for the duration of the block."""
+    port = free_port()
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+
+    deadline = time.monotonic() + 10
+    while not server.started:
+        if time.monotonic() > deadline or not thread.is_alive():
+            raise RuntimeError("Stub server failed to start")
+        time.sleep(0.01)
+
+    try:
+        yield f"http://127.0.0.1:{port}"
+    finally:
+        server.should_exit = True
+        thread.join(timeout=5)
+
+
+@pytest.fixture
+def stub_config() -> Optional[Dict[str, Dict[str, Any]]]:
+    """
+    Provider stand-in overrides (see benchmarks/stubs.py); defaults unless a test sets them.
+
+    Usage:
+        @pytest.mark.parametrize("stub_config", [{"supabase": {"latency_ms": 200, "jitter_ms": 0}}])
+        def test_x(stub_url):
+            ...
+    """
+    return None
+
+
+@pytest.fixture
+def stub_url(stub_config) -> Iterator[str]:
+    """Base URL of the provider stand-ins running with stub_config."""
+    with serve_app(create_app(stub_config)) as url:
+        yield url
+
+
+@pytest.fixture
+async def resp_stand_in() -> AsyncIterator[RespStandIn]:
+    """Redis-protocol stand-in listening on a free local port (server.port)."""
+    server = RespStandIn()
+    await server.start()
+    yield server
+    await server.stop()
+
+
+@pytest.fixture
+def redis_server() -> Iterator[int]:
+    """Port of a throwaway redis-server; skips the test when the binary isn't installed."""
+    binary = shutil.which("redis-server")
+    if binary is None:
+        pytest.skip("redis-server not installed")
+
+    port = free_port()
+    process = subprocess.Popen(
+        [binary, "--bind", "127.0.0.1", "--port", str(port), "--save", "", "--appendonly", "no"],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        deadline = time.monotonic() + 10
+        while True:
+            try:
+                socket.create_connection(("127.0.0.1", port), timeout=0.1).close()
+                break
+            except OSError:
+                if time.monotonic() > deadline or process.poll() is not None:
+                    raise RuntimeError("redis-server failed to start")
+                time.sleep(0.01)
+        yield port
+    finally:
+        process.terminate()
+        process.wait(timeout=5)
@@ -0,0 +1,69 @@
+"""Batch runner: bounded concurrency and refunds when the client goes away."""
+
+import asyncio
+
+from services.batch_runner import ndjson_stream, run_batch
+
+
+def _refunding_worker(started, refunded, completed):
+    """Worker shaped like the batch routers' items: refund on cancellation."""
+    async def worker(index, slot):
+        try:
+            async with slot:
+                started.append(index)
+                await asyncio.sleep(0.01 if index == 0 else 10)
+            completed.append(index)
+            return {"index": index, "status": "ok"}
+        except asyncio.CancelledError:
+            refunded.append(index)
+            raise
+
+    return worker
+
+
+async def test_concurrency_limits_items_in_flight():
+    in_flight = peak = 0
+
+    async def worker(index, slot):
+        nonlocal in_flight, peak
+        async with slot:
+            in_flight += 1
+            peak = max(peak, in_flight)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+        return {"index": index, "status": "ok"}
+
+    outcomes = [outcome async for outcome in run_batch(6, worker, concurrency=2)]
+
+    assert sorted(outcome["index"] for outcome in outcomes) == list(range(6))
+    assert peak == 2
+
+
+async def test_disconnect_refunds_queued_items_too():
+    started, refunded, completed = [], [], []
+    outcomes = run_batch(4, _refunding_worker(started, refunded, completed), concurrency=1)
+
+    first = await outcomes.__anext__()
+    await outcomes.aclose()  # Client disconnected
+
+    assert first["index"] == 0 and completed == [0]
+    # Item 1 was running; items 2-3 were still waiting for the slot
+    assert started == [0, 1]
+    assert sorted(refunded) == [1, 2, 3]
+
+
+async def test_cancelled_response_refunds_every_unfinished_item():
+    started, refunded, completed = [], [], []
+    worker = _refunding_worker(started, refunded, completed)
+
+    async def consume():
+        async for _ in ndjson_stream(run_batch(5, worker, concurrency=2)):
+            pass
+
+    response = asyncio.create_task(consume())
+    await asyncio.sleep(0.05)
+    response.cancel()
+    await asyncio.gather(response, return_exceptions=True)
+
+    assert completed == [0]
+    assert sorted(refunded) == [1, 2, 3, 4]
@@ -0,0 +1,66 @@
+"""Credit service against the Supabase PostgREST stand-in."""
+
+import asyncio
+import time
+
+import httpx
+import pytest
+from supabase import acreate_client
+
+from services.credit_service import CreditService
+
+RPC_LATENCY_MS = 300
+
+
+@pytest.fixture
+def stub_config():
+    return {"supabase": {"latency_ms": RPC_LATENCY_MS, "jitter_ms": 0}}
+
+
+async def _credit_service(base_url: str) -> CreditService:
+    service = CreditService()
+    service.supabase = await acreate_client(base_url, "test-service-role-key")
+    return service
+
+
+async def test_concurrent_deductions_overlap(stub_url):
+    service = await _credit_service(stub_url)
+
+    started = time.perf_counter()
+    results = await asyncio.gather(
+        service.check_and_deduct_credit("user-a", "name", "Jane Doe"),
+        service.check_and_deduct_credit("user-b", "name", "John Roe"),
+    )
+    elapsed = time.perf_counter() - started
+
+    assert all(result["success"] for result in results)
+    assert results[0]["search_id"] != results[1]["search_id"]
+
+    # Sequential calls would take at least two round trips
+    assert elapsed < 2 * RPC_LATENCY_MS / 1000
+
+    async with httpx.AsyncClient() as client:
+        stats = (await client.get(f"{stub_url}/stats")).json()
+    assert stats["calls"]["supabase"] == 2
+    assert stats["peak_in_flight"]["supabase"] == 2
+
+
+async def test_deduction_does_not_block_event_loop(stub_url):
+    service = await _credit_service(stub_url)
+
+    ticks = 0
+
+    async def ticker():
+        nonlocal ticks
+        while True:
+            await asyncio.sleep(0.01)
+            ticks += 1
+
+    task = asyncio.create_task(ticker())
+    try:
+        await service.check_and_deduct_credit("user-a", "phone", "+14155552671", cost=2)
+    finally:
+        task.cancel()
+
+    # The loop kept running other work while the RPC was in flight
+    assert ticks >= RPC_LATENCY_MS / 10 / 2
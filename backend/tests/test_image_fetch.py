@@ -0,0 +1,111 @@
+"""Image URL fetches connect only to the address that passed the SSRF check."""
+
+import socket
+
+import httpcore
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.responses import Response
+
+from services import image_fetch, provider_registry
+from services.image_fetch import fetch_image
+from services.provider_registry import ProviderRegistry
+from tests.conftest import serve_app
+
+PUBLIC_ADDRESS = "93.184.216.34"
+IMAGE = b"\x89PNG fake image"
+
+
+@pytest.fixture
+def image_server():
+    """Local server standing in for both the image host and an internal service."""
+    app = FastAPI()
+    app.state.hosts = []
+
+    @app.get("/photo.png")
+    async def photo(request: Request):
+        app.state.hosts.append(request.headers["host"])
+        return Response(IMAGE, media_type="image/png")
+
+    with serve_app(app) as base_url:
+        yield app, int(base_url.rsplit(":", 1)[1])
+
+
+@pytest.fixture
+async def registry(monkeypatch):
+    registry = ProviderRegistry()
+    monkeypatch.setattr(provider_registry, "_provider_registry", registry)
+    yield registry
+    await registry.aclose()
+
+
+def _fake_dns(monkeypatch, answers):
+    """Resolve hosts from a queue of answers per host (the last answer repeats)."""
+    real_getaddrinfo = socket.getaddrinfo
+    lookups = []
+
+    def getaddrinfo(host, port, *args, **kwargs):
+        if host not in answers:
+            return real_getaddrinfo(host, port, *args, **kwargs)
+        lookups.append(host)
+        queue = answers[host]
+        address = queue.pop(0) if len(queue) > 1 else queue[0]
+        return [(socket.AF_INET, socket.SOCK_STREAM, 6, "", (address, port))]
+
+    monkeypatch.setattr(socket, "getaddrinfo", getaddrinfo)
+    return lookups
+
+
+async def test_dns_rebinding_cannot_reach_internal_address(image_server, registry, monkeypatch):
+    app, port = image_server
+    # Public on the check, loopback on any later lookup
+    lookups = _fake_dns(monkeypatch, {"rebind.example": [PUBLIC_ADDRESS, "127.0.0.1"]})
+    connects = []
+
+    async def refuse(self, host, port, *args, **kwargs):
+        connects.append(host)
+        raise httpcore.ConnectError("unreachable in tests")
+
+    monkeypatch.setattr(httpcore.AnyIOBackend, "connect_tcp", refuse)
+
+    assert await fetch_image(f"http://rebind.example:{port}/photo.png") is None
+    assert connects == [PUBLIC_ADDRESS]
+    assert lookups == ["rebind.example"]
+    assert app.state.hosts == []
+
+
+async def test_fetch_connects_to_checked_address_with_original_host(image_server, registry, monkeypatch):
+    app, port = image_server
+
+    async def checked(host, port):
+        return ["127.0.0.1"] if host == "images.example" else []
+
+    # Treat the local server as the checked public address; the host itself never resolves
+    monkeypatch.setattr(image_fetch, "_public_addresses", checked)
+
+    assert await fetch_image(f"http://images.example:{port}/photo.png") == IMAGE
+    assert app.state.hosts == [f"images.example:{port}"]
+
+
+@pytest.mark.parametrize("url", [
+    "http://127.0.0.1/photo.png",
+    "http://localhost/photo.png",
+    "http://[::1]/photo.png",
+    "http://10.0.0.8/photo.png",
+    "ftp://example.com/photo.png",
+    "http:///photo.png",
+])
+async def test_non_public_urls_are_refused(url, registry, monkeypatch):
+    async def fail(*args, **kwargs):
+        raise AssertionError("no connection expected")
+
+    monkeypatch.setattr(httpcore.AnyIOBackend, "connect_tcp", fail)
+
+    assert await fetch_image(url) is None
+
+
+async def test_unpinned_host_is_never_connected(registry):
+    client = registry.http_client("image_fetch")
+
+    with pytest.raises(Exception, match="No checked address"):
+        await client.get("http://127.0.0.1:1/photo.png")
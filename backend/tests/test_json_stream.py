@@ -0,0 +1,43 @@
+"""Incremental array parsing with arbitrary chunk boundaries."""
+
+import json
+
+import pytest
+
+from services.json_stream import iter_array_items
+
+
+async def _chunks(payload: bytes, size: int):
+    for start in range(0, len(payload), size):
+        yield payload[start:start + size]
+
+
+async def _items(payload: bytes, size: int, key: str = "offenders"):
+    return [item async for item in iter_array_items(_chunks(payload, size), key)]
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 7, 1024])
+async def test_numbers_split_across_chunks_are_not_truncated(size):
+    payload = b'{"offenders": [1, 23,456 , -7.5e2, 0]}'
+
+    assert await _items(payload, size) == [1, 23, 456, -750.0, 0]
+
+
+@pytest.mark.parametrize("size", [1, 4, 1024])
+async def test_mixed_items_match_json_loads(size):
+    document = {
+        "status": "ok",
+        "offenders": [{"name": "Jane é", "age": 41}, "x", [1, 2], True, None, 12, False],
+    }
+    payload = json.dumps(document, ensure_ascii=False).encode()
+
+    assert await _items(payload, size) == document["offenders"]
+
+
+async def test_missing_key_yields_nothing():
+    assert await _items(b'{"error": "unauthorized"}', 3) == []
+
+
+async def test_truncated_array_raises():
+    with pytest.raises(ValueError):
+        await _items(b'{"offenders": [1, 2', 2)
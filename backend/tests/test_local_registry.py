@@ -0,0 +1,65 @@
+"""Local registry index: phonetic keys, exact-only lookups and state coverage."""
+
+import pytest
+
+from services.local_registry import LocalRegistry, double_metaphone, soundex
+
+
+@pytest.fixture
+def registry(tmp_path):
+    writer = LocalRegistry(str(tmp_path / "registry.db"), read_only=False)
+    writer.ingest(
+        [
+            {"id": 1, "name": "Robert Smith", "state": "CA", "zip": "94102", "age": 40},
+            {"id": 2, "first_name": "Rupert", "last_name": "Schmidt", "state": "CA"},
+            {"id": 3, "name": "JONES, Kathryn Ann", "state": "TX"},
+        ],
+        source="test",
+    )
+    yield writer
+    writer.close()
+
+
+def _names(records):
+    return [record["fullName"] for record in records]
+
+
+def test_phonetic_keys():
+    assert soundex("Robert") == soundex("Rupert") == "R163"
+    assert double_metaphone("Schmidt") == ("XMT", "SMT")
+    # Single reading: alternate repeats the primary
+    assert double_metaphone("Robert") == ("RPRT", "RPRT")
+    assert double_metaphone("O'Brien") == double_metaphone("obrien")
+    assert double_metaphone("---") == ("", "")
+
+
+def test_phonetic_lookup_ranks_exact_match_first(registry):
+    assert _names(registry.lookup("Rupert", "Schmidt")) == ["Rupert Schmidt", "Robert Smith"]
+
+
+def test_double_metaphone_matches_where_soundex_differs(registry):
+    # Catherine (C365) vs Kathryn (K365): only Double Metaphone links them
+    assert soundex("Catherine") != soundex("Kathryn")
+    assert _names(registry.lookup("Catherine", "Jones")) == ["JONES, Kathryn Ann"]
+
+
+def test_exact_only_skips_phonetic_collisions(registry):
+    assert _names(registry.lookup("Rupert", "Schmidt", exact_only=True)) == ["Rupert Schmidt"]
+    assert registry.lookup("Catherine", "Jones", exact_only=True) == []
+    assert _names(registry.lookup("robert", None, exact_only=True)) == ["Robert Smith"]
+    assert _names(registry.lookup("Robert", "Smith", zip_code="94102-1234", exact_only=True)) == ["Robert Smith"]
+
+
+def test_coverage_is_declared_per_source(registry):
+    # Rows mention CA and TX, but nothing was declared
+    assert not registry.covers("CA")
+
+    registry.ingest([], source="test", covers=["ca", " TX "])
+    assert registry.covers("CA") and registry.covers("tx")
+    assert not registry.covers("NV") and not registry.covers(None)
+
+    # A later declaration replaces the source's previous one; None keeps it
+    registry.ingest([], source="test", covers=["CA"])
+    registry.ingest([{"id": 4, "name": "Ann Lee", "state": "TX"}], source="test")
+    assert registry.covers("CA") and not registry.covers("TX")
+    assert registry.stats()["sources"]["test"]["covers"] == ["CA"]
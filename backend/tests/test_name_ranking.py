@@ -0,0 +1,32 @@
+"""Name similarity: the small-set loop and the vectorized path must agree."""
+
+import numpy as np
+
+from services import name_ranking
+from services.name_ranking import batch_similarity, rank_results
+
+CANDIDATES = ["smith", "smyth", "schmidt", "", "jones", "smithson", "a" * 40]
+
+
+def test_loop_and_vectorized_paths_agree(monkeypatch):
+    small = batch_similarity("smith", CANDIDATES)
+    monkeypatch.setattr(name_ranking, "_VECTORIZE_MIN_CANDIDATES", 0)
+    vectorized = batch_similarity("smith", CANDIDATES)
+
+    np.testing.assert_allclose(small, vectorized)
+    assert small[0] == 1.0
+    assert small[1] == 0.8
+    assert small[3] == 0.0
+
+
+def test_rank_results_orders_by_score():
+    results = [
+        {"fullName": "Jon Smyth", "age": "35", "state": "CA"},
+        {"fullName": "SMITH, JOHN", "age": "36", "state": "CA"},
+        {"fullName": "Jane Jones", "age": "60", "state": "TX"},
+    ]
+
+    ranked = rank_results(results, "John", "Smith", age="35", state="CA")
+
+    assert [r["fullName"] for r in ranked] == ["SMITH, JOHN", "Jon Smyth", "Jane Jones"]
+    assert ranked[0]["matchScore"] > ranked[1]["matchScore"] > ranked[2]["matchScore"]
@@ -0,0 +1,33 @@
+"""Phone number normalization: national vs country-code readings of bare digits."""
+
+import pytest
+
+from services.numbering_plan import InvalidPhoneNumberError, PhoneNumberLengthError, normalize_phone_number
+
+
+@pytest.mark.parametrize("raw", ["2021234567", "3125550100", "6171112222", "4951234567"])
+def test_invalid_ten_digit_us_number_is_not_reread_with_a_country_code(raw):
+    # Without the fix these became +20 (EG), +31 (NL), +61 (AU) and +49 (DE)
+    with pytest.raises(InvalidPhoneNumberError) as raised:
+        normalize_phone_number(raw)
+
+    assert not isinstance(raised.value, PhoneNumberLengthError)
+    assert "US/Canada" in str(raised.value) or "fictional" in str(raised.value)
+
+
+@pytest.mark.parametrize("raw, e164", [
+    ("(415) 555-2671", "+14155552671"),
+    ("1-415-555-2671", "+14155552671"),
+    # Wrong length for the US, so read with their own country code
+    ("447911123456", "+447911123456"),
+    ("49301234567", "+49301234567"),
+    ("+44 7911 123456", "+447911123456"),
+    ("011 44 7911 123456", "+447911123456"),
+])
+def test_valid_readings(raw, e164):
+    assert normalize_phone_number(raw).e164 == e164
+
+
+def test_length_error_when_no_reading_fits():
+    with pytest.raises(PhoneNumberLengthError):
+        normalize_phone_number("12345")
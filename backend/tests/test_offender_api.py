@@ -0,0 +1,277 @@
+"""Offender search modes (fallback, fan-out, hedge) and the local index against the provider stand-ins."""
+
+import asyncio
+import time
+
+import httpx
+import pytest
+
+from services import circuit_breaker, offender_api
+from services.local_registry import LocalRegistry
+from services.offender_api import OffenderAPIService, _merge_results
+from services.provider_registry import ProviderRegistry
+
+
+@pytest.fixture
+async def offender_service(stub_url, monkeypatch):
+    """OffenderAPIService wired to the stand-ins; fallback mode unless a test patches the mode."""
+    monkeypatch.setenv("OFFENDERS_IO_API_KEY", "test")
+    monkeypatch.setenv("CRIMEOMETER_API_KEY", "test")
+    monkeypatch.setenv("OFFENDERS_IO_API_URL", f"{stub_url}/offenders_io")
+    monkeypatch.setenv("CRIMEOMETER_API_URL", f"{stub_url}/crimeometer/v1")
+    monkeypatch.setattr(offender_api, "OFFENDER_SEARCH_MODE", "fallback")
+    monkeypatch.setattr(offender_api, "OFFENDER_PROVIDER_ORDER", ["offenders_io", "crimeometer"])
+    monkeypatch.setattr(offender_api, "OFFENDER_HEDGE_DELAYS", {})
+    # Fresh breakers so latency samples don't leak between tests
+    monkeypatch.setattr(circuit_breaker, "_breakers", {})
+
+    registry = ProviderRegistry()
+    yield OffenderAPIService(registry=registry)
+    await registry.aclose()
+
+
+async def _stub_stats(base_url):
+    async with httpx.AsyncClient() as client:
+        return (await client.get(f"{base_url}/stats")).json()
+
+
+# ==================== MERGING ====================
+
+def test_merge_drops_cross_provider_duplicates_only():
+    primary = [
+        {"id": "a1", "fullName": "Jane Doe", "age": 40, "state": "CA"},
+        # Same name/age/state from the same provider: a different person, kept
+        {"id": "a2", "fullName": "Jane Doe", "age": "40", "state": "CA"},
+    ]
+    secondary = [
+        {"id": "b1", "fullName": "  jane   DOE ", "age": "40", "state": "ca"},  # Duplicate of a1 ("40" vs 40)
+        {"id": "a1", "fullName": "Renamed", "age": "41", "state": "NV"},       # Same provider id
+        {"id": "b2", "fullName": "Jane Doe", "age": "52", "state": "CA"},      # Different age
+    ]
+
+    merged = _merge_results([primary, secondary])
+
+    assert [record["id"] for record in merged] == ["a1", "a2", "b2"]
+
+
+@pytest.mark.parametrize("stub_config", [{
+    "offenders_io": {"latency_ms": 50, "jitter_ms": 0, "records": 5},
+    "crimeometer": {"latency_ms": 50, "jitter_ms": 0, "records": 8},
+}])
+async def test_fanout_merges_both_providers(offender_service, stub_url, monkeypatch):
+    monkeypatch.setattr(offender_api, "OFFENDER_SEARCH_MODE", "fanout")
+
+    results = await offender_service.search_by_name("Jane", "Doe", zip_code="94102")
+
+    # Stand-in records 0-4 are the same people on both providers; 5-7 only on CrimeoMeter
+    assert len(results) == 8
+    stats = await _stub_stats(stub_url)
+    assert stats["calls"] == {"offenders_io": 1, "crimeometer": 1}
+    assert stats["peak_in_flight"] == {"offenders_io": 1, "crimeometer": 1}
+
+
+@pytest.mark.parametrize("stub_config", [{
+    "offenders_io": {"latency_ms": 30, "jitter_ms": 0, "records": 4},
+    "crimeometer": {"latency_ms": 3000, "jitter_ms": 0},
+}])
+async def test_fanout_deadline_cancels_slow_provider(offender_service, monkeypatch):
+    monkeypatch.setattr(offender_api, "OFFENDER_SEARCH_MODE", "fanout")
+    monkeypatch.setattr(offender_api, "OFFENDER_FANOUT_DEADLINE", 0.3)
+
+    started = time.perf_counter()
+    results = await offender_service.search_by_name("Jane", "Doe", zip_code="94102")
+
+    assert time.perf_counter() - started < 1.0
+    assert len(results) == 4
+
+
+@pytest.mark.parametrize("stub_config", [{
+    "offenders_io": {"latency_ms": 3000, "jitter_ms": 0},
+    "crimeometer": {"latency_ms": 3000, "jitter_ms": 0},
+}])
+async def test_fanout_cancelled_caller_cancels_provider_calls(offender_service, stub_url, monkeypatch):
+    monkeypatch.setattr(offender_api, "OFFENDER_SEARCH_MODE", "fanout")
+
+    search = asyncio.create_task(offender_service.search_by_name("Jane", "Doe", zip_code="94102"))
+    deadline = time.monotonic() + 2
+    while (await _stub_stats(stub_url))["in_flight"] != {"offenders_io": 1, "crimeometer": 1}:
+        assert time.monotonic() < deadline, "provider calls never started"
+        await asyncio.sleep(0.02)
+
+    # Client disconnected / batch item refunded
+    search.cancel()
+    await asyncio.gather(search, return_exceptions=True)
+
+    deadline = time.monotonic() + 1
+    while (stats := await _stub_stats(stub_url))["in_flight"]:
+        assert time.monotonic() < deadline, f"provider calls still running: {stats['in_flight']}"
+        await asyncio.sleep(0.02)
+    assert stats["cancelled"] == {"offenders_io": 1, "crimeometer": 1}
+
+
+@pytest.mark.parametrize("stub_config", [{"offenders_io": {"latency_ms": 10, "jitter_ms": 0, "records": 12}}])
+async def test_result_cap_keeps_closest_names_not_first_received(offender_service):
+    service_filter = offender_api.ResultFilter(limit=4, first_name="Jane", last_name="Doe")
+
+    # Stand-in records 0, 3, 6, 9 are "J. Doe"; the rest are exact "Jane Doe"
+    results = await offender_service._search_offenders_io("Jane", "Doe", None, None, result_filter=service_filter)
+
+    assert [record["fullName"] for record in results] == ["Jane Doe"] * 4
+    assert [record["age"] for record in results] == [26, 27, 29, 30]  # Response order kept
+
+
+def test_name_score_prefers_exact_names():
+    result_filter = offender_api.ResultFilter(first_name="Jane", last_name="Doe")
+
+    scores = [
+        result_filter.name_score({"fullName": name})
+        for name in ("Jane Doe", "DOE, JANE A", "J. Doe", "John Doe", "Jane Roe", "")
+    ]
+
+    assert scores == [6, 6, 5, 5, 2, 0]
+    assert result_filter.best_score == 6
+    assert offender_api.ResultFilter().name_score({"fullName": "Jane Doe"}) == 0
+
+
+# ==================== HEDGING ====================
+
+@pytest.mark.parametrize("stub_config", [{
+    "offenders_io": {"latency_ms": 2000, "jitter_ms": 0},
+    "crimeometer": {"latency_ms": 50, "jitter_ms": 0, "records": 3},
+}])
+async def test_hedge_starts_next_provider_after_delay(offender_service, stub_url, monkeypatch):
+    monkeypatch.setattr(offender_api, "OFFENDER_SEARCH_MODE", "hedge")
+    monkeypatch.setattr(offender_api, "OFFENDER_HEDGE_DELAYS", {"offenders_io": 0.2})
+
+    started = time.perf_counter()
+    results = await offender_service.search_by_name("Jane", "Doe", zip_code="94102")
+    elapsed = time.perf_counter() - started
+
+    # Hedge delay + CrimeoMeter latency, not the 2s primary
+    assert 0.2 <= elapsed < 1.0
+    assert len(results) == 3
+    assert (await _stub_stats(stub_url))["calls"] == {"offenders_io": 1, "crimeometer": 1}
+
+
+@pytest.mark.parametrize("stub_config", [{
+    "offenders_io": {"latency_ms": 30, "jitter_ms": 0, "records": 6},
+    "crimeometer": {"latency_ms": 30, "jitter_ms": 0},
+}])
+async def test_hedge_not_sent_when_primary_is_fast(offender_service, stub_url, monkeypatch):
+    monkeypatch.setattr(offender_api, "OFFENDER_SEARCH_MODE", "hedge")
+    monkeypatch.setattr(offender_api, "OFFENDER_HEDGE_DELAYS", {"offenders_io": 0.5})
+
+    results = await offender_service.search_by_name("Jane", "Doe", zip_code="94102")
+
+    assert len(results) == 6
+    assert (await _stub_stats(stub_url))["calls"] == {"offenders_io": 1}
+
+
+@pytest.mark.parametrize("stub_config", [{
+    "offenders_io": {"latency_ms": 20, "jitter_ms": 0, "error_rate": 1.0},
+    "crimeometer": {"latency_ms": 20, "jitter_ms": 0, "records": 2},
+}])
+async def test_hedge_moves_on_immediately_when_primary_fails(offender_service, stub_url, monkeypatch):
+    monkeypatch.setattr(offender_api, "OFFENDER_SEARCH_MODE", "hedge")
+    monkeypatch.setattr(offender_api, "OFFENDER_HEDGE_DELAYS", {"offenders_io": 5.0})
+
+    started = time.perf_counter()
+    results = await offender_service.search_by_name("Jane", "Doe", zip_code="94102")
+
+    assert time.perf_counter() - started < 1.0
+    assert len(results) == 2
+
+
+async def test_hedge_delay_uses_per_provider_override_then_default(offender_service, monkeypatch):
+    monkeypatch.setattr(offender_api, "OFFENDER_HEDGE_DELAYS", {"offenders_io": 0.75})
+    monkeypatch.setattr(offender_api, "OFFENDER_HEDGE_DEFAULT_DELAY", 1.25)
+
+    assert offender_service._hedge_delay("offenders_io") == 0.75
+    # No override and too few latency samples yet
+    assert offender_service._hedge_delay("crimeometer") == 1.25
+
+
+# ==================== PER-PROVIDER CONFIG ====================
+
+@pytest.mark.parametrize("stub_config", [{
+    "offenders_io": {"latency_ms": 10, "jitter_ms": 0},
+    "crimeometer": {"latency_ms": 10, "jitter_ms": 0, "records": 3},
+}])
+async def test_provider_order_controls_fallback_primary(offender_service, stub_url, monkeypatch):
+    monkeypatch.setattr(offender_api, "OFFENDER_PROVIDER_ORDER", ["crimeometer", "offenders_io"])
+
+    results = await offender_service.search_by_name("Jane", "Doe", zip_code="94102")
+
+    assert len(results) == 3
+    assert (await _stub_stats(stub_url))["calls"] == {"crimeometer": 1}
+
+
+@pytest.mark.parametrize("stub_config", [{"offenders_io": {"latency_ms": 10, "jitter_ms": 0, "records": 2}}])
+async def test_crimeometer_skipped_without_zip(offender_service, stub_url, monkeypatch):
+    monkeypatch.setattr(offender_api, "OFFENDER_SEARCH_MODE", "fanout")
+
+    results = await offender_service.search_by_name("Jane", "Doe")
+
+    assert len(results) == 2
+    assert (await _stub_stats(stub_url))["calls"] == {"offenders_io": 1}
+
+
+# ==================== LOCAL REGISTRY ====================
+
+@pytest.fixture
+def local_index(tmp_path, monkeypatch):
+    """Partial index: only California's registry has been ingested."""
+    registry = LocalRegistry(str(tmp_path / "registry.db"), read_only=False)
+    registry.ingest([{"id": 1, "name": "Robert Smith", "state": "CA"}], source="ca", covers=["CA"])
+    monkeypatch.setattr(offender_api, "get_local_registry", lambda: registry)
+    yield registry
+    registry.close()
+
+
+async def test_local_exact_match_in_covered_state_skips_paid_providers(offender_service, stub_url, local_index):
+    results = await offender_service.search_by_name("Robert", "Smith", state="CA")
+
+    assert [record["id"] for record in results] == ["ca:1"]
+    assert (await _stub_stats(stub_url))["calls"] == {}
+
+
+@pytest.mark.parametrize("stub_config", [{"offenders_io": {"latency_ms": 10, "jitter_ms": 0, "records": 2}}])
+async def test_partial_index_merges_local_and_provider_records(offender_service, stub_url, local_index):
+    # No state given: registrants outside California only come from the providers
+    results = await offender_service.search_by_name("Robert", "Smith")
+
+    ids = [record["id"] for record in results]
+    assert ids[0] == "ca:1"
+    assert len(ids) == 3
+    assert (await _stub_stats(stub_url))["calls"] == {"offenders_io": 1}
+
+
+@pytest.mark.parametrize("stub_config", [{"offenders_io": {"latency_ms": 10, "jitter_ms": 0, "records": 2}}])
+async def test_local_match_without_declared_coverage_still_queries_providers(offender_service, stub_url, local_index):
+    # A second source has TX rows but declares no coverage
+    local_index.ingest([{"id": 7, "name": "Robert Smith", "state": "TX"}], source="tx")
+
+    results = await offender_service.search_by_name("Robert", "Smith", state="TX")
+
+    ids = [record["id"] for record in results]
+    assert ids[0] == "tx:7" and len(ids) > 1
+    assert (await _stub_stats(stub_url))["calls"] == {"offenders_io": 1}
+
+
+@pytest.mark.parametrize("stub_config", [{"offenders_io": {"latency_ms": 10, "jitter_ms": 0, "records": 2}}])
+async def test_local_phonetic_match_falls_through_to_providers(offender_service, stub_url, local_index):
+    # Same Soundex codes as Robert Smith, but a different person
+    results = await offender_service.search_by_name("Rupert", "Schmidt")
+
+    assert len(results) == 2
+    assert "ca:1" not in [record["id"] for record in results]
+    assert (await _stub_stats(stub_url))["calls"] == {"offenders_io": 1}
+
+
+async def test_authoritative_local_index_returns_phonetic_matches(offender_service, stub_url, local_index, monkeypatch):
+    monkeypatch.setattr(offender_api, "LOCAL_REGISTRY_AUTHORITATIVE", True)
+
+    results = await offender_service.search_by_name("Rupert", "Schmidt")
+
+    assert [record["id"] for record in results] == ["ca:1"]
+    assert (await _stub_stats(stub_url))["calls"] == {}
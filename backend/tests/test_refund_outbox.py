@@ -0,0 +1,58 @@
+"""Refund outbox: final drain on shutdown."""
+
+import asyncio
+import time
+
+from services.refund_outbox import RefundOutbox
+
+
+async def test_stop_applies_queued_refunds_before_closing(tmp_path):
+    applied = []
+
+    async def apply(user_id, search_id, reason, amount):
+        applied.append(search_id)
+        return {"success": True}
+
+    outbox = RefundOutbox(apply_fn=apply, path=str(tmp_path / "outbox.db"), batch_size=2)
+    for index in range(5):
+        await outbox.enqueue("user-1", f"search-{index}", "api_error_500", amount=1)
+
+    # Worker never ran (machine stopping right after the requests)
+    await outbox.stop()
+
+    assert sorted(applied) == [f"search-{index}" for index in range(5)]
+    reopened = RefundOutbox(apply_fn=apply, path=str(tmp_path / "outbox.db"))
+    assert (await reopened.get_metrics())["pending"] == 0
+    await reopened.stop(drain_seconds=0)
+
+
+async def test_stop_drain_is_bounded_and_keeps_unapplied_refunds(tmp_path):
+    async def hanging(user_id, search_id, reason, amount):
+        await asyncio.sleep(60)
+
+    outbox = RefundOutbox(apply_fn=hanging, path=str(tmp_path / "outbox.db"))
+    await outbox.enqueue("user-1", "search-1", "api_error_500", amount=1)
+
+    started = time.perf_counter()
+    await outbox.stop(drain_seconds=0.1)
+
+    assert time.perf_counter() - started < 1.0
+    reopened = RefundOutbox(apply_fn=hanging, path=str(tmp_path / "outbox.db"))
+    assert (await reopened.get_metrics())["pending"] == 1
+    await reopened.stop(drain_seconds=0)
+
+
+async def test_stop_drain_does_not_spin_on_failing_refunds(tmp_path):
+    attempts = []
+
+    async def failing(user_id, search_id, reason, amount):
+        attempts.append(search_id)
+        return {"success": False, "error": "database unavailable"}
+
+    outbox = RefundOutbox(apply_fn=failing, path=str(tmp_path / "outbox.db"))
+    await outbox.enqueue("user-1", "search-1", "api_error_500", amount=1)
+
+    await outbox.stop(drain_seconds=2.0)
+
+    # One attempt, then the entry backs off and stays pending for the next start
+    assert attempts == ["search-1"]
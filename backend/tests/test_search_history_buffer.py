@@ -0,0 +1,49 @@
+"""Search history write-behind buffer."""
+
+import asyncio
+
+from services.search_history_buffer import SearchHistoryBuffer
+
+
+async def test_failed_flush_requeues_before_newer_updates_and_trims_oldest():
+    release = asyncio.Event()
+
+    async def failing_flush(rows):
+        await release.wait()
+        raise RuntimeError("database unavailable")
+
+    buffer = SearchHistoryBuffer(flush_fn=failing_flush, batch_size=100, max_pending=4)
+    for index in range(3):
+        buffer.enqueue(f"old-{index}", results_count=index, search_type="name")
+
+    flush = asyncio.create_task(buffer.flush())
+    await asyncio.sleep(0)  # Batch taken, flush in progress
+
+    buffer.enqueue("new-0", results_count=10)
+    buffer.enqueue("new-1", results_count=11)
+    buffer.enqueue("old-1", results_count=99)  # Newer update for a search in the failed batch
+    release.set()
+    assert await flush == 0
+
+    # Oldest failed row is dropped first; the newer updates all survive
+    assert list(buffer._pending) == ["old-2", "new-0", "new-1", "old-1"]
+    assert buffer._pending["old-1"] == {"id": "old-1", "results_count": 99, "search_type": "name"}
+    assert buffer.get_metrics()["dropped_total"] == 1
+
+
+async def test_flush_writes_latest_update_per_search():
+    written = []
+
+    async def flush_fn(rows):
+        written.extend(rows)
+
+    buffer = SearchHistoryBuffer(flush_fn=flush_fn, batch_size=100)
+    buffer.enqueue("a", results_count=1)
+    buffer.enqueue("b", results_count=2)
+    buffer.enqueue("a", results_count=3, search_type="phone")
+
+    assert await buffer.flush() == 2
+    assert written == [
+        {"id": "b", "results_count": 2},
+        {"id": "a", "results_count": 3, "search_type": "phone"},
+    ]
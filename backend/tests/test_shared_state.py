@@ -0,0 +1,259 @@
+"""Shared state backend against the Redis-protocol stand-in: GCRA script, pipelining, near-cache fallback.
+
+The stand-in runs a Python port of the GCRA script; one test checks it against
+the real Lua on redis-server when that is installed.
+"""
+
+import asyncio
+import time
+
+import pytest
+from fastapi import HTTPException
+from starlette.requests import Request
+
+from benchmarks.stubs import RespStandIn
+from middleware import rate_limit
+from middleware.rate_limit import RateLimiter
+from services import result_cache
+from services.result_cache import ResultCache
+from services.shared_state import RedisBackend, SharedStateError, SharedStateUnavailable
+
+
+@pytest.fixture
+def backend_options():
+    """RedisBackend keyword arguments; tests override with @pytest.mark.parametrize."""
+    return {}
+
+
+@pytest.fixture
+async def backend(resp_stand_in, backend_options):
+    """RedisBackend connected to the stand-in."""
+    backend = RedisBackend(f"redis://127.0.0.1:{resp_stand_in.port}", **backend_options)
+    yield backend
+    await backend.close()
+
+
+@pytest.fixture
+async def second_backend(resp_stand_in):
+    """Another app instance's connection to the same store."""
+    backend = RedisBackend(f"redis://127.0.0.1:{resp_stand_in.port}")
+    yield backend
+    await backend.close()
+
+
+def _request(user_id):
+    request = Request({"type": "http", "client": ("10.0.0.1", 1234), "headers": []})
+    request.state.user_id = user_id
+    return request
+
+
+# ==================== GCRA SCRIPT ====================
+
+async def test_gcra_limit_holds_across_instances(backend, second_backend, resp_stand_in):
+    # 1 request/second sustained with a burst of 3
+    decisions = [
+        await instance.gcra("search:user:1", 1.0, 2.0)
+        for instance in (backend, second_backend, backend, second_backend)
+    ]
+
+    assert [allowed for allowed, _ in decisions] == [True, True, True, False]
+    assert 0.9 < decisions[-1][1] <= 1.0
+    # Another key has its own bucket
+    assert (await second_backend.gcra("search:user:2", 1.0, 2.0))[0]
+
+    calls = resp_stand_in.stats()["calls"]
+    # Only the very first call needed the script source; the server cache serves both instances
+    assert calls["EVAL"] == 1
+    assert calls["EVALSHA"] == 5
+
+
+async def test_noscript_after_restart_falls_back_to_eval_once(backend, resp_stand_in):
+    await backend.gcra("search:user:1", 1.0, 5.0)
+
+    resp_stand_in.flush_scripts()  # Server restarted
+    allowed, _ = await backend.gcra("search:user:1", 1.0, 5.0)
+    await backend.gcra("search:user:1", 1.0, 5.0)
+
+    assert allowed
+    calls = resp_stand_in.stats()["calls"]
+    assert calls["EVAL"] == 2  # First call ever, then once after the flush
+    assert calls["EVALSHA"] == 3
+
+
+async def test_script_error_reply_is_raised_without_retrying_eval(backend, resp_stand_in):
+    await backend.gcra("search:user:1", 1.0, 5.0)
+
+    with pytest.raises(SharedStateError, match="ERR"):
+        await backend._eval(backend._gcra, ["rl:search:user:1"], ["not-a-number", 1])
+
+    assert resp_stand_in.stats()["calls"]["EVAL"] == 1
+    # An error reply leaves the connection usable
+    assert backend.available
+    assert (await backend.gcra("search:user:1", 1.0, 5.0))[0]
+
+
+@pytest.mark.parametrize(
+    "interval, tolerance, pauses",
+    [
+        (1.0, 2.0, [0, 0, 0, 0, 0]),        # Burst of 3, then limited
+        (0.1, 0.0, [0, 0, 0.15, 0]),        # No burst; one slot back after an interval
+        (0.2, 0.2, [0, 0, 0, 0.3, 0, 0]),   # Partly refilled bucket
+    ],
+)
+async def test_gcra_port_matches_real_lua_script(redis_server, resp_stand_in, interval, tolerance, pauses):
+    real = RedisBackend(f"redis://127.0.0.1:{redis_server}")
+    port = RedisBackend(f"redis://127.0.0.1:{resp_stand_in.port}")
+    key = f"{real.prefix}rl:search:user:1"
+    try:
+        decisions = []
+        for pause in pauses:
+            await asyncio.sleep(pause)
+            # Same moment on both servers so their clocks agree on "now"
+            decisions.append(await asyncio.gather(
+                real.gcra("search:user:1", interval, tolerance),
+                port.gcra("search:user:1", interval, tolerance),
+            ))
+        ttls = await asyncio.gather(real.execute("PTTL", key), port.execute("PTTL", key))
+    finally:
+        await real.close()
+        await port.close()
+
+    assert [real_allowed for (real_allowed, _), _ in decisions] == [
+        port_allowed for _, (port_allowed, _) in decisions
+    ]
+    assert any(not allowed for (allowed, _), _ in decisions)
+    for (_, real_wait), (_, port_wait) in decisions:
+        assert abs(real_wait - port_wait) <= 0.02
+    # Both leave the bucket expiring when it is full again
+    assert abs(ttls[0] - ttls[1]) <= 20
+
+
+# ==================== PIPELINING ====================
+
+async def test_concurrent_commands_share_writes_and_keep_reply_order(backend, resp_stand_in):
+    await backend.cache_set("warmup", 0, 60)  # Connect first
+
+    await asyncio.gather(*(backend.cache_set(f"key{index}", {"n": index}, 60) for index in range(50)))
+    values = await asyncio.gather(*(backend.cache_get(f"key{index}") for index in range(50)))
+
+    assert [value for value, _ in values] == [{"n": index} for index in range(50)]
+    assert all(55 < ttl <= 60 for _, ttl in values)
+    # 100 commands from the sets, 100 from the gets (GET + PTTL each), in a handful of writes
+    assert backend.flushes <= 5
+    assert resp_stand_in.stats()["max_batch"] >= 50
+
+
+async def test_cache_miss_and_expiry(backend):
+
+    assert await backend.cache_get("missing") == (None, 0.0)
+    await backend.cache_set("short", [1, 2], 0.05)
+    await asyncio.sleep(0.1)
+    assert await backend.cache_get("short") == (None, 0.0)
+
+
+# ==================== UNREACHABLE STORE ====================
+
+@pytest.mark.parametrize("backend_options", [{"retry_seconds": 0.3}])
+async def test_store_down_fails_fast_then_reconnects(backend, resp_stand_in):
+    await backend.gcra("search:user:1", 1.0, 5.0)
+    port = resp_stand_in.port
+    await resp_stand_in.stop()
+
+    with pytest.raises(SharedStateUnavailable):
+        await backend.gcra("search:user:1", 1.0, 5.0)
+    assert not backend.available
+    errors = backend.errors
+
+    # Inside the retry window: no connection attempt, no waiting on the timeout
+    started = time.perf_counter()
+    with pytest.raises(SharedStateUnavailable):
+        await backend.cache_get("anything")
+    assert time.perf_counter() - started < 0.01
+    assert backend.errors == errors
+
+    await resp_stand_in.start(port=port)
+    await asyncio.sleep(0.3)
+    assert (await backend.gcra("search:user:1", 1.0, 5.0))[0]
+    assert backend.stats()["connections_opened"] == 2
+
+
+@pytest.mark.parametrize("backend_options", [{"timeout": 0.05}])
+async def test_slow_store_times_out_and_is_marked_down(backend, resp_stand_in):
+    await backend.cache_set("warmup", 0, 60)
+    resp_stand_in.latency = 0.5
+
+    with pytest.raises(SharedStateUnavailable, match="timed out"):
+        await backend.cache_get("warmup")
+
+    assert not backend.available
+
+
+async def test_auth_handshake():
+    server = RespStandIn(password="s3cret")
+    port = await server.start()
+    good = RedisBackend(f"redis://:s3cret@127.0.0.1:{port}/2")
+    bad = RedisBackend(f"redis://:wrong@127.0.0.1:{port}")
+    try:
+        await good.cache_set("k", "v", 60)
+        assert (await good.cache_get("k"))[0] == "v"
+
+        with pytest.raises(SharedStateUnavailable, match="WRONGPASS"):
+            await bad.cache_get("k")
+        assert not bad.available
+    finally:
+        await good.close()
+        await bad.close()
+        await server.stop()
+
+
+# ==================== CALLERS: NEAR-CACHE FALLBACK ====================
+
+async def test_rate_limit_is_shared_between_instances(backend, monkeypatch):
+    monkeypatch.setattr(rate_limit, "get_shared_state", lambda: backend)
+    instance_a, instance_b = RateLimiter(enabled=True), RateLimiter(enabled=True)
+
+    await instance_a.check(_request("1"), "search", "2/minute")
+    await instance_b.check(_request("1"), "search", "2/minute")
+    with pytest.raises(HTTPException) as error:
+        await instance_a.check(_request("1"), "search", "2/minute")
+
+    assert error.value.status_code == 429
+    assert int(error.value.headers["Retry-After"]) >= 1
+    store = instance_a.rule("search", "2/minute")
+    assert store.shared_limited == 1
+    # The denied request doesn't use up local budget
+    assert store.stats()["allowed"] == 1
+
+
+@pytest.mark.parametrize("backend_options", [{"retry_seconds": 60}])
+async def test_rate_limit_falls_back_to_local_state_when_store_is_down(backend, resp_stand_in, monkeypatch):
+    monkeypatch.setattr(rate_limit, "get_shared_state", lambda: backend)
+    limiter = RateLimiter(enabled=True)
+    await resp_stand_in.stop()
+
+    await limiter.check(_request("1"), "search", "2/minute")
+    await limiter.check(_request("1"), "search", "2/minute")
+    with pytest.raises(HTTPException):
+        await limiter.check(_request("1"), "search", "2/minute")
+
+    store = limiter.rule("search", "2/minute")
+    assert store.shared_fallbacks == 2
+    assert not backend.available
+
+
+@pytest.mark.parametrize("backend_options", [{"retry_seconds": 60}])
+async def test_result_cache_serves_local_tier_when_store_is_down(backend, resp_stand_in, monkeypatch):
+    monkeypatch.setattr(result_cache, "get_shared_state", lambda: backend)
+    writer, reader = ResultCache("offenders", ttl=60), ResultCache("offenders", ttl=60)
+
+    await writer.set("jane", ["record"])
+    # Another instance finds it in the shared tier
+    assert await reader.get("jane") == ["record"]
+    assert reader.shared_hits == 1
+
+    await resp_stand_in.stop()
+    assert await writer.get("jane") == ["record"]  # Memory tier, store not consulted
+    assert await reader.get("john") is None
+
+    assert reader.shared_errors == 1
+    assert not backend.available
@@ -0,0 +1,212 @@
+"""TinEye client against the provider stand-in: uploads, result parsing and errors."""
+
+import io
+from datetime import datetime
+from types import SimpleNamespace
+from urllib.parse import urlparse
+
+import httpx
+import pytest
+
+from services import circuit_breaker, tineye_service
+from services.provider_registry import ProviderRegistry
+from services.tineye_client import TinEyeAPIError, TinEyeClient, parse_search_response
+from services.tineye_service import TinEyeService
+
+FAST = {"latency_ms": 5, "jitter_ms": 0}
+
+
+def _tineye_config(**settings):
+    return {"tineye": {**FAST, **settings}}
+
+
+@pytest.fixture
+def stub_config():
+    return _tineye_config()
+
+
+@pytest.fixture
+async def tineye(stub_url):
+    """TinEyeClient pointed at the stand-in."""
+    async with httpx.AsyncClient() as http:
+        yield TinEyeClient(http, "test-key", f"{stub_url}/tineye/rest/")
+
+
+async def _stub_stats(base_url):
+    async with httpx.AsyncClient() as client:
+        return (await client.get(f"{base_url}/stats")).json()
+
+
+class _ChunkRecordingFile(io.BytesIO):
+    """File object that records every read() size."""
+
+    def __init__(self, data: bytes):
+        super().__init__(data)
+        self.reads = []
+
+    def read(self, size=-1):
+        self.reads.append(size)
+        return super().read(size)
+
+
+# ==================== UPLOADS ====================
+
+@pytest.mark.parametrize("stub_config", [_tineye_config(matches=2, backlinks=1)])
+async def test_file_upload_is_streamed_in_chunks(tineye, stub_url):
+    image = _ChunkRecordingFile(b"\xff\xd8" + b"x" * (3 * 1024 * 1024))
+
+    result = await tineye.search_data(image)
+
+    assert result["total_matches"] == 2
+    assert (await _stub_stats(stub_url))["upload_bytes"] == {"tineye": 3 * 1024 * 1024 + 2}
+    # Never read whole: httpx pulls bounded chunks from the file
+    assert image.reads and all(0 < size <= 64 * 1024 for size in image.reads)
+
+
+@pytest.mark.parametrize("stub_config", [_tineye_config(matches=3, backlinks=2)])
+async def test_bytes_upload_and_url_search(tineye, stub_url):
+    from_bytes = await tineye.search_data(b"\xff\xd8image")
+    from_url = await tineye.search_url("https://example.com/photo.jpg")
+
+    assert from_bytes == from_url
+    assert from_bytes["total_backlinks"] == 6
+    stats = await _stub_stats(stub_url)
+    assert stats["calls"] == {"tineye": 2}
+    assert stats["upload_bytes"] == {"tineye": 7}
+
+
+async def test_remaining_searches(tineye):
+    remaining = await tineye.remaining_searches()
+
+    assert remaining == {"bundles": [], "total_remaining_searches": 100000}
+
+
+# ==================== RESPONSE PARSING ====================
+
+def _legacy_transform(response):
+    """TinEyeService._transform_response from before the native client (pytineye objects)."""
+    results = []
+    total_backlinks = 0
+    matches = getattr(response, "matches", []) or []
+    for match in matches:
+        backlinks = getattr(match, "backlinks", []) or []
+        total_backlinks += len(backlinks)
+        for backlink in backlinks:
+            url = getattr(backlink, "url", "") or ""
+            results.append({
+                "domain": urlparse(url).netloc if url else "Unknown",
+                "page_url": getattr(backlink, "url", ""),
+                "image_url": getattr(backlink, "backlink", ""),
+                "crawl_date": backlink.crawl_date.isoformat() if getattr(backlink, "crawl_date", None) else None,
+            })
+
+    seen_urls = set()
+    unique_results = []
+    for result in results:
+        if result["page_url"] and result["page_url"] not in seen_urls:
+            seen_urls.add(result["page_url"])
+            unique_results.append(result)
+
+    stats = getattr(response, "stats", {}) or {}
+    return {
+        "total_matches": stats.get("total_results", len(matches)),
+        "total_backlinks": stats.get("total_backlinks", total_backlinks),
+        "results": unique_results[:50],
+        "stats": stats,
+    }
+
+
+def _as_pytineye(payload):
+    """The objects pytineye built from a payload (crawl dates parsed to datetimes)."""
+    def backlink(raw):
+        crawl_date = datetime.strptime(raw["crawl_date"], "%Y-%m-%d") if raw.get("crawl_date") else None
+        return SimpleNamespace(url=raw.get("url", ""), backlink=raw.get("backlink", ""), crawl_date=crawl_date)
+
+    matches = [
+        SimpleNamespace(backlinks=[backlink(raw) for raw in match.get("backlinks", [])])
+        for match in payload["results"]["matches"]
+    ]
+    return SimpleNamespace(matches=matches, stats=payload.get("stats", {}))
+
+
+@pytest.mark.parametrize("with_stats", [True, False])
+def test_parse_matches_legacy_transform(with_stats):
+    matches = [
+        {"backlinks": [
+            {"url": f"https://site{match}.example.com/p/{link}",
+             "backlink": f"https://cdn.example.com/{match}/{link}.jpg",
+             "crawl_date": "2024-05-01" if link % 2 else "2019-12-31"}
+            for link in range(3)
+        ]}
+        for match in range(25)  # 75 pages: exercises the 50-result cap
+    ]
+    matches.append({"backlinks": [
+        {"url": "https://site0.example.com/p/0", "backlink": "dup.jpg", "crawl_date": "2024-01-01"},  # Duplicate page
+        {"url": "", "backlink": "no-page.jpg", "crawl_date": "2024-01-01"},                          # No page URL
+        {"url": "https://nodate.example.com/", "backlink": "x.jpg"},                                 # No crawl date
+    ]})
+    matches.append({"backlinks": []})
+    payload = {"code": 200, "results": {"matches": matches}}
+    if with_stats:
+        payload["stats"] = {"total_results": 4321, "total_backlinks": 9999, "timestamp": "1700000000"}
+
+    assert parse_search_response(payload) == _legacy_transform(_as_pytineye(payload))
+
+
+def test_parse_unparseable_crawl_date_is_none():
+    payload = {"results": {"matches": [{"backlinks": [{"url": "https://a.example.com/", "crawl_date": "bad"}]}]}}
+
+    result = parse_search_response(payload)
+
+    assert result["results"] == [
+        {"domain": "a.example.com", "page_url": "https://a.example.com/", "image_url": "", "crawl_date": None}
+    ]
+    assert result["total_matches"] == 1
+    assert result["total_backlinks"] == 1
+
+
+# ==================== ERRORS ====================
+
+@pytest.mark.parametrize("stub_config", [_tineye_config(error_rate=1.0, error_status=503)])
+async def test_http_error_maps_to_api_error(tineye):
+    with pytest.raises(TinEyeAPIError) as raised:
+        await tineye.search_data(b"image")
+
+    assert raised.value.code == 503
+    assert raised.value.messages == ["stub error"]
+
+
+async def test_error_code_in_ok_response_maps_to_api_error():
+    transport = httpx.MockTransport(
+        lambda request: httpx.Response(200, json={"code": 400, "messages": ["Image too simple"], "results": {}})
+    )
+    async with httpx.AsyncClient(transport=transport) as http:
+        with pytest.raises(TinEyeAPIError) as raised:
+            await TinEyeClient(http, "test-key").search_url("https://example.com/a.jpg")
+
+    assert raised.value.code == 400
+    assert "Image too simple" in str(raised.value)
+
+
+async def test_non_json_body_maps_to_api_error():
+    transport = httpx.MockTransport(lambda request: httpx.Response(502, text="<html>Bad gateway</html>"))
+    async with httpx.AsyncClient(transport=transport) as http:
+        with pytest.raises(TinEyeAPIError) as raised:
+            await TinEyeClient(http, "test-key").remaining_searches()
+
+    assert raised.value.code == 502
+    assert "Could not decode JSON" in str(raised.value)
+
+
+@pytest.mark.parametrize("stub_config", [_tineye_config(error_rate=1.0, error_status=429)])
+async def test_service_wraps_api_errors(stub_url, monkeypatch):
+    monkeypatch.setenv("TINEYE_API_KEY", "test-key")
+    monkeypatch.setattr(tineye_service, "TINEYE_API_URL", f"{stub_url}/tineye/rest/")
+    monkeypatch.setattr(circuit_breaker, "_breakers", {})
+    registry = ProviderRegistry()
+
+    try:
+        with pytest.raises(Exception, match="Image search failed: TinEye API error 429"):
+            await TinEyeService(registry=registry).search_by_url("https://example.com/a.jpg")
+    finally:
+        await registry.aclose()
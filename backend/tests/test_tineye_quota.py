@@ -0,0 +1,61 @@
+"""TinEye quota cache: backoff while TinEye is unavailable and low-quota alerts."""
+
+from services import tineye_quota
+from services.metrics import LOW_QUOTA_ALERTS, render_metrics
+from services.tineye_quota import TinEyeQuota
+
+
+class _Fetcher:
+    def __init__(self, *answers):
+        self.answers = list(answers)
+        self.calls = 0
+
+    async def __call__(self) -> int:
+        self.calls += 1
+        answer = self.answers.pop(0) if len(self.answers) > 1 else self.answers[0]
+        if isinstance(answer, Exception):
+            raise answer
+        return answer
+
+
+async def test_get_backs_off_after_a_failed_fetch(monkeypatch):
+    fetch = _Fetcher(ValueError("TINEYE_API_KEY not configured in environment"), 500)
+    quota = TinEyeQuota(fetch_fn=fetch, retry_after=30)
+    now = [1000.0]
+    monkeypatch.setattr(tineye_quota.time, "monotonic", lambda: now[0])
+
+    for _ in range(5):
+        assert await quota.get() is None
+    assert fetch.calls == 1
+    assert quota.get_metrics()["skipped_fetches_total"] == 4
+    assert "not configured" in quota.get_metrics()["last_error"]
+
+    now[0] += 31
+    assert await quota.get() == 500
+    assert fetch.calls == 2
+
+
+async def test_get_uses_cached_value_without_fetching():
+    fetch = _Fetcher(250)
+    quota = TinEyeQuota(fetch_fn=fetch)
+
+    assert await quota.get() == 250
+    quota.decrement(10)
+    assert await quota.get() == 240
+    assert fetch.calls == 1
+
+
+async def test_low_quota_alert_is_exported_once_per_drop():
+    before = LOW_QUOTA_ALERTS.value("tineye")
+    quota = TinEyeQuota(fetch_fn=_Fetcher(101, 500), low_threshold=100)
+
+    await quota.refresh()
+    quota.decrement()
+    quota.decrement()
+    assert LOW_QUOTA_ALERTS.value("tineye") == before + 1
+
+    await quota.refresh()  # Topped up: alert re-armed
+    quota._remaining = 50
+    quota.decrement()
+    assert LOW_QUOTA_ALERTS.value("tineye") == before + 2
+    assert f'pinkflag_low_quota_alerts_total{{provider="tineye"}} {int(before) + 2}' in render_metrics()
@@ -0,0 +1,179 @@
+-- =====================================================
+-- Batch Credit Deduction
+-- Pink Flag Backend v2.0
+-- =====================================================
+--
+-- Batch endpoints (POST /api/phone/lookup/batch, POST /api/search/name/batch)
+-- charge the whole batch in ONE transaction instead of one
+-- deduct_credit_for_search call per item:
+--   - one row lock on the profile and one balance check for the total cost
+--   - one credit_transactions row for the total
+--   - one searches row per item, so failed items are refunded individually
+--     with refund_credit_for_failed_search()
+--
+-- Called by: backend/services/credit_service.py -> check_and_deduct_credits_batch()
+--
+-- p_items format (order is preserved in the returned search_ids):
+--   [
+--     {"query": "+14155552671", "cost": 2},
+--     {"query": "+12125550123", "cost": 2}
+--   ]
+--
+-- =====================================================
+
+-- =====================================================
+-- 1. Create deduct_credits_for_batch() function
+-- =====================================================
+
+CREATE OR REPLACE FUNCTION deduct_credits_for_batch(
+  p_user_id UUID,
+  p_search_type TEXT,
+  p_items JSONB
+)
+RETURNS JSONB
+LANGUAGE plpgsql
+SECURITY DEFINER
+AS $$
+DECLARE
+  v_current_credits INT;
+  v_new_credits INT;
+  v_total_cost INT;
+  v_transaction_id UUID;
+  v_search_ids JSONB;
+BEGIN
+  SELECT COALESCE(SUM((item->>'cost')::INT), 0) INTO v_total_cost
+  FROM jsonb_array_elements(p_items) AS item;
+
+  IF v_total_cost <= 0 THEN
+    RETURN jsonb_build_object(
+      'success', FALSE,
+      'error', 'empty_batch',
+      'credits', 0,
+      'message', 'Batch has no items'
+    );
+  END IF;
+
+  -- Get current credits with row lock
+  SELECT credits INTO v_current_credits
+  FROM profiles
+  WHERE id = p_user_id
+  FOR UPDATE;
+
+  -- Check if user exists
+  IF v_current_credits IS NULL THEN
+    RETURN jsonb_build_object(
+      'success', FALSE,
+      'error', 'user_not_found',
+      'credits', 0,
+      'message', 'User not found'
+    );
+  END IF;
+
+  -- Validate sufficient credits for the whole batch
+  IF v_current_credits < v_total_cost THEN
+    RETURN jsonb_build_object(
+      'success', FALSE,
+      'error', 'insufficient_credits',
+      'credits', v_current_credits,
+      'message', 'Insufficient credits. You need ' || v_total_cost || ' credit(s) but only have ' || v_current_credits || '.'
+    );
+  END IF;
+
+  -- Deduct credits once for the batch
+  v_new_credits := v_current_credits - v_total_cost;
+
+  UPDATE profiles
+  SET
+    credits = v_new_credits,
+    updated_at = NOW()
+  WHERE id = p_user_id;
+
+  -- Record one credit deduction transaction for the batch
+  INSERT INTO credit_transactions (
+    user_id,
+    transaction_type,
+    credits,
+    status,
+    provider,
+    created_at
+  ) VALUES (
+    p_user_id,
+    'deduct',
+    v_total_cost,
+    'completed',
+    'batch_search',
+    NOW()
+  )
+  RETURNING id INTO v_transaction_id;
+
+  -- Ids are generated up front so they can be returned in item order
+  SELECT jsonb_agg(gen_random_uuid() ORDER BY item.position) INTO v_search_ids
+  FROM jsonb_array_elements(p_items) WITH ORDINALITY AS item(value, position);
+
+  -- Create one search record per item (single multi-row insert)
+  INSERT INTO searches (
+    id,
+    user_id,
+    query,
+    search_type,
+    results_count,
+    refunded,
+    created_at,
+    updated_at
+  )
+  SELECT
+    (v_search_ids->>(item.position::INT - 1))::UUID,
+    p_user_id,
+    item.value->>'query',
+    COALESCE(p_search_type, 'pending'),
+    0,
+    FALSE,
+    NOW(),
+    NOW()
+  FROM jsonb_array_elements(p_items) WITH ORDINALITY AS item(value, position);
+
+  -- Return success
+  RETURN jsonb_build_object(
+    'success', TRUE,
+    'search_ids', v_search_ids,
+    'credits', v_new_credits,
+    'total_cost', v_total_cost,
+    'transaction_id', v_transaction_id,
+    'message', 'Credits deducted for batch. Remaining credits: ' || v_new_credits
+  );
+
+EXCEPTION
+  WHEN OTHERS THEN
+    RETURN jsonb_build_object(
+      'success', FALSE,
+      'error', 'database_error',
+      'credits', 0,
+      'message', 'Database error: ' || SQLERRM
+    );
+END;
+$$;
+
+COMMENT ON FUNCTION deduct_credits_for_batch IS 'Deducts credits for a batch of searches in one transaction and creates one search entry per item';
+
+-- =====================================================
+-- 2. Grant execute permissions (backend only)
+-- =====================================================
+
+REVOKE EXECUTE ON FUNCTION deduct_credits_for_batch(UUID, TEXT, JSONB) FROM PUBLIC;
+GRANT EXECUTE ON FUNCTION deduct_credits_for_batch(UUID, TEXT, JSONB) TO service_role;
+
+-- =====================================================
+-- 3. Verification
+-- =====================================================
+
+SELECT proname, prorettype::regtype
+FROM pg_proc
+WHERE proname = 'deduct_credits_for_batch';
+
+-- =====================================================
+-- ROLLBACK SCRIPT (use only if needed)
+-- =====================================================
+
+/*
+DROP FUNCTION IF EXISTS deduct_credits_for_batch(UUID, TEXT, JSONB);
+*/
@@ -0,0 +1,100 @@
+-- =====================================================
+-- Batched Search History Updates
+-- Pink Flag Backend v2.0
+-- =====================================================
+--
+-- The backend buffers search history updates (results_count, search_type,
+-- metadata) and writes them in bulk. This function applies a whole batch
+-- with ONE multi-row UPDATE instead of one UPDATE per search.
+--
+-- Called by: backend/services/credit_service.py -> write_search_updates()
+--
+-- p_updates format:
+--   [
+--     {"id": "<search uuid>", "results_count": 3, "search_type": "name"},
+--     {"id": "<search uuid>", "results_count": 1, "search_type": "phone", "metadata": {...}}
+--   ]
+--
+-- =====================================================
+
+-- =====================================================
+-- 1. Make sure the columns written by the backend exist
+-- =====================================================
+
+ALTER TABLE searches
+ADD COLUMN IF NOT EXISTS metadata JSONB;
+
+ALTER TABLE searches
+ADD COLUMN IF NOT EXISTS updated_at TIMESTAMPTZ DEFAULT NOW();
+
+-- =====================================================
+-- 2. Create update_search_results_batch() function
+-- =====================================================
+
+CREATE OR REPLACE FUNCTION update_search_results_batch(
+  p_updates JSONB
+)
+RETURNS JSONB
+LANGUAGE plpgsql
+SECURITY DEFINER
+AS $$
+DECLARE
+  v_updated INT;
+BEGIN
+  -- Single statement for the whole batch.
+  -- search_type/metadata keep their current value when not provided.
+  UPDATE searches s
+  SET
+    results_count = u.results_count,
+    search_type = COALESCE(u.search_type, s.search_type),
+    metadata = COALESCE(u.metadata, s.metadata),
+    updated_at = NOW()
+  FROM jsonb_to_recordset(p_updates) AS u(
+    id UUID,
+    results_count INT,
+    search_type TEXT,
+    metadata JSONB
+  )
+  WHERE s.id = u.id;
+
+  GET DIAGNOSTICS v_updated = ROW_COUNT;
+
+  RETURN jsonb_build_object(
+    'success', TRUE,
+    'updated', v_updated
+  );
+
+EXCEPTION
+  WHEN OTHERS THEN
+    RETURN jsonb_build_object(
+      'success', FALSE,
+      'error', 'database_error',
+      'message', SQLERRM
+    );
+END;
+$$;
+
+COMMENT ON FUNCTION update_search_results_batch IS 'Applies a batch of search history updates (results_count, search_type, metadata) in one UPDATE';
+
+-- =====================================================
+-- 3. Grant execute permissions (backend only)
+-- =====================================================
+
+REVOKE EXECUTE ON FUNCTION update_search_results_batch(JSONB) FROM PUBLIC;
+GRANT EXECUTE ON FUNCTION update_search_results_batch(JSONB) TO service_role;
+
+-- =====================================================
+-- 4. Verification
+-- =====================================================
+
+SELECT proname, prorettype::regtype
+FROM pg_proc
+WHERE proname = 'update_search_results_batch';
+
+-- =====================================================
+-- ROLLBACK SCRIPT (use only if needed)
+-- =====================================================
+
+/*
+DROP FUNCTION IF EXISTS update_search_results_batch(JSONB);
+*/